@@ -0,0 +1,28 @@
+"""Add decision source and perception features to agent actions
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('agent_actions', sa.Column('decision_source', sa.String(length=50), nullable=True))
+    op.add_column('agent_actions', sa.Column('features', postgresql.JSON(astext_type=sa.Text()), nullable=True))
+    op.create_index(op.f('ix_agent_actions_decision_source'), 'agent_actions', ['decision_source'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_agent_actions_decision_source'), table_name='agent_actions')
+    op.drop_column('agent_actions', 'features')
+    op.drop_column('agent_actions', 'decision_source')
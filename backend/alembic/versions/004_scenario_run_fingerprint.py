@@ -0,0 +1,29 @@
+"""Add fingerprint and source run to scenario runs
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('scenario_runs', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.add_column('scenario_runs', sa.Column('source_run_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_scenario_runs_fingerprint'), 'scenario_runs', ['fingerprint'], unique=False)
+    op.create_foreign_key('fk_scenario_runs_source_run_id', 'scenario_runs', 'scenario_runs', ['source_run_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_scenario_runs_source_run_id', 'scenario_runs', type_='foreignkey')
+    op.drop_index(op.f('ix_scenario_runs_fingerprint'), table_name='scenario_runs')
+    op.drop_column('scenario_runs', 'source_run_id')
+    op.drop_column('scenario_runs', 'fingerprint')
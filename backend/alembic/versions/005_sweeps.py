@@ -0,0 +1,57 @@
+"""Add parameter sweeps
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sweeps',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('scenario_id', sa.Integer(), nullable=False),
+        sa.Column('parameters', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('design', sa.String(length=50), nullable=True),
+        sa.Column('design_size', sa.Integer(), nullable=True),
+        sa.Column('target_kpi', sa.String(length=100), nullable=True),
+        sa.Column('refine_rounds', sa.Integer(), nullable=True),
+        sa.Column('refine_batch', sa.Integer(), nullable=True),
+        sa.Column('max_runs', sa.Integer(), nullable=True),
+        sa.Column('current_round', sa.Integer(), nullable=True),
+        sa.Column('simulation_days', sa.Integer(), nullable=True),
+        sa.Column('seed', sa.Integer(), nullable=True),
+        sa.Column('run_config', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('results', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['scenario_id'], ['scenarios.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sweeps_id'), 'sweeps', ['id'], unique=False)
+    
+    op.add_column('scenario_runs', sa.Column('sweep_id', sa.Integer(), nullable=True))
+    op.add_column('scenario_runs', sa.Column('sweep_round', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_scenario_runs_sweep_id'), 'scenario_runs', ['sweep_id'], unique=False)
+    op.create_foreign_key('fk_scenario_runs_sweep_id', 'scenario_runs', 'sweeps', ['sweep_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_scenario_runs_sweep_id', 'scenario_runs', type_='foreignkey')
+    op.drop_index(op.f('ix_scenario_runs_sweep_id'), table_name='scenario_runs')
+    op.drop_column('scenario_runs', 'sweep_round')
+    op.drop_column('scenario_runs', 'sweep_id')
+    op.drop_index(op.f('ix_sweeps_id'), table_name='sweeps')
+    op.drop_table('sweeps')
@@ -0,0 +1,41 @@
+"""Add simulation rollups
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'simulation_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('resolution', sa.String(length=10), nullable=False),
+        sa.Column('ticks', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('series', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('minimum', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('maximum', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['run_id'], ['scenario_runs.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('run_id', 'resolution', name='uq_simulation_rollups_run_resolution')
+    )
+    op.create_index(op.f('ix_simulation_rollups_id'), 'simulation_rollups', ['id'], unique=False)
+    op.create_index(op.f('ix_simulation_rollups_run_id'), 'simulation_rollups', ['run_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_simulation_rollups_run_id'), table_name='simulation_rollups')
+    op.drop_index(op.f('ix_simulation_rollups_id'), table_name='simulation_rollups')
+    op.drop_table('simulation_rollups')
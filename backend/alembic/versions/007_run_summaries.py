@@ -0,0 +1,60 @@
+"""Add run summaries
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'run_summaries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('scenario_id', sa.Integer(), nullable=False),
+        sa.Column('sweep_id', sa.Integer(), nullable=True),
+        sa.Column('seed', sa.Integer(), nullable=True),
+        sa.Column('simulation_days', sa.Integer(), nullable=True),
+        sa.Column('ticks', sa.Integer(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('avg_commute_time', sa.Float(), nullable=True),
+        sa.Column('transit_modal_share', sa.Float(), nullable=True),
+        sa.Column('transit_ridership', sa.Integer(), nullable=True),
+        sa.Column('emissions_proxy', sa.Float(), nullable=True),
+        sa.Column('service_coverage', sa.Float(), nullable=True),
+        sa.Column('equity_index', sa.Float(), nullable=True),
+        sa.Column('series', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('groups', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.ForeignKeyConstraint(['run_id'], ['scenario_runs.id'], ),
+        sa.ForeignKeyConstraint(['scenario_id'], ['scenarios.id'], ),
+        sa.ForeignKeyConstraint(['sweep_id'], ['sweeps.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_run_summaries_id'), 'run_summaries', ['id'], unique=False)
+    op.create_index(op.f('ix_run_summaries_run_id'), 'run_summaries', ['run_id'], unique=True)
+    op.create_index(op.f('ix_run_summaries_scenario_id'), 'run_summaries', ['scenario_id'], unique=False)
+    op.create_index(op.f('ix_run_summaries_sweep_id'), 'run_summaries', ['sweep_id'], unique=False)
+    op.create_index(op.f('ix_run_summaries_completed_at'), 'run_summaries', ['completed_at'], unique=False)
+    op.create_index(op.f('ix_scenario_runs_scenario_id'), 'scenario_runs', ['scenario_id'], unique=False)
+    op.create_index(op.f('ix_scenario_runs_status'), 'scenario_runs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_scenario_runs_status'), table_name='scenario_runs')
+    op.drop_index(op.f('ix_scenario_runs_scenario_id'), table_name='scenario_runs')
+    op.drop_index(op.f('ix_run_summaries_completed_at'), table_name='run_summaries')
+    op.drop_index(op.f('ix_run_summaries_sweep_id'), table_name='run_summaries')
+    op.drop_index(op.f('ix_run_summaries_scenario_id'), table_name='run_summaries')
+    op.drop_index(op.f('ix_run_summaries_run_id'), table_name='run_summaries')
+    op.drop_index(op.f('ix_run_summaries_id'), table_name='run_summaries')
+    op.drop_table('run_summaries')
@@ -0,0 +1,31 @@
+"""Store minute rollups one row per simulated day
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('simulation_rollups', sa.Column('chunk', sa.Integer(), server_default='0', nullable=False))
+    op.drop_constraint('uq_simulation_rollups_run_resolution', 'simulation_rollups', type_='unique')
+    op.create_unique_constraint(
+        'uq_simulation_rollups_run_resolution_chunk', 'simulation_rollups', ['run_id', 'resolution', 'chunk']
+    )
+
+
+def downgrade() -> None:
+    # Minute samples span one row per day; drop them rather than keep a partial first day
+    op.execute("DELETE FROM simulation_rollups WHERE resolution = 'minute'")
+    op.drop_constraint('uq_simulation_rollups_run_resolution_chunk', 'simulation_rollups', type_='unique')
+    op.create_unique_constraint('uq_simulation_rollups_run_resolution', 'simulation_rollups', ['run_id', 'resolution'])
+    op.drop_column('simulation_rollups', 'chunk')
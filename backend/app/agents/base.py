@@ -2,21 +2,160 @@
 Base agent class with LLM reasoning capabilities
 """
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Dict, List, Optional, Any
+import random
+import time
+import anthropic
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import HumanMessage, SystemMessage
+from langchain_core.pydantic_v1 import root_validator
 import structlog
 
 from app.core.config import settings
+from app.agents.prompting import TokenStats
+from app.core.metrics import RunProfiler
+from app.core.rng import StreamKey, child_key, python_random
+from app.core.tracing import tracer
 
 logger = structlog.get_logger()
 
+_llm_clients: Dict[str, Any] = {}
+_llm_attempts: ContextVar[Optional[List[int]]] = ContextVar("llm_attempts", default=None)
+
+
+@contextmanager
+def numbered_attempts():
+    """Number the HTTP attempts of one LLM call, SDK retries included, in the X-Mock-Attempt header"""
+    token = _llm_attempts.set([0])
+    try:
+        yield
+    finally:
+        _llm_attempts.reset(token)
+
+
+def _tag_attempt(request: httpx.Request):
+    attempts = _llm_attempts.get()
+    if attempts is not None:
+        request.headers["X-Mock-Attempt"] = str(attempts[0])
+        attempts[0] += 1
+
+
+def attempt_http_client(**kwargs) -> httpx.Client:
+    """HTTP client for the chat SDKs that tags requests made inside ``numbered_attempts``.
+
+    openai 1.6.1 sends no retry count, so without this the mock server
+    would see every retry as attempt 0 and repeat an injected fault.
+    """
+    return httpx.Client(event_hooks={"request": [_tag_attempt]}, **kwargs)
+
+
+class _ChatAnthropic(ChatAnthropic):
+    """ChatAnthropic whose SDK client honours base URL, timeout and retries (langchain-anthropic 0.1.0 passes only the key)"""
+
+    max_retries: int = 2
+    http_client: Any = None
+
+    @root_validator()
+    def _configure_client(cls, values: Dict) -> Dict:
+        options = {"timeout": values["default_request_timeout"]} if values.get("default_request_timeout") else {}
+        values["_client"] = anthropic.Client(
+            api_key=values["anthropic_api_key"].get_secret_value(),
+            base_url=values["anthropic_api_url"],
+            max_retries=values["max_retries"],
+            http_client=values["http_client"],
+            **options
+        )
+        return values
+
+
+def get_llm(provider: str = "openai"):
+    """Return the shared chat client for a provider, or None when no API key is configured.
+
+    Setting OPENAI_BASE_URL / ANTHROPIC_BASE_URL points the clients at a
+    compatible endpoint such as the bundled mock server (app.mock_llm), and
+    then numbers each request's attempts for its fault injection.
+    """
+    if provider in _llm_clients:
+        return _llm_clients[provider]
+    
+    if provider == "openai" and settings.OPENAI_API_KEY:
+        llm = ChatOpenAI(
+            model=settings.OPENAI_MODEL,
+            temperature=0.7,
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=attempt_http_client() if settings.OPENAI_BASE_URL else None
+        )
+    elif provider == "anthropic" and settings.ANTHROPIC_API_KEY:
+        llm = _ChatAnthropic(
+            model=settings.ANTHROPIC_MODEL,
+            temperature=0.7,
+            anthropic_api_key=settings.ANTHROPIC_API_KEY,
+            anthropic_api_url=settings.ANTHROPIC_BASE_URL or "https://api.anthropic.com",
+            default_request_timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=attempt_http_client() if settings.ANTHROPIC_BASE_URL else None
+        )
+    else:
+        logger.warning("No LLM API key found, using mock LLM", provider=provider)
+        llm = None
+    
+    _llm_clients[provider] = llm
+    return llm
+
+
+# Agent state kept in memory entries older than the latest (what feature extraction and routing read)
+MEMORY_STATE_KEYS = (
+    "current_location", "current_activity", "current_mode", "preferred_mode", "commute_time", "satisfaction"
+)
+
+
+def get_llm(provider: str = "openai"):
+    """Return the shared chat client for a provider, or None when no API key is configured.
+
+    Setting OPENAI_BASE_URL / ANTHROPIC_BASE_URL points the clients at a
+    compatible endpoint such as the bundled mock server (app.mock_llm).
+    """
+    if provider in _llm_clients:
+        return _llm_clients[provider]
+    
+    if provider == "openai" and settings.OPENAI_API_KEY:
+        llm = ChatOpenAI(
+            model=settings.OPENAI_MODEL,
+            temperature=0.7,
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES
+        )
+    elif provider == "anthropic" and settings.ANTHROPIC_API_KEY:
+        llm = ChatAnthropic(
+            model=settings.ANTHROPIC_MODEL,
+            temperature=0.7,
+            anthropic_api_key=settings.ANTHROPIC_API_KEY,
+            anthropic_api_url=settings.ANTHROPIC_BASE_URL or "https://api.anthropic.com",
+            default_request_timeout=settings.LLM_TIMEOUT_SECONDS
+        )
+    else:
+        logger.warning("No LLM API key found, using mock LLM", provider=provider)
+        llm = None
+    
+    _llm_clients[provider] = llm
+    return llm
+
 
 class BaseAgent(ABC):
     """Base class for all agents with LLM reasoning"""
     
+    memory_limit: int = settings.AGENT_MEMORY_LIMIT
+    
     def __init__(
         self,
         agent_id: str,
@@ -29,29 +168,54 @@ class BaseAgent(ABC):
         self.persona_config = persona_config
         self.state: Dict[str, Any] = {}
         self.memory: List[Dict[str, Any]] = []
+        self.token_stats: Optional[TokenStats] = None  # Shared per-run accounting, set by the model
+        self.profiler: Optional[RunProfiler] = None  # Shared per-run profiling, set by the model
+        self.rng_key: Optional[StreamKey] = None  # This step's stream (run seed, agent, tick), set by the scheduler
+        self.population_row: Optional[int] = None  # Row in the run's synthetic population, set when synthesized
+        self._rng: Optional[random.Random] = None
+        self._rng_key: Optional[StreamKey] = None
+        self._decider_rng: Optional[random.Random] = None
+        self._decider_rng_key: Optional[StreamKey] = None
         
-        # Initialize LLM
-        if llm_provider == "openai" and settings.OPENAI_API_KEY:
-            self.llm = ChatOpenAI(
-                model="gpt-4-turbo-preview",
-                temperature=0.7,
-                api_key=settings.OPENAI_API_KEY
-            )
-        elif llm_provider == "anthropic" and settings.ANTHROPIC_API_KEY:
-            self.llm = ChatAnthropic(
-                model="claude-3-opus-20240229",
-                temperature=0.7,
-                api_key=settings.ANTHROPIC_API_KEY
-            )
-        else:
-            logger.warning("No LLM API key found, using mock LLM")
-            self.llm = None
+        # Initialize LLM (clients are shared between agents of the same provider)
+        self.llm_provider = llm_provider
+        self.llm = get_llm(llm_provider)
+    
+    @property
+    def unique_id(self) -> str:
+        """Identifier used by the scheduler and the Mesa grid"""
+        return self.agent_id
+    
+    @property
+    def rng(self) -> random.Random:
+        """Random stream for the current step's decision.
+
+        Derived from ``rng_key`` (run seed, agent and tick), so draws are the
+        same whichever process steps the agent; unseeded runs draw freely.
+        """
+        if self._rng is None or self._rng_key != self.rng_key:
+            self._rng = python_random(child_key(self.rng_key, "decide"))
+            self._rng_key = self.rng_key
+        return self._rng
+    
+    @property
+    def decider_rng(self) -> random.Random:
+        """Random stream for batch deciders acting for this agent in the current step (archetypes, surrogate).
+
+        Apart from ``rng``, so a decider's draws never shift the agent's own
+        reasoning; one generator per agent and step serves all of them.
+        """
+        if self._decider_rng is None or self._decider_rng_key != self.rng_key:
+            self._decider_rng = python_random(child_key(self.rng_key, "deciders"))
+            self._decider_rng_key = self.rng_key
+        return self._decider_rng
     
     def perceive(self, environment_state: Dict[str, Any]) -> Dict[str, Any]:
         """Perceive the current environment state"""
         perception = {
             "timestamp": environment_state.get("timestamp"),
             "location": self.state.get("location"),
+            "agent_state": dict(self.state),
             "nearby_agents": environment_state.get("agents", []),
             "city_state": environment_state.get("city_state", {}),
             "events": environment_state.get("events", [])
@@ -66,24 +230,41 @@ class BaseAgent(ABC):
         """Use LLM to reason about the current situation"""
         if not self.llm:
             # Fallback to simple rule-based reasoning
-            return self._simple_reason(perception)
+            return dict(self._simple_reason(perception), source="rule")
         
         # Build prompt with context
         prompt = self._build_reasoning_prompt(perception, retrieved_docs)
         
+        system_prompt = self._get_system_prompt()
+        if self.token_stats is not None:
+            self.token_stats.record(self.agent_type, system_prompt, prompt)
+        
+        start = time.perf_counter()
         try:
+            # Static system prompt first so providers can reuse the cached prefix
             messages = [
-                SystemMessage(content=self._get_system_prompt()),
+                SystemMessage(content=system_prompt),
                 HumanMessage(content=prompt)
             ]
-            response = self.llm.invoke(messages)
+            with tracer.start_as_current_span("agent.reason", attributes={
+                "agent.id": self.agent_id,
+                "agent.type": self.agent_type,
+                "llm.provider": self.llm_provider,
+                "llm.prompt_chars": len(prompt)
+            }), numbered_attempts():
+                response = self.llm.invoke(messages)
+            if self.profiler is not None:
+                self.profiler.observe_llm(self.agent_type, self.llm_provider, time.perf_counter() - start)
             reasoning = self._parse_llm_response(response.content)
             reasoning["retrieved_docs"] = retrieved_docs
             reasoning["prompt_used"] = prompt
+            reasoning["source"] = "llm"
             return reasoning
         except Exception as e:
+            if self.profiler is not None:
+                self.profiler.observe_llm(self.agent_type, self.llm_provider, time.perf_counter() - start, outcome="error")
             logger.error("LLM reasoning failed", error=str(e), agent_id=self.agent_id)
-            return self._simple_reason(perception)
+            return dict(self._simple_reason(perception), source="rule")
     
     def act(self, reasoning: Dict[str, Any]) -> Dict[str, Any]:
         """Execute an action based on reasoning"""
@@ -105,17 +286,49 @@ class BaseAgent(ABC):
         """Complete agent step: perceive -> reason -> act"""
         perception = self.perceive(environment_state)
         reasoning = self.reason(perception, retrieved_docs)
+        return self.commit(perception, reasoning)
+    
+    def step_with_reasoning(self, environment_state: Dict[str, Any], reasoning: Dict[str, Any]) -> Dict[str, Any]:
+        """Complete agent step using reasoning produced by another agent (no LLM call)"""
+        perception = self.perceive(environment_state)
+        return self.commit(perception, self.adapt_reasoning(reasoning))
+    
+    def adapt_reasoning(self, reasoning: Dict[str, Any]) -> Dict[str, Any]:
+        """Adapt reasoning shared from another agent to this agent's own state"""
+        adapted = dict(reasoning)
+        adapted["action_data"] = dict(reasoning.get("action_data", {}))
+        return adapted
+    
+    def commit(self, perception: Dict[str, Any], reasoning: Dict[str, Any]) -> Dict[str, Any]:
+        """Act on reasoning decided for ``perception`` and store the step in memory.
+
+        ``step`` calls this right after reasoning; the staged scheduler calls it
+        once every agent has perceived and decided, so all act on the same state.
+        """
         action = self.act(reasoning)
-        
-        # Store in memory
-        self.memory.append({
+
+        self.remember({
             "perception": perception,
             "reasoning": reasoning,
             "action": action
         })
-        
+
         return action
     
+    def remember(self, entry: Dict[str, Any]):
+        """Append a step to memory, slimming the previous entry and keeping at most ``memory_limit`` steps.
+
+        Only the latest entry keeps its full perception (shared city state,
+        nearby agents, the whole agent state); older ones keep the timestamp,
+        location and the few state fields read back later. The previous entry
+        is replaced rather than edited, so callers holding it still see it whole.
+        """
+        if self.memory:
+            self.memory[-1] = compact_memory(self.memory[-1])
+        self.memory.append(entry)
+        if len(self.memory) > self.memory_limit:
+            del self.memory[:-self.memory_limit]
+    
     @abstractmethod
     def _get_system_prompt(self) -> str:
         """Get system prompt for this agent type"""
@@ -149,3 +362,14 @@ class BaseAgent(ABC):
         """Update agent state based on executed action"""
         # Override in subclasses
         pass
+
+
+def compact_memory(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Memory entry without shared environment references and with only MEMORY_STATE_KEYS of the agent state"""
+    perception = entry.get("perception") or {}
+    state = perception.get("agent_state") or {}
+    return {**entry, "perception": {
+        "timestamp": perception.get("timestamp"),
+        "location": perception.get("location"),
+        "agent_state": {key: state[key] for key in MEMORY_STATE_KEYS if key in state}
+    }}
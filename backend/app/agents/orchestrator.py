@@ -3,6 +3,7 @@ Orchestrator agent - coordinates simulation and aggregates KPIs
 """
 from typing import Dict, List, Optional, Any
 from app.agents.base import BaseAgent
+from app.agents.prompting import PromptBuilder
 import structlog
 
 logger = structlog.get_logger()
@@ -35,23 +36,22 @@ class OrchestratorAgent(BaseAgent):
         current_tick = self.state.get("current_tick", 0)
         scenario_config = self.state.get("scenario_config", {})
         
-        prompt = f"""Simulation state:
+        builder = PromptBuilder(self.agent_type)
+        builder.add("simulation_state", f"""Simulation state:
 - Current tick: {current_tick}
 - Simulation days: {self.state.get('simulation_days', 7)}
 - Scenario: {scenario_config.get('name', 'default')}
 - Policy: {scenario_config.get('policy_type', 'none')}
-
-Current KPIs:
+""")
+        builder.add("kpis", f"""Current KPIs:
 {self.state.get('kpis', {})}
-
-Safety constraints:
+""")
+        builder.add("safety_constraints", f"""Safety constraints:
 {self.state.get('safety_constraints', {})}
-
-"""
-        
-        prompt += "\nWhat should happen in the next simulation tick? Coordinate agent actions and update metrics."
+""", priority=1)
+        builder.instruct("What should happen in the next simulation tick? Coordinate agent actions and update metrics.")
         
-        return prompt
+        return builder.build()
     
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         """Parse LLM response for orchestrator actions"""
@@ -65,13 +65,17 @@ Safety constraints:
             "confidence": 0.9
         }
     
-    def aggregate_kpis(self, agent_states: List[Dict], city_state: Dict) -> Dict[str, Any]:
-        """Aggregate KPIs from agent states and city state"""
-        # Calculate aggregate metrics
+    def aggregate_kpis(self, window_kpis: Dict[str, Any], city_state: Dict) -> Dict[str, Any]:
+        """Combine the current window's KPIs (maintained incrementally by the model) with city state indicators.
+
+        Commute time and modal share are None for a window without trips or
+        moves; run totals are only written with the final metrics.
+        """
         kpis = {
-            "avg_commute_time": city_state.get("avg_commute_time", 0),
+            "avg_commute_time": window_kpis.get("avg_commute_time"),
             "transit_ridership": city_state.get("transit_ridership", 0),
-            "transit_modal_share": city_state.get("transit_modal_share", 0),
+            "transit_boardings": window_kpis.get("transit_boardings", {}),
+            "transit_modal_share": window_kpis.get("transit_modal_share"),
             "service_coverage": city_state.get("service_coverage", 0),
             "equity_index": city_state.get("equity_index", 0.7),
             "emissions_proxy": city_state.get("emissions_proxy", 0)
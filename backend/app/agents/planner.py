@@ -3,6 +3,7 @@ Planner agent - proposes policies and reads regulations
 """
 from typing import Dict, List, Optional, Any
 from app.agents.base import BaseAgent
+from app.agents.prompting import PromptBuilder, format_documents
 import structlog
 
 logger = structlog.get_logger()
@@ -37,27 +38,20 @@ class PlannerAgent(BaseAgent):
         city_state = perception.get("city_state", {})
         current_metrics = city_state.get("metrics", {})
         
-        prompt = f"""Current city metrics:
+        builder = PromptBuilder(self.agent_type)
+        builder.add_static(format_documents(retrieved_docs, 5, 300, "Relevant regulations and case studies:"))
+        builder.add("metrics", f"""Current city metrics:
 - Average commute time: {current_metrics.get('avg_commute_time', 'N/A')} minutes
 - Transit modal share: {current_metrics.get('transit_modal_share', 'N/A')}
 - Service coverage: {current_metrics.get('service_coverage', 'N/A')}
 - Equity index: {current_metrics.get('equity_index', 'N/A')}
-
-Budget constraints:
+""")
+        builder.add("budget", f"""Budget constraints:
 {self.state.get('budget_constraints', {})}
-
-"""
-        
-        if retrieved_docs:
-            prompt += "\nRelevant regulations and case studies:\n"
-            for i, doc in enumerate(retrieved_docs[:5], 1):
-                prompt += f"{i}. {doc.get('title', 'Document')}\n"
-                prompt += f"   Type: {doc.get('document_type', 'unknown')}\n"
-                prompt += f"   Content: {doc.get('content', '')[:300]}...\n\n"
-        
-        prompt += "\nBased on the current state and regulations, what policy should you propose? Provide specific recommendations with citations."
+""", priority=1)
+        builder.instruct("Based on the current state and regulations, what policy should you propose? Provide specific recommendations with citations.")
         
-        return prompt
+        return builder.build()
     
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         """Parse LLM response for planner actions"""
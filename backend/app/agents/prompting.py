@@ -0,0 +1,203 @@
+"""
+Token-budgeted prompt building for agent reasoning
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Iterable
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load the tiktoken encoding lazily; None when unavailable (e.g. offline)"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning("tiktoken unavailable, estimating token counts", error=str(e))
+    return _encoding
+
+
+@lru_cache(maxsize=1024)
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, falling back to a 4-chars-per-token estimate"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+class CompactPrompt(str):
+    """Prompt string carrying its token count and the sections dropped to fit the budget"""
+
+    tokens: int = 0
+    budget: int = 0
+    dropped_sections: tuple = ()
+
+
+class PromptBuilder:
+    """Assemble a reasoning prompt from sections within a per-agent-type token budget.
+
+    Static sections (retrieved documents, standing instructions) are placed
+    first so the system prompt plus that prefix can hit provider-side prefix
+    caches; dynamic sections follow. When over budget, optional sections are
+    dropped lowest-priority first, then the static context is truncated.
+    """
+
+    def __init__(self, agent_type: str, budget: Optional[int] = None):
+        self.agent_type = agent_type
+        self.budget = budget or settings.PROMPT_TOKEN_BUDGETS.get(agent_type, settings.DEFAULT_PROMPT_TOKEN_BUDGET)
+        self._static: List[str] = []
+        self._sections: List[Dict[str, Any]] = []
+        self._instruction = ""
+
+    def add_static(self, text: str) -> "PromptBuilder":
+        if text:
+            self._static.append(text)
+        return self
+
+    def add(self, name: str, text: str, priority: int = 0) -> "PromptBuilder":
+        """Add a dynamic section; priority 0 is never dropped, higher values are dropped first"""
+        if text:
+            self._sections.append({"name": name, "text": text, "priority": priority})
+        return self
+
+    def instruct(self, text: str) -> "PromptBuilder":
+        self._instruction = text
+        return self
+
+    def build(self) -> CompactPrompt:
+        sections = list(self._sections)
+        dropped = []
+
+        def render(static: List[str]) -> str:
+            return "\n".join(static + [s["text"] for s in sections] + [self._instruction])
+
+        prompt = render(self._static)
+        droppable = sorted((s for s in sections if s["priority"] > 0), key=lambda s: -s["priority"])
+        while count_tokens(prompt) > self.budget and droppable:
+            section = droppable.pop(0)
+            sections.remove(section)
+            dropped.append(section["name"])
+            prompt = render(self._static)
+
+        static = list(self._static)
+        overflow = count_tokens(prompt) - self.budget
+        if overflow > 0 and static:
+            static_text = "\n".join(static)
+            keep_chars = len(static_text)
+            # ~4 chars per token is only an estimate; re-count until the prompt fits or the context is gone
+            while overflow > 0 and keep_chars > 0:
+                keep_chars = max(0, keep_chars - overflow * 4)
+                static = [static_text[:keep_chars] + "..."] if keep_chars else []
+                prompt = render(static)
+                overflow = count_tokens(prompt) - self.budget
+            dropped.append("static_context")
+
+        result = CompactPrompt(prompt)
+        result.tokens = count_tokens(prompt)
+        result.budget = self.budget
+        result.dropped_sections = tuple(dropped)
+        return result
+
+
+def format_documents(retrieved_docs: Optional[List[Dict]], limit: int, max_chars: int, heading: str) -> str:
+    """Render retrieved documents as a compact static context block"""
+    if not retrieved_docs:
+        return ""
+    lines = [heading]
+    for doc in retrieved_docs[:limit]:
+        lines.append(f"- {doc.get('title', 'Document')}: {doc.get('content', '')[:max_chars]}...")
+    return "\n".join(lines)
+
+
+def summarize_routes(routes: Iterable[Any], locations: Iterable[Any] = (), k: int = 5) -> str:
+    """Summarize transit routes as the top-k routes serving the given locations"""
+    routes = list(routes)
+    if not routes:
+        return "none"
+    locations = {loc for loc in locations if loc is not None}
+
+    def route_id(route: Any) -> str:
+        if isinstance(route, dict):
+            return str(route.get("id", route.get("route_id", "route")))
+        return str(route)
+
+    def served(route: Any) -> int:
+        stops = route.get("stops", []) if isinstance(route, dict) else []
+        return len(locations.intersection(stops))
+
+    ranked = sorted(routes, key=served, reverse=True)[:k]
+    summary = ", ".join(
+        f"{route_id(r)} ({len(r.get('stops', []))} stops)" if isinstance(r, dict) and "stops" in r else route_id(r)
+        for r in ranked
+    )
+    if len(routes) > k:
+        summary += f" and {len(routes) - k} more"
+    return summary
+
+
+def summarize_deltas(current: Dict[str, Any], previous: Dict[str, Any], k: int = 5, label: str = "routes") -> str:
+    """Top-k changes between two numeric dicts (e.g. ridership by route)"""
+    if not current:
+        return "no data"
+    deltas = {
+        key: (value or 0) - (previous.get(key) or 0)
+        for key, value in current.items()
+        if isinstance(value, (int, float))
+    }
+    top = sorted(deltas.items(), key=lambda item: abs(item[1]), reverse=True)[:k]
+    total = sum(v for v in current.values() if isinstance(v, (int, float)))
+    changes = ", ".join(f"{key} {delta:+g}" for key, delta in top if delta) or "no change"
+    return f"total {total:g} across {len(current)} {label}; largest changes: {changes}"
+
+
+def summarize_values(values: Dict[str, Any], k: int = 5) -> str:
+    """Range summary plus the k smallest values of a numeric dict (e.g. headways)"""
+    numeric = {key: v for key, v in values.items() if isinstance(v, (int, float))}
+    if not numeric:
+        return "none"
+    ordered = sorted(numeric.items(), key=lambda item: item[1])
+    listed = ", ".join(f"{key}: {value:g}" for key, value in ordered[:k])
+    return f"{len(numeric)} routes, min {ordered[0][1]:g}, max {ordered[-1][1]:g}; {listed}"
+
+
+class TokenStats:
+    """Per-run prompt token accounting by agent type"""
+
+    def __init__(self):
+        self.by_type: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent_type: str, system_prompt: str, prompt: str):
+        prompt_tokens = getattr(prompt, "tokens", 0) or count_tokens(prompt)
+        stats = self.by_type.setdefault(agent_type, {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "system_tokens": 0,
+            "max_prompt_tokens": 0,
+            "compacted_calls": 0
+        })
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["system_tokens"] += count_tokens(system_prompt)
+        stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], prompt_tokens)
+        if getattr(prompt, "dropped_sections", ()):
+            stats["compacted_calls"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {}
+        for agent_type, stats in self.by_type.items():
+            summary[agent_type] = dict(
+                stats,
+                mean_prompt_tokens=stats["prompt_tokens"] / stats["calls"],
+                total_tokens=stats["prompt_tokens"] + stats["system_tokens"]
+            )
+        return summary
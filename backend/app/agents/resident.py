@@ -2,11 +2,20 @@
 Resident agent - represents citizens with schedules and mode choice
 """
 from typing import Dict, List, Optional, Any
+import math
 from app.agents.base import BaseAgent
+from app.agents.prompting import PromptBuilder, format_documents, summarize_routes
 import structlog
 
 logger = structlog.get_logger()
 
+# Rule-based mode choice: a logit over generalized costs in minutes
+MODES = ("car", "transit", "bike", "walk")
+DEFAULT_MODE_MINUTES = {"car": 20.0, "transit": 30.0, "bike": 35.0, "walk": 60.0}  # when no commute time is known
+VALUE_OF_TIME = 15.0  # dollars per hour, converts charges to minutes
+HABIT_MINUTES = 10.0  # the preferred mode feels this much quicker
+CHOICE_SCALE = 10.0  # minutes of cost difference that change the odds e-fold
+
 
 class ResidentAgent(BaseAgent):
     """Resident agent with household schedules and transportation choices"""
@@ -19,6 +28,7 @@ class ResidentAgent(BaseAgent):
             "home_location": persona_config.get("home_location"),
             "work_location": persona_config.get("work_location"),
             "schedule": persona_config.get("schedule", {}),  # Daily schedule
+            "preferred_mode": persona_config.get("preferred_mode", "transit"),
             "current_mode": persona_config.get("preferred_mode", "transit"),  # car, transit, bike, walk
             "current_location": persona_config.get("home_location"),
             "current_activity": "home",
@@ -45,7 +55,10 @@ class ResidentAgent(BaseAgent):
         # Determine next activity based on schedule
         next_activity = self._get_next_activity(current_time, schedule)
         
-        prompt = f"""Current situation:
+        city_state = perception.get('city_state', {})
+        builder = PromptBuilder(self.agent_type)
+        builder.add_static(format_documents(retrieved_docs, 3, 200, "Relevant policy documents:"))
+        builder.add("situation", f"""Current situation:
 - Time: {current_time}:00
 - Current activity: {current_activity}
 - Current location: {self.state.get('current_location')}
@@ -53,22 +66,32 @@ class ResidentAgent(BaseAgent):
 - Preferred mode: {self.state.get('current_mode')}
 - Current commute time: {self.state.get('commute_time')} minutes
 - Satisfaction: {self.state.get('satisfaction')}
-
-City state:
-- Transit delays: {perception.get('city_state', {}).get('transit_delays', 0)} minutes
-- Traffic congestion: {perception.get('city_state', {}).get('traffic_level', 'normal')}
-- Available transit routes: {perception.get('city_state', {}).get('transit_routes', [])}
-
-"""
-        
-        if retrieved_docs:
-            prompt += "\nRelevant policy documents:\n"
-            for doc in retrieved_docs[:3]:  # Top 3 docs
-                prompt += f"- {doc.get('title', 'Document')}: {doc.get('content', '')[:200]}...\n"
-        
-        prompt += "\nWhat should you do? Consider your schedule, transportation options, and any policy changes."
+""")
+        commutes = ""
+        if self.state.get("car_commute_minutes") is not None:
+            commutes += f"- Car commute: {self.state['car_commute_minutes']} minutes ({self.state.get('car_free_flow_minutes')} without traffic)\n"
+        if "transit_commute_minutes" in self.state:
+            transit_minutes = self.state["transit_commute_minutes"]
+            commutes += f"- Transit commute: {transit_minutes} minutes\n" if transit_minutes is not None else "- Transit commute: no connection\n"
+        builder.add("city_state", f"""City state:
+- Transit delays: {city_state.get('transit_delays', 0)} minutes
+- Traffic congestion: {city_state.get('traffic_level', 'normal')}
+{commutes}""")
+        policy = city_state.get("policy")
+        if policy:
+            builder.add("policy", f"""Policy:
+- Transit fare: ${policy.get('transit_fare', 0):.2f} per trip
+- Congestion charge: ${policy.get('congestion_charge', 0):.2f} per car trip
+- Parking: ${policy.get('parking_cost', 0):.2f} per car trip
+""")
+        routes = summarize_routes(
+            city_state.get('transit_routes', []),
+            locations=(self.state.get('current_location'), self.state.get('home_location'), self.state.get('work_location'))
+        )
+        builder.add("transit_routes", f"- Nearby transit routes: {routes}\n", priority=1)
+        builder.instruct("What should you do? Consider your schedule, transportation options, and any policy changes.")
         
-        return prompt
+        return builder.build()
     
     def _get_next_activity(self, current_hour: int, schedule: Dict) -> str:
         """Determine next activity based on schedule"""
@@ -82,6 +105,47 @@ City state:
         else:
             return "home"
     
+    def _simple_reason(self, perception: Dict[str, Any]) -> Dict[str, Any]:
+        """Head to the other end of the commute by a mode drawn from a logit over generalized costs.
+
+        Costs are the known commute minutes (traffic, timetable) or typical
+        ones, plus the policy's charges at VALUE_OF_TIME, less a habit bonus
+        for the preferred mode; draws come from this step's ``rng``.
+        """
+        destination = self.state.get("work_location") if self.state.get("current_activity") == "home" else self.state.get("home_location")
+        if destination is None:
+            return super()._simple_reason(perception)
+        policy = perception.get("city_state", {}).get("policy") or {}
+        charges = {
+            "car": policy.get("congestion_charge", 0.0) + policy.get("parking_cost", 0.0),
+            "transit": policy.get("transit_fare", 0.0)
+        }
+        costs = {}
+        for mode in MODES:
+            minutes = DEFAULT_MODE_MINUTES[mode]
+            if mode == "car" and self.state.get("car_commute_minutes") is not None:
+                minutes = self.state["car_commute_minutes"]
+            elif mode == "transit" and "transit_commute_minutes" in self.state:
+                minutes = self.state["transit_commute_minutes"]
+                if minutes is None:
+                    continue  # no connection
+            costs[mode] = minutes + charges.get(mode, 0.0) * 60 / VALUE_OF_TIME
+            if mode == self.state.get("preferred_mode"):
+                costs[mode] -= HABIT_MINUTES
+        cheapest = min(costs.values())
+        weights = {mode: math.exp((cheapest - cost) / CHOICE_SCALE) for mode, cost in costs.items()}
+        draw = self.rng.random() * sum(weights.values())
+        for mode, weight in weights.items():
+            draw -= weight
+            if draw < 0:
+                break
+        return {
+            "action_type": "move",
+            "action_data": {"destination": destination, "mode": mode},
+            "rationale": f"Rule-based mode choice ({costs[mode]:.0f} generalized minutes by {mode})",
+            "confidence": weights[mode] / sum(weights.values())
+        }
+    
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         """Parse LLM response for resident actions"""
         # Extract action type and data from response
@@ -109,6 +173,13 @@ City state:
             "confidence": 0.7
         }
     
+    def adapt_reasoning(self, reasoning: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-target shared reasoning at this resident's own home/work locations"""
+        adapted = super().adapt_reasoning(reasoning)
+        if "destination" in adapted["action_data"]:
+            adapted["action_data"]["destination"] = self.state.get("work_location") if self.state.get("current_activity") == "home" else self.state.get("home_location")
+        return adapted
+    
     def _update_state_from_action(self, action: Dict[str, Any]):
         """Update resident state after action"""
         action_data = action.get("action_data", {})
@@ -0,0 +1,207 @@
+"""
+Surrogate decision model - cheap local policy trained on recorded LLM decisions
+"""
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+import json
+import random
+import numpy as np
+import structlog
+
+from app.agents.base import BaseAgent
+
+logger = structlog.get_logger()
+
+MODES = ["car", "transit", "bike", "walk"]
+TRAFFIC_LEVELS = {"low": 0.0, "normal": 1.0, "moderate": 2.0, "heavy": 3.0, "gridlock": 4.0}
+
+FEATURE_NAMES = (
+    ["hour_sin", "hour_cos", "at_home", "commute_time", "satisfaction", "transit_delay", "traffic_level"]
+    + [f"current_{mode}" for mode in MODES]
+    + [f"preferred_{mode}" for mode in MODES]
+)
+
+
+def extract_features(perception: Dict[str, Any]) -> Dict[str, float]:
+    """Compact numeric features of a resident's perception used by the surrogate"""
+    state = perception.get("agent_state", {})
+    city_state = perception.get("city_state", {})
+    hour = (perception.get("timestamp") or {}).get("hour", 9)
+    delays = city_state.get("transit_delays", 0)
+    if isinstance(delays, dict):
+        delays = sum(delays.values()) / len(delays) if delays else 0
+
+    features = {
+        "hour_sin": float(np.sin(2 * np.pi * hour / 24)),
+        "hour_cos": float(np.cos(2 * np.pi * hour / 24)),
+        "at_home": 1.0 if state.get("current_activity") == "home" else 0.0,
+        "commute_time": float(state.get("commute_time") or 0),
+        "satisfaction": float(state.get("satisfaction") or 0),
+        "transit_delay": float(delays or 0),
+        "traffic_level": TRAFFIC_LEVELS.get(city_state.get("traffic_level", "normal"), 1.0),
+    }
+    for mode in MODES:
+        features[f"current_{mode}"] = 1.0 if state.get("current_mode") == mode else 0.0
+        features[f"preferred_{mode}"] = 1.0 if state.get("preferred_mode") == mode else 0.0
+    return features
+
+
+def features_to_matrix(rows: List[Dict[str, float]]) -> np.ndarray:
+    return np.array([[row.get(name, 0.0) for name in FEATURE_NAMES] for row in rows], dtype=np.float64)
+
+
+class SurrogatePolicy:
+    """Multinomial logistic regression over perception features.
+
+    Small enough to train in seconds on millions of rows with numpy alone
+    and to predict for the whole population in one matrix product.
+    """
+
+    def __init__(self, classes: Optional[List[str]] = None):
+        self.classes = classes or list(MODES)
+        self.weights = np.zeros((len(FEATURE_NAMES), len(self.classes)))
+        self.bias = np.zeros(len(self.classes))
+        self.mean = np.zeros(len(FEATURE_NAMES))
+        self.scale = np.ones(len(FEATURE_NAMES))
+        self.metadata: Dict[str, Any] = {}
+
+    def fit(self, X: np.ndarray, labels: List[str], epochs: int = 200, learning_rate: float = 0.5, l2: float = 1e-3) -> "SurrogatePolicy":
+        """Fit with full-batch gradient descent on the cross-entropy loss"""
+        self.classes = sorted(set(labels))
+        index = {label: i for i, label in enumerate(self.classes)}
+        y = np.zeros((len(labels), len(self.classes)))
+        y[np.arange(len(labels)), [index[label] for label in labels]] = 1.0
+
+        self.mean = X.mean(axis=0)
+        self.scale = X.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        Xn = (X - self.mean) / self.scale
+
+        self.weights = np.zeros((X.shape[1], len(self.classes)))
+        self.bias = np.zeros(len(self.classes))
+        for _ in range(epochs):
+            error = self._softmax(Xn @ self.weights + self.bias) - y
+            self.weights -= learning_rate * (Xn.T @ error / len(labels) + l2 * self.weights)
+            self.bias -= learning_rate * error.mean(axis=0)
+        return self
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self._softmax(((X - self.mean) / self.scale) @ self.weights + self.bias)
+
+    def predict(self, X: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """Predicted class and its probability for each row"""
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return [self.classes[i] for i in best], proba[np.arange(len(best)), best]
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "classes": self.classes,
+            "features": FEATURE_NAMES,
+            "weights": self.weights.tolist(),
+            "bias": self.bias.tolist(),
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "metadata": self.metadata
+        }))
+
+    @classmethod
+    def load(cls, path: Path) -> "SurrogatePolicy":
+        data = json.loads(Path(path).read_text())
+        if data["features"] != FEATURE_NAMES:
+            raise ValueError("Surrogate model was trained on a different feature set")
+        policy = cls(data["classes"])
+        policy.weights = np.array(data["weights"])
+        policy.bias = np.array(data["bias"])
+        policy.mean = np.array(data["mean"])
+        policy.scale = np.array(data["scale"])
+        policy.metadata = data.get("metadata", {})
+        return policy
+
+
+class SurrogateRunner:
+    """Serves surrogate decisions for residents, escalating low-confidence ones to the LLM"""
+
+    def __init__(self, policy: SurrogatePolicy, confidence_threshold: float = 0.8, audit_sample_rate: float = 0.0, seed: Optional[int] = None):
+        self.policy = policy
+        self.confidence_threshold = confidence_threshold
+        self.audit_sample_rate = audit_sample_rate
+        self.rng = random.Random(seed)
+        self.stats = {"served": 0, "escalated": 0, "compared": 0, "agreements": 0, "confidence_sum": 0.0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], seed: Optional[int] = None) -> Optional["SurrogateRunner"]:
+        """Runner for a run's surrogate config, or None (residents reason as usual) when the model can't be loaded"""
+        from app.core.config import settings
+        path = Path(config.get("model_path") or settings.SURROGATE_MODEL_DIR / "resident.json")
+        try:
+            policy = SurrogatePolicy.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Surrogate model unavailable, falling back to LLM/rule reasoning", path=str(path), error=str(e))
+            return None
+        return cls(
+            policy,
+            confidence_threshold=config.get("confidence_threshold", 0.8),
+            audit_sample_rate=config.get("audit_sample_rate", 0.0),
+            seed=seed
+        )
+
+    def decide(self, agents: List[BaseAgent], perceptions: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Decide for all given residents with one vectorized prediction"""
+        residents = [agent for agent in agents if agent.agent_type == "resident"]
+        if not residents:
+            return {}
+        features = [extract_features(perceptions[agent.agent_id]) for agent in residents]
+        modes, confidences = self.policy.predict(features_to_matrix(features))
+
+        decisions: Dict[str, Optional[Dict[str, Any]]] = {}
+        for agent, mode, confidence in zip(residents, modes, confidences):
+            confidence = float(confidence)
+            self.stats["confidence_sum"] += confidence
+            audit = self.audit_sample_rate and (
+                agent.decider_rng if agent.rng_key is not None else self.rng
+            ).random() < self.audit_sample_rate
+            if confidence >= self.confidence_threshold and not audit:
+                decisions[agent.agent_id] = agent.adapt_reasoning({
+                    "action_type": "move",
+                    "action_data": {"destination": None, "mode": mode},
+                    "rationale": f"Surrogate policy prediction ({confidence:.2f} confidence)",
+                    "confidence": confidence,
+                    "source": "surrogate"
+                })
+                self.stats["served"] += 1
+                continue
+
+            try:
+                reasoning = agent.reason(perceptions[agent.agent_id])
+            except Exception as e:
+                logger.error("Agent reasoning failed", agent_id=agent.agent_id, error=str(e))
+                decisions[agent.agent_id] = None
+                continue
+            decisions[agent.agent_id] = reasoning
+            self.stats["escalated"] += 1
+            if reasoning.get("source") == "llm":
+                self.stats["compared"] += 1
+                if reasoning.get("action_data", {}).get("mode") == mode:
+                    self.stats["agreements"] += 1
+        return decisions
+
+    def report(self) -> Dict[str, Any]:
+        decisions = self.stats["served"] + self.stats["escalated"]
+        return {
+            "served": self.stats["served"],
+            "escalated": self.stats["escalated"],
+            "escalation_rate": self.stats["escalated"] / decisions if decisions else None,
+            "mean_confidence": self.stats["confidence_sum"] / decisions if decisions else None,
+            "llm_comparisons": self.stats["compared"],
+            "agreement_rate": self.stats["agreements"] / self.stats["compared"] if self.stats["compared"] else None,
+            "confidence_threshold": self.confidence_threshold,
+            "model": self.policy.metadata
+        }
@@ -3,6 +3,7 @@ Transit operator agent - manages routes and frequencies
 """
 from typing import Dict, List, Optional, Any
 from app.agents.base import BaseAgent
+from app.agents.prompting import PromptBuilder, format_documents, summarize_deltas, summarize_values
 import structlog
 
 logger = structlog.get_logger()
@@ -23,6 +24,8 @@ class TransitOperatorAgent(BaseAgent):
             "operating_costs": persona_config.get("operating_costs", {}),
             "satisfaction_score": 0.7
         })
+        # Ridership seen at the previous committed step, so prompts carry deltas not raw dicts
+        self._previous_ridership: Dict[str, Any] = {}
     
     def _get_system_prompt(self) -> str:
         return """You are a transit operator agent managing public transportation in a city. Your goals are:
@@ -39,27 +42,32 @@ class TransitOperatorAgent(BaseAgent):
         current_ridership = city_state.get("transit_ridership", {})
         demand_changes = city_state.get("demand_changes", {})
         
-        prompt = f"""Current transit system state:
+        builder = PromptBuilder(self.agent_type)
+        builder.add_static(format_documents(retrieved_docs, 3, 200, "Relevant policy/budget documents:"))
+        builder.add("system_state", f"""Current transit system state:
 - Routes: {len(self.state.get('routes', []))}
-- Current ridership: {current_ridership}
 - Budget: ${self.state.get('budget', 0):,}
 - Operating costs: ${sum(self.state.get('operating_costs', {}).values()):,}
-- Demand changes: {demand_changes}
 - Service coverage: {city_state.get('service_coverage', 0.7)}
-
-Current route frequencies:
-{self.state.get('frequencies', {})}
-
-"""
+""")
+        if isinstance(current_ridership, dict):
+            ridership = summarize_deltas(current_ridership, self._previous_ridership)
+        else:
+            ridership = current_ridership
+        builder.add("ridership", f"- Ridership: {ridership}\n", priority=1)
+        builder.add("demand_changes", f"- Demand changes: {summarize_deltas(demand_changes, {}, label='areas')}\n", priority=2)
+        builder.add("frequencies", f"Current route headways (minutes): {summarize_values(self.state.get('frequencies', {}))}\n", priority=1)
+        builder.instruct("What adjustments should you make to routes or frequencies? Consider budget, demand, and policy constraints.")
         
-        if retrieved_docs:
-            prompt += "\nRelevant policy/budget documents:\n"
-            for doc in retrieved_docs[:3]:
-                prompt += f"- {doc.get('title', 'Document')}: {doc.get('content', '')[:200]}...\n"
-        
-        prompt += "\nWhat adjustments should you make to routes or frequencies? Consider budget, demand, and policy constraints."
-        
-        return prompt
+        return builder.build()
+    
+    def commit(self, perception: Dict[str, Any], reasoning: Dict[str, Any]) -> Dict[str, Any]:
+        """Act and remember this step's ridership; building a prompt has no side effects"""
+        action = super().commit(perception, reasoning)
+        current_ridership = perception.get("city_state", {}).get("transit_ridership", {})
+        if isinstance(current_ridership, dict):
+            self._previous_ridership = dict(current_ridership)
+        return action
     
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         """Parse LLM response for transit operator actions"""
@@ -87,3 +87,13 @@ async def get_agent_actions(
     
     actions = query.order_by(AgentAction.simulation_tick).limit(limit).all()
     return actions
+
+
+@router.post("/surrogate/train", status_code=202)
+async def train_surrogate_model(
+    max_rows: int = Query(1_000_000, le=10_000_000)
+):
+    """Train the resident surrogate decision model from recorded LLM decisions"""
+    from app.tasks.surrogate import train_surrogate_model_task
+    task = train_surrogate_model_task.delay(max_rows=max_rows)
+    return {"task_id": task.id, "status": "queued"}
@@ -6,9 +6,12 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
+from pathlib import Path
+import numpy as np
 
 from app.core.database import get_db
 from app.models.data import CityData, PolicyDocument
+from app.simulation.spatial import spatial_index_path, cached_spatial_index
 
 router = APIRouter()
 
@@ -28,6 +31,19 @@ class CityDataResponse(BaseModel):
         from_attributes = True
 
 
+class SnapRequest(BaseModel):
+    lon: List[float]
+    lat: List[float]
+    max_distance: Optional[float] = None  # metres; farther points snap to null
+    radius: Optional[float] = None  # metres; also return all nodes within this radius
+
+
+class SnapResponse(BaseModel):
+    nodes: List[Optional[str]]
+    distances: List[Optional[float]]
+    within: Optional[List[List[str]]] = None
+
+
 class PolicyDocumentResponse(BaseModel):
     id: int
     title: str
@@ -91,6 +107,59 @@ async def get_city_data(
     return data
 
 
+@router.post("/city/{data_id}/process", response_model=CityDataResponse, status_code=202)
+async def process_city_data(
+    data_id: int,
+    db: Session = Depends(get_db)
+):
+    """Queue processing of a city data entry (OSM download, GTFS timetable compilation)"""
+    from app.tasks.data_ingestion import process_city_data_task
+    
+    data = db.query(CityData).filter(CityData.id == data_id).first()
+    if not data:
+        raise HTTPException(status_code=404, detail="City data not found")
+    if data.status == "processing":
+        raise HTTPException(status_code=409, detail="City data is already being processed")
+    
+    data.status = "pending"
+    db.commit()
+    db.refresh(data)
+    process_city_data_task.delay(data.id)
+    return data
+
+
+@router.post("/city/{data_id}/snap", response_model=SnapResponse)
+async def snap_to_nodes(
+    data_id: int,
+    request: SnapRequest,
+    db: Session = Depends(get_db)
+):
+    """Snap lat/lon points to their nearest city graph nodes in one batch"""
+    data = db.query(CityData).filter(CityData.id == data_id).first()
+    if not data:
+        raise HTTPException(status_code=404, detail="City data not found")
+    if len(request.lon) != len(request.lat):
+        raise HTTPException(status_code=422, detail="lon and lat must have the same length")
+    
+    path = Path((data.geometry or {}).get("spatial_index_path") or spatial_index_path(data.id))
+    if not path.exists():
+        raise HTTPException(status_code=409, detail="City data has no spatial index; process it first")
+    index = cached_spatial_index(path)
+    
+    lon, lat = np.asarray(request.lon, dtype=float), np.asarray(request.lat, dtype=float)
+    positions, distances = index.nearest(lon, lat, request.max_distance)
+    found = positions >= 0
+    nodes = np.full(len(positions), None, dtype=object)
+    nodes[found] = index.node_ids[positions[found]]
+    rounded = np.round(distances, 2).astype(object)
+    rounded[~found] = None
+    return SnapResponse(
+        nodes=nodes.tolist(),
+        distances=rounded.tolist(),
+        within=index.within(lon, lat, request.radius) if request.radius else None
+    )
+
+
 @router.post("/policy", response_model=PolicyDocumentResponse, status_code=201)
 async def create_policy_document(
     title: str,
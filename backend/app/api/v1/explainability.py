@@ -1,12 +1,13 @@
 """
 Explainability API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 
 from app.core.database import get_db
+from app.core.cache import response_cache
 from app.models.agent import AgentAction
 
 router = APIRouter()
@@ -28,14 +29,23 @@ class ExplainabilityResponse(BaseModel):
 @router.get("/actions/{action_id}", response_model=ExplainabilityResponse)
 async def get_action_explanation(
     action_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Get explainability data for a specific action"""
+    # Recorded actions never change, so they are cached without invalidation
+    scope = f"action:{action_id}"
+    cache_key = response_cache.key(scope, "explanation")
+    cached = response_cache.respond(request, cache_key)
+    if cached:
+        return cached
+    
     action = db.query(AgentAction).filter(AgentAction.id == action_id).first()
     if not action:
         raise HTTPException(status_code=404, detail="Action not found")
     
-    return action
+    body = ExplainabilityResponse.model_validate(action).model_dump_json()
+    return response_cache.store_and_respond(request, scope, cache_key, body, True)
 
 
 @router.get("/agents/{agent_id}/explanations", response_model=List[ExplainabilityResponse])
@@ -1,15 +1,18 @@
 """
 Scenario API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import null
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional, Any
 from pydantic import BaseModel
 from datetime import datetime
 
 from app.core.database import get_db
 from app.models.scenario import Scenario, ScenarioRun
-from app.models.simulation import SimulationMetrics
+from app.models.simulation import SimulationMetrics, RunSummary
+from app.simulation.fingerprint import create_run
+from app.simulation.summary import SUMMARY_KPIS, add_reused_summary, compare_summaries
 
 router = APIRouter()
 
@@ -39,6 +42,8 @@ class ScenarioResponse(BaseModel):
 class ScenarioRunCreate(BaseModel):
     simulation_days: int = 7
     seed: Optional[int] = None
+    run_config: Optional[dict] = None
+    force: bool = False  # re-simulate even if an identical run already completed
 
 
 class ScenarioRunResponse(BaseModel):
@@ -49,12 +54,57 @@ class ScenarioRunResponse(BaseModel):
     start_time: datetime
     end_time: Optional[datetime]
     seed: Optional[int]
+    run_config: Optional[dict]
+    fingerprint: Optional[str] = None
+    source_run_id: Optional[int] = None
     metrics: Optional[dict]
     
     class Config:
         from_attributes = True
 
 
+class ScenarioRunListItem(BaseModel):
+    """Run as listed; the full ``metrics`` are served per run"""
+    id: int
+    scenario_id: int
+    status: str
+    simulation_days: int
+    start_time: datetime
+    end_time: Optional[datetime]
+    seed: Optional[int]
+    run_config: Optional[dict]
+    fingerprint: Optional[str] = None
+    source_run_id: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class RunSummaryResponse(BaseModel):
+    run_id: int
+    scenario_id: int
+    sweep_id: Optional[int]
+    seed: Optional[int]
+    simulation_days: Optional[int]
+    ticks: Optional[int]
+    completed_at: Optional[datetime]
+    avg_commute_time: Optional[float]
+    transit_modal_share: Optional[float]
+    transit_ridership: Optional[int]
+    emissions_proxy: Optional[float]
+    service_coverage: Optional[float]
+    equity_index: Optional[float]
+    
+    class Config:
+        from_attributes = True
+
+
+class RunComparisonResponse(BaseModel):
+    baseline_run_id: int
+    resolution: str
+    comparisons: List[Dict[str, Any]]
+
+
 @router.post("/", response_model=ScenarioResponse, status_code=status.HTTP_201_CREATED)
 async def create_scenario(
     scenario: ScenarioCreate,
@@ -79,6 +129,74 @@ async def list_scenarios(
     return scenarios
 
 
+@router.get("/runs/summaries", response_model=List[RunSummaryResponse])
+async def list_run_summaries(
+    scenario_id: Optional[int] = None,
+    sweep_id: Optional[int] = None,
+    seed: Optional[int] = None,
+    sort_by: str = "completed_at",
+    descending: bool = True,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Headline KPIs of completed runs, filtered and sorted, without series or per-group outcomes"""
+    if sort_by not in SUMMARY_KPIS + ("completed_at", "run_id"):
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort_by}")
+    # Only the listed columns are loaded; series and groups stay in the table
+    query = db.query(*[getattr(RunSummary, field) for field in RunSummaryResponse.model_fields])
+    if scenario_id is not None:
+        query = query.filter(RunSummary.scenario_id == scenario_id)
+    if sweep_id is not None:
+        query = query.filter(RunSummary.sweep_id == sweep_id)
+    if seed is not None:
+        query = query.filter(RunSummary.seed == seed)
+    column = getattr(RunSummary, sort_by)
+    query = query.order_by(column.desc() if descending else column.asc(), RunSummary.run_id)
+    return query.offset(skip).limit(limit).all()
+
+
+@router.get("/runs/compare", response_model=RunComparisonResponse)
+async def compare_runs(
+    baseline: int,
+    runs: List[int] = Query(...),
+    resolution: str = "day",
+    groups: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Differences of each run's KPIs, KPI series and per-group/zone outcomes against a baseline run"""
+    if resolution not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="resolution must be hour or day")
+    requested = {baseline, *runs}
+    # Runs that reused identical results are compared through the run that produced them
+    results_of = {
+        run_id: source_run_id or run_id
+        for run_id, source_run_id in db.query(ScenarioRun.id, ScenarioRun.source_run_id).filter(ScenarioRun.id.in_(requested))
+    }
+    # Only the compared resolution's series, and group outcomes only when asked for
+    columns = [
+        RunSummary.run_id,
+        *(getattr(RunSummary, name) for name in SUMMARY_KPIS),
+        RunSummary.series[resolution].label("series"),
+        (RunSummary.groups if groups else null()).label("groups")
+    ]
+    summaries = {
+        summary.run_id: summary
+        for summary in db.query(*columns).filter(RunSummary.run_id.in_(set(results_of.values())))
+    }
+    missing = sorted(run_id for run_id in requested if results_of.get(run_id) not in summaries)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"No summary for runs {missing}")
+    
+    base = summaries[results_of[baseline]]
+    comparisons = []
+    for run_id in runs:
+        comparison = compare_summaries(summaries[results_of[run_id]], base, groups)
+        comparison["run_id"] = run_id
+        comparisons.append(comparison)
+    return {"baseline_run_id": baseline, "resolution": resolution, "comparisons": comparisons}
+
+
 @router.get("/{scenario_id}", response_model=ScenarioResponse)
 async def get_scenario(
     scenario_id: int,
@@ -102,16 +220,22 @@ async def create_scenario_run(
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
-    db_run = ScenarioRun(
-        scenario_id=scenario_id,
+    db_run, reused = create_run(
+        db,
+        scenario,
         simulation_days=run_config.simulation_days,
         seed=run_config.seed,
-        status="pending"
+        run_config=run_config.run_config,
+        force=run_config.force
     )
-    db.add(db_run)
+    if reused:
+        add_reused_summary(db, db_run)
     db.commit()
     db.refresh(db_run)
     
+    if reused:
+        return db_run
+    
     # Trigger simulation task via Celery
     from app.tasks.simulation import run_simulation_task
     run_simulation_task.delay(db_run.id)
@@ -119,14 +243,25 @@ async def create_scenario_run(
     return db_run
 
 
-@router.get("/{scenario_id}/runs", response_model=List[ScenarioRunResponse])
+@router.get("/{scenario_id}/runs", response_model=List[ScenarioRunListItem])
 async def list_scenario_runs(
     scenario_id: int,
+    run_status: Optional[str] = Query(None, alias="status"),
+    sweep_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
-    """List all runs for a scenario"""
-    runs = db.query(ScenarioRun).filter(ScenarioRun.scenario_id == scenario_id).all()
-    return runs
+    """List runs for a scenario, newest first, without their metrics"""
+    # Only the listed columns are loaded; metrics can be large
+    query = db.query(*[getattr(ScenarioRun, field) for field in ScenarioRunListItem.model_fields]).filter(
+        ScenarioRun.scenario_id == scenario_id
+    )
+    if run_status is not None:
+        query = query.filter(ScenarioRun.status == run_status)
+    if sweep_id is not None:
+        query = query.filter(ScenarioRun.sweep_id == sweep_id)
+    return query.order_by(ScenarioRun.id.desc()).offset(skip).limit(limit).all()
 
 
 @router.get("/{scenario_id}/runs/{run_id}", response_model=ScenarioRunResponse)
@@ -1,15 +1,22 @@
 """
 Simulation API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, TypeAdapter
 from datetime import datetime
 
-from app.core.database import get_db
-from app.models.simulation import SimulationState, SimulationMetrics
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal
+from app.core.progress import progress_hub, TERMINAL_TYPES
+from app.core.cache import response_cache, run_scope
+from app.models.simulation import SimulationState, SimulationMetrics, SimulationRollup
 from app.models.scenario import ScenarioRun
+from app.simulation.rollups import CHUNK_MINUTES, MAX_CHUNKS, chunk_range, downsample_indices, pick_resolution, sample_values
 
 router = APIRouter()
 
@@ -45,21 +52,56 @@ class SimulationMetricsResponse(BaseModel):
         from_attributes = True
 
 
+class SeriesPoints(BaseModel):
+    ticks: List[int]
+    values: List[float]
+    # Bucket extremes at hour and day resolution, aligned with ``ticks``
+    min: Optional[List[Optional[float]]] = None
+    max: Optional[List[Optional[float]]] = None
+
+
+class SimulationSeriesResponse(BaseModel):
+    run_id: int
+    resolution: str
+    series: Dict[str, SeriesPoints]
+
+
+_states_adapter = TypeAdapter(List[SimulationStateResponse])
+
+
+def _results_run(db: Session, run_id: int) -> Tuple[int, bool]:
+    """Run holding the stored results for ``run_id`` and whether they are final.
+    
+    Runs that reused an identical run's results point at it through
+    ``source_run_id``. Only completed runs are immutable and therefore cacheable.
+    """
+    run = db.query(ScenarioRun.status, ScenarioRun.source_run_id).filter(ScenarioRun.id == run_id).first()
+    if not run:
+        return run_id, False
+    return run.source_run_id or run_id, run.status == "completed"
+
+
 @router.get("/runs/{run_id}/states", response_model=List[SimulationStateResponse])
 async def get_simulation_states(
     run_id: int,
+    request: Request,
     tick_start: Optional[int] = None,
     tick_end: Optional[int] = None,
     limit: int = 1000,
     db: Session = Depends(get_db)
 ):
     """Get simulation states for a run"""
+    cache_key = response_cache.key(run_scope(run_id), "states", {"tick_start": tick_start, "tick_end": tick_end, "limit": limit})
+    cached = response_cache.respond(request, cache_key)
+    if cached:
+        return cached
+    
     # Verify run exists
     run = db.query(ScenarioRun).filter(ScenarioRun.id == run_id).first()
     if not run:
         raise HTTPException(status_code=404, detail="Scenario run not found")
     
-    query = db.query(SimulationState).filter(SimulationState.run_id == run_id)
+    query = db.query(SimulationState).filter(SimulationState.run_id == (run.source_run_id or run_id))
     
     if tick_start is not None:
         query = query.filter(SimulationState.tick >= tick_start)
@@ -67,38 +109,217 @@ async def get_simulation_states(
         query = query.filter(SimulationState.tick <= tick_end)
     
     states = query.order_by(SimulationState.tick).limit(limit).all()
-    return states
+    body = _states_adapter.dump_json(states).decode()
+    return response_cache.store_and_respond(request, run_scope(run_id), cache_key, body, run.status == "completed")
+
+
+def _sse(message: dict) -> str:
+    return f"event: {message['type']}\ndata: {json.dumps(message, default=str)}\n\n"
+
+
+@router.get("/runs/{run_id}/stream")
+async def stream_run_progress(run_id: int, request: Request):
+    """Stream live run progress as Server-Sent Events.
+    
+    Progress comes from Redis pub/sub; the database is only consulted once,
+    when no live state exists for the run.
+    """
+    subscriber = await progress_hub.subscribe(run_id)
+    latest = await progress_hub.latest(run_id)
+    if latest is None:
+        db = SessionLocal()
+        try:
+            run = db.query(ScenarioRun).filter(ScenarioRun.id == run_id).first()
+        finally:
+            db.close()
+        if not run:
+            await progress_hub.unsubscribe(subscriber)
+            raise HTTPException(status_code=404, detail="Scenario run not found")
+        if run.status in TERMINAL_TYPES:
+            latest = {"type": run.status, "run_id": run_id, "kpis": run.metrics or {}, "kpi_delta": {}}
+    
+    async def events():
+        try:
+            if latest:
+                yield _sse(latest)
+                if latest["type"] in TERMINAL_TYPES:
+                    return
+            while not await request.is_disconnected():
+                message = await subscriber.next(timeout=settings.PROGRESS_HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                if latest and message["type"] == "tick" and message["tick"] <= latest.get("tick", -1):
+                    # Already covered by the replayed latest state
+                    continue
+                yield _sse(message)
+                if message["type"] in TERMINAL_TYPES:
+                    return
+        finally:
+            await progress_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/runs/{run_id}/states/{tick}", response_model=SimulationStateResponse)
 async def get_simulation_state_at_tick(
     run_id: int,
     tick: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Get simulation state at a specific tick"""
+    cache_key = response_cache.key(run_scope(run_id), "state", {"tick": tick})
+    cached = response_cache.respond(request, cache_key)
+    if cached:
+        return cached
+    
+    results_run_id, completed = _results_run(db, run_id)
     state = db.query(SimulationState).filter(
-        SimulationState.run_id == run_id,
+        SimulationState.run_id == results_run_id,
         SimulationState.tick == tick
     ).first()
     
     if not state:
         raise HTTPException(status_code=404, detail="Simulation state not found")
     
-    return state
+    body = SimulationStateResponse.model_validate(state).model_dump_json()
+    return response_cache.store_and_respond(request, run_scope(run_id), cache_key, body, completed)
 
 
 @router.get("/runs/{run_id}/metrics", response_model=SimulationMetricsResponse)
 async def get_simulation_metrics(
     run_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Get aggregated metrics for a simulation run"""
+    cache_key = response_cache.key(run_scope(run_id), "metrics")
+    cached = response_cache.respond(request, cache_key)
+    if cached:
+        return cached
+    
+    results_run_id, completed = _results_run(db, run_id)
     metrics = db.query(SimulationMetrics).filter(
-        SimulationMetrics.run_id == run_id
+        SimulationMetrics.run_id == results_run_id
     ).first()
     
     if not metrics:
         raise HTTPException(status_code=404, detail="Simulation metrics not found")
     
-    return metrics
+    body = SimulationMetricsResponse.model_validate(metrics).model_dump_json()
+    return response_cache.store_and_respond(request, run_scope(run_id), cache_key, body, completed)
+
+
+def _rollup_rows(db: Session, run_id: int, resolution: str, tick_start: Optional[int], tick_end: Optional[int]):
+    """Rows of one stored resolution whose chunks overlap the tick range"""
+    query = db.query(SimulationRollup).filter(SimulationRollup.run_id == run_id, SimulationRollup.resolution == resolution)
+    first, last = chunk_range(resolution, tick_start, tick_end)
+    if first is not None:
+        query = query.filter(SimulationRollup.chunk >= first)
+    if last is not None:
+        query = query.filter(SimulationRollup.chunk <= last)
+    return query
+
+
+def _load_rollup(
+    db: Session,
+    run_id: int,
+    resolution: str,
+    tick_start: Optional[int],
+    tick_end: Optional[int]
+) -> Tuple[List[int], Dict[str, List[Optional[float]]], Dict[str, List[Optional[float]]], Dict[str, List[Optional[float]]]]:
+    """Ticks, series, minimum and maximum of one stored resolution, reading only the chunks the range covers (at most MAX_CHUNKS)"""
+    query = _rollup_rows(db, run_id, resolution, tick_start, tick_end).with_entities(
+        SimulationRollup.ticks, SimulationRollup.series, SimulationRollup.minimum, SimulationRollup.maximum
+    ).order_by(SimulationRollup.chunk)
+    if resolution in MAX_CHUNKS:
+        query = query.limit(MAX_CHUNKS[resolution])
+    ticks: List[int] = []
+    fields: Tuple[Dict[str, List[Optional[float]]], ...] = ({}, {}, {})
+    for row in query:
+        for merged, part in zip(fields, (row.series, row.minimum, row.maximum)):
+            for name, values in (part or {}).items():
+                # Columns first seen in a later chunk are padded for the ticks before it
+                merged.setdefault(name, [None] * len(ticks)).extend(values)
+            for values in merged.values():
+                values.extend([None] * (len(ticks) + len(row.ticks) - len(values)))
+        ticks.extend(row.ticks)
+    return (ticks, *fields)
+
+
+@router.get("/runs/{run_id}/series", response_model=SimulationSeriesResponse)
+async def get_simulation_series(
+    run_id: int,
+    request: Request,
+    tick_start: Optional[int] = None,
+    tick_end: Optional[int] = None,
+    points: int = Query(200, ge=2, le=5000),
+    metrics: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """KPI series downsampled to at most ``points`` per metric (LTTB) over a tick range, for playback.
+
+    Completed runs are served from their stored rollups, using the coarsest
+    resolution that still has ``points`` samples in the range (with bucket
+    min/max at hour and day resolution); minute samples are read only for the
+    days the range covers, and only when those are at most MAX_CHUNKS, else
+    hourly buckets serve the range. Runs still in progress fall back to their
+    hourly state snapshots.
+    """
+    cache_key = response_cache.key(run_scope(run_id), "series", {
+        "tick_start": tick_start, "tick_end": tick_end, "points": points, "metrics": sorted(metrics or [])
+    })
+    cached = response_cache.respond(request, cache_key)
+    if cached:
+        return cached
+    
+    results_run_id, completed = _results_run(db, run_id)
+    resolutions = [resolution for resolution, in db.query(SimulationRollup.resolution).filter(
+        SimulationRollup.run_id == results_run_id
+    ).distinct()]
+    lows, highs = {}, {}
+    if resolutions:
+        # Chunked (minute) ticks are never needed to pick: minute is the fallback
+        available = {resolution: [] for resolution in resolutions}
+        available.update(db.query(SimulationRollup.resolution, SimulationRollup.ticks).filter(
+            SimulationRollup.run_id == results_run_id, SimulationRollup.resolution.notin_(list(CHUNK_MINUTES))
+        ).all())
+        # Chunk counts only, so a wide range never loads minute rows just to find it needs fewer
+        chunks_in_range = {
+            resolution: _rollup_rows(db, results_run_id, resolution, tick_start, tick_end).with_entities(func.count(SimulationRollup.id)).scalar()
+            for resolution in resolutions if resolution in MAX_CHUNKS
+        }
+        resolution = pick_resolution(available, points, tick_start, tick_end, chunks_in_range)
+        ticks, columns, lows, highs = _load_rollup(db, results_run_id, resolution, tick_start, tick_end)
+    else:
+        if not db.query(ScenarioRun.id).filter(ScenarioRun.id == run_id).first():
+            raise HTTPException(status_code=404, detail="Scenario run not found")
+        resolution = "snapshot"
+        query = db.query(SimulationState.tick, SimulationState.city_state).filter(SimulationState.run_id == results_run_id)
+        if tick_start is not None:
+            query = query.filter(SimulationState.tick >= tick_start)
+        if tick_end is not None:
+            query = query.filter(SimulationState.tick <= tick_end)
+        samples = [(tick, sample_values(city_state or {})) for tick, city_state in query.order_by(SimulationState.tick)]
+        ticks = [tick for tick, _ in samples]
+        names = {name for _, values in samples for name in values}
+        columns = {name: [values.get(name) for _, values in samples] for name in names}
+    
+    series = {}
+    for name in sorted(columns):
+        if metrics and name not in metrics:
+            continue
+        chosen = downsample_indices(ticks, columns[name], points, tick_start, tick_end).tolist()
+        series[name] = SeriesPoints(
+            ticks=[int(ticks[i]) for i in chosen],
+            values=[float(columns[name][i]) for i in chosen],
+            min=[lows[name][i] for i in chosen] if name in lows else None,
+            max=[highs[name][i] for i in chosen] if name in highs else None
+        )
+    body = SimulationSeriesResponse(run_id=run_id, resolution=resolution, series=series).model_dump_json()
+    return response_cache.store_and_respond(request, run_scope(run_id), cache_key, body, completed)
@@ -0,0 +1,178 @@
+"""
+Parameter sweep API endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+from app.core.database import get_db
+from app.models.scenario import Scenario
+from app.models.sweep import Sweep
+from app.simulation.policy import check_levers
+from app.simulation.sweeps import KPI_FIELDS, ParameterSpace
+
+router = APIRouter()
+
+
+class ParameterRange(BaseModel):
+    min: float
+    max: float
+    integer: bool = False
+
+
+class SweepCreate(BaseModel):
+    name: str
+    # Either an existing base scenario, or the policy to sweep
+    scenario_id: Optional[int] = None
+    policy_type: Optional[str] = None
+    policy_config: Optional[dict] = None
+    city_data_id: Optional[int] = None
+    parameters: Dict[str, ParameterRange]
+    design: str = "lhs"  # grid or lhs
+    design_size: Optional[int] = None  # points per axis (grid) or samples (lhs)
+    target_kpi: Optional[str] = None  # refine where this KPI changes fastest
+    refine_rounds: int = 0
+    refine_batch: int = 8
+    max_runs: int = 100
+    simulation_days: int = 7
+    seed: int = 0
+    run_config: Optional[dict] = None
+
+
+class SweepResponse(BaseModel):
+    id: int
+    name: str
+    scenario_id: int
+    parameters: dict
+    design: str
+    design_size: Optional[int]
+    target_kpi: Optional[str]
+    refine_rounds: int
+    max_runs: int
+    current_round: int
+    status: str
+    results: Optional[dict]
+    created_at: datetime
+    completed_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+@router.post("/", response_model=SweepResponse, status_code=status.HTTP_201_CREATED)
+async def create_sweep(
+    sweep_in: SweepCreate,
+    db: Session = Depends(get_db)
+):
+    """Create a sweep and dispatch the runs of its initial design"""
+    from app.tasks.sweeps import initial_design, launch_points, dispatch, advance_sweep
+
+    if sweep_in.design not in ("grid", "lhs"):
+        raise HTTPException(status_code=400, detail="design must be 'grid' or 'lhs'")
+    if sweep_in.target_kpi and sweep_in.target_kpi not in KPI_FIELDS:
+        raise HTTPException(status_code=400, detail=f"target_kpi must be one of {KPI_FIELDS}")
+    if sweep_in.refine_rounds and not sweep_in.target_kpi:
+        raise HTTPException(status_code=400, detail="Adaptive refinement needs a target_kpi")
+    parameters = {name: p.dict() for name, p in sweep_in.parameters.items()}
+    try:
+        ParameterSpace(parameters)
+        check_levers(list(parameters), sweep_in.run_config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if sweep_in.scenario_id is not None:
+        scenario = db.query(Scenario).filter(Scenario.id == sweep_in.scenario_id).first()
+        if not scenario:
+            raise HTTPException(status_code=404, detail="Scenario not found")
+    elif sweep_in.policy_type:
+        scenario = Scenario(
+            name=f"Sweep: {sweep_in.name}",
+            policy_type=sweep_in.policy_type,
+            policy_config=sweep_in.policy_config or {},
+            city_data_id=sweep_in.city_data_id
+        )
+        db.add(scenario)
+        db.flush()
+    else:
+        raise HTTPException(status_code=400, detail="Either scenario_id or policy_type is required")
+
+    sweep = Sweep(
+        name=sweep_in.name,
+        scenario_id=scenario.id,
+        parameters=parameters,
+        design=sweep_in.design,
+        design_size=sweep_in.design_size,
+        target_kpi=sweep_in.target_kpi,
+        refine_rounds=sweep_in.refine_rounds,
+        refine_batch=sweep_in.refine_batch,
+        max_runs=sweep_in.max_runs,
+        current_round=0,
+        simulation_days=sweep_in.simulation_days,
+        seed=sweep_in.seed,
+        run_config=sweep_in.run_config,
+        status="running"
+    )
+    db.add(sweep)
+    db.flush()
+
+    points = initial_design(sweep)
+    if len(points) > sweep.max_runs:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Initial design has {len(points)} points, more than max_runs")
+
+    to_dispatch = launch_points(db, sweep, points, 0)
+    db.commit()
+    dispatch(to_dispatch)
+    if not to_dispatch:
+        # Every point reused an earlier run
+        advance_sweep(db, sweep.id)
+    db.refresh(sweep)
+    return sweep
+
+
+@router.get("/", response_model=List[SweepResponse])
+async def list_sweeps(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """List sweeps"""
+    return db.query(Sweep).order_by(Sweep.id.desc()).offset(skip).limit(limit).all()
+
+
+@router.get("/{sweep_id}", response_model=SweepResponse)
+async def get_sweep(
+    sweep_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a sweep with its aggregated results once completed"""
+    sweep = db.query(Sweep).filter(Sweep.id == sweep_id).first()
+    if not sweep:
+        raise HTTPException(status_code=404, detail="Sweep not found")
+    return sweep
+
+
+@router.get("/{sweep_id}/points")
+async def get_sweep_points(
+    sweep_id: int,
+    sweep_round: Optional[int] = None,
+    kpi: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Current points of a sweep (parameters, status, KPIs), optionally for one round or KPI"""
+    from app.tasks.sweeps import collect_points
+
+    sweep = db.query(Sweep).filter(Sweep.id == sweep_id).first()
+    if not sweep:
+        raise HTTPException(status_code=404, detail="Sweep not found")
+    if kpi and kpi not in KPI_FIELDS:
+        raise HTTPException(status_code=400, detail=f"kpi must be one of {KPI_FIELDS}")
+
+    points = collect_points(db, sweep)
+    if sweep_round is not None:
+        points = [p for p in points if p["round"] == sweep_round]
+    if kpi:
+        points = [{**p, "kpis": {kpi: p["kpis"].get(kpi)}} for p in points]
+    return {"sweep_id": sweep_id, "status": sweep.status, "points": points}
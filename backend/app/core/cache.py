@@ -0,0 +1,117 @@
+"""
+Read-through response cache for immutable API resources (completed runs).
+
+Responses are stored pre-serialized in Redis with their ETag, so a hit is a
+single Redis round trip with no database access or model serialization.
+Entries are grouped by scope (e.g. ``run:42``) and dropped together when the
+run's status changes.
+"""
+import hashlib
+import json
+from typing import Dict, Any, Optional
+from fastapi import Request
+from fastapi.responses import Response
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+KEY_PREFIX = "cache:v1"
+
+
+def run_scope(run_id: int) -> str:
+    return f"run:{run_id}"
+
+
+def make_etag(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def json_response(request: Request, body: str, etag: Optional[str] = None, cache_status: Optional[str] = None) -> Response:
+    """JSON response with ETag / If-None-Match handling"""
+    etag = etag or make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if cache_status:
+        headers["X-Cache"] = cache_status
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Pre-serialized response bodies in Redis; failures fall through to the database"""
+
+    def __init__(self, redis=None, ttl: Optional[int] = None):
+        self._redis = redis
+        self.ttl = ttl or settings.RESPONSE_CACHE_TTL_SECONDS
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from app.core.redis_client import redis_client
+            self._redis = redis_client
+        return self._redis
+
+    @staticmethod
+    def key(scope: str, name: str, params: Optional[Dict[str, Any]] = None) -> str:
+        query = json.dumps(params or {}, sort_keys=True, default=str)
+        return f"{KEY_PREFIX}:{scope}:{name}:{hashlib.sha1(query.encode()).hexdigest()[:16]}"
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return None
+        try:
+            entry = self.redis.hgetall(key)
+        except Exception as e:
+            logger.warning("Response cache read failed", error=str(e), key=key)
+            return None
+        return entry or None
+
+    def set(self, scope: str, key: str, body: str) -> str:
+        """Store a body under ``key`` (tracked in ``scope``) and return its ETag"""
+        etag = make_etag(body)
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return etag
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(key, mapping={"body": body, "etag": etag})
+            pipe.expire(key, self.ttl)
+            pipe.sadd(f"{KEY_PREFIX}:{scope}:keys", key)
+            pipe.expire(f"{KEY_PREFIX}:{scope}:keys", self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Response cache write failed", error=str(e), key=key)
+        return etag
+
+    def invalidate(self, scope: str):
+        """Drop every cached response of a scope"""
+        index = f"{KEY_PREFIX}:{scope}:keys"
+        try:
+            keys = self.redis.smembers(index)
+            self.redis.delete(index, *keys)
+        except Exception as e:
+            logger.warning("Response cache invalidation failed", error=str(e), scope=scope)
+
+    def respond(self, request: Request, key: str) -> Optional[Response]:
+        """Serve a cached response, or None on a miss"""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        return json_response(request, entry["body"], entry["etag"], cache_status="HIT")
+
+    def store_and_respond(self, request: Request, scope: str, key: str, body: str, cacheable: bool) -> Response:
+        """Respond with a freshly serialized body, caching it when the resource is immutable"""
+        etag = self.set(scope, key, body) if cacheable else None
+        return json_response(request, body, etag, cache_status="MISS")
+
+
+response_cache = ResponseCache()
@@ -3,6 +3,8 @@ Celery application for background tasks
 """
 from celery import Celery
 from app.core.config import settings
+from app.core.metrics import instrument_worker_metrics
+from app.core.tracing import instrument_celery
 
 celery_app = Celery(
     "citylab",
@@ -20,4 +22,9 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutes
     task_soft_time_limit=25 * 60,  # 25 minutes
+    # Region workers block for their whole run; a separate pool keeps them from waiting on the runs they serve
+    task_routes={"run_region_worker": {"queue": "regions"}},
 )
+
+instrument_celery()
+instrument_worker_metrics()
@@ -2,7 +2,7 @@
 Application configuration using Pydantic settings
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 from pathlib import Path
 
@@ -21,10 +21,45 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+    RESPONSE_CACHE_ENABLED: bool = True  # cache completed-run API responses in Redis
+    RESPONSE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
     
     # LLM APIs
     OPENAI_API_KEY: str = ""
     ANTHROPIC_API_KEY: str = ""
+    OPENAI_MODEL: str = "gpt-4-turbo-preview"
+    ANTHROPIC_MODEL: str = "claude-3-opus-20240229"
+    OPENAI_BASE_URL: str = ""  # e.g. http://localhost:8100/v1 for the mock LLM server
+    ANTHROPIC_BASE_URL: str = ""  # e.g. http://localhost:8100
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_RETRIES: int = 2
+    
+    # Mock LLM server (app.mock_llm) for offline benchmarking
+    MOCK_LLM_SEED: int = 0
+    MOCK_LLM_LATENCY: str = "fixed:0"  # fixed:<ms>, uniform:<lo_ms>,<hi_ms> or lognormal:<median_ms>,<sigma>
+    MOCK_LLM_ERROR_RATE: float = 0.0
+    MOCK_LLM_TIMEOUT_RATE: float = 0.0
+    MOCK_LLM_TIMEOUT_SECONDS: float = 120.0
+    
+    # Prompt token budgets per agent type
+    PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+        "resident": 600,
+        "transit_operator": 1200,
+        "planner": 2000,
+        "orchestrator": 800
+    }
+    DEFAULT_PROMPT_TOKEN_BUDGET: int = 1000
+    
+    # Monitoring
+    METRICS_ENABLED: bool = True  # expose Prometheus metrics on /metrics
+    PROMETHEUS_PUSHGATEWAY_URL: str = ""  # e.g. localhost:9091, pushed to by Celery workers
+    WORKER_INSTANCE_ID: str = ""  # stable name of this worker host in the Pushgateway; defaults to the hostname
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "file"  # file, otlp, console or none
+    TRACING_FILE_PATH: Path = Path("./data/traces/spans.jsonl")
+    OTLP_ENDPOINT: str = "http://localhost:4317"
+    TRACING_SAMPLE_RATE: float = 1.0  # fraction of traces (API requests / runs) kept
+    TRACING_TICK_SAMPLE_EVERY: int = 60  # within a run, trace every Nth tick; 0 traces none
     
     # Vector DB
     PINECONE_API_KEY: str = ""
@@ -36,6 +71,12 @@ class Settings(BaseSettings):
     SIMULATION_TICK_INTERVAL: int = 60  # seconds per simulation tick
     MAX_SIMULATION_DAYS: int = 30
     DEFAULT_AGENT_COUNT: int = 100
+    AGENT_MEMORY_LIMIT: int = 48  # steps of memory kept per agent
+    PROGRESS_PUBLISH_EVERY: int = 1  # publish live progress every N ticks
+    PROGRESS_LATEST_TTL_SECONDS: int = 24 * 3600
+    PROGRESS_HEARTBEAT_SECONDS: float = 15.0
+    SIMULATION_CODE_VERSION: str = ""  # optional tag (e.g. the deployed git commit) added to the source hash in run fingerprints
+    SURROGATE_MODEL_DIR: Path = Path("./data/processed/surrogates")
     
     # Data paths
     DATA_DIR: Path = Path("./data")
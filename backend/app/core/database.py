@@ -1,17 +1,45 @@
 """
 Database connection and session management
 """
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional
+import json
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
+_json_sizes: ContextVar[Optional[List[int]]] = ContextVar("json_sizes", default=None)
+
+
+def json_serializer(value: Any) -> str:
+    """Serializer for JSON columns that reports payload sizes to an active measure_json_size block"""
+    text = json.dumps(value)
+    sizes = _json_sizes.get()
+    if sizes is not None:
+        sizes.append(len(text))
+    return text
+
+
+@contextmanager
+def measure_json_size():
+    """Collect the sizes of JSON column values serialized inside the block (e.g. by a commit)"""
+    sizes: List[int] = []
+    token = _json_sizes.set(sizes)
+    try:
+        yield sizes
+    finally:
+        _json_sizes.reset(token)
+
+
 # Create database engine
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20,
+    json_serializer=json_serializer,
 )
 
 # Create session factory
@@ -0,0 +1,190 @@
+"""
+Prometheus metrics and per-run profiling of the simulation hot path
+"""
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+import socket
+import time
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, delete_from_gateway, push_to_gateway
+)
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Buckets span sub-millisecond rule-based steps up to slow LLM calls
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+LLM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+WORKER_METRICS_JOB = "citylab_worker"
+
+TICKS = Counter("citylab_simulation_ticks_total", "Simulation ticks executed")
+PHASE_SECONDS = Histogram(
+    "citylab_simulation_phase_seconds", "Duration of each phase of a simulation tick",
+    ["phase"], buckets=FAST_BUCKETS
+)
+AGENT_STEP_SECONDS = Histogram(
+    "citylab_agent_step_seconds", "Duration of a single agent step",
+    ["agent_type", "source"], buckets=FAST_BUCKETS
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "citylab_llm_request_seconds", "LLM request latency",
+    ["agent_type", "provider", "outcome"], buckets=LLM_BUCKETS
+)
+DB_FLUSH_SECONDS = Histogram(
+    "citylab_db_flush_seconds", "Duration of simulation persistence operations",
+    ["operation"], buckets=FAST_BUCKETS
+)
+DB_ROWS = Counter("citylab_db_rows_total", "Rows written by simulation persistence", ["operation"])
+SNAPSHOT_BYTES = Histogram(
+    "citylab_snapshot_bytes", "Serialized size of simulation state snapshots", buckets=SIZE_BUCKETS
+)
+
+
+def _accumulate(totals: Dict[str, Dict[str, float]], key: str, value: float):
+    entry = totals.get(key)
+    if entry is None:
+        totals[key] = {"count": 1, "total": value, "max": value}
+        return
+    entry["count"] += 1
+    entry["total"] += value
+    if value > entry["max"]:
+        entry["max"] = value
+
+
+def _timing_summary(totals: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        key: {
+            "count": entry["count"],
+            "total_seconds": round(entry["total"], 6),
+            "mean_ms": round(1000 * entry["total"] / entry["count"], 4),
+            "max_ms": round(1000 * entry["max"], 4)
+        }
+        for key, entry in totals.items()
+    }
+
+
+class RunProfiler:
+    """Timers and counters for one simulation run.
+
+    Every observation feeds the process-wide Prometheus metrics and a small
+    in-memory aggregate (count / total / max) that is summarized into
+    ``ScenarioRun.metrics`` when the run ends.
+    """
+
+    def __init__(self):
+        self.ticks = 0
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.agents: Dict[str, Dict[str, float]] = {}
+        self.llm: Dict[str, Dict[str, float]] = {}
+        self.db: Dict[str, Dict[str, float]] = {}
+        self.db_rows: Dict[str, int] = {}
+        self.snapshots: Dict[str, Dict[str, float]] = {}
+        # Labelled children cached per label set; ``labels()`` dominates the cost of an observation
+        self._children: Dict[tuple, Any] = {}
+
+    def _child(self, metric, *labels):
+        key = (metric, labels)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = metric.labels(*labels)
+        return child
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block as a named tick phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(name, time.perf_counter() - start)
+
+    def observe_phase(self, name: str, seconds: float):
+        self._child(PHASE_SECONDS, name).observe(seconds)
+        _accumulate(self.phases, name, seconds)
+
+    def observe_tick(self):
+        TICKS.inc()
+        self.ticks += 1
+
+    def observe_agent(self, agent_type: str, source: Optional[str], seconds: float):
+        source = source or "unknown"
+        self._child(AGENT_STEP_SECONDS, agent_type, source).observe(seconds)
+        _accumulate(self.agents, f"{agent_type}.{source}", seconds)
+
+    def observe_llm(self, agent_type: str, provider: str, seconds: float, outcome: str = "ok"):
+        self._child(LLM_REQUEST_SECONDS, agent_type, provider, outcome).observe(seconds)
+        _accumulate(self.llm, f"{agent_type}.{outcome}", seconds)
+
+    def observe_db(self, operation: str, seconds: float, rows: int = 0):
+        self._child(DB_FLUSH_SECONDS, operation).observe(seconds)
+        _accumulate(self.db, operation, seconds)
+        if rows:
+            self._child(DB_ROWS, operation).inc(rows)
+            self.db_rows[operation] = self.db_rows.get(operation, 0) + rows
+
+    def observe_snapshot(self, size_bytes: int):
+        SNAPSHOT_BYTES.observe(size_bytes)
+        _accumulate(self.snapshots, "state", size_bytes)
+
+    def summary(self) -> Dict[str, Any]:
+        snapshots = self.snapshots.get("state")
+        return {
+            "ticks": self.ticks,
+            "phases": _timing_summary(self.phases),
+            "agents": _timing_summary(self.agents),
+            "llm": _timing_summary(self.llm),
+            "db": _timing_summary(self.db),
+            "db_rows": dict(self.db_rows),
+            "snapshots": {
+                "count": snapshots["count"],
+                "mean_bytes": int(snapshots["total"] / snapshots["count"]),
+                "max_bytes": int(snapshots["max"])
+            } if snapshots else None
+        }
+
+
+def push_metrics(job: str, grouping_key: Optional[Dict[str, str]] = None, registry: CollectorRegistry = REGISTRY):
+    """Push this process's metrics to the Prometheus Pushgateway, if one is configured"""
+    if not settings.PROMETHEUS_PUSHGATEWAY_URL:
+        return
+    try:
+        push_to_gateway(
+            settings.PROMETHEUS_PUSHGATEWAY_URL, job=job,
+            registry=registry, grouping_key=grouping_key or {}
+        )
+    except Exception as e:
+        logger.warning("Pushing metrics failed", error=str(e), job=job)
+
+
+def delete_metrics(job: str, grouping_key: Optional[Dict[str, str]] = None):
+    """Remove a group from the Prometheus Pushgateway, if one is configured"""
+    if not settings.PROMETHEUS_PUSHGATEWAY_URL:
+        return
+    try:
+        delete_from_gateway(settings.PROMETHEUS_PUSHGATEWAY_URL, job=job, grouping_key=grouping_key or {})
+    except Exception as e:
+        logger.warning("Deleting pushed metrics failed", error=str(e), job=job)
+
+
+def worker_instance() -> str:
+    """Pushgateway instance of this worker process: the host's WORKER_INSTANCE_ID (or hostname) and pool slot.
+
+    Prefork slots are reused when a child is replaced, so the number of
+    groups stays at one per slot instead of growing with every pid.
+    """
+    from billiard.process import current_process
+    return f"{settings.WORKER_INSTANCE_ID or socket.gethostname()}-{getattr(current_process(), 'index', 0)}"
+
+
+def _on_worker_process_shutdown(**kwargs):
+    delete_metrics(WORKER_METRICS_JOB, {"instance": worker_instance()})
+
+
+def instrument_worker_metrics():
+    """Drop a worker process's Pushgateway group when it shuts down"""
+    from celery import signals
+    signals.worker_process_shutdown.connect(_on_worker_process_shutdown, weak=False)
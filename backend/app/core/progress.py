@@ -0,0 +1,187 @@
+"""
+Live run progress over Redis pub/sub.
+
+The simulation engine publishes small per-tick messages (tick, progress and
+the KPIs that changed) to ``run:<id>:progress`` and keeps the merged latest
+state under ``run:<id>:progress:latest``. API processes hold one subscription
+per run and fan messages out to any number of stream clients; a client that
+falls behind receives one coalesced message instead of a growing queue.
+"""
+import asyncio
+import json
+from typing import Dict, Any, Optional, Set
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# "stream_error" rather than "error": EventSource reserves the latter for connection errors
+STREAM_ERROR = "stream_error"
+TERMINAL_TYPES = {"completed", "failed", STREAM_ERROR}
+
+
+def progress_channel(run_id: int) -> str:
+    return f"run:{run_id}:progress"
+
+
+def latest_key(run_id: int) -> str:
+    return f"run:{run_id}:progress:latest"
+
+
+def coalesce(pending: Optional[Dict[str, Any]], message: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a message into one the client has not received yet, keeping every KPI change"""
+    if pending is None:
+        return message
+    merged = dict(message)
+    merged["kpi_delta"] = {**pending.get("kpi_delta", {}), **message.get("kpi_delta", {})}
+    merged["coalesced"] = pending.get("coalesced", 1) + message.get("coalesced", 1)
+    return merged
+
+
+class ProgressPublisher:
+    """Publishes per-tick progress for one run; Redis failures never interrupt the run"""
+
+    def __init__(self, run_id: int, redis=None, every: Optional[int] = None):
+        if redis is None:
+            from app.core.redis_client import redis_client as redis
+        self.run_id = run_id
+        self.redis = redis
+        self.every = every or settings.PROGRESS_PUBLISH_EVERY
+        self.channel = progress_channel(run_id)
+        self.kpis: Dict[str, Any] = {}
+        self.enabled = True
+
+    def publish_tick(self, tick: int, total_ticks: int, kpis: Dict[str, Any], simulation_time: Any = None):
+        delta = {key: value for key, value in kpis.items() if self.kpis.get(key) != value}
+        self.kpis.update(delta)
+        last = tick == total_ticks - 1
+        if tick % self.every and not last:
+            return
+        self._publish({
+            "type": "tick",
+            "run_id": self.run_id,
+            "tick": tick,
+            "total_ticks": total_ticks,
+            "progress": (tick + 1) / total_ticks,
+            "simulation_time": simulation_time.isoformat() if simulation_time else None,
+            "kpi_delta": delta
+        })
+
+    def publish_status(self, status: str, **extra):
+        self._publish({"type": status, "run_id": self.run_id, "kpi_delta": {}, **extra})
+
+    def _publish(self, message: Dict[str, Any]):
+        if not self.enabled:
+            return
+        # Late subscribers start from the merged state, so it carries all KPIs
+        latest = {**message, "kpis": self.kpis}
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(latest_key(self.run_id), json.dumps(latest, default=str), ex=settings.PROGRESS_LATEST_TTL_SECONDS)
+            pipe.publish(self.channel, json.dumps(message, default=str))
+            pipe.execute()
+        except Exception as e:
+            # Progress is best effort; keep the run going without it
+            logger.warning("Progress publishing disabled", error=str(e), run_id=self.run_id)
+            self.enabled = False
+
+
+class ProgressSubscriber:
+    """One client's view of a run: at most one pending (coalesced) message"""
+
+    def __init__(self, run_id: int):
+        self.run_id = run_id
+        self.pending: Optional[Dict[str, Any]] = None
+        self._ready = asyncio.Event()
+
+    def offer(self, message: Dict[str, Any]):
+        self.pending = coalesce(self.pending, message)
+        self._ready.set()
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next message, or None if nothing arrived within ``timeout`` seconds"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        message, self.pending = self.pending, None
+        return message
+
+
+class ProgressHub:
+    """Shares one Redis subscription per run between all subscribers in this process"""
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url or settings.REDIS_URL
+        self._redis = None
+        self._subscribers: Dict[int, Set[ProgressSubscriber]] = {}
+        self._readers: Dict[int, asyncio.Task] = {}
+        self._subscribed: Dict[int, asyncio.Event] = {}
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    async def latest(self, run_id: int) -> Optional[Dict[str, Any]]:
+        data = await self.redis.get(latest_key(run_id))
+        return json.loads(data) if data else None
+
+    async def subscribe(self, run_id: int) -> ProgressSubscriber:
+        """Register a subscriber; returns once the run's channel subscription is live.
+
+        The subscriber is registered before any await and the caller reads the
+        latest state only after the channel is subscribed, so no message falls
+        between the replayed state and the live stream.
+        """
+        subscriber = ProgressSubscriber(run_id)
+        self._subscribers.setdefault(run_id, set()).add(subscriber)
+        if run_id not in self._readers:
+            self._subscribed[run_id] = asyncio.Event()
+            self._readers[run_id] = asyncio.create_task(self._read(run_id, self._subscribed[run_id]))
+        await self._subscribed[run_id].wait()
+        return subscriber
+
+    async def unsubscribe(self, subscriber: ProgressSubscriber):
+        subscribers = self._subscribers.get(subscriber.run_id, set())
+        subscribers.discard(subscriber)
+        if not subscribers:
+            self._subscribers.pop(subscriber.run_id, None)
+            self._subscribed.pop(subscriber.run_id, None)
+            reader = self._readers.pop(subscriber.run_id, None)
+            if reader:
+                reader.cancel()
+
+    async def _read(self, run_id: int, subscribed: asyncio.Event):
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(progress_channel(run_id))
+            subscribed.set()
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = json.loads(message["data"])
+                for subscriber in list(self._subscribers.get(run_id, ())):
+                    subscriber.offer(data)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error("Progress subscription failed", error=str(e), run_id=run_id)
+            self._readers.pop(run_id, None)
+            self._subscribed.pop(run_id, None)
+            for subscriber in list(self._subscribers.pop(run_id, ())):
+                subscriber.offer({"type": STREAM_ERROR, "run_id": run_id, "kpi_delta": {}, "detail": "Progress stream unavailable"})
+        finally:
+            subscribed.set()
+            try:
+                await pubsub.unsubscribe(progress_channel(run_id))
+                await pubsub.close()
+            except Exception:
+                pass
+
+
+progress_hub = ProgressHub()
@@ -0,0 +1,61 @@
+"""
+Seeded random streams - independent, stable streams derived from the run seed per phase, agent and tick
+"""
+from typing import Optional, Tuple, Union
+import hashlib
+import random
+import numpy as np
+
+StreamKey = Tuple[int, ...]
+
+# Phases of a run that draw random numbers; each gets its own family of streams
+ACTIVATION = "activation"
+AGENT = "agent"
+DEPARTURE = "departure"
+POPULATION = "population"
+
+
+def _word(part: Union[int, str]) -> int:
+    """Stable non-negative integer for a key component (strings hash the same in every process)"""
+    if isinstance(part, (int, np.integer)) and part >= 0:
+        return int(part)
+    return int.from_bytes(hashlib.blake2b(str(part).encode(), digest_size=8).digest(), "little")
+
+
+def stream_key(seed: Optional[int], *path: Union[int, str]) -> Optional[StreamKey]:
+    """Key of the stream at ``path`` under ``seed``, e.g. ``(AGENT, agent_id, tick)``; None when unseeded.
+
+    The stream is a pure function of the key, so it does not depend on which
+    process draws from it or on how many draws other streams made before.
+    """
+    if seed is None:
+        return None
+    return (_word(seed), *(_word(part) for part in path))
+
+
+def child_key(key: Optional[StreamKey], *path: Union[int, str]) -> Optional[StreamKey]:
+    """Sub-stream of ``key``, e.g. a decider's draws for an agent apart from the agent's own"""
+    if key is None:
+        return None
+    return (*key, *(_word(part) for part in path))
+
+
+def seed_sequence(key: StreamKey) -> np.random.SeedSequence:
+    return np.random.SeedSequence(entropy=key[0], spawn_key=key[1:])
+
+
+def generator(key: Optional[StreamKey]) -> np.random.Generator:
+    """NumPy generator for ``key``; unseeded when ``key`` is None"""
+    return np.random.default_rng(None if key is None else seed_sequence(key))
+
+
+def python_random(key: Optional[StreamKey]) -> random.Random:
+    """``random.Random`` for ``key``; unseeded when ``key`` is None.
+
+    Seeded from a hash of the key rather than through a SeedSequence, which
+    costs several times more and is paid per agent and step.
+    """
+    if key is None:
+        return random.Random()
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=32).digest()
+    return random.Random(int.from_bytes(digest, "little"))
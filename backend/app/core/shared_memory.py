@@ -0,0 +1,212 @@
+"""
+Host-wide shared memory for large read-only arrays (population columns, graph arrays)
+
+Arrays are published once per host under a key; any process on the host
+attaches by key and gets zero-copy numpy views. A small registry file per key
+records the array layout and which processes hold a reference. The last
+holder to release unlinks the segments, and segments whose holders all died
+(crashed runs) are swept on the next publish or attach.
+"""
+from contextlib import contextmanager
+from multiprocessing import shared_memory, resource_tracker
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+REGISTRY_DIR = Path(tempfile.gettempdir()) / "citylab-shm"
+
+# References held by this process, released at exit
+_held: Dict[str, "SharedArrays"] = {}
+
+
+def _key_id(key: str) -> str:
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+@contextmanager
+def _locked(key: str):
+    """Exclusive lock on a key's registry across processes of the host"""
+    REGISTRY_DIR.mkdir(parents=True, exist_ok=True)
+    with open(REGISTRY_DIR / f"{_key_id(key)}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield REGISTRY_DIR / f"{_key_id(key)}.json"
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _open_segment(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+    # Lifetime is managed by the registry; the resource tracker would unlink on the first process exit
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _unlink(layout: Dict[str, Any]):
+    for spec in layout["arrays"].values():
+        try:
+            # Left registered with the resource tracker: unlink() unregisters it again
+            segment = shared_memory.SharedMemory(name=spec["segment"])
+            segment.close()
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _read(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def _drop_dead_holders(path: Path, layout: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Forget holders that no longer run; unlink and return None when nobody is left"""
+    holders = {pid: count for pid, count in layout["holders"].items() if _alive(int(pid))}
+    if not holders:
+        _unlink(layout)
+        path.unlink(missing_ok=True)
+        logger.info("Shared arrays removed", key=layout["key"])
+        return None
+    layout["holders"] = holders
+    return layout
+
+
+class SharedArrays:
+    """Read-only numpy views of arrays published under ``key``; holds one reference until released"""
+
+    def __init__(self, key: str, layout: Dict[str, Any]):
+        self.key = key
+        self.meta = layout.get("meta", {})
+        self._segments: List[shared_memory.SharedMemory] = []
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, spec in layout["arrays"].items():
+            segment = _open_segment(spec["segment"])
+            self._segments.append(segment)
+            array = np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=segment.buf)
+            array.flags.writeable = False
+            self.arrays[name] = array
+        self.released = False
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+    @classmethod
+    def publish(cls, key: str, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> "SharedArrays":
+        """Copy ``arrays`` into shared memory under ``key``, or attach if the host already has them"""
+        with _locked(key) as path:
+            layout = _read(path)
+            if layout is not None:
+                layout = _drop_dead_holders(path, layout)
+            if layout is None:
+                layout = {"key": key, "arrays": {}, "meta": meta or {}, "holders": {}}
+                for i, (name, array) in enumerate(arrays.items()):
+                    array = np.ascontiguousarray(array)
+                    segment_name = f"cl_{_key_id(key)}_{i}"
+                    segment = _open_segment(segment_name, create=True, size=max(array.nbytes, 1))
+                    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+                    segment.close()
+                    layout["arrays"][name] = {"segment": segment_name, "dtype": array.dtype.str, "shape": list(array.shape)}
+                logger.info("Shared arrays published", key=key, bytes=int(sum(np.asarray(a).nbytes for a in arrays.values())))
+            return cls._hold(path, layout)
+
+    @classmethod
+    def attach(cls, key: str) -> Optional["SharedArrays"]:
+        """Attach to arrays published under ``key``; None when the host has none"""
+        with _locked(key) as path:
+            layout = _read(path)
+            if layout is not None:
+                layout = _drop_dead_holders(path, layout)
+            if layout is None:
+                return None
+            return cls._hold(path, layout)
+
+    @classmethod
+    def _hold(cls, path: Path, layout: Dict[str, Any]) -> "SharedArrays":
+        pid = str(os.getpid())
+        layout["holders"][pid] = layout["holders"].get(pid, 0) + 1
+        path.write_text(json.dumps(layout))
+        shared = cls(layout["key"], layout)
+        _held[f"{layout['key']}:{id(shared)}"] = shared
+        return shared
+
+    def release(self):
+        """Drop this reference; the last holder on the host unlinks the segments"""
+        if self.released:
+            return
+        self.released = True
+        _held.pop(f"{self.key}:{id(self)}", None)
+        self.arrays = {}
+        for segment in self._segments:
+            try:
+                segment.close()
+            except BufferError:
+                # Views still exported elsewhere in this process; the mapping goes with the process
+                pass
+        self._segments = []
+        with _locked(self.key) as path:
+            layout = _read(path)
+            if layout is None:
+                return
+            pid = str(os.getpid())
+            count = layout["holders"].get(pid, 0) - 1
+            if count > 0:
+                layout["holders"][pid] = count
+            else:
+                layout["holders"].pop(pid, None)
+            if layout["holders"]:
+                path.write_text(json.dumps(layout))
+            else:
+                _drop_dead_holders(path, layout)
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def sweep_stale() -> int:
+    """Remove shared arrays of the host whose holders have all exited; returns how many were removed"""
+    removed = 0
+    if not REGISTRY_DIR.exists():
+        return removed
+    for path in REGISTRY_DIR.glob("*.json"):
+        layout = _read(path)
+        if layout is None:
+            continue
+        with _locked(layout["key"]) as locked_path:
+            current = _read(locked_path)
+            if current is not None and _drop_dead_holders(locked_path, current) is None:
+                removed += 1
+    return removed
+
+
+@atexit.register
+def _release_all():
+    for shared in list(_held.values()):
+        try:
+            shared.release()
+        except Exception as e:
+            logger.warning("Failed to release shared arrays", key=shared.key, error=str(e))
@@ -0,0 +1,125 @@
+"""
+OpenTelemetry tracing: exporter setup, sampling and Celery context propagation
+"""
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+from opentelemetry import context as otel_context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.id_generator import RandomIdGenerator
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import NonRecordingSpan, SpanContext, TraceFlags
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+tracer = trace.get_tracer("citylab")
+
+_configured = False
+_celery_spans: Dict[str, Any] = {}
+
+
+def configure_tracing(service_name: str) -> bool:
+    """Install the tracer provider for this process; returns False when tracing is disabled"""
+    global _configured
+    if _configured or not settings.TRACING_ENABLED:
+        return _configured
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        # Children follow their parent's decision, so a trace is kept or dropped as a whole
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATE))
+    )
+    exporter = _create_exporter()
+    if exporter is not None:
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _configured = True
+    logger.info("Tracing configured", service=service_name, exporter=settings.TRACING_EXPORTER)
+    return True
+
+
+def _create_exporter():
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.OTLP_ENDPOINT, insecure=True)
+    if settings.TRACING_EXPORTER == "file":
+        settings.TRACING_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        return ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE_PATH, "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    return None
+
+
+@contextmanager
+def sampled(keep: bool):
+    """Run a block whose child spans are kept only if ``keep`` is true.
+
+    Long runs trace every Nth tick: for the other ticks an unsampled parent
+    is made current, and the ParentBased sampler drops everything below it.
+    """
+    if keep:
+        yield
+        return
+    parent = trace.get_current_span().get_span_context()
+    ids = RandomIdGenerator()
+    unsampled = NonRecordingSpan(SpanContext(
+        trace_id=parent.trace_id if parent.is_valid else ids.generate_trace_id(),
+        span_id=ids.generate_span_id(),
+        is_remote=False,
+        trace_flags=TraceFlags(TraceFlags.DEFAULT)
+    ))
+    with trace.use_span(unsampled, end_on_exit=False):
+        yield
+
+
+def tick_sampled(tick: int) -> bool:
+    every = settings.TRACING_TICK_SAMPLE_EVERY
+    return every > 0 and tick % every == 0
+
+
+def inject_headers(headers: Dict[str, Any]):
+    """Write the current trace context into a carrier (e.g. Celery message headers)"""
+    propagate.inject(headers)
+
+
+def _on_before_task_publish(headers: Optional[Dict[str, Any]] = None, **kwargs):
+    if headers is not None:
+        inject_headers(headers)
+
+
+def _on_task_prerun(task_id: str = None, task=None, **kwargs):
+    # Configured lazily so the provider is created in the process that runs tasks (after fork)
+    configure_tracing("citylab-worker")
+    # Custom message headers are exposed as attributes of the task request
+    carrier = {key: value for key, value in vars(task.request).items() if isinstance(value, str)}
+    carrier.update(getattr(task.request, "headers", None) or {})
+    token = otel_context.attach(propagate.extract(carrier))
+    span = tracer.start_span(f"celery.{task.name}", attributes={"celery.task_id": task_id})
+    _celery_spans[task_id] = (span, token, otel_context.attach(trace.set_span_in_context(span)))
+
+
+def _on_task_postrun(task_id: str = None, state: str = None, **kwargs):
+    entry = _celery_spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token, span_token = entry
+    if state:
+        span.set_attribute("celery.state", state)
+    span.end()
+    otel_context.detach(span_token)
+    otel_context.detach(token)
+
+
+def instrument_celery():
+    """Propagate trace context through Celery headers and wrap each task in a span"""
+    from celery import signals
+    signals.before_task_publish.connect(_on_before_task_publish, weak=False)
+    signals.task_prerun.connect(_on_task_prerun, weak=False)
+    signals.task_postrun.connect(_on_task_postrun, weak=False)
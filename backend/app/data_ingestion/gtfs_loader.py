@@ -0,0 +1,157 @@
+"""
+GTFS feed loader - compiles stops, trips and stop_times into a RAPTOR timetable
+"""
+from typing import Dict, List, Any, Optional, Set
+from datetime import datetime
+from pathlib import Path
+import io
+import zipfile
+import numpy as np
+import pandas as pd
+import structlog
+
+from app.simulation.raptor import Timetable
+
+logger = structlog.get_logger()
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def _read_feed(path: Path) -> Dict[str, pd.DataFrame]:
+    """GTFS tables from a zip archive or an extracted directory, all columns as strings"""
+    tables = {}
+    names = ["stops", "routes", "trips", "stop_times", "calendar", "calendar_dates"]
+    if path.is_dir():
+        for name in names:
+            if (path / f"{name}.txt").exists():
+                tables[name] = pd.read_csv(path / f"{name}.txt", dtype=str, keep_default_na=False)
+    else:
+        with zipfile.ZipFile(path) as archive:
+            members = {Path(member).name: member for member in archive.namelist()}
+            for name in names:
+                if f"{name}.txt" in members:
+                    with archive.open(members[f"{name}.txt"]) as handle:
+                        tables[name] = pd.read_csv(io.TextIOWrapper(handle, encoding="utf-8-sig"), dtype=str, keep_default_na=False)
+    missing = {"stops", "trips", "stop_times"} - set(tables)
+    if missing:
+        raise ValueError(f"GTFS feed is missing {', '.join(sorted(missing))}")
+    return tables
+
+
+def _seconds(times: pd.Series) -> np.ndarray:
+    """HH:MM:SS (hours may exceed 24) to seconds after midnight"""
+    parts = times.str.strip().str.split(":", expand=True).astype(int)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy(dtype=float)
+
+
+def active_services(tables: Dict[str, pd.DataFrame], service_date: Optional[str] = None) -> Optional[Set[str]]:
+    """Services running on ``service_date`` (YYYYMMDD); without a date, the weekday (Monday) services.
+
+    Returns None when the feed has no calendar, meaning every trip runs.
+    """
+    calendar = tables.get("calendar")
+    calendar_dates = tables.get("calendar_dates")
+    if calendar is None and calendar_dates is None:
+        return None
+    services: Set[str] = set()
+    if service_date is None:
+        if calendar is not None:
+            services = set(calendar.loc[calendar["monday"] == "1", "service_id"])
+        return services or None
+    weekday = WEEKDAYS[datetime.strptime(service_date, "%Y%m%d").weekday()]
+    if calendar is not None:
+        running = (calendar[weekday] == "1") & (calendar["start_date"] <= service_date) & (calendar["end_date"] >= service_date)
+        services = set(calendar.loc[running, "service_id"])
+    if calendar_dates is not None:
+        exceptions = calendar_dates[calendar_dates["date"] == service_date]
+        services |= set(exceptions.loc[exceptions["exception_type"] == "1", "service_id"])
+        services -= set(exceptions.loc[exceptions["exception_type"] == "2", "service_id"])
+    return services
+
+
+def compile_timetable(tables: Dict[str, pd.DataFrame], service_date: Optional[str] = None) -> Timetable:
+    """Group trips into stop patterns and build per-pattern arrival/departure arrays"""
+    stops = tables["stops"]
+    stop_ids = stops["stop_id"].tolist()
+    stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+
+    trips = tables["trips"]
+    services = active_services(tables, service_date)
+    if services is not None:
+        trips = trips[trips["service_id"].isin(services)]
+    trip_route = dict(zip(trips["trip_id"], trips["route_id"]))
+
+    stop_times = tables["stop_times"]
+    stop_times = stop_times[stop_times["trip_id"].isin(trip_route) & stop_times["stop_id"].isin(stop_index)].copy()
+    stop_times["sequence"] = stop_times["stop_sequence"].astype(int)
+    stop_times = stop_times.sort_values(["trip_id", "sequence"])
+    # Untimed intermediate stops are interpolated linearly within each trip
+    for column in ("arrival_time", "departure_time"):
+        values = stop_times[column].where(stop_times[column].str.strip() != "")
+        stop_times[column + "_s"] = np.nan
+        timed = values.notna()
+        stop_times.loc[timed, column + "_s"] = _seconds(values[timed])
+        stop_times[column + "_s"] = stop_times.groupby("trip_id")[column + "_s"].transform(lambda s: s.interpolate(limit_area="inside"))
+    stop_times["arrival_time_s"] = stop_times["arrival_time_s"].fillna(stop_times["departure_time_s"])
+    stop_times["departure_time_s"] = stop_times["departure_time_s"].fillna(stop_times["arrival_time_s"])
+    stop_times = stop_times.dropna(subset=["arrival_time_s", "departure_time_s"])
+    stop_times["stop"] = stop_times["stop_id"].map(stop_index)
+
+    # Pattern = route plus exact stop sequence
+    patterns: Dict[tuple, List[tuple]] = {}
+    for trip_id, group in stop_times.groupby("trip_id", sort=False):
+        key = (trip_route[trip_id], tuple(group["stop"].tolist()))
+        patterns.setdefault(key, []).append((group["arrival_time_s"].to_numpy(), group["departure_time_s"].to_numpy()))
+
+    pattern_routes, pattern_stops, arrivals, departures = [], [], [], []
+    for (route_id, sequence), pattern_trips in patterns.items():
+        pattern_trips.sort(key=lambda trip: trip[1][0])
+        pattern_routes.append(route_id)
+        pattern_stops.append(np.array(sequence, dtype=np.int64))
+        arrivals.append(np.vstack([trip[0] for trip in pattern_trips]))
+        departures.append(np.vstack([trip[1] for trip in pattern_trips]))
+
+    return Timetable(
+        stop_ids,
+        stops["stop_lat"].astype(float).to_numpy(),
+        stops["stop_lon"].astype(float).to_numpy(),
+        pattern_routes,
+        pattern_stops,
+        arrivals,
+        departures
+    )
+
+
+def load_gtfs(path: Path, output_path: Path, service_date: Optional[str] = None) -> Dict[str, Any]:
+    """Compile a GTFS feed into a timetable file and return a summary for the city data record"""
+    try:
+        logger.info("Loading GTFS feed", path=str(path), service_date=service_date)
+        tables = _read_feed(Path(path))
+        timetable = compile_timetable(tables, service_date)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        timetable.save(output_path)
+
+        routes = tables.get("routes")
+        route_names = {}
+        if routes is not None:
+            for _, route in routes.iterrows():
+                route_names[route["route_id"]] = route.get("route_short_name") or route.get("route_long_name") or route["route_id"]
+        result = {
+            "timetable_path": str(output_path),
+            "routes": [
+                {"route_id": route_id, "name": route_names.get(route_id, route_id), "headway_minutes": timetable.headway_minutes(route_id)}
+                for route_id in timetable.route_patterns
+            ],
+            "metadata": {
+                "stop_count": len(timetable.stop_ids),
+                "pattern_count": len(timetable.pattern_stops),
+                "trip_count": timetable.trips,
+                "service_date": service_date
+            }
+        }
+        logger.info("GTFS feed compiled", **result["metadata"])
+        return result
+
+    except Exception as e:
+        logger.error("Failed to load GTFS feed", error=str(e), path=str(path))
+        raise
@@ -3,11 +3,13 @@ CityLab AI - Main FastAPI Application
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import structlog
 
 from app.core.config import settings
-from app.api.v1 import scenarios, agents, simulations, data, explainability
+from app.core.tracing import configure_tracing
+from app.api.v1 import scenarios, agents, simulations, data, explainability, sweeps
 
 # Configure structured logging
 logger = structlog.get_logger()
@@ -20,6 +22,11 @@ app = FastAPI(
     redoc_url="/api/redoc",
 )
 
+# Tracing (spans are linked to Celery tasks through message headers)
+if configure_tracing("citylab-api"):
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="health,metrics")
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -35,6 +42,7 @@ app.include_router(agents.router, prefix="/api/v1/agents", tags=["agents"])
 app.include_router(simulations.router, prefix="/api/v1/simulations", tags=["simulations"])
 app.include_router(data.router, prefix="/api/v1/data", tags=["data"])
 app.include_router(explainability.router, prefix="/api/v1/explainability", tags=["explainability"])
+app.include_router(sweeps.router, prefix="/api/v1/sweeps", tags=["sweeps"])
 
 
 @app.get("/")
@@ -54,6 +62,13 @@ async def health_check():
     return {"status": "healthy", "service": "citylab-api"}
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics"""
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler"""
@@ -0,0 +1,6 @@
+"""
+Deterministic OpenAI/Anthropic-compatible mock LLM server for offline benchmarking
+"""
+from app.mock_llm.server import MockLLMConfig, create_app
+
+__all__ = ["MockLLMConfig", "create_app"]
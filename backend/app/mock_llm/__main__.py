@@ -0,0 +1,33 @@
+"""
+Run the mock LLM server: python -m app.mock_llm --port 8100 --latency lognormal:200,0.5
+"""
+import argparse
+import uvicorn
+
+from app.mock_llm.server import MockLLMConfig, create_app
+
+
+def main():
+    defaults = MockLLMConfig.from_settings()
+    parser = argparse.ArgumentParser(description="Deterministic mock LLM server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--latency", default=defaults.latency, help="fixed:<ms>, uniform:<lo>,<hi> or lognormal:<median_ms>,<sigma>")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--timeout-rate", type=float, default=defaults.timeout_rate)
+    parser.add_argument("--timeout-seconds", type=float, default=defaults.timeout_seconds)
+    args = parser.parse_args()
+
+    config = MockLLMConfig(
+        seed=args.seed,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
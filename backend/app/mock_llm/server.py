@@ -0,0 +1,270 @@
+"""
+Mock LLM server speaking the OpenAI chat completions and Anthropic messages APIs.
+
+Responses are deterministic per (seed, agent type, prompt, attempt), so runs are
+reproducible regardless of request concurrency, while latency, error and timeout
+injection exercise the real client code path (timeouts, retries, parsing).
+
+The attempt comes from the client in X-Mock-Attempt, which the app's chat
+clients (app.agents.base.get_llm) number per call, SDK retries included;
+openai 1.6.1 sends no retry count of its own. X-Stainless-Retry-Count from
+newer SDKs is used when X-Mock-Attempt is absent. The server keeps no
+per-prompt state; clients that send neither header always get attempt 0, so
+an injected fault repeats on retry and error_rate acts per prompt.
+"""
+import asyncio
+import hashlib
+import random
+import time
+from typing import Dict, List, Any, Optional, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import structlog
+
+from app.core.config import settings
+from app.agents.prompting import count_tokens
+
+logger = structlog.get_logger()
+
+# Responses per agent type, worded so each agent's _parse_llm_response picks up an action
+RESPONSES: Dict[str, List[Tuple[str, float]]] = {
+    "resident": [
+        ("I will take transit today; the bus is reliable and cheaper than parking.", 0.45),
+        ("I will drive my car since the trip is faster at this hour.", 0.35),
+        ("I will bike to my destination, the weather is fine and it is healthy.", 0.12),
+        ("I will walk, it is close enough.", 0.08),
+    ],
+    "transit_operator": [
+        ("Ridership is growing, increase frequency on the busiest route.", 0.5),
+        ("Keep current service levels; demand is stable and the budget is tight.", 0.5),
+    ],
+    "planner": [
+        ("Propose congestion pricing in the downtown core, citing the regional mobility plan.", 0.3),
+        ("Propose bus priority lanes to improve transit reliability.", 0.3),
+        ("Propose zoning changes allowing mixed-use development near stations.", 0.2),
+        ("Propose protected bike lanes on arterial corridors.", 0.2),
+    ],
+    "orchestrator": [
+        ("Advance to the next tick; all constraints are satisfied.", 1.0),
+    ],
+}
+
+AGENT_TYPE_MARKERS = [
+    ("resident agent", "resident"),
+    ("transit operator", "transit_operator"),
+    ("urban planner", "planner"),
+    ("orchestrator", "orchestrator"),
+]
+
+
+class MockLLMConfig:
+    """Behaviour of the mock server"""
+
+    def __init__(
+        self,
+        seed: int = 0,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_seconds: float = 120.0
+    ):
+        self.seed = seed
+        self.latency = latency
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self._latency_kind, self._latency_params = parse_latency(latency)
+
+    @classmethod
+    def from_settings(cls) -> "MockLLMConfig":
+        return cls(
+            seed=settings.MOCK_LLM_SEED,
+            latency=settings.MOCK_LLM_LATENCY,
+            error_rate=settings.MOCK_LLM_ERROR_RATE,
+            timeout_rate=settings.MOCK_LLM_TIMEOUT_RATE,
+            timeout_seconds=settings.MOCK_LLM_TIMEOUT_SECONDS
+        )
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Latency in seconds drawn from the configured distribution"""
+        if self._latency_kind == "uniform":
+            low, high = self._latency_params
+            return rng.uniform(low, high) / 1000
+        if self._latency_kind == "lognormal":
+            median, sigma = self._latency_params
+            return median * rng.lognormvariate(0, sigma) / 1000
+        return self._latency_params[0] / 1000
+
+
+def parse_latency(spec: str) -> Tuple[str, List[float]]:
+    """Parse 'fixed:50', 'uniform:20,200' or 'lognormal:150,0.6'"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v] or [0.0]
+    expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+    return kind, values
+
+
+def detect_agent_type(system_prompt: str) -> str:
+    lowered = system_prompt.lower()
+    for marker, agent_type in AGENT_TYPE_MARKERS:
+        if marker in lowered:
+            return agent_type
+    return "orchestrator"
+
+
+class MockLLM:
+    """Deterministic response generation and token accounting"""
+
+    def __init__(self, config: MockLLMConfig):
+        self.config = config
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.started_at = time.time()
+
+    def _request_rng(self, agent_type: str, prompt: str, attempt: int) -> random.Random:
+        """RNG keyed by prompt content and client-supplied attempt, independent of server history"""
+        digest = hashlib.sha256(f"{self.config.seed}|{agent_type}|{prompt}".encode()).hexdigest()
+        return random.Random(f"{digest}|{attempt}")
+
+    async def complete(self, system_prompt: str, prompt: str, attempt: int = 0) -> Tuple[int, Dict[str, Any]]:
+        """Return (status, result) where result has text and token usage on success"""
+        agent_type = detect_agent_type(system_prompt)
+        rng = self._request_rng(agent_type, prompt, attempt)
+        stats = self.stats.setdefault(agent_type, {
+            "requests": 0, "errors": 0, "timeouts": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "latency_seconds": 0.0
+        })
+        stats["requests"] += 1
+
+        fault = rng.random()
+        if fault < self.config.timeout_rate:
+            stats["timeouts"] += 1
+            await asyncio.sleep(self.config.timeout_seconds)
+            return 504, {"error": "Injected timeout"}
+        if fault < self.config.timeout_rate + self.config.error_rate:
+            stats["errors"] += 1
+            status = rng.choice([429, 500, 503])
+            return status, {"error": f"Injected error {status}"}
+
+        latency = self.config.sample_latency(rng)
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+        texts, weights = zip(*RESPONSES[agent_type])
+        text = rng.choices(texts, weights=weights)[0]
+        prompt_tokens = count_tokens(system_prompt) + count_tokens(prompt)
+        completion_tokens = count_tokens(text)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["latency_seconds"] += latency
+        return 200, {"text": text, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+    def summary(self) -> Dict[str, Any]:
+        totals = {"requests": 0, "errors": 0, "timeouts": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        for stats in self.stats.values():
+            for key in totals:
+                totals[key] += stats[key]
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "totals": totals,
+            "by_agent_type": self.stats
+        }
+
+
+def _message_text(content: Any) -> str:
+    """Flatten OpenAI/Anthropic message content (string or content blocks)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+def _request_attempt(request: Request) -> int:
+    """Retry attempt supplied by the client, 0 when absent or malformed"""
+    for header in ("x-mock-attempt", "x-stainless-retry-count"):
+        value = request.headers.get(header)
+        if value is not None:
+            try:
+                return max(int(value), 0)
+            except ValueError:
+                return 0
+    return 0
+
+
+def create_app(config: Optional[MockLLMConfig] = None) -> FastAPI:
+    """Create the mock server application"""
+    mock = MockLLM(config or MockLLMConfig.from_settings())
+    app = FastAPI(title="CityLab mock LLM", docs_url=None, redoc_url=None)
+    app.state.mock = mock
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        """OpenAI-compatible chat completions"""
+        body = await request.json()
+        messages = body.get("messages", [])
+        system_prompt = "".join(_message_text(m.get("content")) for m in messages if m.get("role") == "system")
+        prompt = "".join(_message_text(m.get("content")) for m in messages if m.get("role") != "system")
+
+        status, result = await mock.complete(system_prompt, prompt, _request_attempt(request))
+        if status != 200:
+            return JSONResponse(status_code=status, content={"error": {"message": result["error"], "type": "mock_error"}})
+
+        return {
+            "id": f"chatcmpl-mock-{hashlib.sha1(prompt.encode()).hexdigest()[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": result["text"]},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": result["prompt_tokens"],
+                "completion_tokens": result["completion_tokens"],
+                "total_tokens": result["prompt_tokens"] + result["completion_tokens"]
+            }
+        }
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        """Anthropic-compatible messages"""
+        body = await request.json()
+        system_prompt = _message_text(body.get("system", ""))
+        prompt = "".join(_message_text(m.get("content")) for m in body.get("messages", []))
+
+        status, result = await mock.complete(system_prompt, prompt, _request_attempt(request))
+        if status != 200:
+            return JSONResponse(status_code=status, content={"type": "error", "error": {"type": "api_error", "message": result["error"]}})
+
+        return {
+            "id": f"msg_mock_{hashlib.sha1(prompt.encode()).hexdigest()[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": [{"type": "text", "text": result["text"]}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": result["prompt_tokens"], "output_tokens": result["completion_tokens"]}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        """Request, fault and token accounting since start or last reset"""
+        return mock.summary()
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        mock.reset_stats()
+        return {"status": "reset"}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "service": "mock-llm"}
+
+    return app
@@ -3,8 +3,9 @@ Database models
 """
 from app.models.scenario import Scenario, ScenarioRun
 from app.models.agent import Agent, AgentAction
-from app.models.simulation import SimulationState, SimulationMetrics
+from app.models.simulation import SimulationState, SimulationMetrics, SimulationRollup, RunSummary
 from app.models.data import CityData, PolicyDocument
+from app.models.sweep import Sweep
 
 __all__ = [
     "Scenario",
@@ -13,6 +14,9 @@ __all__ = [
     "AgentAction",
     "SimulationState",
     "SimulationMetrics",
+    "SimulationRollup",
+    "RunSummary",
     "CityData",
     "PolicyDocument",
+    "Sweep",
 ]
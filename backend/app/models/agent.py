@@ -50,6 +50,8 @@ class AgentAction(Base):
     retrieved_docs = Column(JSON)  # Policy documents consulted
     prompt_used = Column(Text)  # Prompt that generated this action
     confidence_score = Column(Float)
+    decision_source = Column(String(50), index=True)  # llm, rule, archetype, surrogate
+    features = Column(JSON)  # Compact perception features for surrogate training
     
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -31,12 +31,17 @@ class ScenarioRun(Base):
     __tablename__ = "scenario_runs"
     
     id = Column(Integer, primary_key=True, index=True)
-    scenario_id = Column(Integer, ForeignKey("scenarios.id"), nullable=False)
-    status = Column(String(50), default="pending")  # pending, running, completed, failed
+    scenario_id = Column(Integer, ForeignKey("scenarios.id"), nullable=False, index=True)
+    status = Column(String(50), default="pending", index=True)  # pending, running, completed, failed
     simulation_days = Column(Integer, default=7)
     start_time = Column(DateTime(timezone=True), server_default=func.now())
     end_time = Column(DateTime(timezone=True))
     seed = Column(Integer)  # Random seed for reproducibility
+    run_config = Column(JSON)  # Engine options (archetypes, etc.)
+    fingerprint = Column(String(64), index=True)  # Hash of all inputs, for reusing identical runs
+    source_run_id = Column(Integer, ForeignKey("scenario_runs.id"))  # Set when results are reused from another run
+    sweep_id = Column(Integer, ForeignKey("sweeps.id"), index=True)
+    sweep_round = Column(Integer)  # 0 for the initial design, then one per refinement
     
     # Results
     metrics = Column(JSON)  # Aggregated KPIs
@@ -44,4 +49,5 @@ class ScenarioRun(Base):
     
     # Relationships
     scenario = relationship("Scenario", back_populates="runs")
+    sweep = relationship("Sweep", back_populates="runs")
     simulation_states = relationship("SimulationState", back_populates="run", cascade="all, delete-orphan")
@@ -1,7 +1,7 @@
 """
 Simulation state and metrics models
 """
-from sqlalchemy import Column, Integer, String, JSON, DateTime, ForeignKey, Float, Text
+from sqlalchemy import Column, Integer, String, JSON, DateTime, ForeignKey, Float, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -53,3 +53,50 @@ class SimulationMetrics(Base):
     
     # Relationships
     run = relationship("ScenarioRun", uselist=False)
+
+
+class SimulationRollup(Base):
+    """KPI and city state series of a run at one resolution (minute, hour or day), stored column-wise.
+
+    Minute samples are stored one row per simulated day (``chunk`` is the day
+    index); hour and day rollups are a single row with chunk 0.
+    """
+    __tablename__ = "simulation_rollups"
+    __table_args__ = (UniqueConstraint("run_id", "resolution", "chunk", name="uq_simulation_rollups_run_resolution_chunk"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("scenario_runs.id"), nullable=False, index=True)
+    resolution = Column(String(10), nullable=False)
+    chunk = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    ticks = Column(JSON)  # First tick of each sample or bucket
+    series = Column(JSON)  # {name: [value per tick]} (bucket means for hour/day)
+    minimum = Column(JSON)  # {name: [bucket min]}, hour/day only
+    maximum = Column(JSON)  # {name: [bucket max]}, hour/day only
+    
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class RunSummary(Base):
+    """Compact results of a completed run, materialized once for listing and comparison"""
+    __tablename__ = "run_summaries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("scenario_runs.id"), nullable=False, unique=True, index=True)
+    scenario_id = Column(Integer, ForeignKey("scenarios.id"), nullable=False, index=True)
+    sweep_id = Column(Integer, ForeignKey("sweeps.id"), index=True)
+    seed = Column(Integer)
+    simulation_days = Column(Integer)
+    ticks = Column(Integer)  # Simulated minutes, less than planned when stopped at steady state
+    completed_at = Column(DateTime(timezone=True), index=True)
+    
+    # Headline KPIs, as columns for filtering and sorting
+    avg_commute_time = Column(Float)
+    transit_modal_share = Column(Float)
+    transit_ridership = Column(Integer)
+    emissions_proxy = Column(Float)
+    service_coverage = Column(Float)
+    equity_index = Column(Float)
+    
+    series = Column(JSON)  # {"hour": {...}, "day": {...}} columnar KPI series
+    groups = Column(JSON)  # {group: {category: outcomes}}, persona groups and home zones
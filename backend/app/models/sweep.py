@@ -0,0 +1,35 @@
+"""
+Parameter sweep models
+"""
+from sqlalchemy import Column, Integer, String, JSON, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class Sweep(Base):
+    """Parameter sweep over a scenario's policy_config"""
+    __tablename__ = "sweeps"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    scenario_id = Column(Integer, ForeignKey("scenarios.id"), nullable=False)  # Base scenario
+    parameters = Column(JSON, nullable=False)  # {name: {"min": .., "max": .., "integer": bool}}
+    design = Column(String(50), default="lhs")  # grid, lhs
+    design_size = Column(Integer)  # Points per axis (grid) or samples (lhs)
+    target_kpi = Column(String(100))  # KPI used for adaptive refinement
+    refine_rounds = Column(Integer, default=0)
+    refine_batch = Column(Integer, default=8)
+    max_runs = Column(Integer, default=100)
+    current_round = Column(Integer, default=0)
+    simulation_days = Column(Integer, default=7)
+    seed = Column(Integer)  # Shared by all points (common random numbers)
+    run_config = Column(JSON)
+    status = Column(String(50), default="running")  # running, completed, failed
+    results = Column(JSON)  # Aggregated points and KPIs
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True))
+    
+    # Relationships
+    scenario = relationship("Scenario")
+    runs = relationship("ScenarioRun", back_populates="sweep")
@@ -5,6 +5,7 @@ from typing import List, Dict, Any, Optional
 from app.rag.vector_store import vector_store
 from app.core.database import SessionLocal
 from app.models.data import PolicyDocument
+from app.core.tracing import tracer
 import structlog
 
 logger = structlog.get_logger()
@@ -32,11 +33,13 @@ class DocumentRetriever:
         filter_metadata = self._get_filter_metadata(agent_type, context)
         
         # Search vector store
-        results = self.vector_store.search(
-            query=enhanced_query,
-            n_results=n_results,
-            filter_metadata=filter_metadata
-        )
+        with tracer.start_as_current_span("rag.retrieve", attributes={"agent.type": agent_type, "rag.n_results": n_results}) as span:
+            results = self.vector_store.search(
+                query=enhanced_query,
+                n_results=n_results,
+                filter_metadata=filter_metadata
+            )
+            span.set_attribute("rag.hits", len(results))
         
         # Enrich with full document data
         enriched_results = []
@@ -0,0 +1,235 @@
+"""
+Persona archetype clustering - residents with near-identical personas share one reasoning call
+"""
+from typing import Dict, List, Any, Optional, Tuple
+import json
+import random
+import networkx as nx
+import structlog
+
+from app.agents.base import BaseAgent
+
+logger = structlog.get_logger()
+
+DEFAULT_SPATIAL_RESOLUTION = 0.01  # degrees, roughly 1km cells
+DEFAULT_PERTURBATION = 0.1
+
+
+class ArchetypeIndex:
+    """Groups residents into archetypes by persona and situation features.
+
+    Each archetype reasons once per decision point through a representative
+    member; the decision is then applied to every other member, who falls back
+    to their own habitual mode with probability ``perturbation`` (seeded).
+    """
+
+    def __init__(
+        self,
+        residents: List[BaseAgent],
+        graph: Optional[nx.Graph] = None,
+        spatial_resolution: float = DEFAULT_SPATIAL_RESOLUTION,
+        max_members: Optional[int] = None,
+        perturbation: float = DEFAULT_PERTURBATION,
+        fidelity_sample_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.graph = graph
+        self.spatial_resolution = spatial_resolution
+        self.perturbation = perturbation
+        self.fidelity_sample_rate = fidelity_sample_rate
+        self.rng = random.Random(seed)
+
+        self.archetypes: Dict[str, List[str]] = self._cluster(residents, max_members)
+        self.member_to_archetype = {
+            member_id: archetype_id
+            for archetype_id, members in self.archetypes.items()
+            for member_id in members
+        }
+
+        # Fidelity bookkeeping
+        self.reasoning_calls = 0
+        self.applied_decisions = 0
+        self.fidelity_samples: Dict[str, Dict[str, int]] = {}
+        self.mode_share_applied: Dict[str, int] = {}
+        self.mode_share_shadow: Dict[str, int] = {}
+
+        logger.info(
+            "Archetypes built",
+            residents=len(self.member_to_archetype),
+            archetypes=len(self.archetypes)
+        )
+
+    @classmethod
+    def from_config(cls, agents: Dict[str, BaseAgent], graph: nx.Graph, config: Dict[str, Any], seed: Optional[int] = None) -> "ArchetypeIndex":
+        """Build the index for all resident agents from a run's ``archetypes`` config"""
+        residents = [agent for agent in agents.values() if agent.agent_type == "resident"]
+        return cls(
+            residents,
+            graph=graph,
+            spatial_resolution=config.get("spatial_resolution", DEFAULT_SPATIAL_RESOLUTION),
+            max_members=config.get("max_members"),
+            perturbation=config.get("perturbation", DEFAULT_PERTURBATION),
+            fidelity_sample_rate=config.get("fidelity_sample_rate", 0.0),
+            seed=seed
+        )
+
+    def _cluster(self, residents: List[BaseAgent], max_members: Optional[int]) -> Dict[str, List[str]]:
+        """Group residents by feature key, splitting groups larger than ``max_members``"""
+        groups: Dict[Tuple, List[str]] = {}
+        for agent in residents:
+            groups.setdefault(self._feature_key(agent), []).append(agent.agent_id)
+
+        archetypes = {}
+        for key, members in groups.items():
+            chunk = max_members or len(members)
+            for offset in range(0, len(members), chunk):
+                archetypes[f"archetype_{len(archetypes)}"] = members[offset:offset + chunk]
+        return archetypes
+
+    def _feature_key(self, agent: BaseAgent) -> Tuple:
+        """Persona and situation features that decide archetype membership"""
+        persona = agent.persona_config
+        return (
+            persona.get("preferred_mode", "transit"),
+            json.dumps(persona.get("schedule", {}), sort_keys=True, default=str),
+            self._spatial_cell(persona.get("home_location")),
+            self._spatial_cell(persona.get("work_location")),
+            agent.state.get("current_activity")
+        )
+
+    def _spatial_cell(self, location: Any) -> Any:
+        """Snap a graph node to a coarse spatial cell when coordinates are known"""
+        if self.graph is None or location not in self.graph.nodes:
+            return location
+        attrs = self.graph.nodes[location]
+        if "x" not in attrs or "y" not in attrs:
+            return location
+        return (
+            int(attrs["x"] // self.spatial_resolution),
+            int(attrs["y"] // self.spatial_resolution)
+        )
+
+    def decide(self, agents: List[BaseAgent], perceptions: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Reasoning for every archetype member in ``agents``, one reasoning call per archetype"""
+        # With event scheduling only the members due to decide are passed in
+        present = {agent.agent_id: agent for agent in agents}
+        decisions: Dict[str, Optional[Dict[str, Any]]] = {}
+        for archetype_id, members in self.archetypes.items():
+            members = [member_id for member_id in members if member_id in present]
+            if not members:
+                continue
+            representative = present[members[0]]
+            try:
+                reasoning = representative.reason(perceptions[representative.agent_id])
+                self.reasoning_calls += 1
+            except Exception as e:
+                logger.error("Archetype reasoning failed", archetype_id=archetype_id, error=str(e))
+                for member_id in members:
+                    decisions[member_id] = None
+                continue
+            decisions[representative.agent_id] = reasoning
+
+            shared_reasoning = dict(reasoning)
+            shared_reasoning["archetype_id"] = archetype_id
+            shared_reasoning["source"] = "archetype"
+            self._record_mode(self.mode_share_applied, reasoning)
+
+            for member_id in members[1:]:
+                member = present[member_id]
+                member_reasoning = member.adapt_reasoning(self._perturb(shared_reasoning, member))
+                decisions[member_id] = member_reasoning
+                self.applied_decisions += 1
+                self._record_mode(self.mode_share_applied, member_reasoning)
+                # Decisions are applied after all agents decided, so shadows see the member's current state
+                if self.fidelity_sample_rate and self._draw(member) < self.fidelity_sample_rate:
+                    shadow = self._shadow_reason(member, perceptions[member_id])
+                    if shadow is not None:
+                        self._record_fidelity(archetype_id, shadow, member_reasoning)
+
+        return decisions
+
+    def _draw(self, member: BaseAgent) -> float:
+        """Uniform draw from the member's decider stream for this step, so it does not depend on archetype order"""
+        if member.rng_key is None:
+            return self.rng.random()
+        return member.decider_rng.random()
+
+    def _perturb(self, reasoning: Dict[str, Any], member: BaseAgent) -> Dict[str, Any]:
+        """Draw a member's decision from the archetype's decision distribution"""
+        perturbed = dict(reasoning)
+        perturbed["action_data"] = dict(reasoning.get("action_data", {}))
+        habitual_mode = member.persona_config.get("preferred_mode")
+        if (
+            "mode" in perturbed["action_data"]
+            and habitual_mode
+            and self._draw(member) < self.perturbation
+        ):
+            perturbed["action_data"]["mode"] = habitual_mode
+            perturbed["perturbed"] = True
+        return perturbed
+
+    def _shadow_reason(self, member: BaseAgent, perception: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Full per-agent reasoning for one member, used only for the fidelity report"""
+        try:
+            return member.reason(perception)
+        except Exception as e:
+            logger.warning("Fidelity sample failed", agent_id=member.agent_id, error=str(e))
+            return None
+
+    def _record_fidelity(self, archetype_id: str, shadow: Dict[str, Any], applied: Dict[str, Any]):
+        """Compare full per-agent reasoning with the decision the archetype applied"""
+        samples = self.fidelity_samples.setdefault(archetype_id, {"samples": 0, "agreements": 0})
+        samples["samples"] += 1
+        shadow_mode = shadow.get("action_data", {}).get("mode")
+        applied_mode = applied.get("action_data", {}).get("mode")
+        if shadow.get("action_type", "wait") == applied.get("action_type", "wait") and shadow_mode == applied_mode:
+            samples["agreements"] += 1
+        self._record_mode(self.mode_share_shadow, shadow)
+
+    @staticmethod
+    def _record_mode(counts: Dict[str, int], action: Dict[str, Any]):
+        mode = action.get("action_data", {}).get("mode")
+        if mode:
+            counts[mode] = counts.get(mode, 0) + 1
+
+    def fidelity_report(self, worst: int = 10) -> Dict[str, Any]:
+        """Summarize reasoning savings and agreement against full per-agent reasoning"""
+        sampled = sum(s["samples"] for s in self.fidelity_samples.values())
+        agreements = sum(s["agreements"] for s in self.fidelity_samples.values())
+        applied_share = _normalize(self.mode_share_applied)
+        shadow_share = _normalize(self.mode_share_shadow)
+
+        per_archetype = sorted(
+            (
+                {
+                    "archetype_id": archetype_id,
+                    "members": len(self.archetypes[archetype_id]),
+                    "samples": s["samples"],
+                    "agreement_rate": s["agreements"] / s["samples"]
+                }
+                for archetype_id, s in self.fidelity_samples.items() if s["samples"]
+            ),
+            key=lambda entry: entry["agreement_rate"]
+        )
+
+        return {
+            "residents": len(self.member_to_archetype),
+            "archetypes": len(self.archetypes),
+            "reasoning_calls": self.reasoning_calls,
+            "applied_decisions": self.applied_decisions,
+            "compression_ratio": len(self.member_to_archetype) / len(self.archetypes) if self.archetypes else 1.0,
+            "fidelity_samples": sampled,
+            "agreement_rate": agreements / sampled if sampled else None,
+            "mode_share_applied": applied_share,
+            "mode_share_full_reasoning": shadow_share,
+            "mode_share_l1": sum(
+                abs(applied_share.get(mode, 0) - shadow_share.get(mode, 0))
+                for mode in set(applied_share) | set(shadow_share)
+            ) if shadow_share else None,
+            "worst_archetypes": per_archetype[:worst]
+        }
+
+
+def _normalize(counts: Dict[str, int]) -> Dict[str, float]:
+    total = sum(counts.values())
+    return {key: value / total for key, value in counts.items()} if total else {}
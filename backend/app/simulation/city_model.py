@@ -2,16 +2,45 @@
 Mesa-based city model for agent-based simulation
 """
 from mesa import Model
-from mesa.time import SimultaneousActivation
 from mesa.space import NetworkGrid
 import networkx as nx
-from typing import Dict, List, Any, Optional
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+import math
 import structlog
 
 from app.agents import ResidentAgent, TransitOperatorAgent, PlannerAgent, OrchestratorAgent
+from app.agents.prompting import TokenStats
+from app.agents.surrogate import SurrogateRunner
+from app.core.metrics import RunProfiler
+from app.core.rng import DEPARTURE, stream_key, python_random
+from app.simulation.archetypes import ArchetypeIndex
+from app.simulation.convergence import ConvergenceMonitor
+from app.simulation.kpis import KPIEngine
+from app.simulation.rollups import TimeSeriesRecorder, sample_values
+from app.simulation.traffic import TrafficModel
+from app.simulation.raptor import TransitModel
+from app.simulation.population import load_or_synthesize
+from app.simulation.scheduler import StagedScheduler
+from app.simulation.policy import policy_levers
+from app.simulation.parallel import ParallelDecider
+from app.simulation.distributed import DistributedRunner, UNSUPPORTED as DISTRIBUTED_UNSUPPORTED
+from app.simulation.spatial import SpatialIndex, is_coordinate
+from app.simulation.events import (
+    EventQueue, Event, MODE_SPEEDS, DEFAULT_LEAVE_HOME, DEFAULT_LEAVE_WORK, minute_of_day, next_occurrence
+)
 
 logger = structlog.get_logger()
 
+LOCATION_KEYS = ("location", "home_location", "work_location")
+
+AGENT_CLASSES = {
+    "resident": ResidentAgent,
+    "transit_operator": TransitOperatorAgent,
+    "planner": PlannerAgent,
+    "orchestrator": OrchestratorAgent,
+}
+
 
 class CityModel(Model):
     """Mesa model for city simulation"""
@@ -21,17 +50,22 @@ class CityModel(Model):
         city_data: Dict[str, Any],
         scenario_config: Dict[str, Any],
         agents_config: List[Dict[str, Any]],
-        seed: Optional[int] = None
+        seed: Optional[int] = None,
+        run_config: Optional[Dict[str, Any]] = None
     ):
         super().__init__(seed=seed)
         
+        # Every random draw of the run comes from a stream derived from this seed (app.core.rng)
+        self.seed = seed
         self.city_data = city_data
         self.scenario_config = scenario_config
-        self.schedule = SimultaneousActivation(self)
+        self.run_config = run_config or {}
+        self.schedule = StagedScheduler(seed=seed, shuffle=self.run_config.get("scheduler", {}).get("shuffle", False))
         
         # Create network graph from city data
         self.graph = self._create_network_graph(city_data)
         self.grid = NetworkGrid(self.graph)
+        self.spatial_index = self._load_spatial_index(city_data)
         
         # City state
         self.city_state = {
@@ -41,17 +75,92 @@ class CityModel(Model):
             "transit_ridership": {},
             "demand_changes": {},
             "service_coverage": 0.7,
+            "policy": policy_levers(scenario_config.get("policy_config")),
             "metrics": {}
         }
+        self.kpis = KPIEngine.from_config(self.run_config.get("kpis", {}))
+        self.timeseries = TimeSeriesRecorder()
         
         # Initialize agents
         self.agents = {}
-        self._initialize_agents(agents_config)
+        self.population = None
+        self._initialize_agents(agents_config, seed)
+        
+        # Prompt token accounting and hot-path profiling shared by all agents
+        self.token_stats = TokenStats()
+        self.profiler = RunProfiler()
+        for agent in self.agents.values():
+            agent.token_stats = self.token_stats
+            agent.profiler = self.profiler
+        
+        # Optional archetype clustering of residents
+        archetype_config = self.run_config.get("archetypes", {})
+        self.archetypes = ArchetypeIndex.from_config(
+            self.agents, self.graph, archetype_config, seed=seed
+        ) if archetype_config.get("enabled") else None
+        
+        # Optional surrogate policy for resident decisions
+        surrogate_config = self.run_config.get("surrogate", {})
+        self.surrogate = SurrogateRunner.from_config(
+            surrogate_config, seed=seed
+        ) if surrogate_config.get("enabled") else None
+        
+        # Optional process pool for rule-based decisions
+        parallel_config = self.run_config.get("parallel", {})
+        self.parallel = ParallelDecider.from_config(
+            parallel_config
+        ) if parallel_config.get("enabled") else None
+        if self.parallel and self.population is not None:
+            self.parallel.population = self.population.shared_key
+        
+        # Optional equilibrium traffic assignment of resident car trips
+        traffic_config = self.run_config.get("traffic", {})
+        self.traffic = TrafficModel.from_config(
+            self.graph, traffic_config
+        ) if traffic_config.get("enabled") else None
+        
+        # Optional GTFS timetable with RAPTOR routing; operators manage its real routes
+        transit_config = self.run_config.get("transit", {})
+        self.transit = TransitModel.from_config(
+            self.graph, transit_config
+        ) if transit_config.get("enabled") else None
+        if self.transit:
+            self._scale_headways(self.city_state["policy"]["headway_scale"])
+            self._seed_transit_operators()
+        
+        # Optional steady-state detection for early termination
+        convergence_config = self.run_config.get("convergence", {})
+        self.convergence = ConvergenceMonitor.from_config(
+            convergence_config
+        ) if convergence_config.get("enabled") else None
         
         # Simulation state
         self.current_tick = 0
         self.simulation_time = None  # Will be datetime object
         
+        # Optional discrete-event scheduling instead of stepping every agent every tick
+        event_config = self.run_config.get("events", {})
+        self.events = EventQueue() if event_config.get("enabled") else None
+        if self.events is not None:
+            self._init_events(event_config)
+        
+        # Optional distribution of residents over graph-partitioned region workers
+        distributed_config = self.run_config.get("distributed", {})
+        self.distributed = None
+        if distributed_config.get("enabled"):
+            enabled = [name for name in DISTRIBUTED_UNSUPPORTED if self.run_config.get(name, {}).get("enabled")]
+            if enabled:
+                raise ValueError(f"Distributed runs do not support {', '.join(enabled)}")
+            self.distributed = DistributedRunner.from_config(self.graph, distributed_config, seed=seed)
+            try:
+                self.distributed.start(
+                    self.schedule.of_type("resident"),
+                    population=self.population.shared_key if self.population is not None else None
+                )
+            except Exception:
+                self.close()
+                raise
+        
         logger.info("CityModel initialized", agents_count=len(self.agents))
     
     def _create_network_graph(self, city_data: Dict) -> nx.Graph:
@@ -75,71 +184,177 @@ class CityModel(Model):
         
         return G
     
-    def _initialize_agents(self, agents_config: List[Dict]):
-        """Initialize agents from configuration"""
+    def _load_spatial_index(self, city_data: Dict) -> Optional[SpatialIndex]:
+        """Node index persisted at ingestion, or built from the graph's coordinates"""
+        path = city_data.get("spatial_index_path")
+        if path:
+            try:
+                return SpatialIndex.load(Path(path), self.graph)
+            except Exception as e:
+                logger.warning("Failed to load spatial index, rebuilding", error=str(e), path=path)
+        return SpatialIndex.from_graph(self.graph)
+    
+    def _initialize_agents(self, agents_config: List[Dict], seed: Optional[int] = None):
+        """Initialize agents from configuration; ``population`` entries expand into synthetic residents"""
+        agents_config = self._snap_locations(agents_config)
         for agent_config in agents_config:
             agent_type = agent_config.get("agent_type")
-            agent_id = agent_config.get("agent_id", f"{agent_type}_{len(self.agents)}")
-            
-            if agent_type == "resident":
-                agent = ResidentAgent(agent_id, agent_config.get("persona_config", {}))
-            elif agent_type == "transit_operator":
-                agent = TransitOperatorAgent(agent_id, agent_config.get("persona_config", {}))
-            elif agent_type == "planner":
-                agent = PlannerAgent(agent_id, agent_config.get("persona_config", {}))
-            elif agent_type == "orchestrator":
-                agent = OrchestratorAgent(agent_id, agent_config.get("persona_config", {}))
-            else:
+            if agent_type == "population":
+                self._add_population(agent_config.get("persona_config", {}), seed)
+                continue
+            agent_class = AGENT_CLASSES.get(agent_type)
+            if agent_class is None:
                 logger.warning("Unknown agent type", agent_type=agent_type)
                 continue
-            
-            self.agents[agent_id] = agent
-            self.schedule.add(agent)
-            
-            # Place agent on grid if location specified
-            location = agent.state.get("location") or agent.state.get("home_location")
-            if location and location in self.graph.nodes():
-                self.grid.place_agent(agent, location)
+            agent_id = agent_config.get("agent_id", f"{agent_type}_{len(self.agents)}")
+            self._add_agent(agent_class(agent_id, agent_config.get("persona_config", {})))
+    
+    def _snap_locations(self, agents_config: List[Dict]) -> List[Dict]:
+        """Replace ``{"lat", "lon"}`` persona locations with their nearest graph nodes, in one query"""
+        points = [
+            (i, key, location)
+            for i, agent_config in enumerate(agents_config)
+            for key, location in agent_config.get("persona_config", {}).items()
+            if key in LOCATION_KEYS and is_coordinate(location)
+        ]
+        if not points or self.spatial_index is None:
+            return agents_config
+        nodes = self.spatial_index.snap(
+            [float(location["lon"]) for _, _, location in points],
+            [float(location["lat"]) for _, _, location in points]
+        )
+        agents_config = [dict(agent_config) for agent_config in agents_config]
+        for (i, key, _), node in zip(points, nodes):
+            agents_config[i]["persona_config"] = {**agents_config[i]["persona_config"], key: node}
+        return agents_config
+    
+    def _add_agent(self, agent):
+        self.agents[agent.agent_id] = agent
+        self.schedule.add(agent)
+        
+        # Place agent on grid if location specified
+        location = agent.state.get("location") or agent.state.get("home_location")
+        if location and location in self.graph.nodes():
+            self.grid.place_agent(agent, location)
+    
+    def _add_population(self, config: Dict[str, Any], seed: Optional[int]):
+        """Synthesize (or load the cached) population and add its residents"""
+        self.population = load_or_synthesize(self.graph, config, seed=seed, spatial_index=self.spatial_index)
+        for agent in self.population.residents(config.get("prefix", "resident"), limit=config.get("max_agents")):
+            self._add_agent(agent)
     
     def step(self):
         """Execute one simulation step"""
-        # Get environment state for agents
-        environment_state = {
+        if self.traffic and self.traffic.due(self.current_tick):
+            self._update_traffic()
+        if self.transit and self.transit.due(self.current_tick):
+            self._update_transit()
+        with self.profiler.phase("environment"):
+            environment_state = self._build_environment_state()
+            origins = {agent_id: agent.state.get("current_location") for agent_id, agent in self.agents.items()}
+        with self.profiler.phase("agents"):
+            agent_actions = self._step_agents(environment_state)
+        
+        # Update city state based on agent actions
+        with self.profiler.phase("city_state"):
+            self._update_city_state(agent_actions, origins)
+        with self.profiler.phase("metrics"):
+            self._update_metrics(self.current_tick)
+            self._record_sample(self.current_tick)
+        if self.convergence:
+            self.convergence.observe(self.current_tick, self.city_state["metrics"])
+        self._advance_clock()
+        self.profiler.observe_tick()
+    
+    def _build_environment_state(self, tick: Optional[int] = None) -> Dict[str, Any]:
+        """Get environment state for agents"""
+        tick = self.current_tick if tick is None else tick
+        return {
             "timestamp": {
-                "tick": self.current_tick,
-                "hour": (self.current_tick // 60) % 24,  # Assuming 1 tick = 1 minute
-                "day": self.current_tick // (60 * 24)
+                "tick": tick,
+                "hour": (tick // 60) % 24,  # Assuming 1 tick = 1 minute
+                "day": tick // (60 * 24)
             },
             "city_state": self.city_state,
             "agents": [{"id": aid, "state": agent.state} for aid, agent in self.agents.items()],
             "events": []
         }
-        
-        # Execute agent steps
-        agent_actions = {}
-        for agent_id, agent in self.agents.items():
-            try:
-                # TODO: Retrieve relevant docs via RAG
-                retrieved_docs = []
-                action = agent.step(environment_state, retrieved_docs)
-                agent_actions[agent_id] = action
-            except Exception as e:
-                logger.error("Agent step failed", agent_id=agent_id, error=str(e))
-                agent_actions[agent_id] = {"action_type": "error", "action_data": {}}
-        
-        # Update city state based on agent actions
-        self._update_city_state(agent_actions)
-        
-        # Update metrics
-        agent_states = [agent.state for agent in self.agents.values()]
-        if "orchestrator" in [a.agent_type for a in self.agents.values()]:
-            orchestrator = next(a for a in self.agents.values() if a.agent_type == "orchestrator")
-            self.city_state["metrics"] = orchestrator.aggregate_kpis(agent_states, self.city_state)
-        
+    
+    def _step_agents(self, environment_state: Dict[str, Any], agent_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Execute agent steps, for all agents or only ``agent_ids``"""
+        if self.distributed:
+            return self._step_distributed(environment_state)
+        agents = None if agent_ids is None else [self.agents[agent_id] for agent_id in agent_ids]
+        deciders = {}
+        if self.archetypes:
+            deciders["archetypes"] = self.archetypes
+        if self.surrogate:
+            deciders["surrogate"] = self.surrogate
+        if self.parallel:
+            deciders["parallel"] = self.parallel
+        return self.schedule.step(environment_state, self.profiler, agents, deciders)
+    
+    def _step_distributed(self, environment_state: Dict[str, Any]) -> Dict[str, Dict]:
+        """Residents step in their region workers, every other agent here; actions merged in activation order"""
+        local = [
+            agent for agent_type, bucket in self.schedule.buckets.items() if agent_type != "resident"
+            for agent in bucket.values()
+        ]
+        # Both perceive the same pre-step state: remote decisions are collected before local ones apply
+        with self.profiler.phase("agents.distributed"):
+            remote_actions = self.distributed.step(environment_state, self.agents)
+        local_actions = self.schedule.step(environment_state, self.profiler, local)
+        actions = {**local_actions, **remote_actions}
+        return {
+            agent_id: actions[agent_id]
+            for bucket in self.schedule.buckets.values() for agent_id in bucket if agent_id in actions
+        }
+    
+    def _update_traffic(self):
+        """Re-run traffic assignment; congestion feeds into city state and resident perception"""
+        with self.profiler.phase("traffic"):
+            self.traffic.update(self.schedule.of_type("resident"), self.city_state)
+            if self.distributed:
+                self.distributed.push_state(self.schedule.of_type("resident"))
+    
+    def _update_transit(self):
+        """Transit commute times of all residents for the current decision period, in one RAPTOR pass"""
+        with self.profiler.phase("transit"):
+            self.transit.update(self.schedule.of_type("resident"), (self.current_tick % (24 * 60)) * 60)
+            if self.distributed:
+                self.distributed.push_state(self.schedule.of_type("resident"))
+    
+    def _scale_headways(self, scale: float):
+        """Apply the policy's headway multiplier to every timetable route"""
+        if scale == 1.0:
+            return
+        for route_id, headway in self.transit.routes().items():
+            if headway:
+                self.transit.set_headway(route_id, headway * scale)
+    
+    def _seed_transit_operators(self):
+        """Give transit operators without configured routes the timetable's routes and headways"""
+        routes = self.transit.routes()
+        for agent in self.schedule.of_type("transit_operator"):
+            if not agent.state.get("routes"):
+                agent.state["routes"] = list(routes)
+                agent.state["frequencies"] = {route_id: round(headway) for route_id, headway in routes.items() if headway}
+    
+    def _update_metrics(self, tick: int):
+        """Publish the KPIs of the window containing ``tick`` through the orchestrator, if present"""
+        orchestrators = self.schedule.of_type("orchestrator")
+        if orchestrators:
+            self.city_state["metrics"] = orchestrators[0].aggregate_kpis(self.kpis.current(tick), self.city_state)
+    
+    def _record_sample(self, tick: int):
+        """Sample KPIs and city state for the run's rollups"""
+        self.timeseries.record(tick, sample_values(self.city_state, self.kpis.current(tick)))
+    
+    def _advance_clock(self):
         self.current_tick += 1
-        self.schedule.step()
+        self.schedule.advance()
     
-    def _update_city_state(self, agent_actions: Dict[str, Dict]):
+    def _update_city_state(self, agent_actions: Dict[str, Dict], origins: Dict[str, Any]):
         """Update city state based on agent actions"""
         # Update transit ridership from resident actions
         transit_ridership = {}
@@ -151,8 +366,11 @@ class CityModel(Model):
                     transit_ridership[route_id] = transit_ridership.get(route_id, 0) + 1
         
         self.city_state["transit_ridership"] = transit_ridership
-        
-        # Update transit frequencies from transit operator actions
+        self.kpis.observe_actions(self.current_tick, self.agents, agent_actions, origins)
+        self._apply_frequency_changes(agent_actions)
+    
+    def _apply_frequency_changes(self, agent_actions: Dict[str, Dict]):
+        """Update transit frequencies from transit operator actions"""
         for agent_id, action in agent_actions.items():
             if action.get("action_type") == "adjust_frequency":
                 route_id = action.get("action_data", {}).get("route_id")
@@ -162,6 +380,194 @@ class CityModel(Model):
                     if "transit_frequencies" not in self.city_state:
                         self.city_state["transit_frequencies"] = {}
                     self.city_state["transit_frequencies"][route_id] = new_freq
+                    if self.transit:
+                        # Only this route's patterns are regenerated
+                        self.transit.set_headway(route_id, new_freq)
+    
+    def get_run_stats(self) -> Dict[str, Any]:
+        """Run-level diagnostics to be stored with the scenario run"""
+        stats = {"profile": self.profiler.summary(), "kpis": self.kpis.report()}
+        if self.token_stats.by_type:
+            stats["prompt_tokens"] = self.token_stats.summary()
+        if self.population is not None:
+            stats["population"] = self.population.summary()
+        if self.archetypes:
+            stats["archetypes"] = self.archetypes.fidelity_report()
+        if self.surrogate:
+            stats["surrogate"] = self.surrogate.report()
+        if self.parallel:
+            stats["parallel"] = self.parallel.report()
+        if self.distributed:
+            stats["distributed"] = self.distributed.report()
+        if self.traffic:
+            stats["traffic"] = self.traffic.report()
+        if self.transit:
+            stats["transit"] = self.transit.report()
+        if self.convergence:
+            stats["convergence"] = self.convergence.report()
+        if self.events is not None:
+            stats["events"] = {
+                "processed": dict(self.events.processed),
+                "pending": len(self.events),
+                "trips": self.trips["count"]
+            }
+        return stats
+    
+    def close(self):
+        """Release resources held outside the process (worker pools, shared memory)"""
+        if self.parallel:
+            self.parallel.close()
+        if self.distributed:
+            self.distributed.close()
+        # After the workers, so the last holder of the shared population is this process
+        if self.population is not None:
+            self.population.release()
+    
+    def _init_events(self, config: Dict[str, Any]):
+        """Seed the event queue: each resident's first departure and periodic reviews by everyone else"""
+        # Metrics, convergence sampling and persistence happen once per window
+        self.event_window = int(config.get("sample_every", 15))
+        if self.convergence:
+            self.event_window = math.gcd(self.event_window, self.convergence.sample_every)
+        if self.event_window <= 0 or (24 * 60) % self.event_window:
+            raise ValueError("events sample_every must divide the minutes of a day")
+        self.review_every = float(config.get("review_every", 60))
+        self.departure_spread = float(config.get("departure_spread", 0))
+        self.default_travel_minutes = float(config.get("default_travel_minutes", 30))
+        self.leave_home = minute_of_day(config.get("leave_home"), DEFAULT_LEAVE_HOME)
+        self.leave_work = minute_of_day(config.get("leave_work"), DEFAULT_LEAVE_WORK)
+        self.event_handlers = {
+            "departure": self._on_departure,
+            "arrival": self._on_arrival,
+            "review": self._on_review
+        }
+        self.acted: List[Tuple[int, Any, Dict[str, Any]]] = []
+        self.trips = {"count": 0, "minutes": 0.0}
+        self._distances: Dict[Tuple[Any, Any], Optional[float]] = {}
+        
+        for agent_id, agent in self.agents.items():
+            if agent.agent_type == "resident":
+                self._schedule_departure(agent, -1.0)
+            else:
+                self.events.schedule(0.0, "review", agent_id)
+    
+    def advance_to(self, until: float):
+        """Process all events before ``until`` (minutes since start), then update metrics"""
+        if self.traffic and (-self.current_tick) % self.traffic.every < until - self.current_tick:
+            self._update_traffic()
+        if self.transit and (-self.current_tick) % self.transit.every < until - self.current_tick:
+            self._update_transit()
+        while True:
+            batch = self.events.pop_batch(until)
+            if not batch:
+                break
+            # Agents due at the same time decide together, so archetypes and surrogate can batch them
+            deciders: List[str] = []
+            for event in batch:
+                if event.agent_id in self.agents:
+                    self.event_handlers[event.kind](event, deciders)
+            if deciders:
+                self._decide(batch[0].time, deciders)
+        
+        if self.trips["count"]:
+            self.city_state["avg_commute_time"] = self.trips["minutes"] / self.trips["count"]
+        with self.profiler.phase("metrics"):
+            self._update_metrics(int(until) - 1)
+            self._record_sample(self.current_tick)
+        if self.convergence:
+            self.convergence.observe(int(until) - 1, self.city_state["metrics"])
+        elapsed = int(until) - self.current_tick
+        self.current_tick = int(until)
+        self.schedule.advance(elapsed)
+        self.profiler.observe_tick()
+    
+    def drain_actions(self) -> List[Tuple[int, Any, Dict[str, Any]]]:
+        """(tick, agent, memory entry) of every decision since the last call"""
+        acted, self.acted = self.acted, []
+        return acted
+    
+    def _on_departure(self, event: Event, deciders: List[str]):
+        deciders.append(event.agent_id)
+    
+    def _on_review(self, event: Event, deciders: List[str]):
+        deciders.append(event.agent_id)
+        self.events.schedule(event.time + self.review_every, "review", event.agent_id)
+    
+    def _on_arrival(self, event: Event, deciders: List[str]):
+        agent = self.agents[event.agent_id]
+        route_id = event.data.get("route_id")
+        if route_id is not None:
+            ridership = self.city_state["transit_ridership"]
+            ridership[route_id] = max(ridership.get(route_id, 0) - 1, 0)
+        agent.state["commute_time"] = event.data["minutes"]
+        self.trips["count"] += 1
+        self.trips["minutes"] += event.data["minutes"]
+        self.kpis.observe_trip(int(event.time), event.data["minutes"])
+        self._schedule_departure(agent, event.time)
+    
+    def _decide(self, now: float, agent_ids: List[str]):
+        environment_state = self._build_environment_state(int(now))
+        with self.profiler.phase("agents"):
+            agent_actions = self._step_agents(environment_state, agent_ids)
+        with self.profiler.phase("city_state"):
+            for agent_id, action in agent_actions.items():
+                agent = self.agents[agent_id]
+                if action.get("action_type") != "error" and agent.memory:
+                    self.acted.append((int(now), agent, agent.memory[-1]))
+                if agent.agent_type == "resident":
+                    self._start_trip(now, agent, action)
+            self._apply_frequency_changes(agent_actions)
+    
+    def _start_trip(self, now: float, agent, action: Dict[str, Any]):
+        """Board the chosen mode and schedule the arrival"""
+        if action.get("action_type") != "move":
+            self._schedule_departure(agent, now)
+            return
+        action_data = action.get("action_data", {})
+        mode = action_data.get("mode") or agent.state.get("current_mode")
+        origin = agent.memory[-1]["perception"]["agent_state"].get("current_location")
+        destination = action_data.get("destination")
+        if origin is None or destination is None:
+            # No home/work location to travel between; wait for the next departure
+            self._schedule_departure(agent, now)
+            return
+        minutes = self._travel_minutes(origin, destination, mode)
+        route_id = None
+        if mode == "transit":
+            route_id = action_data.get("route_id", "default")
+            ridership = self.city_state["transit_ridership"]
+            ridership[route_id] = ridership.get(route_id, 0) + 1
+        self.kpis.observe_departure(int(now), mode, route_id)
+        self.events.schedule(now + minutes, "arrival", agent.agent_id, {"minutes": minutes, "route_id": route_id})
+    
+    def _schedule_departure(self, agent, now: float):
+        """Next departure from the resident's current activity, per its schedule"""
+        schedule = agent.state.get("schedule") or {}
+        if agent.state.get("current_activity") == "work":
+            minute = minute_of_day(schedule.get("leave_work", self.leave_work), DEFAULT_LEAVE_WORK)
+        else:
+            minute = minute_of_day(schedule.get("leave_home", self.leave_home), DEFAULT_LEAVE_HOME)
+        at = next_occurrence(now, minute)
+        if self.departure_spread:
+            rng = python_random(stream_key(self.seed, DEPARTURE, agent.agent_id, int(now)))
+            at = max(at + rng.uniform(-self.departure_spread / 2, self.departure_spread / 2), now)
+        self.events.schedule(at, "departure", agent.agent_id)
+    
+    def _travel_minutes(self, origin: Any, destination: Any, mode: str) -> float:
+        if mode == "car" and self.traffic:
+            minutes = self.traffic.travel_minutes(origin, destination)
+            if minutes is not None:
+                return minutes
+        key = (origin, destination)
+        if key not in self._distances:
+            try:
+                self._distances[key] = nx.shortest_path_length(self.graph, origin, destination, weight="weight")
+            except nx.NetworkXException:
+                self._distances[key] = None
+        distance = self._distances[key]
+        if distance is None:
+            return self.default_travel_minutes
+        return distance / MODE_SPEEDS.get(mode, MODE_SPEEDS["transit"])
     
     def get_state_snapshot(self) -> Dict[str, Any]:
         """Get current simulation state snapshot"""
@@ -0,0 +1,139 @@
+"""
+Steady-state detection - ends a run early once the orchestrator's KPIs stop changing day over day
+"""
+from typing import Dict, List, Any, Optional
+import math
+import structlog
+
+logger = structlog.get_logger()
+
+TICKS_PER_DAY = 24 * 60
+DEFAULT_METRICS = [
+    "avg_commute_time",
+    "transit_ridership",
+    "transit_modal_share",
+    "service_coverage",
+    "equity_index",
+    "emissions_proxy",
+]
+
+
+def kpi_value(value: Any) -> Optional[float]:
+    """Numeric value of a KPI; per-route dicts (e.g. ridership) are summed"""
+    if isinstance(value, dict):
+        value = sum(v for v in value.values() if isinstance(v, (int, float)))
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+class ConvergenceMonitor:
+    """Online day-over-day equivalence test on sampled KPIs.
+
+    Every ``sample_every`` ticks the KPIs are sampled; at the end of each day
+    the samples are paired with the same time of day on the previous day, which
+    removes the daily cycle. A KPI is stable for the day when the upper
+    confidence bound of its mean absolute paired difference,
+    ``|mean| + z * sd / sqrt(n)``, is within ``max(abs_tolerance,
+    rel_tolerance * |previous day mean|)``. The run has converged once all
+    KPIs were stable for ``patience`` consecutive days, and not before
+    ``min_days`` days were simulated.
+    """
+
+    def __init__(
+        self,
+        metrics: Optional[List[str]] = None,
+        sample_every: int = 15,
+        rel_tolerance: float = 0.01,
+        abs_tolerance: float = 1e-6,
+        z: float = 1.96,
+        patience: int = 1,
+        min_days: int = 2
+    ):
+        if sample_every <= 0 or TICKS_PER_DAY % sample_every:
+            raise ValueError("sample_every must divide the ticks of a day")
+        self.metrics = metrics or DEFAULT_METRICS
+        self.sample_every = sample_every
+        self.rel_tolerance = rel_tolerance
+        self.abs_tolerance = abs_tolerance
+        self.z = z
+        self.patience = max(patience, 1)
+        self.min_days = max(min_days, 2)
+
+        self.previous_day: Optional[Dict[str, List[Optional[float]]]] = None
+        self.current_day: Dict[str, List[Optional[float]]] = {name: [] for name in self.metrics}
+        self.stable_days = 0
+        self.days: List[Dict[str, Any]] = []
+        self.converged_tick: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ConvergenceMonitor":
+        """Monitor from a run's ``convergence`` config"""
+        return cls(
+            metrics=config.get("metrics"),
+            sample_every=config.get("sample_every", 15),
+            rel_tolerance=config.get("rel_tolerance", 0.01),
+            abs_tolerance=config.get("abs_tolerance", 1e-6),
+            z=config.get("z", 1.96),
+            patience=config.get("patience", 1),
+            min_days=config.get("min_days", 2)
+        )
+
+    @property
+    def converged(self) -> bool:
+        return self.converged_tick is not None
+
+    def observe(self, tick: int, kpis: Dict[str, Any]) -> bool:
+        """Record the KPIs after ``tick``; returns True once the run has converged"""
+        if self.converged:
+            return True
+        if (tick + 1) % self.sample_every == 0:
+            for name in self.metrics:
+                self.current_day[name].append(kpi_value(kpis.get(name)))
+        if (tick + 1) % TICKS_PER_DAY == 0:
+            self._end_day(tick)
+        return self.converged
+
+    def _end_day(self, tick: int):
+        day = (tick + 1) // TICKS_PER_DAY
+        if self.previous_day is not None:
+            comparison = {name: self._compare(self.previous_day[name], self.current_day[name]) for name in self.metrics}
+            stable = all(result["stable"] for result in comparison.values())
+            self.stable_days = self.stable_days + 1 if stable else 0
+            self.days.append({"day": day, "stable": stable, "kpis": comparison})
+            if self.stable_days >= self.patience and day >= self.min_days:
+                self.converged_tick = tick
+                logger.info("Steady state reached", day=day, tick=tick)
+        self.previous_day = self.current_day
+        self.current_day = {name: [] for name in self.metrics}
+
+    def _compare(self, previous: List[Optional[float]], current: List[Optional[float]]) -> Dict[str, Any]:
+        pairs = [(a, b) for a, b in zip(previous, current) if a is not None and b is not None]
+        if not pairs:
+            # A KPI that is never reported cannot hold the run open
+            return {"stable": True, "samples": 0}
+        diffs = [b - a for a, b in pairs]
+        n = len(diffs)
+        mean = sum(diffs) / n
+        sd = math.sqrt(sum((d - mean) ** 2 for d in diffs) / (n - 1)) if n > 1 else 0.0
+        bound = abs(mean) + self.z * sd / math.sqrt(n)
+        baseline = sum(a for a, _ in pairs) / n
+        tolerance = max(self.abs_tolerance, self.rel_tolerance * abs(baseline))
+        return {
+            "stable": bound <= tolerance,
+            "samples": n,
+            "mean_change": mean,
+            "bound": bound,
+            "tolerance": tolerance
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Convergence diagnostics to be stored with the run"""
+        return {
+            "converged": self.converged,
+            "converged_tick": self.converged_tick,
+            "converged_day": self.days[-1]["day"] if self.converged else None,
+            "rel_tolerance": self.rel_tolerance,
+            "patience": self.patience,
+            "days": self.days
+        }
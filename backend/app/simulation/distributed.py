@@ -0,0 +1,460 @@
+"""
+Distributed stepping - the city graph is partitioned into regions whose agents decide in separate workers
+"""
+from importlib import import_module
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
+import math
+import os
+import pickle
+import queue
+import time
+import uuid
+import billiard
+import networkx as nx
+import numpy as np
+import structlog
+
+from app.agents.base import BaseAgent, compact_memory
+from app.core.metrics import RunProfiler
+from app.simulation.population import SyntheticPopulation, attach_population
+from app.simulation.scheduler import StagedScheduler
+
+logger = structlog.get_logger()
+
+# Environment entries every region receives each step; the run's agent list is not among them
+SHARED_KEYS = ("timestamp", "city_state", "events")
+# Resident state the coordinator computes (traffic, transit) and pushes to the regions
+PUSHED_STATE_KEYS = ("car_commute_minutes", "car_free_flow_minutes", "transit_commute_minutes")
+# Run features that need every resident in one process
+UNSUPPORTED = ("archetypes", "surrogate", "events", "parallel")
+# Seconds a region worker waits for a message before checking that its coordinator is alive
+POLL_SECONDS = 5.0
+_MISSING = object()
+
+# The persona is a row of the host's shared population when regions attach to one; memory travels with migrants
+AgentSpec = Tuple[str, str, str, Union[int, Dict[str, Any]], Dict[str, Any], List[Dict[str, Any]]]
+
+
+def _bisect(graph: nx.Graph, nodes: List[Any], seed: Optional[int]) -> Tuple[List[Any], List[Any]]:
+    """Balanced split of ``nodes``: median cut along the wider coordinate axis, else Kernighan-Lin"""
+    attrs = [graph.nodes[node] for node in nodes]
+    if all("x" in a and "y" in a for a in attrs):
+        xy = np.array([(a["x"], a["y"]) for a in attrs], dtype=float)
+        axis = int(np.argmax(xy.max(axis=0) - xy.min(axis=0)))
+        order = np.argsort(xy[:, axis], kind="stable")
+        half = len(nodes) // 2
+        return [nodes[i] for i in order[:half]], [nodes[i] for i in order[half:]]
+    left, right = nx.algorithms.community.kernighan_lin_bisection(graph.subgraph(nodes), weight=None, seed=seed)
+    return sorted(left, key=str), sorted(right, key=str)
+
+
+def partition_graph(graph: nx.Graph, regions: int, seed: Optional[int] = None) -> Tuple[Dict[Any, int], Dict[str, Any]]:
+    """Assign every node to one of ``regions`` balanced parts by recursive bisection.
+
+    Coordinate bisection keeps parts compact, which keeps the edge cut (and so
+    boundary crossings) low; graphs without coordinates use Kernighan-Lin.
+    Returns the assignment and a report with part sizes and the edge cut.
+    """
+    parts = [list(graph.nodes)]
+    while len(parts) < regions:
+        # Split the largest part next so sizes stay balanced for any region count
+        largest = max(range(len(parts)), key=lambda i: len(parts[i]))
+        if len(parts[largest]) < 2:
+            break
+        parts[largest:largest + 1] = list(_bisect(graph, parts[largest], seed))
+    assignment = {node: region for region, part in enumerate(parts) for node in part}
+    edge_cut = sum(1 for u, v in graph.edges if assignment[u] != assignment[v])
+    return assignment, {"regions": len(parts), "sizes": [len(part) for part in parts], "edge_cut": edge_cut}
+
+
+def region_boundaries(graph: nx.Graph, assignment: Dict[Any, int], regions: int) -> Tuple[Dict[int, Set[Any]], Dict[int, Set[int]]]:
+    """Per region, its nodes with an edge into another region and the regions those edges reach"""
+    boundary: Dict[int, Set[Any]] = {region: set() for region in range(regions)}
+    neighbours: Dict[int, Set[int]] = {region: set() for region in range(regions)}
+    for u, v in graph.edges:
+        a, b = assignment[u], assignment[v]
+        if a != b:
+            boundary[a].add(u)
+            boundary[b].add(v)
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+    return boundary, neighbours
+
+
+def agent_spec(agent: BaseAgent, by_row: bool = False, memory: bool = False) -> AgentSpec:
+    persona = agent.population_row if by_row and agent.population_row is not None else agent.persona_config
+    return (
+        type(agent).__module__, type(agent).__name__, agent.agent_id, persona, agent.state,
+        [compact_memory(entry) for entry in agent.memory] if memory else []
+    )
+
+
+def build_agent(spec: AgentSpec, population: Optional[SyntheticPopulation] = None) -> BaseAgent:
+    module, class_name, agent_id, persona, state, memory = spec
+    row = persona if isinstance(persona, int) else None
+    if row is not None:
+        persona = population.persona(row)
+    agent = getattr(import_module(module), class_name)(agent_id, persona)
+    agent.population_row = row
+    agent.state = state
+    agent.memory = list(memory)
+    return agent
+
+
+def summary(agent: BaseAgent) -> Dict[str, Any]:
+    """An agent as other agents perceive it among their nearby agents"""
+    return {"id": agent.agent_id, "state": agent.state}
+
+
+class LocalTransport:
+    """Message layer within one host: a queue per region plus one for results.
+
+    Regions are billiard child processes, which daemonic processes such as
+    Celery prefork workers may start too; they stop once the coordinator that
+    started them is no longer their parent.
+    """
+
+    def __init__(self, regions: int):
+        context = billiard.get_context()
+        self.queues = {f"region:{region}": context.Queue() for region in range(regions)}
+        self.queues["results"] = context.Queue()
+        self.coordinator_pid = os.getpid()
+
+    def send(self, channel: str, message: Dict[str, Any]):
+        self.queues[channel].put(message)
+
+    def recv(self, channel: str, timeout: float) -> Dict[str, Any]:
+        try:
+            return self.queues[channel].get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No message on {channel}")
+
+    def beat(self):
+        """Coordinator liveness is the parent process itself; nothing to publish"""
+
+    def coordinator_alive(self) -> bool:
+        # Orphans are re-parented, so a changed parent means the coordinator exited
+        return os.getppid() == self.coordinator_pid
+
+    def close(self):
+        pass
+
+
+class RedisTransport:
+    """Message layer across hosts: Redis lists keyed by run and channel.
+
+    The coordinator refreshes a heartbeat key while the run is live; region
+    workers poll with a bounded timeout and stop once the heartbeat expires,
+    so a dead coordinator does not hold their worker slots.
+    """
+
+    def __init__(self, namespace: str, url: Optional[str] = None, heartbeat_ttl: float = 300.0):
+        import redis
+        from app.core.config import settings
+        self.namespace = namespace
+        self.url = url or settings.REDIS_URL
+        self.heartbeat_ttl = heartbeat_ttl
+        self.client = redis.from_url(self.url)
+
+    def __getstate__(self):
+        return {"namespace": self.namespace, "url": self.url, "heartbeat_ttl": self.heartbeat_ttl}
+
+    def __setstate__(self, state):
+        self.__init__(state["namespace"], state["url"], state["heartbeat_ttl"])
+
+    def send(self, channel: str, message: Dict[str, Any]):
+        self.client.rpush(f"{self.namespace}:{channel}", pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def recv(self, channel: str, timeout: float) -> Dict[str, Any]:
+        # BLPOP treats 0 as "block forever"; always wait a bounded time
+        item = self.client.blpop(f"{self.namespace}:{channel}", timeout=max(1, math.ceil(timeout)))
+        if item is None:
+            raise TimeoutError(f"No message on {channel}")
+        return pickle.loads(item[1])
+
+    def beat(self):
+        self.client.set(f"{self.namespace}:heartbeat", time.time(), ex=max(1, math.ceil(self.heartbeat_ttl)))
+
+    def coordinator_alive(self) -> bool:
+        return bool(self.client.exists(f"{self.namespace}:heartbeat"))
+
+    def clear(self, channels: List[str]):
+        self.client.delete(*[f"{self.namespace}:{channel}" for channel in channels])
+
+    def close(self):
+        self.client.delete(f"{self.namespace}:heartbeat")
+
+
+def region_worker(
+    region: int,
+    transport,
+    assignment: Dict[Any, int],
+    seed: Optional[int],
+    population_key: Optional[str] = None
+):
+    """Own one region's agents: step them on request and hand over agents that leave the region.
+
+    With ``population_key`` the worker attaches to the host's shared
+    population, and agents arrive and leave as population rows.
+    """
+    population = None
+    if population_key is not None:
+        population = attach_population(population_key)
+        if population is None:
+            raise RuntimeError(f"Shared population {population_key} is not published")
+    try:
+        _run_region(region, transport, assignment, seed, population)
+    finally:
+        if population is not None:
+            population.release()
+
+
+def _open_session():
+    """Database session for a region process; pooled connections inherited from a forked parent are not reused"""
+    from app.core.database import SessionLocal, engine
+    engine.dispose(close=False)
+    return SessionLocal()
+
+
+def _run_region(region: int, transport, assignment: Dict[Any, int], seed: Optional[int], population: Optional[SyntheticPopulation]):
+    from app.simulation.persistence import add_agent_actions
+    scheduler = StagedScheduler(seed=seed)
+    profiler = RunProfiler()
+    agents: Dict[str, BaseAgent] = {}
+    boundary: Set[Any] = set()
+    db = None
+    channel = f"region:{region}"
+    try:
+        while True:
+            try:
+                message = transport.recv(channel, timeout=POLL_SECONDS)
+            except TimeoutError:
+                if not transport.coordinator_alive():
+                    logger.warning("Coordinator gone, stopping region worker", region=region)
+                    break
+                continue
+            kind = message["type"]
+            if kind == "stop":
+                break
+            if kind == "agents":
+                for spec in message["agents"]:
+                    agent = build_agent(spec, population)
+                    agents[agent.agent_id] = agent
+                    scheduler.add(agent)
+            elif kind == "boundary":
+                boundary = set(message["nodes"])
+            elif kind == "persist":
+                db = db or _open_session()
+            elif kind == "patch":
+                for agent_id, values in message["patches"].items():
+                    if agent_id in agents:
+                        agents[agent_id].state.update(values)
+            elif kind == "step":
+                # Agents perceive their own region plus the boundary agents of neighbouring regions
+                environment_state = {
+                    **message["environment"],
+                    "agents": [summary(agent) for agent in agents.values()] + message["boundary"]
+                }
+                before = {agent_id: dict(agent.state) for agent_id, agent in agents.items()}
+                actions = scheduler.step(environment_state, profiler)
+                if db is not None:
+                    tick = environment_state["timestamp"]["tick"]
+                    add_agent_actions(db, [(tick, agents[agent_id], agents[agent_id].memory[-1]) for agent_id in actions if agents[agent_id].memory])
+                    db.commit()
+                # State values are replaced, never mutated in place, so a shallow comparison finds every change
+                deltas = {}
+                for agent_id, agent in agents.items():
+                    changed = {key: value for key, value in agent.state.items() if before[agent_id].get(key, _MISSING) != value}
+                    if changed:
+                        deltas[agent_id] = changed
+                # Agents whose location now belongs to another region move there, with their memory
+                migrants = []
+                for agent_id, agent in list(agents.items()):
+                    target = assignment.get(agent.state.get("current_location"), region)
+                    if target != region:
+                        migrants.append((target, agent_spec(agent, by_row=population is not None, memory=True)))
+                        scheduler.remove(agent)
+                        del agents[agent_id]
+                transport.send("results", {
+                    "region": region,
+                    "actions": actions,
+                    "deltas": deltas,
+                    "boundary": [summary(agent) for agent in agents.values() if agent.state.get("current_location") in boundary],
+                    "migrants": migrants
+                })
+    finally:
+        if db is not None:
+            db.close()
+
+
+class DistributedRunner:
+    """Coordinator side of a distributed run.
+
+    Residents are assigned to the region of their current location and stepped
+    by that region's worker, which keeps their memory and, for engine runs,
+    persists their actions; every other agent stays with the coordinator.
+    Each step the coordinator sends the regions the shared city state and the
+    residents on their neighbours' boundary nodes (those with an edge into
+    another region), so messages grow with the edge cut rather than with
+    agents times regions. Regions return actions and changed state, which the
+    coordinator merges into a memory-less mirror of the residents for city
+    state, traffic, KPIs and snapshots, and it forwards agents that crossed a
+    region boundary to their new region. A resident perceives only its own
+    region and the neighbouring boundary as nearby agents; decisions use the
+    same per-agent RNG streams as a single-process run.
+
+    Local regions are billiard child processes, so daemonic Celery prefork
+    workers run them in parallel too. Local regions given the run's shared
+    population key attach to the host's population and exchange synthetic
+    residents as population rows. Redis regions may run on other
+    hosts, always receive full personas and are routed to the dedicated
+    ``regions`` queue, so they never wait on the worker slots of the runs
+    that coordinate them.
+    """
+
+    def __init__(
+        self,
+        graph: nx.Graph,
+        regions: int = 2,
+        transport: str = "local",
+        namespace: Optional[str] = None,
+        timeout: float = 600.0,
+        heartbeat_ttl: float = 300.0,
+        seed: Optional[int] = None
+    ):
+        self.assignment, self.partition = partition_graph(graph, regions, seed)
+        self.regions = self.partition["regions"]
+        self.boundary_nodes, self.neighbours = region_boundaries(graph, self.assignment, self.regions)
+        self.timeout = timeout
+        self.seed = seed
+        self.processes: List[Any] = []
+        self.tasks: List[Any] = []
+        self.region_of: Dict[str, int] = {}
+        # Residents on each region's boundary nodes as of its last step
+        self.boundary: Dict[int, List[Dict[str, Any]]] = {region: [] for region in range(self.regions)}
+        self.population: Optional[str] = None
+        self.stats = {"steps": 0, "migrations": 0, "wait_seconds": 0.0}
+        if transport == "redis":
+            self.transport = RedisTransport(namespace or f"citylab:distributed:{uuid.uuid4().hex}", heartbeat_ttl=heartbeat_ttl)
+            self.transport.clear([f"region:{region}" for region in range(self.regions)] + ["results"])
+        else:
+            self.transport = LocalTransport(self.regions)
+
+    @classmethod
+    def from_config(cls, graph: nx.Graph, config: Dict[str, Any], seed: Optional[int] = None) -> "DistributedRunner":
+        """Runner from a run's ``distributed`` config"""
+        return cls(
+            graph,
+            regions=config.get("regions", 2),
+            transport=config.get("transport", "local"),
+            namespace=config.get("namespace"),
+            timeout=config.get("timeout", 600.0),
+            heartbeat_ttl=config.get("heartbeat_ttl", 300.0),
+            seed=seed
+        )
+
+    def start(self, residents: List[BaseAgent], population: Optional[str] = None):
+        """Start the region workers and hand each its residents; stops any started workers on failure"""
+        if not isinstance(self.transport, RedisTransport):
+            self.population = population
+        try:
+            self._start_workers()
+            by_region: Dict[int, List[AgentSpec]] = {region: [] for region in range(self.regions)}
+            for agent in residents:
+                location = agent.state.get("current_location") or agent.state.get("home_location")
+                region = self.assignment.get(location, 0)
+                self.region_of[agent.agent_id] = region
+                by_region[region].append(agent_spec(agent, by_row=self.population is not None))
+                if location in self.boundary_nodes[region]:
+                    self.boundary[region].append(summary(agent))
+            for region, specs in by_region.items():
+                self.transport.send(f"region:{region}", {"type": "boundary", "nodes": sorted(self.boundary_nodes[region], key=str)})
+                self.transport.send(f"region:{region}", {"type": "agents", "agents": specs})
+        except Exception:
+            self.close()
+            raise
+        logger.info("Distributed regions started", **self.partition, residents=len(residents))
+
+    def _start_workers(self):
+        self.transport.beat()
+        if isinstance(self.transport, RedisTransport):
+            from app.tasks.simulation import region_worker_task
+            self.tasks = [
+                region_worker_task.delay(region, self.transport.namespace, pickle.dumps(self.assignment), self.seed)
+                for region in range(self.regions)
+            ]
+        else:
+            context = billiard.get_context()
+            for region in range(self.regions):
+                process = context.Process(
+                    target=region_worker, args=(region, self.transport, self.assignment, self.seed, self.population), daemon=True
+                )
+                process.start()
+                # Only started processes are joined on close
+                self.processes.append(process)
+
+    def persist_actions(self):
+        """Have every region persist its residents' actions as it steps them"""
+        for region in range(self.regions):
+            self.transport.send(f"region:{region}", {"type": "persist"})
+
+    def push_state(self, agents: List[BaseAgent], keys: Tuple[str, ...] = PUSHED_STATE_KEYS):
+        """Send coordinator-side state changes of remote agents to their regions"""
+        patches: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        for agent in agents:
+            region = self.region_of.get(agent.agent_id)
+            values = {key: agent.state[key] for key in keys if key in agent.state}
+            if region is not None and values:
+                patches.setdefault(region, {})[agent.agent_id] = values
+        for region, region_patches in patches.items():
+            self.transport.send(f"region:{region}", {"type": "patch", "patches": region_patches})
+
+    def step(self, environment_state: Dict[str, Any], agents: Dict[str, BaseAgent]) -> Dict[str, Dict[str, Any]]:
+        """Step every region; merge their residents' state changes into ``agents`` and return the actions"""
+        self.transport.beat()
+        shared = {key: environment_state.get(key) for key in SHARED_KEYS}
+        for region in range(self.regions):
+            boundary = [entry for neighbour in sorted(self.neighbours[region]) for entry in self.boundary[neighbour]]
+            self.transport.send(f"region:{region}", {"type": "step", "environment": shared, "boundary": boundary})
+
+        start = time.perf_counter()
+        results = [self.transport.recv("results", timeout=self.timeout) for _ in range(self.regions)]
+        self.stats["wait_seconds"] += time.perf_counter() - start
+        self.stats["steps"] += 1
+
+        actions = {}
+        for result in sorted(results, key=lambda r: r["region"]):
+            for agent_id, values in result["deltas"].items():
+                # In place, so this step's nearby_agents views see the new state as in a single process
+                agents[agent_id].state.update(values)
+            actions.update(result["actions"])
+            self.boundary[result["region"]] = result["boundary"]
+        for result in sorted(results, key=lambda r: r["region"]):
+            for target, spec in result["migrants"]:
+                self.region_of[spec[2]] = target
+                self.transport.send(f"region:{target}", {"type": "agents", "agents": [spec]})
+                if spec[4].get("current_location") in self.boundary_nodes[target]:
+                    self.boundary[target].append({"id": spec[2], "state": spec[4]})
+                self.stats["migrations"] += 1
+        return actions
+
+    def close(self):
+        for region in range(self.regions):
+            try:
+                self.transport.send(f"region:{region}", {"type": "stop"})
+            except Exception as e:
+                logger.warning("Failed to stop region worker", region=region, error=str(e))
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        try:
+            self.transport.close()
+        except Exception as e:
+            logger.warning("Failed to close distributed transport", error=str(e))
+
+    def report(self) -> Dict[str, Any]:
+        return {**self.partition, **self.stats, "agents_per_region": np.bincount(
+            list(self.region_of.values()), minlength=self.regions
+        ).tolist() if self.region_of else []}
@@ -0,0 +1,197 @@
+"""
+Run inputs and fingerprints - identical inputs produce identical results, so completed runs can be reused
+"""
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+import hashlib
+import json
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.data import CityData
+from app.models.scenario import Scenario, ScenarioRun
+from app.simulation.raptor import timetable_path
+
+# Source (relative to app/) that determines results; any change to it yields new fingerprints
+SIMULATION_SOURCES = ("simulation", "agents", "core/rng.py")
+# Bumped when results change in a way that must never reuse older runs, whatever the source hash
+# 2: staged stepping - every agent perceives the pre-step state before any agent acts
+FINGERPRINT_VERSION = 2
+
+
+@lru_cache(maxsize=1)
+def simulation_code_version() -> str:
+    """Hash of the simulation source, so results of older code are never reused"""
+    root = Path(__file__).resolve().parent.parent
+    digest = hashlib.sha256()
+    for source in SIMULATION_SOURCES:
+        path = root / source
+        for file in sorted(path.rglob("*.py")) if path.is_dir() else [path]:
+            digest.update(file.relative_to(root).as_posix().encode())
+            digest.update(file.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+@lru_cache(maxsize=64)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+
+def file_version(path: Path) -> Optional[str]:
+    """Content hash of a model or data file a run reads; None when it does not exist"""
+    try:
+        stat = Path(path).stat()
+        return _file_digest(str(path), stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def surrogate_version(run_config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Identity of the surrogate model a run decides with; retraining it yields new fingerprints"""
+    config = (run_config or {}).get("surrogate") or {}
+    if not config.get("enabled"):
+        return None
+    return file_version(config.get("model_path") or settings.SURROGATE_MODEL_DIR / "resident.json")
+
+
+def timetable_version(run_config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Identity of the transit timetable a run routes on; reprocessing the GTFS feed yields new fingerprints"""
+    config = (run_config or {}).get("transit") or {}
+    if not config.get("enabled"):
+        return None
+    try:
+        return file_version(timetable_path(config))
+    except ValueError:
+        # Invalid transit config; the run fails when it starts
+        return None
+
+
+def scenario_config_for(scenario: Scenario, run_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Scenario settings as passed to the simulation, with the run's ``policy_overrides`` applied"""
+    overrides = (run_config or {}).get("policy_overrides") or {}
+    return {
+        "name": scenario.name,
+        "policy_type": scenario.policy_type,
+        "policy_config": {**(scenario.policy_config or {}), **overrides}
+    }
+
+
+def build_agents_config(
+    scenario_config: Dict[str, Any],
+    simulation_days: int,
+    run_config: Optional[Dict[str, Any]] = None,
+    city_version: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Agents for a run: the orchestrator, any explicit ``agents`` and a synthetic ``population``"""
+    run_config = run_config or {}
+    agents_config = [
+        {
+            "agent_type": "orchestrator",
+            "persona_config": {
+                "scenario_config": scenario_config,
+                "simulation_days": simulation_days
+            }
+        }
+    ]
+    agents_config.extend(run_config.get("agents", []))
+    population_config = run_config.get("population", {})
+    if population_config.get("enabled"):
+        # The city version keys the per-city/seed population cache
+        agents_config.append({
+            "agent_type": "population",
+            "persona_config": {**population_config, "city_version": city_version}
+        })
+    return agents_config
+
+
+def city_data_version(city_data) -> Optional[str]:
+    """Identifies the imported city data a run uses; reprocessing produces a new version"""
+    if city_data is None:
+        return None
+    processed_at = city_data.processed_at.isoformat() if city_data.processed_at else ""
+    return f"{city_data.id}:{processed_at}"
+
+
+def canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def run_fingerprint(
+    scenario_config: Dict[str, Any],
+    city_version: Optional[str],
+    agents_config: List[Dict[str, Any]],
+    seed: Optional[int],
+    simulation_days: int,
+    run_config: Optional[Dict[str, Any]] = None
+) -> Optional[str]:
+    """SHA-256 over everything that determines a run's results; None for unseeded runs"""
+    if seed is None:
+        return None
+    inputs = {
+        "scenario": scenario_config,
+        "city_data": city_version,
+        "agents": agents_config,
+        "seed": seed,
+        "simulation_days": simulation_days,
+        "run_config": run_config or {},
+        "surrogate": surrogate_version(run_config),
+        "timetable": timetable_version(run_config),
+        "code_version": [FINGERPRINT_VERSION, simulation_code_version(), settings.SIMULATION_CODE_VERSION]
+    }
+    return hashlib.sha256(canonical_json(inputs).encode()).hexdigest()
+
+
+def create_run(
+    db: Session,
+    scenario: Scenario,
+    simulation_days: int,
+    seed: Optional[int],
+    run_config: Optional[Dict[str, Any]] = None,
+    force: bool = False,
+    **fields
+) -> Tuple[ScenarioRun, bool]:
+    """Create a run, reusing the results of a completed identical run unless ``force`` is set.
+    
+    Returns the run and whether its results were reused; only runs that were
+    not reused need to be dispatched, reused ones get their listing row from
+    ``summary.add_reused_summary``.
+    """
+    city_data = db.query(CityData).filter(CityData.id == scenario.city_data_id).first() if scenario.city_data_id else None
+    scenario_config = scenario_config_for(scenario, run_config)
+    fingerprint = run_fingerprint(
+        scenario_config,
+        city_data_version(city_data),
+        build_agents_config(scenario_config, simulation_days, run_config, city_data_version(city_data)),
+        seed,
+        simulation_days,
+        run_config
+    )
+    
+    run = ScenarioRun(
+        scenario_id=scenario.id,
+        simulation_days=simulation_days,
+        seed=seed,
+        run_config=run_config,
+        fingerprint=fingerprint,
+        status="pending",
+        **fields
+    )
+    
+    # Identical inputs give identical results: reuse a completed run instead of re-simulating
+    source = None
+    if fingerprint and not force:
+        source = db.query(ScenarioRun).filter(
+            ScenarioRun.fingerprint == fingerprint,
+            ScenarioRun.status == "completed"
+        ).order_by(ScenarioRun.id.desc()).first()
+    if source:
+        run.source_run_id = source.source_run_id or source.id
+        run.status = "completed"
+        run.end_time = datetime.now()
+        run.metrics = source.metrics
+    
+    db.add(run)
+    db.flush()
+    return run, source is not None
@@ -0,0 +1,292 @@
+"""
+Streaming KPIs - constant-time accumulators fed by agent actions and trips, rolled up per hour and day
+"""
+from typing import Dict, List, Any, Optional
+import math
+
+MINUTES_PER_HOUR = 60
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_QUANTILES = (0.5, 0.9)
+# Resident state with a commute estimate per mode, set by traffic and transit assignment
+MODE_COMMUTE_KEYS = {"car": "car_commute_minutes", "transit": "transit_commute_minutes"}
+
+
+class Welford:
+    """Running count, mean, variance, min and max (Welford's algorithm); mergeable"""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Welford"):
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> Optional[float]:
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        variance = self.variance
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": math.sqrt(variance) if variance is not None else None,
+            "min": self.min,
+            "max": self.max
+        }
+
+
+class QuantileSketch:
+    """Log-bucketed histogram (DDSketch-style): quantiles of non-negative values within ``relative_accuracy``.
+
+    Updates and merges are constant time per bucket; the number of buckets
+    grows with the log of the value range, not with the number of values.
+    """
+
+    __slots__ = ("relative_accuracy", "gamma", "log_gamma", "bins", "zeros", "count")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+
+    def update(self, value: float):
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other: "QuantileSketch"):
+        self.count += other.count
+        self.zeros += other.zeros
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class KPIWindow:
+    """Accumulators for one period (an hour, a day or the whole run)"""
+
+    __slots__ = ("decisions", "modes", "commute", "sketch", "boardings")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.decisions = 0
+        self.modes: Dict[str, int] = {}
+        self.commute = Welford()
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.boardings: Dict[str, int] = {}
+
+    def observe_mode(self, mode: Optional[str]):
+        self.decisions += 1
+        if mode:
+            self.modes[mode] = self.modes.get(mode, 0) + 1
+
+    def observe_commute(self, minutes: float):
+        self.commute.update(minutes)
+        self.sketch.update(minutes)
+
+    def observe_boarding(self, route_id: str):
+        self.boardings[route_id] = self.boardings.get(route_id, 0) + 1
+
+    def merge(self, other: "KPIWindow"):
+        self.decisions += other.decisions
+        for mode, count in other.modes.items():
+            self.modes[mode] = self.modes.get(mode, 0) + count
+        self.commute.merge(other.commute)
+        self.sketch.merge(other.sketch)
+        for route_id, count in other.boardings.items():
+            self.boardings[route_id] = self.boardings.get(route_id, 0) + count
+
+    @property
+    def transit_modal_share(self) -> Optional[float]:
+        chosen = sum(self.modes.values())
+        return self.modes.get("transit", 0) / chosen if chosen else None
+
+    def kpis(self, quantiles=DEFAULT_QUANTILES) -> Dict[str, Any]:
+        return {
+            "decisions": self.decisions,
+            "modes": dict(self.modes),
+            "transit_modal_share": self.transit_modal_share,
+            "commute": {
+                **self.commute.to_dict(),
+                **{f"p{round(q * 100)}": self.sketch.quantile(q) for q in quantiles}
+            },
+            "boardings": dict(self.boardings)
+        }
+
+
+class KPIEngine:
+    """Run KPIs maintained incrementally from agent actions and completed trips.
+
+    Each observation updates the current hour's window and the run total in
+    constant time, so full-run aggregates are exact (quantiles within the
+    sketch's relative accuracy) without rescanning agent states. Hours are
+    merged into days when the series are read.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, quantiles=DEFAULT_QUANTILES, window: str = "hour"):
+        if window not in ("hour", "day"):
+            raise ValueError(f"Unknown KPI window: {window}")
+        self.relative_accuracy = relative_accuracy
+        self.quantiles = tuple(quantiles)
+        self.window = window
+        self.total = KPIWindow(relative_accuracy)
+        self.hours: Dict[int, KPIWindow] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "KPIEngine":
+        """Engine from a run's ``kpis`` config"""
+        return cls(
+            relative_accuracy=config.get("relative_accuracy", 0.01),
+            quantiles=config.get("quantiles", DEFAULT_QUANTILES),
+            window=config.get("window", "hour")
+        )
+
+    def _windows(self, tick: int):
+        hour = int(tick) // MINUTES_PER_HOUR
+        window = self.hours.get(hour)
+        if window is None:
+            window = self.hours[hour] = KPIWindow(self.relative_accuracy)
+        return window, self.total
+
+    def observe_actions(self, tick: int, agents: Dict[str, Any], agent_actions: Dict[str, Dict], origins: Dict[str, Any]):
+        """Mode choices of a step's resident moves, and a trip for each move that took its resident away from ``origins``.
+
+        Tick-mode trips complete within the step, so each is timed by the
+        mover's commute estimate for the chosen mode; moves that leave a
+        resident where it was count as decisions only.
+        """
+        windows = self._windows(tick)
+        for agent_id, action in agent_actions.items():
+            if action.get("action_type") != "move":
+                continue
+            action_data = action.get("action_data", {})
+            mode = action_data.get("mode")
+            state = agents[agent_id].state if agent_id in agents else {}
+            minutes = None
+            if state.get("current_location") != origins.get(agent_id):
+                minutes = state.get(MODE_COMMUTE_KEYS.get(mode)) if mode in MODE_COMMUTE_KEYS else None
+                if minutes is None and state.get("commute_time"):
+                    minutes = state["commute_time"]
+            for window in windows:
+                window.observe_mode(mode)
+                if mode == "transit":
+                    window.observe_boarding(action_data.get("route_id", "default"))
+                if minutes is not None:
+                    window.observe_commute(float(minutes))
+
+    def observe_departure(self, tick: int, mode: Optional[str], route_id: Optional[str] = None):
+        """A resident leaving on ``mode`` (event-driven runs)"""
+        for window in self._windows(tick):
+            window.observe_mode(mode)
+            if route_id is not None:
+                window.observe_boarding(route_id)
+
+    def observe_trip(self, tick: int, minutes: float):
+        """A completed trip's travel time (event-driven runs)"""
+        for window in self._windows(tick):
+            window.observe_commute(float(minutes))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Run-to-date values under the orchestrator's metric names; only the final metrics store these"""
+        return _values(self.total)
+
+    def current(self, tick: int) -> Dict[str, Any]:
+        """Values of the hour (or day, per ``window``) containing ``tick``, named as in ``snapshot``"""
+        hour = int(tick) // MINUTES_PER_HOUR
+        if self.window == "hour":
+            return _values(self.hours.get(hour) or KPIWindow(self.relative_accuracy))
+        first = hour - hour % (MINUTES_PER_DAY // MINUTES_PER_HOUR)
+        day = KPIWindow(self.relative_accuracy)
+        for h in range(first, hour + 1):
+            if h in self.hours:
+                day.merge(self.hours[h])
+        return _values(day)
+
+    def series(self, resolution: str = "hour") -> Dict[str, List[Any]]:
+        """Columnar series per hour or day: one list per KPI, index-aligned with ``start``"""
+        if resolution == "day":
+            periods: Dict[int, KPIWindow] = {}
+            for hour, window in self.hours.items():
+                day = hour * MINUTES_PER_HOUR // MINUTES_PER_DAY
+                periods.setdefault(day, KPIWindow(self.relative_accuracy)).merge(window)
+            minutes = MINUTES_PER_DAY
+        elif resolution == "hour":
+            periods = self.hours
+            minutes = MINUTES_PER_HOUR
+        else:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        columns: Dict[str, List[Any]] = {
+            "start": [], "decisions": [], "transit_modal_share": [], "boardings": [],
+            "trips": [], "commute_mean": [], "commute_std": []
+        }
+        columns.update({f"commute_p{round(q * 100)}": [] for q in self.quantiles})
+        for period in sorted(periods):
+            window = periods[period]
+            share = window.transit_modal_share
+            std = window.commute.variance
+            columns["start"].append(period * minutes)
+            columns["decisions"].append(window.decisions)
+            columns["transit_modal_share"].append(None if share is None else round(share, 4))
+            columns["boardings"].append(sum(window.boardings.values()))
+            columns["trips"].append(window.commute.count)
+            columns["commute_mean"].append(round(window.commute.mean, 2) if window.commute.count else None)
+            columns["commute_std"].append(None if std is None else round(math.sqrt(std), 2))
+            for q in self.quantiles:
+                value = window.sketch.quantile(q)
+                columns[f"commute_p{round(q * 100)}"].append(None if value is None else round(value, 2))
+        return columns
+
+    def report(self) -> Dict[str, Any]:
+        """Exact full-run aggregates"""
+        return {**self.total.kpis(self.quantiles), "relative_accuracy": self.relative_accuracy, "hours": len(self.hours)}
+
+
+def _values(window: KPIWindow) -> Dict[str, Any]:
+    return {
+        "avg_commute_time": window.commute.mean if window.commute.count else None,
+        "transit_modal_share": window.transit_modal_share,
+        "transit_boardings": dict(window.boardings)
+    }
@@ -0,0 +1,195 @@
+"""
+Process-pool decisions - rule-based agents of one run reason in parallel worker processes
+"""
+from importlib import import_module
+from multiprocessing import shared_memory
+from typing import Dict, List, Any, Optional, Tuple, Union
+import math
+import os
+import pickle
+import time
+import billiard
+from billiard.pool import Pool
+import structlog
+
+from app.agents.base import BaseAgent
+from app.simulation.population import SyntheticPopulation, attach_population
+
+logger = structlog.get_logger()
+
+# Perception entries that are the same for every agent of a step
+SHARED_KEYS = ("timestamp", "nearby_agents", "city_state", "events")
+
+# The persona is a row of the host's shared population when the run publishes one
+WorkItem = Tuple[str, str, str, Union[int, Dict[str, Any]], Dict[str, Any], Optional[str], Dict[str, Any]]
+
+# Populations this worker process attached to, kept for the life of the pool
+_populations: Dict[str, SyntheticPopulation] = {}
+
+
+def _read_shared(name: str, size: int) -> Dict[str, Any]:
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        return pickle.loads(bytes(segment.buf[:size]))
+    finally:
+        segment.close()
+
+
+def _attached_population(key: str) -> SyntheticPopulation:
+    population = _populations.get(key)
+    if population is None:
+        population = attach_population(key)
+        if population is None:
+            raise RuntimeError(f"Shared population {key} is not published")
+        _populations[key] = population
+    return population
+
+
+def _release_populations(pid: Optional[int] = None, exitcode: Optional[int] = None):
+    """Pool worker exit hook: drop this worker's population attachments (workers skip atexit and finalizers)"""
+    while _populations:
+        _populations.popitem()[1].release()
+
+
+def _decide_chunk(
+    name: str,
+    size: int,
+    items: List[WorkItem],
+    population_key: Optional[str] = None
+) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    """Worker side: rebuild each agent from its persona and state and run its rule-based reasoning"""
+    shared = _read_shared(name, size)
+    population = _attached_population(population_key) if population_key else None
+    results = []
+    for module, class_name, agent_id, persona, state, rng_key, own in items:
+        try:
+            if isinstance(persona, int):
+                persona = population.persona(persona)
+            agent = getattr(import_module(module), class_name)(agent_id, persona)
+            agent.llm = None
+            agent.state = state
+            agent.rng_key = rng_key
+            results.append((agent_id, agent.reason({**shared, **own})))
+        except Exception as e:
+            logger.error("Parallel agent reasoning failed", agent_id=agent_id, error=str(e))
+            results.append((agent_id, None))
+    return results
+
+
+class ParallelDecider:
+    """Decides for rule-based agents (no LLM client) across a process pool.
+
+    The step's shared environment (city state, other agents, clock) is pickled
+    once into a shared-memory segment that every worker reads; per-agent work
+    items carry only persona, state and the agent's RNG stream key. With
+    ``population`` set to a run's shared population key, synthetic
+    residents are sent as population rows and workers attach to the host's
+    copy once instead of receiving personas every step. Agents are
+    split into contiguous chunks and results are merged in activation order,
+    so decisions equal serial execution. Batches smaller than ``min_agents``
+    are left to the serial path, where the pool overhead would dominate.
+
+    The pool is billiard's (Celery's fork of multiprocessing), which unlike
+    the standard library lets daemonic processes have children, so runs in
+    a Celery prefork worker decide in parallel too.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_agents: int = 1000, start_method: Optional[str] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_agents = min_agents
+        self.start_method = start_method
+        self._pool: Optional[Any] = None
+        self.disabled = False
+        self.population: Optional[str] = None
+        self.stats = {"batches": 0, "agents": 0, "seconds": 0.0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ParallelDecider":
+        """Decider from a run's ``parallel`` config"""
+        return cls(
+            workers=config.get("workers"),
+            min_agents=config.get("min_agents", 1000),
+            start_method=config.get("start_method")
+        )
+
+    def _get_pool(self) -> Optional[Any]:
+        if self._pool is None and not self.disabled:
+            try:
+                self._pool = Pool(
+                    self.workers,
+                    on_process_exit=_release_populations,
+                    context=billiard.get_context(self.start_method)
+                )
+                # Run one task so a pool that cannot start fails here
+                self._pool.apply_async(os.getpid).get(timeout=60)
+            except Exception as e:
+                logger.warning("Process pool unavailable, deciding serially", error=str(e))
+                self.disabled = True
+                self.close(terminate=True)
+        return self._pool
+    
+    def decide(self, agents: List[BaseAgent], perceptions: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        eligible = [agent for agent in agents if agent.llm is None]
+        if len(eligible) < self.min_agents or self.workers < 2:
+            return {}
+        pool = self._get_pool()
+        if pool is None:
+            return {}
+
+        start = time.perf_counter()
+        first = perceptions[eligible[0].agent_id]
+        blob = pickle.dumps({key: first.get(key) for key in SHARED_KEYS}, protocol=pickle.HIGHEST_PROTOCOL)
+        segment = shared_memory.SharedMemory(create=True, size=max(len(blob), 1))
+        try:
+            segment.buf[:len(blob)] = blob
+            items = [
+                (
+                    type(agent).__module__,
+                    type(agent).__name__,
+                    agent.agent_id,
+                    self._persona(agent),
+                    agent.state,
+                    agent.rng_key,
+                    {key: value for key, value in perceptions[agent.agent_id].items() if key not in SHARED_KEYS}
+                )
+                for agent in eligible
+            ]
+            chunk = math.ceil(len(items) / self.workers)
+            results = [
+                pool.apply_async(_decide_chunk, (segment.name, len(blob), items[offset:offset + chunk], self.population))
+                for offset in range(0, len(items), chunk)
+            ]
+            decisions = {}
+            for result in results:
+                decisions.update(result.get())
+        except Exception as e:
+            logger.warning("Parallel decisions failed, deciding serially", error=str(e))
+            self.disabled = True
+            self.close(terminate=True)
+            return {}
+        finally:
+            segment.close()
+            segment.unlink()
+
+        self.stats["batches"] += 1
+        self.stats["agents"] += len(eligible)
+        self.stats["seconds"] += time.perf_counter() - start
+        return decisions
+
+    def _persona(self, agent: BaseAgent) -> Union[int, Dict[str, Any]]:
+        if self.population is not None and agent.population_row is not None:
+            return agent.population_row
+        return agent.persona_config
+
+    def close(self, terminate: bool = False):
+        """Stop the pool; workers finishing normally release their population attachments first"""
+        if self._pool is not None:
+            if terminate:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def report(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "disabled": self.disabled, **self.stats}
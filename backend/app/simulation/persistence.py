@@ -0,0 +1,53 @@
+"""
+Agent action persistence - shared by the engine and by distributed region workers, which persist their own residents
+"""
+from typing import Dict, List, Any, Tuple
+
+from app.models.agent import Agent, AgentAction, AgentType
+from app.agents.surrogate import extract_features
+
+AGENT_TYPES = {
+    "resident": AgentType.RESIDENT,
+    "transit_operator": AgentType.TRANSIT_OPERATOR,
+    "planner": AgentType.PLANNER,
+    "orchestrator": AgentType.ORCHESTRATOR
+}
+
+
+def add_agent_actions(db, entries: List[Tuple[int, Any, Dict[str, Any]]]) -> int:
+    """Add (tick, agent, memory entry) decisions to ``db``, creating missing agent rows; returns the actions added"""
+    rows = 0
+    for tick, agent, latest_memory in entries:
+        agent_id = agent.agent_id
+        action = latest_memory.get("action", {})
+        
+        # Find or create agent in DB
+        db_agent = db.query(Agent).filter(Agent.id == int(agent_id.split("_")[-1])).first()
+        if not db_agent:
+            db_agent = Agent(
+                id=int(agent_id.split("_")[-1]) if agent_id.split("_")[-1].isdigit() else None,
+                agent_type=AGENT_TYPES.get(agent.agent_type, AgentType.RESIDENT),
+                name=agent_id,
+                persona_config=agent.persona_config,
+                state=agent.state
+            )
+            db.add(db_agent)
+            db.flush()
+        
+        # Save action
+        reasoning = latest_memory.get("reasoning", {})
+        db_action = AgentAction(
+            agent_id=db_agent.id,
+            simulation_tick=tick,
+            action_type=action.get("action_type", "unknown"),
+            action_data=action.get("action_data", {}),
+            rationale=action.get("rationale", ""),
+            retrieved_docs=reasoning.get("retrieved_docs"),
+            prompt_used=reasoning.get("prompt_used"),
+            confidence_score=action.get("confidence", 0.5),
+            decision_source=reasoning.get("source"),
+            features=extract_features(latest_memory["perception"]) if agent.agent_type == "resident" else None
+        )
+        db.add(db_action)
+        rows += 1
+    return rows
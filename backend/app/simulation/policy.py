@@ -0,0 +1,37 @@
+"""
+Policy levers - the numeric policy_config parameters the simulation reads, and so the ones a sweep may vary
+"""
+from typing import Dict, List, Any, Optional
+
+# Lever -> default; residents perceive the levers as city_state["policy"]
+POLICY_LEVERS: Dict[str, float] = {
+    "transit_fare": 2.5,  # dollars per transit trip
+    "congestion_charge": 0.0,  # dollars per car trip
+    "parking_cost": 0.0,  # dollars per car trip
+    "headway_scale": 1.0,  # multiplier on every timetable route's headway at the start of the run
+}
+
+# Levers that only act when the run enables a model
+LEVER_REQUIRES: Dict[str, str] = {
+    "headway_scale": "transit",
+}
+
+
+def policy_levers(policy_config: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Lever values of a scenario's policy_config, defaults for the rest; other (descriptive) keys are ignored"""
+    policy_config = policy_config or {}
+    return {name: float(policy_config.get(name, default)) for name, default in POLICY_LEVERS.items()}
+
+
+def check_levers(names: List[str], run_config: Optional[Dict[str, Any]] = None):
+    """Raise ValueError for parameters the simulation would not read in a run with ``run_config``"""
+    run_config = run_config or {}
+    unknown = sorted(name for name in names if name not in POLICY_LEVERS)
+    if unknown:
+        raise ValueError(f"Unknown policy parameters {unknown}; the simulation reads {sorted(POLICY_LEVERS)}")
+    inactive = sorted(
+        name for name in names
+        if name in LEVER_REQUIRES and not run_config.get(LEVER_REQUIRES[name], {}).get("enabled")
+    )
+    if inactive:
+        raise ValueError(f"Policy parameters {inactive} need {sorted({LEVER_REQUIRES[name] for name in inactive})} enabled in run_config")
@@ -0,0 +1,353 @@
+"""
+Synthetic population - resident personas fitted to marginal tables with iterative proportional fitting
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import hashlib
+import json
+import time
+import networkx as nx
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.core.rng import POPULATION, generator, stream_key
+from app.core.shared_memory import SharedArrays
+from app.agents import ResidentAgent
+from app.simulation.spatial import SpatialIndex
+
+logger = structlog.get_logger()
+
+EARTH_RADIUS_METRES = 6371000.0
+# Source (relative to app/) that determines a synthesized population; changes invalidate cached ones
+SYNTHESIS_SOURCES = ("simulation/population.py", "core/rng.py")
+
+
+def ipf(
+    seed: np.ndarray,
+    marginals: List[np.ndarray],
+    max_iterations: int = 100,
+    tolerance: float = 1e-8
+) -> np.ndarray:
+    """Scale ``seed`` (one axis per attribute) until its sums along every axis match ``marginals``.
+
+    Marginals are rescaled to the total of the first one; cells that are zero
+    in the seed stay zero.
+    """
+    total = float(np.sum(marginals[0]))
+    targets = [np.asarray(m, dtype=float) * (total / np.sum(m)) for m in marginals]
+    table = np.asarray(seed, dtype=float) * (total / max(np.sum(seed), 1e-12))
+    axes = list(range(table.ndim))
+    for _ in range(max_iterations):
+        error = 0.0
+        for axis, target in enumerate(targets):
+            other = tuple(a for a in axes if a != axis)
+            current = table.sum(axis=other)
+            error = max(error, float(np.max(np.abs(current - target))))
+            factor = np.divide(target, current, out=np.zeros_like(target), where=current > 0)
+            shape = [1] * table.ndim
+            shape[axis] = -1
+            table *= factor.reshape(shape)
+        if error <= tolerance * total:
+            break
+    return table
+
+
+def _seed_table(attributes: Dict[str, Dict[str, float]], seed_tables: List[Dict[str, Any]]) -> np.ndarray:
+    """Uniform prior, multiplied by any cross-tabulations (e.g. survey samples) over subsets of the attributes"""
+    names = list(attributes)
+    shape = [len(categories) for categories in attributes.values()]
+    seed = np.ones(shape)
+    for table in seed_tables:
+        dims = table["dims"]
+        counts = np.asarray(table["counts"], dtype=float)
+        # Order the table's axes like the population's and broadcast over the rest
+        order = sorted(range(len(dims)), key=lambda i: names.index(dims[i]))
+        counts = np.transpose(counts, order)
+        index = [slice(None) if name in dims else np.newaxis for name in names]
+        seed = seed * counts[tuple(index)]
+    return seed
+
+
+@dataclass
+class SyntheticPopulation:
+    """Residents as parallel arrays: node indices for home and work, category codes per attribute"""
+    node_ids: np.ndarray
+    home: np.ndarray
+    work: np.ndarray
+    attributes: Dict[str, List[str]]
+    codes: Dict[str, np.ndarray]
+    shared: Optional[SharedArrays] = field(default=None, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.home)
+
+    def persona(self, i: int) -> Dict[str, Any]:
+        persona = {name: self.attributes[name][int(self.codes[name][i])] for name in self.attributes}
+        persona["home_location"] = self.node_ids[self.home[i]].item()
+        persona["work_location"] = self.node_ids[self.work[i]].item()
+        return persona
+
+    def residents(self, prefix: str = "resident", limit: Optional[int] = None) -> List[ResidentAgent]:
+        """ResidentAgents for the first ``limit`` persons, labels resolved per column rather than per person"""
+        count = len(self) if limit is None else min(limit, len(self))
+        columns = {
+            name: np.asarray(categories, dtype=object)[self.codes[name][:count]].tolist()
+            for name, categories in self.attributes.items()
+        }
+        columns["home_location"] = self.node_ids[self.home[:count]].tolist()
+        columns["work_location"] = self.node_ids[self.work[:count]].tolist()
+        names = list(columns)
+        residents = []
+        for i, values in enumerate(zip(*columns.values())):
+            agent = ResidentAgent(f"{prefix}_{i}", dict(zip(names, values)))
+            agent.population_row = i
+            residents.append(agent)
+        return residents
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "size": len(self),
+            "attributes": {
+                name: dict(zip(categories, np.bincount(self.codes[name], minlength=len(categories)).tolist()))
+                for name, categories in self.attributes.items()
+            },
+            "home_nodes": int(len(np.unique(self.home))),
+            "work_nodes": int(len(np.unique(self.work)))
+        }
+
+    def save(self, path: Path):
+        np.savez(
+            path,
+            attributes=np.asarray(json.dumps(self.attributes)),
+            **self.arrays()
+        )
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Columns as plain arrays"""
+        return {
+            "node_ids": self.node_ids,
+            "home": self.home,
+            "work": self.work,
+            **{f"code_{name}": codes for name, codes in self.codes.items()}
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, attributes: Dict[str, List[str]]) -> "SyntheticPopulation":
+        """Population over ``arrays`` without copying its columns, node ids included"""
+        return cls(
+            arrays["node_ids"],
+            arrays["home"],
+            arrays["work"],
+            attributes,
+            {name: arrays[f"code_{name}"] for name in attributes}
+        )
+
+    @classmethod
+    def from_shared(cls, shared: SharedArrays) -> "SyntheticPopulation":
+        population = cls.from_arrays(shared, shared.meta["attributes"])
+        population.shared = shared
+        return population
+
+    @property
+    def shared_key(self) -> Optional[str]:
+        """Key other processes of the host attach by; None unless the population is shared"""
+        return self.shared.key if self.shared is not None else None
+
+    def release(self):
+        """Drop this process's reference to the host's shared copy"""
+        if self.shared is not None:
+            self.shared.release()
+            self.shared = None
+
+    @classmethod
+    def load(cls, path: Path) -> "SyntheticPopulation":
+        """Load a cached population"""
+        with np.load(path) as data:
+            return cls.from_arrays(data, json.loads(str(data["attributes"])))
+
+
+def node_id_array(nodes: List[Any]) -> np.ndarray:
+    """Graph node ids as int64 (OSM ids) or fixed-width strings, so they are stored and shared without pickling"""
+    if all(isinstance(node, (int, np.integer)) and not isinstance(node, bool) for node in nodes):
+        return np.asarray(nodes, dtype=np.int64)
+    if all(isinstance(node, str) for node in nodes):
+        return np.asarray(nodes, dtype=str)
+    raise ValueError("Population node ids must be all integers or all strings")
+
+
+def _location_weights(graph: nx.Graph, node_ids: np.ndarray, attribute: str) -> Optional[np.ndarray]:
+    """Per-node weights from a node attribute such as ``population`` or ``jobs``; None when no node has it"""
+    weights = np.array([float(graph.nodes[node].get(attribute) or 0.0) for node in node_ids.tolist()])
+    return weights / weights.sum() if weights.sum() > 0 else None
+
+
+def _sample_locations(
+    rng: np.random.Generator,
+    graph: nx.Graph,
+    node_ids: np.ndarray,
+    spatial_index: Optional[SpatialIndex],
+    size: int,
+    zones: List[Dict[str, Any]],
+    weight_key: str,
+    node_attribute: str,
+    zone_radius: float
+) -> np.ndarray:
+    """Node index per person: from zone centroids snapped in bulk, else node attribute weights, else uniform"""
+    weighted = [zone for zone in zones if zone.get(weight_key)]
+    if weighted and spatial_index is not None:
+        weights = np.array([float(zone[weight_key]) for zone in weighted])
+        zone = rng.choice(len(weighted), size=size, p=weights / weights.sum())
+        lat = np.array([float(z["lat"]) for z in weighted])[zone]
+        lon = np.array([float(z["lon"]) for z in weighted])[zone]
+        if zone_radius > 0:
+            # Uniform within a disc around the centroid
+            distance = zone_radius * np.sqrt(rng.random(size))
+            bearing = rng.random(size) * 2 * np.pi
+            lat = lat + np.degrees(distance * np.cos(bearing) / EARTH_RADIUS_METRES)
+            lon = lon + np.degrees(distance * np.sin(bearing) / (EARTH_RADIUS_METRES * np.cos(np.radians(lat))))
+        index, _ = spatial_index.nearest(lon, lat)
+        # Positions of the index's nodes among ``node_ids``
+        positions = {node: i for i, node in enumerate(node_ids.tolist())}
+        return np.array([positions[node] for node in spatial_index.node_ids], dtype=np.int64)[index]
+    weights = _location_weights(graph, node_ids, node_attribute)
+    return rng.choice(len(node_ids), size=size, p=weights)
+
+
+def synthesize(
+    graph: nx.Graph,
+    config: Dict[str, Any],
+    seed: Optional[int] = None,
+    spatial_index: Optional[SpatialIndex] = None
+) -> SyntheticPopulation:
+    """Draw a population of ``size`` persons whose attribute marginals match ``attributes``.
+
+    The joint distribution is fitted with IPF to the marginals (fractions or
+    counts) starting from any ``seed_tables``, integerised with a single
+    multinomial draw, and expanded into per-person category codes. Home and
+    work nodes are drawn from ``zones`` (``lat``/``lon`` with ``residents``
+    and ``jobs`` weights), or from the nodes' ``population``/``jobs``
+    attributes, or uniformly.
+    """
+    if graph.number_of_nodes() == 0:
+        raise ValueError("Population synthesis needs a city graph")
+    size = int(config.get("size", 1000))
+    attributes = {
+        name: {str(category): float(share) for category, share in marginal.items()}
+        for name, marginal in (config.get("attributes") or {"preferred_mode": {"transit": 1.0}}).items()
+    }
+    rng = generator(stream_key(seed, POPULATION))
+
+    joint = ipf(
+        _seed_table(attributes, config.get("seed_tables", [])),
+        [np.array(list(marginal.values())) for marginal in attributes.values()],
+        max_iterations=config.get("max_iterations", 100)
+    )
+    counts = rng.multinomial(size, (joint / joint.sum()).ravel())
+    cells = rng.permutation(np.repeat(np.arange(counts.size), counts))
+    unravelled = np.unravel_index(cells, joint.shape)
+    codes = {name: unravelled[axis].astype(np.int32) for axis, name in enumerate(attributes)}
+
+    node_ids = node_id_array(list(graph.nodes))
+    zones = config.get("zones", [])
+    if spatial_index is None and zones:
+        spatial_index = SpatialIndex.from_graph(graph)
+    zone_radius = float(config.get("zone_radius", 0.0))
+    home = _sample_locations(rng, graph, node_ids, spatial_index, size, zones, "residents", "population", zone_radius)
+    work = _sample_locations(rng, graph, node_ids, spatial_index, size, zones, "jobs", "jobs", zone_radius)
+
+    return SyntheticPopulation(
+        node_ids,
+        home.astype(np.int64),
+        work.astype(np.int64),
+        {name: list(marginal) for name, marginal in attributes.items()},
+        codes
+    )
+
+
+@lru_cache(maxsize=1)
+def synthesis_version() -> str:
+    """Hash of the synthesis and random stream source, so populations drawn by older code are not reused"""
+    root = Path(__file__).resolve().parent.parent
+    digest = hashlib.sha256()
+    for source in SYNTHESIS_SOURCES:
+        digest.update(source.encode())
+        digest.update((root / source).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def population_cache_key(city_version: Optional[str], config: Dict[str, Any], seed: Optional[int]) -> Optional[str]:
+    """Identifies a population by city data, synthesis config, seed and synthesis code; None when it cannot be reproduced"""
+    if seed is None or city_version is None:
+        return None
+    inputs = {key: value for key, value in config.items() if key not in ("enabled", "city_version", "max_agents", "shared_memory")}
+    payload = json.dumps(
+        {"city": city_version, "config": inputs, "seed": seed, "synthesis": synthesis_version()},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_or_synthesize(
+    graph: nx.Graph,
+    config: Dict[str, Any],
+    seed: Optional[int] = None,
+    spatial_index: Optional[SpatialIndex] = None
+) -> SyntheticPopulation:
+    """Population from the per-city/seed cache, synthesizing and caching it on a miss.
+
+    With ``shared_memory`` set, the columns are held once per host: runs of the
+    same city, config and seed attach to the published copy instead of loading
+    their own, and the caller releases it with ``population.release()``.
+    """
+    key = population_cache_key(config.get("city_version"), config, seed)
+    shared_key = f"population:{key}" if key and config.get("shared_memory") else None
+    if shared_key:
+        try:
+            shared = SharedArrays.attach(shared_key)
+            if shared is not None:
+                population = SyntheticPopulation.from_shared(shared)
+                logger.info("Population attached from shared memory", size=len(population))
+                return population
+        except Exception as e:
+            logger.warning("Failed to attach shared population", error=str(e))
+
+    population = None
+    path = settings.PROCESSED_DATA_DIR / "populations" / f"{key}.npz" if key else None
+    if path and path.exists():
+        try:
+            population = SyntheticPopulation.load(path)
+            logger.info("Population loaded from cache", size=len(population), path=str(path))
+        except Exception as e:
+            logger.warning("Failed to load cached population", error=str(e), path=str(path))
+
+    if population is None:
+        start = time.perf_counter()
+        population = synthesize(graph, config, seed, spatial_index)
+        logger.info("Population synthesized", size=len(population), seconds=round(time.perf_counter() - start, 3))
+        if path:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                population.save(path)
+            except Exception as e:
+                logger.warning("Failed to cache population", error=str(e), path=str(path))
+
+    if shared_key:
+        try:
+            shared = SharedArrays.publish(shared_key, population.arrays(), meta={"attributes": population.attributes})
+            population = SyntheticPopulation.from_shared(shared)
+        except Exception as e:
+            logger.warning("Failed to share population", error=str(e))
+    return population
+
+
+def attach_population(key: str) -> Optional[SyntheticPopulation]:
+    """Population published by another process of the host, node ids included.
+
+    Workers use this instead of receiving personas pickled; returns None when
+    it is no longer published.
+    """
+    shared = SharedArrays.attach(key)
+    return SyntheticPopulation.from_shared(shared) if shared is not None else None
@@ -0,0 +1,315 @@
+"""
+Transit timetable arrays and RAPTOR journey planning (Delling et al., round-based public transit routing)
+"""
+from typing import Dict, List, Any, Optional, Tuple
+from pathlib import Path
+import numpy as np
+import networkx as nx
+import structlog
+
+logger = structlog.get_logger()
+
+WALK_SPEED = 80.0 / 60  # metres per second
+MAX_WALK_METRES = 800.0
+TRANSFER_METRES = 300.0
+INF = np.inf
+
+
+def distance_matrix(lat_a: np.ndarray, lon_a: np.ndarray, lat_b: np.ndarray, lon_b: np.ndarray) -> np.ndarray:
+    """Equirectangular distances in metres between every point of a and every point of b"""
+    scale = np.cos(np.radians((np.mean(lat_a) + np.mean(lat_b)) / 2 if len(lat_a) and len(lat_b) else 0.0))
+    dx = (lon_a[:, None] - lon_b[None, :]) * 111_320 * scale
+    dy = (lat_a[:, None] - lat_b[None, :]) * 110_540
+    return np.hypot(dx, dy)
+
+
+class Timetable:
+    """Stops, stop patterns and their trips as compact arrays.
+
+    A pattern is a GTFS route's exact stop sequence; its trips are stored as
+    ``(trips, stops)`` arrival and departure blocks in seconds after midnight,
+    sorted by departure. Frequency changes replace a pattern's blocks only.
+    """
+
+    def __init__(
+        self,
+        stop_ids: List[str],
+        stop_lat: np.ndarray,
+        stop_lon: np.ndarray,
+        pattern_routes: List[str],
+        pattern_stops: List[np.ndarray],
+        arrivals: List[np.ndarray],
+        departures: List[np.ndarray],
+        transfer_seconds: Optional[Dict[int, List[Tuple[int, float]]]] = None
+    ):
+        self.stop_ids = list(stop_ids)
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        self.stop_lat = np.asarray(stop_lat, dtype=float)
+        self.stop_lon = np.asarray(stop_lon, dtype=float)
+        self.pattern_routes = list(pattern_routes)
+        self.pattern_stops = [np.asarray(stops, dtype=np.int64) for stops in pattern_stops]
+        self.arrivals = [np.asarray(block, dtype=float) for block in arrivals]
+        self.departures = [np.asarray(block, dtype=float) for block in departures]
+        # Original trips, the base for regenerated timetables
+        self._base = list(zip(self.arrivals, self.departures))
+
+        # stop -> (pattern, position) pairs
+        self.stop_patterns: List[List[Tuple[int, int]]] = [[] for _ in self.stop_ids]
+        for pattern, stops in enumerate(self.pattern_stops):
+            for position, stop in enumerate(stops):
+                self.stop_patterns[stop].append((pattern, position))
+
+        self.route_patterns: Dict[str, List[int]] = {}
+        for pattern, route_id in enumerate(self.pattern_routes):
+            self.route_patterns.setdefault(route_id, []).append(pattern)
+
+        self.transfers = transfer_seconds if transfer_seconds is not None else self._walking_transfers()
+
+    @property
+    def trips(self) -> int:
+        return sum(len(block) for block in self.departures)
+
+    def _walking_transfers(self) -> Dict[int, List[Tuple[int, float]]]:
+        """Footpaths between stops within TRANSFER_METRES, computed in chunks"""
+        transfers: Dict[int, List[Tuple[int, float]]] = {}
+        chunk = 1024
+        for start in range(0, len(self.stop_ids), chunk):
+            rows = slice(start, start + chunk)
+            distances = distance_matrix(self.stop_lat[rows], self.stop_lon[rows], self.stop_lat, self.stop_lon)
+            for i, j in zip(*np.nonzero(distances <= TRANSFER_METRES)):
+                if start + i != j:
+                    transfers.setdefault(start + i, []).append((int(j), float(distances[i, j] / WALK_SPEED)))
+        return transfers
+
+    def headway_minutes(self, route_id: str) -> Optional[float]:
+        """Median headway at the first stop over the route's patterns"""
+        gaps = [np.diff(self.departures[p][:, 0]) for p in self.route_patterns.get(route_id, [])]
+        gaps = np.concatenate(gaps) if gaps else np.array([])
+        gaps = gaps[gaps > 0]
+        return float(np.median(gaps) / 60) if len(gaps) else None
+
+    def set_headway(self, route_id: str, minutes: float) -> int:
+        """Regenerate the route's trips at a fixed headway over its original service span.
+
+        Each new trip copies the running times of the original trip departing
+        closest to it, so time-of-day variation is kept. Returns the number of
+        patterns regenerated.
+        """
+        patterns = self.route_patterns.get(route_id, [])
+        for pattern in patterns:
+            base_arrivals, base_departures = self._base[pattern]
+            first = base_departures[:, 0]
+            starts = np.arange(first.min(), first.max() + 1, max(minutes, 1.0) * 60)
+            nearest = np.abs(first[None, :] - starts[:, None]).argmin(axis=1)
+            shift = (starts - first[nearest])[:, None]
+            self.arrivals[pattern] = base_arrivals[nearest] + shift
+            self.departures[pattern] = base_departures[nearest] + shift
+        return len(patterns)
+
+    def save(self, path: Path):
+        """Store as flat arrays plus offsets"""
+        stop_offsets = np.cumsum([0] + [len(stops) for stops in self.pattern_stops])
+        trip_counts = np.array([len(block) for block in self.departures], dtype=np.int64)
+        sources = [source for source, targets in self.transfers.items() for _ in targets]
+        targets = [(target, seconds) for source in self.transfers for target, seconds in self.transfers[source]]
+        np.savez_compressed(
+            path,
+            stop_ids=np.array(self.stop_ids, dtype=str),
+            stop_lat=self.stop_lat,
+            stop_lon=self.stop_lon,
+            pattern_routes=np.array(self.pattern_routes, dtype=str),
+            pattern_stop_offsets=stop_offsets,
+            pattern_stops=np.concatenate(self.pattern_stops) if self.pattern_stops else np.array([], dtype=np.int64),
+            trip_counts=trip_counts,
+            arrivals=np.concatenate([block.ravel() for block in self.arrivals]) if self.arrivals else np.array([]),
+            departures=np.concatenate([block.ravel() for block in self.departures]) if self.departures else np.array([]),
+            transfer_sources=np.array(sources, dtype=np.int64),
+            transfer_targets=np.array([t for t, _ in targets], dtype=np.int64),
+            transfer_seconds=np.array([s for _, s in targets], dtype=float)
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "Timetable":
+        data = np.load(path)
+        offsets = data["pattern_stop_offsets"]
+        pattern_stops = [data["pattern_stops"][offsets[p]:offsets[p + 1]] for p in range(len(offsets) - 1)]
+        arrivals, departures = [], []
+        position = 0
+        for stops, trips in zip(pattern_stops, data["trip_counts"]):
+            size = int(trips) * len(stops)
+            arrivals.append(data["arrivals"][position:position + size].reshape(int(trips), len(stops)))
+            departures.append(data["departures"][position:position + size].reshape(int(trips), len(stops)))
+            position += size
+        transfers: Dict[int, List[Tuple[int, float]]] = {}
+        for source, target, seconds in zip(data["transfer_sources"], data["transfer_targets"], data["transfer_seconds"]):
+            transfers.setdefault(int(source), []).append((int(target), float(seconds)))
+        return cls(
+            data["stop_ids"].tolist(),
+            data["stop_lat"],
+            data["stop_lon"],
+            data["pattern_routes"].tolist(),
+            pattern_stops,
+            arrivals,
+            departures,
+            transfers
+        )
+
+
+def earliest_arrivals(timetable: Timetable, access: np.ndarray, max_rounds: int = 4, min_transfer_seconds: float = 60.0) -> np.ndarray:
+    """RAPTOR from many origins at once.
+
+    ``access`` holds, per origin row, the time each stop is reached on foot
+    (inf if not). Returns the earliest arrival at every stop with up to
+    ``max_rounds`` vehicle legs; route scans are vectorized across origins.
+    """
+    best = access.astype(float).copy()
+    marked = best.copy()  # labels improved in the previous round, boarding candidates
+    for round_index in range(max_rounds):
+        marked_stops = np.flatnonzero(np.isfinite(marked).any(axis=0))
+        if not len(marked_stops):
+            break
+        # Scan each pattern from its earliest marked stop
+        scan: Dict[int, int] = {}
+        for stop in marked_stops:
+            for pattern, position in timetable.stop_patterns[stop]:
+                if position < scan.get(pattern, len(timetable.pattern_stops[pattern])):
+                    scan[pattern] = position
+        # Boarding after a vehicle leg needs time to transfer
+        slack = min_transfer_seconds if round_index else 0.0
+        improved = np.full_like(best, INF)
+        for pattern, start in scan.items():
+            stops = timetable.pattern_stops[pattern]
+            arrivals, departures = timetable.arrivals[pattern], timetable.departures[pattern]
+            if not len(departures):
+                continue
+            trip = np.full(best.shape[0], -1)
+            for position in range(start, len(stops)):
+                stop = stops[position]
+                riding = trip >= 0
+                if riding.any():
+                    arrival = np.where(riding, arrivals[np.maximum(trip, 0), position], INF)
+                    better = arrival < best[:, stop]
+                    if better.any():
+                        best[better, stop] = arrival[better]
+                        improved[better, stop] = arrival[better]
+                label = marked[:, stop]
+                boardable = np.isfinite(label)
+                if boardable.any():
+                    candidate = np.searchsorted(departures[:, position], label + slack, side="left")
+                    catch = boardable & (candidate < len(departures)) & ((trip < 0) | (candidate < trip))
+                    trip = np.where(catch, candidate, trip)
+        # Footpaths from stops reached in this round
+        for stop in np.flatnonzero(np.isfinite(improved).any(axis=0)):
+            for target, seconds in timetable.transfers.get(int(stop), []):
+                walked = improved[:, stop] + seconds
+                better = walked < best[:, target]
+                if better.any():
+                    best[better, target] = walked[better]
+                    improved[better, target] = np.minimum(improved[better, target], walked[better])
+        marked = improved
+    return best
+
+
+def timetable_path(config: Dict[str, Any]) -> Path:
+    """Timetable file named by a run's ``transit`` config"""
+    if config.get("timetable_path"):
+        return Path(config["timetable_path"])
+    if config.get("gtfs_city_data_id") is None:
+        raise ValueError("Transit needs a timetable_path or gtfs_city_data_id")
+    from app.core.config import settings
+    return settings.PROCESSED_DATA_DIR / "gtfs" / f"{config['gtfs_city_data_id']}.npz"
+
+
+class TransitModel:
+    """GTFS timetable on the city graph: bulk resident transit commutes and operator headway changes"""
+
+    def __init__(self, timetable: Timetable, graph: nx.Graph, every: int = 60, max_rounds: int = 4, max_walk_metres: float = MAX_WALK_METRES):
+        self.timetable = timetable
+        self.every = every
+        self.max_rounds = max_rounds
+        self.max_walk_metres = max_walk_metres
+        nodes = [node for node, attrs in graph.nodes(data=True) if "x" in attrs and "y" in attrs]
+        self.node_index = {node: i for i, node in enumerate(nodes)}
+        self.node_lat = np.array([graph.nodes[node]["y"] for node in nodes], dtype=float)
+        self.node_lon = np.array([graph.nodes[node]["x"] for node in nodes], dtype=float)
+        self._walk: Dict[Any, Tuple[np.ndarray, np.ndarray]] = {}  # node -> (stops, walk seconds)
+        self.updates = 0
+        self.regenerated_patterns = 0
+        logger.info("Transit timetable loaded", stops=len(timetable.stop_ids), patterns=len(timetable.pattern_stops), trips=timetable.trips)
+
+    @classmethod
+    def from_config(cls, graph: nx.Graph, config: Dict[str, Any]) -> "TransitModel":
+        """Transit model from a run's ``transit`` config (``timetable_path`` or ``gtfs_city_data_id``)"""
+        return cls(
+            Timetable.load(timetable_path(config)),
+            graph,
+            every=config.get("every", 60),
+            max_rounds=config.get("max_rounds", 4),
+            max_walk_metres=config.get("max_walk_metres", MAX_WALK_METRES)
+        )
+
+    def due(self, tick: int) -> bool:
+        return tick % self.every == 0
+
+    def routes(self) -> Dict[str, Optional[float]]:
+        """Route ids with their current headway in minutes"""
+        return {route_id: self.timetable.headway_minutes(route_id) for route_id in self.timetable.route_patterns}
+
+    def set_headway(self, route_id: str, minutes: float):
+        self.regenerated_patterns += self.timetable.set_headway(route_id, minutes)
+
+    def _walkable_stops(self, node: Any) -> Tuple[np.ndarray, np.ndarray]:
+        if node not in self._walk:
+            if node not in self.node_index:
+                self._walk[node] = (np.array([], dtype=np.int64), np.array([]))
+            else:
+                i = self.node_index[node]
+                distances = distance_matrix(self.node_lat[i:i + 1], self.node_lon[i:i + 1], self.timetable.stop_lat, self.timetable.stop_lon)[0]
+                stops = np.flatnonzero(distances <= self.max_walk_metres)
+                self._walk[node] = (stops, distances[stops] / WALK_SPEED)
+        return self._walk[node]
+
+    def commute_minutes(self, trips: List[Tuple[Any, Any]], depart_seconds: float) -> List[Optional[float]]:
+        """Door-to-door transit minutes for (origin node, destination node) trips leaving at ``depart_seconds``"""
+        origins = sorted({origin for origin, _ in trips}, key=str)
+        row_of = {origin: row for row, origin in enumerate(origins)}
+        access = np.full((len(origins), len(self.timetable.stop_ids)), INF)
+        for origin, row in row_of.items():
+            stops, seconds = self._walkable_stops(origin)
+            access[row, stops] = depart_seconds + seconds
+        arrivals = earliest_arrivals(self.timetable, access, max_rounds=self.max_rounds)
+
+        minutes = []
+        for origin, destination in trips:
+            stops, seconds = self._walkable_stops(destination)
+            if not len(stops):
+                minutes.append(None)
+                continue
+            arrival = (arrivals[row_of[origin], stops] + seconds).min()
+            minutes.append(round(float(arrival - depart_seconds) / 60, 1) if np.isfinite(arrival) else None)
+        return minutes
+
+    def update(self, residents: List[Any], depart_seconds: float):
+        """Transit time of every resident's next commute, computed in one RAPTOR pass"""
+        trips, travellers = [], []
+        for agent in residents:
+            origin = agent.state.get("current_location")
+            home, work = agent.state.get("home_location"), agent.state.get("work_location")
+            destination = work if agent.state.get("current_activity") == "home" else home
+            if origin is not None and destination is not None and origin != destination:
+                trips.append((origin, destination))
+                travellers.append(agent)
+        if not trips:
+            return
+        for agent, minutes in zip(travellers, self.commute_minutes(trips, depart_seconds)):
+            agent.state["transit_commute_minutes"] = minutes
+        self.updates += 1
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "stops": len(self.timetable.stop_ids),
+            "patterns": len(self.timetable.pattern_stops),
+            "trips": self.timetable.trips,
+            "updates": self.updates,
+            "regenerated_patterns": self.regenerated_patterns
+        }
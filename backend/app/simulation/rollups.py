@@ -0,0 +1,213 @@
+"""
+KPI rollups - per-tick samples of KPIs and city state rolled up per hour and day, with LTTB downsampling
+"""
+from typing import Dict, List, Any, Optional, Tuple
+import math
+import numpy as np
+
+from app.agents.surrogate import TRAFFIC_LEVELS
+from app.simulation.convergence import kpi_value
+from app.simulation.kpis import MINUTES_PER_HOUR, MINUTES_PER_DAY
+
+RESOLUTIONS = {"minute": 1, "hour": MINUTES_PER_HOUR, "day": MINUTES_PER_DAY}
+# Ticks per stored row; minute samples are split per simulated day so range reads load only the days they cover
+CHUNK_MINUTES = {"minute": MINUTES_PER_DAY}
+# Most chunks one series request reads; wider ranges are served from an aggregated resolution
+MAX_CHUNKS = {"minute": 14}
+# City state entries sampled alongside the orchestrator's KPIs; KPIs themselves come only from the current window
+CITY_STATE_KEYS = ("transit_ridership", "traffic_level")
+
+
+def sample_values(city_state: Dict[str, Any], window_kpis: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+    """Numeric KPI and city state values at one point in time; per-route dicts are summed.
+
+    KPIs are the current window's (as in ``city_state["metrics"]``), never
+    run-to-date totals, so every resolution aggregates comparable samples.
+    """
+    values: Dict[str, float] = {}
+    for key in CITY_STATE_KEYS:
+        value = city_state.get(key)
+        if key == "traffic_level" and isinstance(value, str):
+            value = TRAFFIC_LEVELS.get(value)
+        value = kpi_value(value)
+        if value is not None:
+            values[key] = value
+    for key, value in {**(city_state.get("metrics") or {}), **(window_kpis or {})}.items():
+        value = kpi_value(value)
+        if value is not None:
+            values[key] = value
+    return values
+
+
+class TimeSeriesRecorder:
+    """Samples recorded as they are produced, as columns aligned with ``ticks``"""
+
+    def __init__(self):
+        self.ticks: List[int] = []
+        self.columns: Dict[str, List[float]] = {}
+
+    def record(self, tick: int, values: Dict[str, float]):
+        count = len(self.ticks)
+        self.ticks.append(int(tick))
+        for name, value in values.items():
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = [math.nan] * count
+            column.append(value)
+        for name, column in self.columns.items():
+            if len(column) == count:
+                column.append(math.nan)
+
+    def rollups(self) -> Dict[str, Dict[str, Any]]:
+        """Series per resolution: raw samples, then mean/min/max per hour and per day"""
+        ticks = np.asarray(self.ticks, dtype=np.int64)
+        columns = {name: np.asarray(column, dtype=float) for name, column in self.columns.items()}
+        result = {"minute": {"ticks": self.ticks, "series": {name: _rounded(v) for name, v in columns.items()}}}
+        for resolution in ("hour", "day"):
+            result[resolution] = rollup(ticks, columns, RESOLUTIONS[resolution])
+        return result
+
+
+def rollup(ticks: np.ndarray, columns: Dict[str, np.ndarray], minutes: int) -> Dict[str, Any]:
+    """Mean, min and max of each column per ``minutes``-long bucket; buckets are keyed by their first tick"""
+    if not len(ticks):
+        return {"ticks": [], "series": {}, "min": {}, "max": {}}
+    buckets, inverse = np.unique(ticks // minutes, return_inverse=True)
+    series, lows, highs = {}, {}, {}
+    for name, values in columns.items():
+        present = ~np.isnan(values)
+        counts = np.bincount(inverse[present], minlength=len(buckets))
+        sums = np.bincount(inverse[present], weights=values[present], minlength=len(buckets))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            series[name] = _rounded(np.where(counts > 0, sums / np.maximum(counts, 1), np.nan))
+        low = np.full(len(buckets), np.inf)
+        high = np.full(len(buckets), -np.inf)
+        np.minimum.at(low, inverse[present], values[present])
+        np.maximum.at(high, inverse[present], values[present])
+        lows[name] = _rounded(np.where(counts > 0, low, np.nan))
+        highs[name] = _rounded(np.where(counts > 0, high, np.nan))
+    return {"ticks": (buckets * minutes).tolist(), "series": series, "min": lows, "max": highs}
+
+
+def chunks(resolution: str, rollup: Dict[str, Any]) -> List[Tuple[int, Dict[str, Any]]]:
+    """Rows to store for one resolution as (chunk, rollup part); resolutions without a chunk size are one row"""
+    minutes = CHUNK_MINUTES.get(resolution)
+    if minutes is None or not rollup["ticks"]:
+        return [(0, rollup)]
+    ticks = np.asarray(rollup["ticks"], dtype=np.int64)
+    keys, starts = np.unique(ticks // minutes, return_index=True)
+    bounds = list(starts) + [len(ticks)]
+    parts = []
+    for chunk, start, end in zip(keys.tolist(), bounds[:-1], bounds[1:]):
+        part = {"ticks": rollup["ticks"][start:end]}
+        for field in ("series", "min", "max"):
+            if field in rollup:
+                part[field] = {name: values[start:end] for name, values in rollup[field].items()}
+        parts.append((chunk, part))
+    return parts
+
+
+def chunk_range(resolution: str, tick_start: Optional[int], tick_end: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+    """First and last chunk of ``resolution`` overlapping the tick range; None for an open end"""
+    minutes = CHUNK_MINUTES.get(resolution)
+    if minutes is None:
+        return None, None
+    return (
+        tick_start // minutes if tick_start is not None else None,
+        tick_end // minutes if tick_end is not None else None
+    )
+
+
+def _rounded(values: np.ndarray) -> List[Optional[float]]:
+    return [None if math.isnan(v) else round(v, 4) for v in values.tolist()]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of ``points`` samples chosen by Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last samples and, per bucket in between, the one
+    forming the largest triangle with the previously kept sample and the
+    next bucket's average, which preserves peaks and troughs.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n) if points >= n else np.linspace(0, n - 1, max(points, 1)).astype(int)
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    previous = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    selected[-1] = n - 1
+    return selected
+
+
+def downsample_indices(
+    ticks: List[int],
+    values: List[Optional[float]],
+    points: int,
+    tick_start: Optional[int] = None,
+    tick_end: Optional[int] = None
+) -> np.ndarray:
+    """Positions in ``ticks`` of at most ``points`` samples within the tick range, missing values dropped"""
+    x = np.asarray(ticks, dtype=float)
+    y = np.asarray([math.nan if v is None else v for v in values], dtype=float)
+    keep = ~np.isnan(y)
+    if tick_start is not None:
+        keep &= x >= tick_start
+    if tick_end is not None:
+        keep &= x <= tick_end
+    positions = np.flatnonzero(keep)
+    return positions[lttb(x[positions], y[positions], points)]
+
+
+def downsample(
+    ticks: List[int],
+    values: List[Optional[float]],
+    points: int,
+    tick_start: Optional[int] = None,
+    tick_end: Optional[int] = None
+) -> Tuple[List[int], List[float]]:
+    """At most ``points`` (tick, value) pairs of a series within the tick range, missing values dropped"""
+    chosen = downsample_indices(ticks, values, points, tick_start, tick_end).tolist()
+    return [int(ticks[i]) for i in chosen], [float(values[i]) for i in chosen]
+
+
+def pick_resolution(
+    rollups: Dict[str, List[int]],
+    points: int,
+    tick_start: Optional[int],
+    tick_end: Optional[int],
+    chunks_in_range: Optional[Dict[str, int]] = None
+) -> str:
+    """Coarsest stored resolution that still has ``points`` samples in the range, else the finest.
+
+    The minute ticks need not be given: minute is the fallback whenever it is
+    stored, unless ``chunks_in_range`` shows the range covers more than its
+    MAX_CHUNKS, in which case the finest aggregated resolution is used.
+    """
+    for resolution in ("day", "hour", "minute"):
+        ticks = np.asarray(rollups.get(resolution, []))
+        if not len(ticks):
+            continue
+        in_range = np.ones(len(ticks), dtype=bool)
+        if tick_start is not None:
+            in_range &= ticks >= tick_start
+        if tick_end is not None:
+            in_range &= ticks <= tick_end
+        if in_range.sum() >= points:
+            return resolution
+    if "minute" in rollups and (chunks_in_range or {}).get("minute", 0) > MAX_CHUNKS["minute"]:
+        coarser = [resolution for resolution in ("hour", "day") if len(rollups.get(resolution, []))]
+        if coarser:
+            return coarser[0]
+    return "minute" if "minute" in rollups else next(iter(rollups), "minute")
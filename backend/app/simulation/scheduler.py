@@ -0,0 +1,120 @@
+"""
+Staged activation scheduler - agents perceive, decide and apply in explicit phases
+"""
+from typing import Dict, List, Any, Optional, Protocol
+import time
+import structlog
+
+from app.agents.base import BaseAgent
+from app.core.metrics import RunProfiler
+from app.core.rng import ACTIVATION, AGENT, stream_key, python_random
+
+logger = structlog.get_logger()
+
+
+class Decider(Protocol):
+    """Decides for several agents at once (archetypes, surrogate); agents it leaves out reason individually"""
+
+    def decide(self, agents: List[BaseAgent], perceptions: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        ...
+
+
+class StagedScheduler:
+    """Agents partitioned by type and stepped with simultaneous semantics.
+
+    Every step runs three phases over the active agents: all perceive the same
+    environment state, then decide (batch deciders first, then per-agent
+    reasoning), then apply their decisions. No agent sees another agent's
+    decision of the same step. Agents are activated bucket by bucket in the
+    order their types were first added, in insertion order within a bucket,
+    or in a seeded random order when ``shuffle`` is set. Each agent gets the
+    step's random stream for its agent id and tick, so draws do not depend on
+    activation order or on the process that steps the agent.
+    """
+
+    def __init__(self, seed: Optional[int] = None, shuffle: bool = False):
+        self.buckets: Dict[str, Dict[str, BaseAgent]] = {}
+        self.shuffle = shuffle
+        self.seed = seed
+        self.steps = 0
+        self.time = 0
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def add(self, agent: BaseAgent):
+        self.buckets.setdefault(agent.agent_type, {})[agent.agent_id] = agent
+
+    def remove(self, agent: BaseAgent):
+        self.buckets.get(agent.agent_type, {}).pop(agent.agent_id, None)
+
+    def of_type(self, agent_type: str) -> List[BaseAgent]:
+        return list(self.buckets.get(agent_type, {}).values())
+
+    def activation_order(self, agents: Optional[List[BaseAgent]] = None, tick: Optional[int] = None) -> List[BaseAgent]:
+        """All agents bucket by bucket, or the given ones; shuffled with the tick's stream when enabled"""
+        if agents is None:
+            agents = [agent for bucket in self.buckets.values() for agent in bucket.values()]
+        else:
+            agents = list(agents)
+        if self.shuffle:
+            python_random(stream_key(self.seed, ACTIVATION, self.steps if tick is None else tick)).shuffle(agents)
+        return agents
+
+    def step(
+        self,
+        environment_state: Dict[str, Any],
+        profiler: RunProfiler,
+        agents: Optional[List[BaseAgent]] = None,
+        deciders: Optional[Dict[str, Decider]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Perceive, decide and apply for all agents or only ``agents``; returns their actions.
+
+        ``deciders`` are consulted in order, each for the agents still undecided.
+        """
+        tick = (environment_state.get("timestamp") or {}).get("tick", self.steps)
+        ordered = self.activation_order(agents, tick)
+        for agent in ordered:
+            agent.rng_key = stream_key(self.seed, AGENT, agent.agent_id, tick)
+
+        with profiler.phase("agents.perceive"):
+            perceptions = {agent.agent_id: agent.perceive(environment_state) for agent in ordered}
+
+        decisions: Dict[str, Optional[Dict[str, Any]]] = {}
+        with profiler.phase("agents.decide"):
+            for name, decider in (deciders or {}).items():
+                pending = [agent for agent in ordered if agent.agent_id not in decisions]
+                with profiler.phase(f"agents.{name}"):
+                    decisions.update(decider.decide(pending, perceptions))
+            for agent in ordered:
+                if agent.agent_id in decisions:
+                    continue
+                start = time.perf_counter()
+                try:
+                    # TODO: Retrieve relevant docs via RAG
+                    retrieved_docs = []
+                    decisions[agent.agent_id] = agent.reason(perceptions[agent.agent_id], retrieved_docs)
+                    source = decisions[agent.agent_id].get("source")
+                except Exception as e:
+                    logger.error("Agent reasoning failed", agent_id=agent.agent_id, error=str(e))
+                    decisions[agent.agent_id] = None
+                    source = "error"
+                profiler.observe_agent(agent.agent_type, source, time.perf_counter() - start)
+
+        agent_actions = {}
+        with profiler.phase("agents.apply"):
+            for agent in ordered:
+                reasoning = decisions.get(agent.agent_id)
+                if reasoning is None:
+                    agent_actions[agent.agent_id] = {"action_type": "error", "action_data": {}}
+                    continue
+                try:
+                    agent_actions[agent.agent_id] = agent.commit(perceptions[agent.agent_id], reasoning)
+                except Exception as e:
+                    logger.error("Agent step failed", agent_id=agent.agent_id, error=str(e))
+                    agent_actions[agent.agent_id] = {"action_type": "error", "action_data": {}}
+        return agent_actions
+
+    def advance(self, ticks: int = 1):
+        self.steps += ticks
+        self.time += ticks
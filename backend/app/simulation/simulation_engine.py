@@ -1,15 +1,21 @@
 """
 Simulation engine that orchestrates runs and manages state
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import time
 import structlog
 from datetime import datetime, timedelta
 
 from app.simulation.city_model import CityModel
-from app.core.database import SessionLocal
+from app.simulation.summary import build_summary
+from app.simulation.persistence import add_agent_actions
+from app.simulation.rollups import chunks
+from app.core.database import SessionLocal, measure_json_size
 from app.models.scenario import ScenarioRun
-from app.models.simulation import SimulationState, SimulationMetrics
-from app.models.agent import Agent, AgentAction
+from app.models.simulation import SimulationState, SimulationMetrics, SimulationRollup, RunSummary
+from app.core.tracing import tracer, sampled, tick_sampled
+from app.core.progress import ProgressPublisher
+from app.core.cache import response_cache, run_scope
 
 logger = structlog.get_logger()
 
@@ -22,25 +28,40 @@ class SimulationEngine:
         self.db = SessionLocal()
         self.model: Optional[CityModel] = None
     
-    def initialize(self, scenario_config: Dict, city_data: Dict, agents_config: List[Dict], seed: Optional[int] = None):
+    def initialize(
+        self,
+        scenario_config: Dict,
+        city_data: Dict,
+        agents_config: List[Dict],
+        seed: Optional[int] = None,
+        run_config: Optional[Dict] = None
+    ):
         """Initialize simulation model"""
         try:
             self.model = CityModel(
                 city_data=city_data,
                 scenario_config=scenario_config,
                 agents_config=agents_config,
-                seed=seed
+                seed=seed,
+                run_config=run_config
             )
+            if self.model.distributed:
+                # Region workers keep their residents' memory, so they persist those actions themselves
+                self.model.distributed.persist_actions()
             
             # Update run status
             run = self.db.query(ScenarioRun).filter(ScenarioRun.id == self.run_id).first()
             if run:
                 run.status = "running"
                 self.db.commit()
+                response_cache.invalidate(run_scope(self.run_id))
             
             logger.info("Simulation initialized", run_id=self.run_id)
         except Exception as e:
             logger.error("Simulation initialization failed", error=str(e), run_id=self.run_id)
+            if self.model:
+                # Worker pools and region workers must not outlive a failed start
+                self.model.close()
             raise
     
     def run(self, simulation_days: int = 7):
@@ -55,42 +76,88 @@ class SimulationEngine:
         
         # Initialize simulation time
         self.model.simulation_time = datetime.now().replace(hour=6, minute=0, second=0)
+        progress = ProgressPublisher(self.run_id)
         
         try:
-            for tick in range(total_ticks):
-                # Execute simulation step
-                self.model.step()
+            with tracer.start_as_current_span("simulation.run", attributes={"run_id": self.run_id, "ticks": total_ticks}):
+                termination = {"reason": "max_ticks", "ticks": total_ticks, "planned_ticks": total_ticks}
+                # Event-driven runs advance a whole sampling window per iteration
+                step = self.model.event_window if self.model.events is not None else 1
+                for tick in range(0, total_ticks, step):
+                    end = min(tick + step, total_ticks)
+                    # Only every Nth tick is traced so long runs stay within collector limits
+                    with sampled(tick_sampled(tick)), tracer.start_as_current_span("simulation.tick", attributes={"tick": tick}):
+                        if self.model.events is not None:
+                            self._run_window(tick, end)
+                        else:
+                            self._run_tick(tick)
+                    progress.publish_tick(end - 1, total_ticks, self.model.city_state.get("metrics", {}), self.model.simulation_time)
+                    
+                    if self.model.convergence and self.model.convergence.converged:
+                        termination = {"reason": "steady_state", "ticks": end, "planned_ticks": total_ticks}
+                        logger.info("Stopping at steady state", run_id=self.run_id, tick=tick, total_ticks=total_ticks)
+                        break
                 
-                # Update simulation time
-                self.model.simulation_time += timedelta(minutes=1)
-                
-                # Save state snapshot periodically (every hour)
-                if tick % 60 == 0:
-                    self._save_state_snapshot()
-                
-                # Save agent actions
-                self._save_agent_actions(tick)
-            
-            # Calculate and save final metrics
-            self._save_final_metrics()
+                # Calculate and save final metrics
+                final_metrics = self._save_final_metrics()
+                self._save_rollups()
             
             # Update run status
             run = self.db.query(ScenarioRun).filter(ScenarioRun.id == self.run_id).first()
             if run:
                 run.status = "completed"
                 run.end_time = datetime.now()
+                run.metrics = {**(run.metrics or {}), **self.model.get_run_stats(), "termination": termination}
+                self._add_summary(run, final_metrics, termination["ticks"])
                 self.db.commit()
+                response_cache.invalidate(run_scope(self.run_id))
+            progress.publish_status("completed")
             
             logger.info("Simulation completed", run_id=self.run_id)
             
         except Exception as e:
             logger.error("Simulation failed", error=str(e), run_id=self.run_id)
+            progress.publish_status("failed", error=str(e))
             run = self.db.query(ScenarioRun).filter(ScenarioRun.id == self.run_id).first()
             if run:
                 run.status = "failed"
                 run.error_message = str(e)
                 self.db.commit()
+                response_cache.invalidate(run_scope(self.run_id))
             raise
+        finally:
+            # Worker pools must not outlive the run
+            self.model.close()
+    
+    def _run_tick(self, tick: int):
+        """Step the model and persist the tick's results"""
+        # Execute simulation step
+        self.model.step()
+        
+        # Update simulation time
+        self.model.simulation_time += timedelta(minutes=1)
+        
+        # Save state snapshot periodically (every hour)
+        if tick % 60 == 0:
+            with self.model.profiler.phase("snapshot"), tracer.start_as_current_span("db.save_snapshot"):
+                self._save_state_snapshot()
+        
+        # Save agent actions
+        with self.model.profiler.phase("save_actions"), tracer.start_as_current_span("db.save_agent_actions"):
+            self._save_agent_actions(tick)
+    
+    def _run_window(self, start: int, end: int):
+        """Process the events of minutes [start, end) and persist the decisions made"""
+        self.model.advance_to(end)
+        self.model.simulation_time += timedelta(minutes=end - start)
+        
+        # Snapshot once per hour, like the tick loop
+        if start % 60 == 0 or start // 60 != (end - 1) // 60:
+            with self.model.profiler.phase("snapshot"), tracer.start_as_current_span("db.save_snapshot"):
+                self._save_state_snapshot()
+        
+        with self.model.profiler.phase("save_actions"), tracer.start_as_current_span("db.save_agent_actions"):
+            self._persist_actions(self.model.drain_actions())
     
     def _save_state_snapshot(self):
         """Save simulation state snapshot to database"""
@@ -109,7 +176,13 @@ class SimulationEngine:
         )
         
         self.db.add(db_state)
-        self.db.commit()
+        start = time.perf_counter()
+        # Size what the commit actually serializes rather than encoding the snapshot twice
+        with measure_json_size() as sizes:
+            self.db.commit()
+        self.model.profiler.observe_db("snapshot", time.perf_counter() - start, rows=1)
+        if sizes:
+            self.model.profiler.observe_snapshot(sum(sizes))
     
     def _save_agent_actions(self, tick: int):
         """Save agent actions to database"""
@@ -117,69 +190,90 @@ class SimulationEngine:
             return
         
         # Get actions from agents' memory
-        for agent_id, agent in self.model.agents.items():
-            if agent.memory:
-                latest_memory = agent.memory[-1]
-                action = latest_memory.get("action", {})
-                
-                # Find or create agent in DB
-                db_agent = self.db.query(Agent).filter(Agent.id == int(agent_id.split("_")[-1])).first()
-                if not db_agent:
-                    # Create agent if doesn't exist
-                    from app.models.agent import AgentType
-                    agent_type_map = {
-                        "resident": AgentType.RESIDENT,
-                        "transit_operator": AgentType.TRANSIT_OPERATOR,
-                        "planner": AgentType.PLANNER,
-                        "orchestrator": AgentType.ORCHESTRATOR
-                    }
-                    db_agent = Agent(
-                        id=int(agent_id.split("_")[-1]) if agent_id.split("_")[-1].isdigit() else None,
-                        agent_type=agent_type_map.get(agent.agent_type, AgentType.RESIDENT),
-                        name=agent_id,
-                        persona_config=agent.persona_config,
-                        state=agent.state
-                    )
-                    self.db.add(db_agent)
-                    self.db.flush()
-                
-                # Save action
-                db_action = AgentAction(
-                    agent_id=db_agent.id,
-                    simulation_tick=tick,
-                    action_type=action.get("action_type", "unknown"),
-                    action_data=action.get("action_data", {}),
-                    rationale=action.get("rationale", ""),
-                    retrieved_docs=latest_memory.get("reasoning", {}).get("retrieved_docs"),
-                    prompt_used=latest_memory.get("reasoning", {}).get("prompt_used"),
-                    confidence_score=action.get("confidence", 0.5)
-                )
-                self.db.add(db_action)
+        self._persist_actions([
+            (tick, agent, agent.memory[-1]) for agent in self.model.agents.values() if agent.memory
+        ])
+    
+    def _persist_actions(self, entries: List[Tuple[int, Any, Dict[str, Any]]]):
+        """Save (tick, agent, memory entry) decisions to database"""
+        rows = add_agent_actions(self.db, entries)
         
+        start = time.perf_counter()
         self.db.commit()
+        self.model.profiler.observe_db("agent_actions", time.perf_counter() - start, rows=rows)
     
     def _save_final_metrics(self):
         """Calculate and save final simulation metrics"""
         if not self.model:
             return
         
-        metrics = self.model.city_state.get("metrics", {})
+        # City state holds the last window's KPIs; the stored run metrics are totals from the streaming accumulators
+        kpis = self.model.kpis
+        totals = kpis.snapshot()
+        metrics = {**self.model.city_state.get("metrics", {}), **{key: value for key, value in totals.items() if value is not None}}
         
         db_metrics = SimulationMetrics(
             run_id=self.run_id,
             avg_commute_time=metrics.get("avg_commute_time"),
             commute_time_change_pct=metrics.get("commute_time_change_pct"),
             transit_modal_share=metrics.get("transit_modal_share"),
-            transit_ridership=sum(metrics.get("transit_ridership", {}).values()) if isinstance(metrics.get("transit_ridership"), dict) else metrics.get("transit_ridership", 0),
+            transit_ridership=sum(totals["transit_boardings"].values()),
             emissions_proxy=metrics.get("emissions_proxy"),
             service_coverage=metrics.get("service_coverage"),
             job_access_30min=metrics.get("job_access_30min"),
             equity_index=metrics.get("equity_index"),
-            metrics_json=metrics
+            metrics_json={
+                **metrics,
+                "kpis": kpis.report(),
+                "series": {"hour": kpis.series("hour"), "day": kpis.series("day")}
+            }
         )
         
         self.db.add(db_metrics)
         self.db.commit()
+        return db_metrics
+    
+    def _save_rollups(self):
+        """Save the run's KPI series at minute (one row per day), hour and day resolution for playback"""
+        if not self.model:
+            return
+        
+        for resolution, rollup in self.model.timeseries.rollups().items():
+            for chunk, part in chunks(resolution, rollup):
+                self.db.add(SimulationRollup(
+                    run_id=self.run_id,
+                    resolution=resolution,
+                    chunk=chunk,
+                    ticks=part["ticks"],
+                    series=part["series"],
+                    minimum=part.get("min"),
+                    maximum=part.get("max")
+                ))
+        self.db.commit()
+    
+    def _add_summary(self, run: ScenarioRun, final_metrics: SimulationMetrics, ticks: int):
+        """Materialize the compact summary that run listings and comparisons are served from"""
+        headline = {
+            "avg_commute_time": final_metrics.avg_commute_time,
+            "transit_modal_share": final_metrics.transit_modal_share,
+            "transit_ridership": final_metrics.transit_ridership,
+            "emissions_proxy": final_metrics.emissions_proxy,
+            "service_coverage": final_metrics.service_coverage,
+            "equity_index": final_metrics.equity_index
+        }
+        summary = build_summary(self.model, headline)
+        self.db.add(RunSummary(
+            run_id=run.id,
+            scenario_id=run.scenario_id,
+            sweep_id=run.sweep_id,
+            seed=run.seed,
+            simulation_days=run.simulation_days,
+            ticks=ticks,
+            completed_at=run.end_time,
+            series=summary["series"],
+            groups=summary["groups"],
+            **summary["kpis"]
+        ))
     
     def cleanup(self):
         """Cleanup resources"""
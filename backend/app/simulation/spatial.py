@@ -0,0 +1,137 @@
+"""
+Spatial index over city graph nodes - bulk snapping of lat/lon points to node ids
+"""
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+import networkx as nx
+import numpy as np
+import structlog
+from scipy.spatial import cKDTree
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+METRES_PER_DEGREE = 111320.0
+
+# Indexes loaded by the API process, keyed by path and invalidated when the file changes
+_loaded: Dict[str, Tuple[float, "SpatialIndex"]] = {}
+
+
+def spatial_index_path(city_data_id: int) -> Path:
+    """Where the index of a city data entry is persisted"""
+    return settings.PROCESSED_DATA_DIR / "spatial" / f"{city_data_id}.npz"
+
+
+def is_coordinate(location: Any) -> bool:
+    """Whether a location is a ``{"lat", "lon"}`` point rather than a node id"""
+    return isinstance(location, dict) and "lat" in location and "lon" in location
+
+
+class SpatialIndex:
+    """KD-tree over node coordinates in a local metric projection.
+
+    Nodes are projected equirectangularly around the network's mean latitude,
+    which keeps errors well below a metre at city scale, so nearest-node and
+    radius queries work directly in metres.
+    """
+
+    def __init__(self, node_ids: List[Any], lon: np.ndarray, lat: np.ndarray):
+        self.node_ids = np.empty(len(node_ids), dtype=object)
+        self.node_ids[:] = list(node_ids)
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.origin_lat = float(np.mean(self.lat)) if len(self.lat) else 0.0
+        self.tree = cKDTree(self._project(self.lon, self.lat))
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph) -> Optional["SpatialIndex"]:
+        """Index of the nodes that have ``x``/``y`` coordinates; None when none do"""
+        nodes = [(node, data["x"], data["y"]) for node, data in graph.nodes(data=True) if "x" in data and "y" in data]
+        if not nodes:
+            return None
+        node_ids, lon, lat = zip(*nodes)
+        return cls(list(node_ids), np.array(lon, dtype=float), np.array(lat, dtype=float))
+
+    @classmethod
+    def from_nodes(cls, nodes: List[Dict[str, Any]]) -> Optional["SpatialIndex"]:
+        """Index of processed city data nodes (``{"id", "attributes": {"x", "y"}}``)"""
+        located = [node for node in nodes if "x" in node.get("attributes", {}) and "y" in node.get("attributes", {})]
+        if not located:
+            return None
+        return cls(
+            [node["id"] for node in located],
+            np.array([node["attributes"]["x"] for node in located], dtype=float),
+            np.array([node["attributes"]["y"] for node in located], dtype=float)
+        )
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def _project(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        scale = np.cos(np.radians(self.origin_lat))
+        return np.column_stack([
+            np.asarray(lon, dtype=float) * METRES_PER_DEGREE * scale,
+            np.asarray(lat, dtype=float) * METRES_PER_DEGREE
+        ])
+
+    def nearest(self, lon: np.ndarray, lat: np.ndarray, max_distance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Index of the nearest node and its distance in metres for every point; -1 beyond ``max_distance``"""
+        distance, index = self.tree.query(
+            self._project(lon, lat),
+            distance_upper_bound=np.inf if max_distance is None else max_distance,
+            workers=-1
+        )
+        index = np.where(np.isfinite(distance), index, -1)
+        return index, distance
+
+    def snap(self, lon: np.ndarray, lat: np.ndarray, max_distance: Optional[float] = None) -> List[Any]:
+        """Nearest node id for every point; None beyond ``max_distance``"""
+        index, _ = self.nearest(lon, lat, max_distance)
+        nodes = np.empty(len(index), dtype=object)
+        found = index >= 0
+        nodes[found] = self.node_ids[index[found]]
+        return nodes.tolist()
+
+    def within(self, lon: np.ndarray, lat: np.ndarray, radius: float) -> List[List[Any]]:
+        """Ids of all nodes within ``radius`` metres of every point"""
+        matches = self.tree.query_ball_point(self._project(lon, lat), r=radius, workers=-1)
+        return [self.node_ids[np.asarray(match, dtype=np.int64)].tolist() for match in matches]
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, node_ids=np.asarray([str(node) for node in self.node_ids]), lon=self.lon, lat=self.lat)
+
+    @classmethod
+    def load(cls, path: Path, graph: Optional[nx.Graph] = None) -> "SpatialIndex":
+        """Load a persisted index; the tree is rebuilt from the stored coordinates.
+
+        Node ids are stored as strings; with ``graph`` they are mapped back to the graph's own ids.
+        """
+        with np.load(path) as data:
+            node_ids = data["node_ids"].tolist()
+            if graph is not None:
+                by_label = {str(node): node for node in graph.nodes}
+                node_ids = [by_label[label] for label in node_ids]
+            return cls(node_ids, data["lon"], data["lat"])
+
+
+def build_spatial_index(city_data_id: int, processed_data: Dict[str, Any]) -> Optional[str]:
+    """Build and persist the index for processed city data; returns its path, or None without located nodes"""
+    index = SpatialIndex.from_nodes(processed_data.get("nodes", []))
+    if index is None:
+        return None
+    path = spatial_index_path(city_data_id)
+    index.save(path)
+    logger.info("Spatial index built", city_data_id=city_data_id, nodes=len(index))
+    return str(path)
+
+
+def cached_spatial_index(path: Path) -> "SpatialIndex":
+    """Persisted index, loaded once per process and reloaded after reprocessing"""
+    mtime = path.stat().st_mtime
+    loaded = _loaded.get(str(path))
+    if loaded is None or loaded[0] != mtime:
+        loaded = (mtime, SpatialIndex.load(path))
+        _loaded[str(path)] = loaded
+    return loaded[1]
@@ -0,0 +1,187 @@
+"""
+Run summaries - compact per-run KPIs, series and group outcomes materialized at completion, and run comparison
+"""
+from typing import Dict, List, Any, Optional, Iterable
+import math
+from sqlalchemy.orm import Session
+
+from app.models.scenario import ScenarioRun
+from app.models.simulation import RunSummary
+from app.simulation.archetypes import DEFAULT_SPATIAL_RESOLUTION
+from app.simulation.kpis import MODE_COMMUTE_KEYS
+
+# Headline KPIs kept as columns of the summary table, so runs can be filtered and sorted by them
+SUMMARY_KPIS = (
+    "avg_commute_time",
+    "transit_modal_share",
+    "transit_ridership",
+    "emissions_proxy",
+    "service_coverage",
+    "equity_index",
+)
+SERIES_KPIS = ("decisions", "transit_modal_share", "boardings", "trips", "commute_mean")
+DEFAULT_GROUPS = ("preferred_mode",)
+
+
+def _commute_minutes(state: Dict[str, Any]) -> Optional[float]:
+    mode = state.get("current_mode")
+    minutes = state.get(MODE_COMMUTE_KEYS[mode]) if mode in MODE_COMMUTE_KEYS else None
+    if minutes is None and state.get("commute_time"):
+        minutes = state["commute_time"]
+    return None if minutes is None else float(minutes)
+
+
+def _zone(graph, node: Any, resolution: float) -> str:
+    """Coarse spatial cell of a node (about 1km at the default resolution), else the node itself"""
+    attrs = graph.nodes[node] if graph is not None and node in graph.nodes else {}
+    if "x" in attrs and "y" in attrs:
+        return f"{int(attrs['x'] // resolution)}:{int(attrs['y'] // resolution)}"
+    return str(node)
+
+
+def group_outcomes(
+    residents: Iterable[Any],
+    graph=None,
+    groups: Iterable[str] = DEFAULT_GROUPS,
+    zone_resolution: float = DEFAULT_SPATIAL_RESOLUTION
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """End-of-run outcomes of residents per persona group and per home zone.
+
+    Each group/category gets its resident count, mean commute minutes and the
+    share of residents whose current mode is transit and car.
+    """
+    totals: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for agent in residents:
+        state = agent.state
+        keys = {name: agent.persona_config.get(name) for name in groups}
+        keys["zone"] = _zone(graph, state.get("home_location"), zone_resolution)
+        minutes = _commute_minutes(state)
+        mode = state.get("current_mode")
+        for name, category in keys.items():
+            if category is None:
+                continue
+            entry = totals.setdefault(name, {}).setdefault(str(category), {
+                "residents": 0, "commuters": 0, "commute_minutes": 0.0, "transit": 0, "car": 0
+            })
+            entry["residents"] += 1
+            entry["transit"] += mode == "transit"
+            entry["car"] += mode == "car"
+            if minutes is not None:
+                entry["commuters"] += 1
+                entry["commute_minutes"] += minutes
+    return {
+        name: {
+            category: {
+                "residents": entry["residents"],
+                "avg_commute_time": round(entry["commute_minutes"] / entry["commuters"], 4) if entry["commuters"] else None,
+                "transit_share": round(entry["transit"] / entry["residents"], 4),
+                "car_share": round(entry["car"] / entry["residents"], 4)
+            }
+            for category, entry in categories.items()
+        }
+        for name, categories in totals.items()
+    }
+
+
+def build_summary(model, metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary fields of a finished run: headline KPIs, KPI series and group outcomes"""
+    config = model.run_config.get("summary", {})
+    groups = config.get("groups")
+    if groups is None:
+        groups = list(DEFAULT_GROUPS) + (list(model.population.attributes) if model.population is not None else [])
+    return {
+        "kpis": {name: metrics.get(name) for name in SUMMARY_KPIS},
+        "series": {"hour": model.kpis.series("hour"), "day": model.kpis.series("day")},
+        "groups": group_outcomes(
+            model.schedule.of_type("resident"),
+            model.graph,
+            groups,
+            config.get("zone_resolution", DEFAULT_SPATIAL_RESOLUTION)
+        )
+    }
+
+
+def add_reused_summary(db: Session, run: ScenarioRun):
+    """Listing row for a run that reused results: the source's headline KPIs under this run's scenario, sweep and seed.
+
+    Series and group outcomes stay on the source's summary, which comparisons
+    reach through ``source_run_id``.
+    """
+    source = db.query(RunSummary).filter(RunSummary.run_id == run.source_run_id).first()
+    if source is None:
+        return
+    db.add(RunSummary(
+        run_id=run.id,
+        scenario_id=run.scenario_id,
+        sweep_id=run.sweep_id,
+        seed=run.seed,
+        simulation_days=run.simulation_days,
+        ticks=source.ticks,
+        completed_at=run.end_time,
+        **{kpi: getattr(source, kpi) for kpi in SUMMARY_KPIS}
+    ))
+
+
+def _difference(value: Optional[float], baseline: Optional[float]) -> Dict[str, Optional[float]]:
+    if value is None or baseline is None:
+        return {"value": value, "baseline": baseline, "diff": None, "pct": None}
+    diff = value - baseline
+    return {
+        "value": value,
+        "baseline": baseline,
+        "diff": round(diff, 6),
+        "pct": round(100 * diff / baseline, 4) if baseline else None
+    }
+
+
+def diff_series(series: Dict[str, List[Any]], baseline: Dict[str, List[Any]], kpis: Iterable[str] = SERIES_KPIS) -> Dict[str, List[Any]]:
+    """Per-period differences of KPI series, aligned on the periods both runs have"""
+    base_index = {start: i for i, start in enumerate(baseline.get("start", []))}
+    pairs = [(i, base_index[start]) for i, start in enumerate(series.get("start", [])) if start in base_index]
+    result: Dict[str, List[Any]] = {"start": [series["start"][i] for i, _ in pairs]}
+    for name in kpis:
+        values, base = series.get(name), baseline.get(name)
+        if values is None or base is None:
+            continue
+        result[name] = [
+            None if values[i] is None or base[j] is None else round(values[i] - base[j], 6)
+            for i, j in pairs
+        ]
+    return result
+
+
+def diff_groups(groups: Dict[str, Dict[str, Dict[str, Any]]], baseline: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Outcome differences for every group/category present in both runs"""
+    result: Dict[str, Any] = {}
+    for name, categories in groups.items():
+        for category, outcome in categories.items():
+            base = baseline.get(name, {}).get(category)
+            if base is None:
+                continue
+            result.setdefault(name, {})[category] = {
+                key: _difference(outcome.get(key), base.get(key))
+                for key in ("avg_commute_time", "transit_share", "car_share")
+            }
+    return result
+
+
+def compare_summaries(summary, baseline, include_groups: bool = True) -> Dict[str, Any]:
+    """Differences of one run's summary against a baseline run's summary.
+
+    Both carry the headline KPIs, ``series`` of the compared resolution and,
+    with ``include_groups``, ``groups``.
+    """
+    comparison = {
+        "run_id": summary.run_id,
+        "kpis": {name: _difference(_number(getattr(summary, name)), _number(getattr(baseline, name))) for name in SUMMARY_KPIS},
+        "series": diff_series(summary.series or {}, baseline.series or {})
+    }
+    if include_groups:
+        comparison["groups"] = diff_groups(summary.groups or {}, baseline.groups or {})
+    return comparison
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return float(value)
@@ -0,0 +1,127 @@
+"""
+Parameter sweep designs and adaptive refinement over policy levers (app.simulation.policy)
+"""
+from typing import Dict, List, Any, Optional
+import itertools
+import numpy as np
+
+KPI_FIELDS = [
+    "avg_commute_time",
+    "commute_time_change_pct",
+    "transit_modal_share",
+    "transit_ridership",
+    "emissions_proxy",
+    "service_coverage",
+    "job_access_30min",
+    "equity_index",
+]
+
+
+class ParameterSpace:
+    """Numeric policy parameters, each with a ``min`` and ``max`` and optionally ``integer: true``"""
+
+    def __init__(self, parameters: Dict[str, Dict[str, Any]]):
+        if not parameters:
+            raise ValueError("A sweep needs at least one parameter")
+        self.names = sorted(parameters)
+        self.low = np.array([float(parameters[name]["min"]) for name in self.names])
+        self.high = np.array([float(parameters[name]["max"]) for name in self.names])
+        if np.any(self.high <= self.low):
+            raise ValueError("Each parameter needs max > min")
+        self.integer = np.array([bool(parameters[name].get("integer")) for name in self.names])
+
+    @property
+    def dims(self) -> int:
+        return len(self.names)
+
+    def to_unit(self, points: List[Dict[str, float]]) -> np.ndarray:
+        values = np.array([[point[name] for name in self.names] for point in points], dtype=float)
+        return (values - self.low) / (self.high - self.low)
+
+    def from_unit(self, unit: np.ndarray) -> List[Dict[str, float]]:
+        values = self.low + np.clip(unit, 0.0, 1.0) * (self.high - self.low)
+        values = np.where(self.integer, np.round(values), values)
+        return [
+            {name: (int(v) if is_int else round(float(v), 10)) for name, v, is_int in zip(self.names, row, self.integer)}
+            for row in values
+        ]
+
+
+def grid_design(space: ParameterSpace, points_per_axis: int = 5) -> List[Dict[str, float]]:
+    """Full factorial grid with ``points_per_axis`` levels per parameter"""
+    axis = np.linspace(0.0, 1.0, points_per_axis)
+    unit = np.array(list(itertools.product(axis, repeat=space.dims)))
+    return _unique(space.from_unit(unit))
+
+
+def latin_hypercube(space: ParameterSpace, samples: int, seed: Optional[int] = None) -> List[Dict[str, float]]:
+    """Latin hypercube: every parameter's range is split into ``samples`` strata, each sampled once"""
+    rng = np.random.default_rng(seed)
+    unit = np.empty((samples, space.dims))
+    for dim in range(space.dims):
+        strata = (rng.permutation(samples) + rng.random(samples)) / samples
+        unit[:, dim] = strata
+    return _unique(space.from_unit(unit))
+
+
+def refine(
+    space: ParameterSpace,
+    points: List[Dict[str, float]],
+    values: List[float],
+    count: int,
+    neighbors: Optional[int] = None,
+    min_distance: float = 1e-3
+) -> List[Dict[str, float]]:
+    """New points where the KPI changes fastest.
+
+    Every pair of nearby evaluated points is scored by the KPI change per unit
+    distance (in normalized parameter space); the midpoints of the steepest
+    pairs become the next samples.
+    """
+    known = [(point, value) for point, value in zip(points, values) if value is not None]
+    if len(known) < 2 or count <= 0:
+        return []
+    unit = space.to_unit([point for point, _ in known])
+    y = np.array([value for _, value in known], dtype=float)
+    spread = y.max() - y.min()
+    if spread == 0:
+        return []
+
+    k = min(neighbors or 2 * space.dims, len(known) - 1)
+    distances = np.linalg.norm(unit[:, None, :] - unit[None, :, :], axis=2)
+    candidates = {}
+    for i in range(len(known)):
+        for j in np.argsort(distances[i])[1:k + 1]:
+            pair = (min(i, int(j)), max(i, int(j)))
+            if pair not in candidates and distances[pair] > 0:
+                candidates[pair] = abs(y[pair[0]] - y[pair[1]]) / spread / distances[pair]
+
+    new_unit: List[np.ndarray] = []
+    for (i, j), _ in sorted(candidates.items(), key=lambda item: -item[1]):
+        midpoint = (unit[i] + unit[j]) / 2
+        taken = np.vstack([unit] + new_unit) if new_unit else unit
+        if np.min(np.linalg.norm(taken - midpoint, axis=1)) < min_distance:
+            continue
+        new_unit.append(midpoint[None, :])
+        if len(new_unit) == count:
+            break
+    if not new_unit:
+        return []
+    existing = {_point_key(point) for point, _ in known}
+    return [point for point in _unique(space.from_unit(np.vstack(new_unit))) if _point_key(point) not in existing]
+
+
+def _point_key(point: Dict[str, float]) -> tuple:
+    return tuple(sorted(point.items()))
+
+
+def _unique(points: List[Dict[str, float]]) -> List[Dict[str, float]]:
+    """Drop duplicates (e.g. from rounding integer parameters), keeping order"""
+    seen = set()
+    unique = []
+    for point in points:
+        key = _point_key(point)
+        if key not in seen:
+            seen.add(key)
+            unique.append(point)
+    return unique
@@ -0,0 +1,418 @@
+"""
+Static traffic assignment - BPR volume-delay functions and Frank-Wolfe user equilibrium on the city graph
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
+import time
+import networkx as nx
+import numpy as np
+import structlog
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+except ImportError:  # pragma: no cover - networkx fallback below
+    csr_matrix = dijkstra = None
+
+logger = structlog.get_logger()
+
+BPR_ALPHA = 0.15
+BPR_BETA = 4.0
+
+# Free-flow speed (km/h) and capacity (vehicles/hour per direction) by OSM highway class
+ROAD_CLASSES = {
+    "motorway": (100.0, 4000.0),
+    "trunk": (80.0, 3000.0),
+    "primary": (60.0, 1800.0),
+    "secondary": (50.0, 1200.0),
+    "tertiary": (40.0, 900.0),
+    "residential": (30.0, 600.0),
+    "living_street": (15.0, 300.0),
+}
+DEFAULT_ROAD_CLASS = (40.0, 800.0)
+
+# km/h per unit of an OSM maxspeed; bare numbers are km/h
+SPEED_UNITS = {"km/h": 1.0, "kmh": 1.0, "kph": 1.0, "mph": 1.609344, "knots": 1.852}
+
+# Volume-weighted mean V/C upper bounds for the city-wide traffic level
+TRAFFIC_LEVEL_BOUNDS = [(0.3, "low"), (0.6, "normal"), (0.85, "moderate"), (1.0, "heavy")]
+
+
+def bpr_time(free_flow: np.ndarray, volume: np.ndarray, capacity: np.ndarray, alpha: float = BPR_ALPHA, beta: float = BPR_BETA) -> np.ndarray:
+    """Congested link travel time t0 * (1 + alpha * (v/c)^beta)"""
+    return free_flow * (1.0 + alpha * (volume / capacity) ** beta)
+
+
+def bpr_derivative(free_flow: np.ndarray, volume: np.ndarray, capacity: np.ndarray, alpha: float = BPR_ALPHA, beta: float = BPR_BETA) -> np.ndarray:
+    return free_flow * alpha * beta * volume ** (beta - 1) / capacity ** beta
+
+
+def traffic_level(volume: np.ndarray, capacity: np.ndarray) -> str:
+    """City-wide traffic level from the volume-weighted mean V/C ratio"""
+    total = volume.sum()
+    if total <= 0:
+        return "low"
+    mean_vc = float((volume * volume / capacity).sum() / total)
+    for bound, level in TRAFFIC_LEVEL_BOUNDS:
+        if mean_vc < bound:
+            return level
+    return "gridlock"
+
+
+def _first_tag(value: Any) -> Any:
+    """First value of an OSM tag that osmnx merged into a list, or gave as 'a;b'"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, str):
+        value = value.split(";")[0].strip()
+    return value
+
+
+def parse_maxspeed(value: Any) -> Optional[float]:
+    """km/h of an OSM maxspeed such as '50', '30 mph' or '20mph'; None for 'none', 'walk', 'signals', ..."""
+    value = _first_tag(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value) if value > 0 else None
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lower()
+    number = text.rstrip("abcdefghijklmnopqrstuvwxyz/ ")
+    unit = text[len(number):].strip() or "km/h"
+    try:
+        speed = float(number) * SPEED_UNITS[unit]
+    except (KeyError, ValueError):
+        return None
+    return speed if speed > 0 else None
+
+
+def _road_class(attributes: Dict[str, Any]) -> Tuple[float, float]:
+    highway = _first_tag(attributes.get("highway"))
+    speed, capacity = ROAD_CLASSES.get(str(highway).removesuffix("_link"), DEFAULT_ROAD_CLASS)
+    speed = parse_maxspeed(attributes.get("maxspeed")) or speed
+    lanes = _first_tag(attributes.get("lanes"))
+    if lanes:
+        try:
+            capacity = capacity * max(float(lanes), 1.0) / 2
+        except (TypeError, ValueError):
+            pass
+    return speed, float(attributes.get("capacity") or capacity)
+
+
+@dataclass
+class Assignment:
+    """Equilibrium link volumes and congested times (minutes) of one assignment"""
+    volumes: np.ndarray
+    times: np.ndarray
+    iterations: int
+    relative_gap: float
+    seconds: float
+
+
+class RoadNetwork:
+    """Directed edge arrays of the city graph; every undirected street is a link in each direction"""
+
+    def __init__(
+        self,
+        nodes: List[Any],
+        tails: np.ndarray,
+        heads: np.ndarray,
+        free_flow: np.ndarray,
+        capacity: np.ndarray,
+        coordinates: Optional[np.ndarray] = None
+    ):
+        self.nodes = nodes
+        self.coordinates = coordinates
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.tails = tails
+        self.heads = heads
+        self.free_flow = np.maximum(free_flow, 1e-6)  # zero costs would drop links from sparse graphs
+        self.capacity = capacity
+        # Sorted (tail, head) keys map predecessor pairs back to link ids
+        self._keys = tails.astype(np.int64) * len(nodes) + heads
+        self._key_order = np.argsort(self._keys)
+        self._sorted_keys = self._keys[self._key_order]
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph) -> "RoadNetwork":
+        nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        tails, heads, free_flow, capacity = [], [], [], []
+        for u, v, data in graph.edges(data=True):
+            speed, link_capacity = _road_class(data)
+            minutes = float(data.get("length", data.get("weight", 1.0))) / (speed * 1000 / 60)
+            pairs = [(u, v)] if graph.is_directed() else [(u, v), (v, u)]
+            for tail, head in pairs:
+                tails.append(index[tail])
+                heads.append(index[head])
+                free_flow.append(minutes)
+                capacity.append(link_capacity)
+        coordinates = None
+        if nodes and all("x" in graph.nodes[node] and "y" in graph.nodes[node] for node in nodes):
+            coordinates = np.array([(graph.nodes[node]["x"], graph.nodes[node]["y"]) for node in nodes], dtype=float)
+        return cls(
+            nodes,
+            np.array(tails, dtype=np.int64),
+            np.array(heads, dtype=np.int64),
+            np.array(free_flow, dtype=float),
+            np.array(capacity, dtype=float),
+            coordinates
+        )
+
+    @property
+    def size(self) -> int:
+        return len(self.nodes)
+
+    def zones(self, max_zones: int) -> np.ndarray:
+        """Map every node to the representative node of its grid cell (about ``max_zones`` cells).
+
+        Trips are assigned from zone representatives, so the number of shortest
+        path trees per iteration is bounded by the number of zones rather than
+        the number of distinct homes. Only origins are zoned: destinations need
+        no tree of their own and stay exact. Without coordinates every node is
+        its own zone.
+        """
+        if self.coordinates is None or not max_zones or self.size <= max_zones:
+            return np.arange(self.size)
+        side = max(int(np.sqrt(max_zones)), 1)
+        low, high = self.coordinates.min(axis=0), self.coordinates.max(axis=0)
+        cells = np.minimum(((self.coordinates - low) / np.maximum(high - low, 1e-12) * side).astype(np.int64), side - 1)
+        cell_ids = cells[:, 0] * side + cells[:, 1]
+        representatives = np.empty(self.size, dtype=np.int64)
+        for cell in np.unique(cell_ids):
+            members = np.flatnonzero(cell_ids == cell)
+            centre = self.coordinates[members].mean(axis=0)
+            representatives[members] = members[np.argmin(((self.coordinates[members] - centre) ** 2).sum(axis=1))]
+        return representatives
+
+    def link_ids(self, tails: np.ndarray, heads: np.ndarray) -> np.ndarray:
+        keys = tails.astype(np.int64) * self.size + heads
+        return self._key_order[np.searchsorted(self._sorted_keys, keys)]
+
+    def shortest_paths(self, costs: np.ndarray, origins: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Distances and predecessor trees (-1 = none) from each origin, one row per origin"""
+        if dijkstra is not None:
+            matrix = csr_matrix((costs, (self.tails, self.heads)), shape=(self.size, self.size))
+            distances, predecessors = dijkstra(matrix, directed=True, indices=origins, return_predecessors=True)
+            return distances, np.where(predecessors < 0, -1, predecessors)
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(range(self.size))
+        graph.add_weighted_edges_from(zip(self.tails.tolist(), self.heads.tolist(), costs.tolist()))
+        distances = np.full((len(origins), self.size), np.inf)
+        predecessors = np.full((len(origins), self.size), -1, dtype=np.int64)
+        for row, origin in enumerate(origins):
+            preds, dist = nx.dijkstra_predecessor_and_distance(graph, int(origin))
+            nodes = np.fromiter(dist.keys(), dtype=np.int64)
+            distances[row, nodes] = np.fromiter(dist.values(), dtype=float)
+            reached = [(node, p[0]) for node, p in preds.items() if p]
+            if reached:
+                children, parents = zip(*reached)
+                predecessors[row, list(children)] = parents
+        return distances, predecessors
+
+    def all_or_nothing(self, costs: np.ndarray, rows: np.ndarray, origins: np.ndarray, destinations: np.ndarray, flows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Load every OD flow onto its shortest path; returns link volumes and the distance rows"""
+        distances, predecessors = self.shortest_paths(costs, origins)
+        volumes = np.zeros(len(costs))
+        reachable = np.isfinite(distances[rows, destinations])
+        row, current, flow = rows[reachable], destinations[reachable], flows[reachable]
+        # Walk all paths back towards their origins at once, one link per pass
+        while len(current):
+            parent = predecessors[row, current]
+            active = parent >= 0
+            row, current, parent, flow = row[active], current[active], parent[active], flow[active]
+            np.add.at(volumes, self.link_ids(parent, current), flow)
+            current = parent
+        return volumes, distances
+
+
+def frank_wolfe(
+    network: RoadNetwork,
+    demand: List[Tuple[Any, Any, float]],
+    max_iterations: int = 50,
+    gap: float = 1e-3,
+    alpha: float = BPR_ALPHA,
+    beta: float = BPR_BETA
+) -> Assignment:
+    """User-equilibrium assignment of (origin, destination, vehicles/hour) demand.
+
+    Conjugate Frank-Wolfe: each search direction combines the new all-or-nothing
+    flows with the previous direction's target, which needs far fewer shortest
+    path rounds than plain Frank-Wolfe for the same relative gap.
+    """
+    start = time.perf_counter()
+    od = [
+        (network.index[o], network.index[d], flow) for o, d, flow in demand
+        if o in network.index and d in network.index and o != d and flow > 0
+    ]
+    if not od:
+        zeros = np.zeros(len(network.free_flow))
+        return Assignment(zeros, network.free_flow.copy(), 0, 0.0, time.perf_counter() - start)
+
+    origins, rows = np.unique(np.array([o for o, _, _ in od]), return_inverse=True)
+    destinations = np.array([d for _, d, _ in od])
+    flows = np.array([f for _, _, f in od], dtype=float)
+
+    def link_times(volumes):
+        return bpr_time(network.free_flow, volumes, network.capacity, alpha, beta)
+
+    volumes, _ = network.all_or_nothing(network.free_flow, rows, origins, destinations, flows)
+    previous_target = None
+    relative_gap = np.inf
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        times = link_times(volumes)
+        target, distances = network.all_or_nothing(times, rows, origins, destinations, flows)
+        total_cost = float(times @ volumes)
+        shortest_cost = float(np.nansum(np.where(np.isfinite(distances[rows, destinations]), distances[rows, destinations], 0) * flows))
+        relative_gap = (total_cost - shortest_cost) / total_cost if total_cost > 0 else 0.0
+        if relative_gap < gap:
+            break
+
+        if previous_target is not None:
+            # Make the new direction conjugate to the previous one w.r.t. the objective's Hessian
+            hessian = bpr_derivative(network.free_flow, volumes, network.capacity, alpha, beta)
+            numerator = float((previous_target - volumes) * hessian @ (target - volumes))
+            denominator = float((previous_target - volumes) * hessian @ (target - previous_target))
+            weight = numerator / denominator if denominator != 0 else 0.0
+            weight = min(max(weight, 0.0), 0.99)
+            target = weight * previous_target + (1 - weight) * target
+        previous_target = target
+
+        # Bisection on the derivative of the Beckmann objective along the search direction
+        direction = target - volumes
+        low, high = 0.0, 1.0
+        for _ in range(20):
+            step = (low + high) / 2
+            if float(direction @ link_times(volumes + step * direction)) > 0:
+                high = step
+            else:
+                low = step
+        volumes = volumes + (low + high) / 2 * direction
+
+    return Assignment(volumes, link_times(volumes), iteration, float(relative_gap), time.perf_counter() - start)
+
+
+class TrafficModel:
+    """Periodic equilibrium assignment of resident car trips, feeding congestion back to the model.
+
+    With more nodes than ``max_zones`` every trip, and every car time residents
+    perceive or travel, starts at the representative node of its origin's zone
+    (see ``RoadNetwork.zones``); the access leg within the zone is ignored.
+    Raise ``max_zones`` to the node count for exact origins.
+    """
+
+    def __init__(
+        self,
+        graph: nx.Graph,
+        every: int = 60,
+        vehicles_per_agent: float = 1.0,
+        max_iterations: int = 30,
+        gap: float = 1e-2,
+        max_zones: int = 100
+    ):
+        self.network = RoadNetwork.from_graph(graph)
+        self.zone_of = self.network.zones(max_zones)
+        logger.info("Road network built", nodes=self.network.size, links=len(self.network.free_flow))
+        self.every = every
+        self.vehicles_per_agent = vehicles_per_agent
+        self.max_iterations = max_iterations
+        self.gap = gap
+        self.assignment: Optional[Assignment] = None
+        self._distances: Dict[int, np.ndarray] = {}  # congested distances by origin, per assignment
+        self._free_flow: Dict[int, np.ndarray] = {}  # free-flow distances by origin
+        self._demand: Optional[Dict[Tuple[Any, Any], float]] = None
+        self.assignments = 0
+        self.total_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, graph: nx.Graph, config: Dict[str, Any]) -> "TrafficModel":
+        """Traffic model from a run's ``traffic`` config"""
+        return cls(
+            graph,
+            every=config.get("every", 60),
+            vehicles_per_agent=config.get("vehicles_per_agent", 1.0),
+            max_iterations=config.get("max_iterations", 30),
+            gap=config.get("gap", 1e-2),
+            max_zones=config.get("max_zones", 100)
+        )
+
+    def due(self, tick: int) -> bool:
+        return tick % self.every == 0
+
+    def update(self, residents: List[Any], city_state: Dict[str, Any]):
+        """Assign current car commutes and write congestion into city and resident state"""
+        drivers = [
+            agent for agent in residents
+            if agent.state.get("current_mode") == "car"
+            and agent.state.get("home_location") is not None
+            and agent.state.get("work_location") is not None
+        ]
+        demand: Dict[Tuple[Any, Any], float] = {}
+        for agent in drivers:
+            key = (self._zone(agent.state["home_location"]), agent.state["work_location"])
+            demand[key] = demand.get(key, 0.0) + self.vehicles_per_agent
+        if demand == self._demand:
+            # Nobody changed mode since the last assignment; the equilibrium still holds
+            return
+        self._demand = demand
+        self.assignment = frank_wolfe(
+            self.network,
+            [(o, d, flow) for (o, d), flow in demand.items()],
+            max_iterations=self.max_iterations,
+            gap=self.gap
+        )
+        self._distances = {}
+        self.assignments += 1
+        self.total_seconds += self.assignment.seconds
+
+        volumes, capacity = self.assignment.volumes, self.network.capacity
+        city_state["traffic_level"] = traffic_level(volumes, capacity)
+        city_state["traffic"] = {
+            "vehicle_hours": float(volumes @ self.assignment.times) / 60,
+            "congested_links": int(np.count_nonzero(volumes > 0.9 * capacity)),
+            "max_vc": float((volumes / capacity).max()) if len(volumes) else 0.0,
+            "relative_gap": self.assignment.relative_gap,
+            "iterations": self.assignment.iterations
+        }
+
+        # Residents perceive their own congested and free-flow car commute
+        residents_with_od = [
+            agent for agent in residents
+            if agent.state.get("home_location") in self.network.index
+            and agent.state.get("work_location") in self.network.index
+        ]
+        for agent in residents_with_od:
+            origin = self.network.index[self._zone(agent.state["home_location"])]
+            work = self.network.index[agent.state["work_location"]]
+            congested = self._distances_from(origin, self._distances, self.assignment.times)[work]
+            if np.isfinite(congested):
+                agent.state["car_commute_minutes"] = round(float(congested), 1)
+                agent.state["car_free_flow_minutes"] = round(float(self._distances_from(origin, self._free_flow, self.network.free_flow)[work]), 1)
+
+    def travel_minutes(self, origin: Any, destination: Any) -> Optional[float]:
+        """Congested car travel time between two nodes under the latest assignment"""
+        if self.assignment is None or origin not in self.network.index or destination not in self.network.index:
+            return None
+        row = self.network.index[self._zone(origin)]
+        minutes = self._distances_from(row, self._distances, self.assignment.times)[self.network.index[destination]]
+        return float(minutes) if np.isfinite(minutes) else None
+
+    def _zone(self, node: Any) -> Any:
+        if node not in self.network.index:
+            return node
+        return self.network.nodes[self.zone_of[self.network.index[node]]]
+
+    def _distances_from(self, origin: int, cache: Dict[int, np.ndarray], costs: np.ndarray) -> np.ndarray:
+        if origin not in cache:
+            cache[origin] = self.network.shortest_paths(costs, np.array([origin]))[0][0]
+        return cache[origin]
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "links": len(self.network.free_flow),
+            "assignments": self.assignments,
+            "seconds": self.total_seconds,
+            "last_iterations": self.assignment.iterations if self.assignment else None,
+            "last_relative_gap": self.assignment.relative_gap if self.assignment else None
+        }
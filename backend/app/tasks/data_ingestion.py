@@ -1,12 +1,17 @@
 """
 Celery tasks for data ingestion
 """
+from pathlib import Path
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models.data import CityData
+from app.data_ingestion.gtfs_loader import load_gtfs
+from app.simulation.spatial import build_spatial_index
 import structlog
 import osmnx as ox
 import networkx as nx
+import requests
 import json
 
 logger = structlog.get_logger()
@@ -30,9 +35,16 @@ def process_city_data_task(self, city_data_id: int):
         # Process based on data type
         if city_data.data_type == "osm":
             processed_data = _process_osm_data(city_data)
+        elif city_data.data_type == "transit_gtfs":
+            processed_data = _process_gtfs_data(city_data)
         else:
             processed_data = {}
         
+        # Nearest-node index for snapping coordinates, stored next to the processed data
+        spatial_path = build_spatial_index(city_data.id, processed_data)
+        if spatial_path:
+            processed_data["spatial_index_path"] = spatial_path
+        
         # Update city data
         city_data.geometry = processed_data
         city_data.status = "completed"
@@ -77,14 +89,17 @@ def _process_osm_data(city_data: CityData) -> dict:
         
         edges = []
         for u, v, data in G.edges(data=True):
+            attributes = {
+                "length": data.get("length", 1.0),
+                "highway": data.get("highway", "unknown")
+            }
+            # Tagged speed limits and lane counts refine the traffic model's road class defaults
+            attributes.update({tag: data[tag] for tag in ("maxspeed", "lanes") if data.get(tag) is not None})
             edges.append({
                 "source": str(u),
                 "target": str(v),
                 "weight": data.get("length", 1.0),
-                "attributes": {
-                    "length": data.get("length", 1.0),
-                    "highway": data.get("highway", "unknown")
-                }
+                "attributes": attributes
             })
         
         return {
@@ -104,3 +119,24 @@ def _process_osm_data(city_data: CityData) -> dict:
             "edges": [],
             "metadata": {"error": str(e)}
         }
+
+
+def _process_gtfs_data(city_data: CityData) -> dict:
+    """Compile a GTFS feed (uploaded file or source URL) into a RAPTOR timetable"""
+    feed_path = Path(city_data.file_path) if city_data.file_path else None
+    if feed_path is None:
+        if not city_data.source_url:
+            raise ValueError("GTFS city data needs a file_path or source_url")
+        feed_path = settings.RAW_DATA_DIR / f"gtfs_{city_data.id}.zip"
+        response = requests.get(city_data.source_url, timeout=120)
+        response.raise_for_status()
+        feed_path.write_bytes(response.content)
+    
+    metadata = city_data.metadata_json or {}
+    result = load_gtfs(
+        feed_path,
+        settings.PROCESSED_DATA_DIR / "gtfs" / f"{city_data.id}.npz",
+        service_date=metadata.get("service_date")
+    )
+    city_data.metadata_json = {**metadata, **result["metadata"]}
+    return result
@@ -1,8 +1,14 @@
 """
 Celery tasks for simulation execution
 """
+import pickle
+from typing import Optional
 from app.core.celery_app import celery_app
+from app.core.metrics import WORKER_METRICS_JOB, push_metrics, worker_instance
+from app.core.cache import response_cache, run_scope
 from app.simulation.simulation_engine import SimulationEngine
+from app.simulation.distributed import region_worker, RedisTransport
+from app.simulation.fingerprint import scenario_config_for, build_agents_config, city_data_version
 from app.core.database import SessionLocal
 from app.models.scenario import Scenario, ScenarioRun
 from app.models.data import CityData
@@ -17,12 +23,14 @@ def run_simulation_task(self, run_id: int):
     logger.info("Starting simulation task", run_id=run_id, task_id=self.request.id)
     
     db = SessionLocal()
+    sweep_id = None
     try:
         # Get scenario run
         run = db.query(ScenarioRun).filter(ScenarioRun.id == run_id).first()
         if not run:
             logger.error("Scenario run not found", run_id=run_id)
             return {"status": "error", "message": "Scenario run not found"}
+        sweep_id = run.sweep_id
         
         # Get scenario
         scenario = db.query(Scenario).filter(Scenario.id == run.scenario_id).first()
@@ -37,22 +45,10 @@ def run_simulation_task(self, run_id: int):
         
         # Prepare configuration
         city_data = city_data_obj.geometry if city_data_obj and city_data_obj.geometry else {}
-        scenario_config = {
-            "name": scenario.name,
-            "policy_type": scenario.policy_type,
-            "policy_config": scenario.policy_config or {}
-        }
-        
-        # TODO: Get agents config from scenario or defaults
-        agents_config = [
-            {
-                "agent_type": "orchestrator",
-                "persona_config": {
-                    "scenario_config": scenario_config,
-                    "simulation_days": run.simulation_days
-                }
-            }
-        ]
+        scenario_config = scenario_config_for(scenario, run.run_config)
+        agents_config = build_agents_config(
+            scenario_config, run.simulation_days, run.run_config, city_data_version(city_data_obj)
+        )
         
         # Initialize and run simulation
         engine = SimulationEngine(run_id)
@@ -60,7 +56,8 @@ def run_simulation_task(self, run_id: int):
             scenario_config=scenario_config,
             city_data=city_data,
             agents_config=agents_config,
-            seed=run.seed
+            seed=run.seed,
+            run_config=run.run_config or {}
         )
         
         engine.run(simulation_days=run.simulation_days)
@@ -76,6 +73,21 @@ def run_simulation_task(self, run_id: int):
             run.status = "failed"
             run.error_message = str(e)
             db.commit()
+            response_cache.invalidate(run_scope(run_id))
         return {"status": "error", "message": str(e)}
     finally:
         db.close()
+        if sweep_id:
+            from app.tasks.sweeps import advance_sweep_task
+            advance_sweep_task.delay(sweep_id)
+        # Workers are not scraped; push this worker's metrics after every run
+        push_metrics(WORKER_METRICS_JOB, {"instance": worker_instance()})
+
+
+@celery_app.task(bind=True, name="run_region_worker")
+def region_worker_task(self, region: int, namespace: str, assignment: bytes, seed: Optional[int] = None):
+    """Own one region of a distributed run, exchanging messages with the coordinator through Redis"""
+    logger.info("Starting region worker", region=region, namespace=namespace, task_id=self.request.id)
+    region_worker(region, RedisTransport(namespace), pickle.loads(assignment), seed)
+    logger.info("Region worker stopped", region=region, namespace=namespace)
+    return {"status": "completed", "region": region}
@@ -0,0 +1,72 @@
+"""
+Celery tasks for surrogate decision models
+"""
+from pathlib import Path
+from typing import Optional
+import numpy as np
+import structlog
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.agent import Agent, AgentAction, AgentType
+from app.agents.surrogate import SurrogatePolicy, features_to_matrix
+
+logger = structlog.get_logger()
+
+
+@celery_app.task(bind=True, name="train_surrogate_model")
+def train_surrogate_model_task(self, max_rows: int = 1_000_000, holdout_fraction: float = 0.1, model_path: Optional[str] = None):
+    """Train the resident mode-choice surrogate from recorded LLM decisions"""
+    logger.info("Starting surrogate training", task_id=self.request.id, max_rows=max_rows)
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(AgentAction.features, AgentAction.action_data)
+            .join(Agent, Agent.id == AgentAction.agent_id)
+            .filter(
+                Agent.agent_type == AgentType.RESIDENT,
+                AgentAction.action_type == "move",
+                AgentAction.decision_source == "llm",
+                AgentAction.features.isnot(None)
+            )
+            .order_by(AgentAction.id.desc())
+            .limit(max_rows)
+            .all()
+        )
+        samples = [(features, (action_data or {}).get("mode")) for features, action_data in rows]
+        samples = [(features, mode) for features, mode in samples if mode]
+        if len(samples) < 100:
+            logger.warning("Not enough LLM decisions to train surrogate", rows=len(samples))
+            return {"status": "skipped", "message": "Not enough recorded LLM decisions", "rows": len(samples)}
+
+        X = features_to_matrix([features for features, _ in samples])
+        labels = [mode for _, mode in samples]
+
+        # Deterministic holdout split for the reported accuracy
+        order = np.random.default_rng(0).permutation(len(labels))
+        holdout = max(1, int(len(labels) * holdout_fraction))
+        test_idx, train_idx = order[:holdout], order[holdout:]
+
+        policy = SurrogatePolicy().fit(X[train_idx], [labels[i] for i in train_idx])
+        predicted, _ = policy.predict(X[test_idx])
+        accuracy = float(np.mean([p == labels[i] for p, i in zip(predicted, test_idx)]))
+        policy.metadata = {
+            "training_rows": int(len(train_idx)),
+            "holdout_rows": int(len(test_idx)),
+            "holdout_accuracy": accuracy,
+            "task_id": self.request.id
+        }
+
+        path = Path(model_path) if model_path else settings.SURROGATE_MODEL_DIR / "resident.json"
+        policy.save(path)
+
+        logger.info("Surrogate training completed", rows=len(labels), holdout_accuracy=accuracy, path=str(path))
+        return {"status": "completed", "rows": len(labels), "holdout_accuracy": accuracy, "model_path": str(path)}
+
+    except Exception as e:
+        logger.error("Surrogate training failed", error=str(e))
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
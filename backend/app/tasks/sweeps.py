@@ -0,0 +1,155 @@
+"""
+Celery tasks and orchestration for parameter sweeps
+"""
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+from sqlalchemy.orm import Session
+import structlog
+
+from app.core.celery_app import celery_app
+from app.core.database import SessionLocal
+from app.models.scenario import ScenarioRun
+from app.models.simulation import SimulationMetrics
+from app.models.sweep import Sweep
+from app.simulation.fingerprint import create_run
+from app.simulation.summary import add_reused_summary
+from app.simulation.sweeps import KPI_FIELDS, ParameterSpace, grid_design, latin_hypercube, refine
+
+logger = structlog.get_logger()
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def initial_design(sweep: Sweep) -> List[Dict[str, float]]:
+    space = ParameterSpace(sweep.parameters)
+    if sweep.design == "grid":
+        return grid_design(space, sweep.design_size or 5)
+    return latin_hypercube(space, sweep.design_size or 10, seed=sweep.seed)
+
+
+def launch_points(db: Session, sweep: Sweep, points: List[Dict[str, float]], sweep_round: int) -> List[int]:
+    """Create one run per point; returns the ids of runs that need simulating"""
+    to_dispatch = []
+    for point in points:
+        run, reused = create_run(
+            db,
+            sweep.scenario,
+            simulation_days=sweep.simulation_days,
+            seed=sweep.seed,
+            run_config={**(sweep.run_config or {}), "policy_overrides": point},
+            sweep_id=sweep.id,
+            sweep_round=sweep_round
+        )
+        if reused:
+            add_reused_summary(db, run)
+        else:
+            to_dispatch.append(run.id)
+    return to_dispatch
+
+
+def dispatch(run_ids: List[int]):
+    from app.tasks.simulation import run_simulation_task
+    for run_id in run_ids:
+        run_simulation_task.delay(run_id)
+
+
+def collect_points(db: Session, sweep: Sweep) -> List[Dict[str, Any]]:
+    """Parameters, status and KPIs of every run in the sweep"""
+    runs = db.query(ScenarioRun).filter(ScenarioRun.sweep_id == sweep.id).order_by(ScenarioRun.id).all()
+    results_ids = [run.source_run_id or run.id for run in runs]
+    metrics = {
+        m.run_id: m for m in db.query(SimulationMetrics).filter(SimulationMetrics.run_id.in_(results_ids)).all()
+    }
+    points = []
+    for run, results_id in zip(runs, results_ids):
+        row = metrics.get(results_id)
+        points.append({
+            "run_id": run.id,
+            "round": run.sweep_round,
+            "status": run.status,
+            "reused_from": run.source_run_id,
+            "params": (run.run_config or {}).get("policy_overrides", {}),
+            "kpis": {field: getattr(row, field) for field in KPI_FIELDS} if row else {}
+        })
+    return points
+
+
+def aggregate(sweep: Sweep, points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sweep result: all points plus per-KPI extremes over the completed ones"""
+    completed = [p for p in points if p["status"] == "completed" and p["kpis"]]
+    extremes = {}
+    for kpi in KPI_FIELDS:
+        valued = [p for p in completed if p["kpis"].get(kpi) is not None]
+        if valued:
+            extremes[kpi] = {
+                "min": min(valued, key=lambda p: p["kpis"][kpi])["params"],
+                "max": max(valued, key=lambda p: p["kpis"][kpi])["params"]
+            }
+    return {
+        "parameters": sorted(sweep.parameters),
+        "target_kpi": sweep.target_kpi,
+        "rounds": sweep.current_round + 1,
+        "runs": len(points),
+        "completed": len(completed),
+        "failed": sum(1 for p in points if p["status"] == "failed"),
+        "extremes": extremes,
+        "points": points
+    }
+
+
+def advance_sweep(db: Session, sweep_id: int) -> Optional[Sweep]:
+    """Start the next refinement round or finalize the sweep once the current round is done"""
+    while True:
+        # Row lock so concurrent run completions advance the sweep only once
+        sweep = db.query(Sweep).filter(Sweep.id == sweep_id).with_for_update().first()
+        if not sweep or sweep.status != "running":
+            db.commit()
+            return sweep
+
+        points = collect_points(db, sweep)
+        if any(p["status"] in ACTIVE_STATUSES for p in points):
+            db.commit()
+            return sweep
+
+        new_points = []
+        budget = (sweep.max_runs or 0) - len(points)
+        if sweep.target_kpi and sweep.current_round < (sweep.refine_rounds or 0) and budget > 0:
+            completed = [p for p in points if p["status"] == "completed"]
+            new_points = refine(
+                ParameterSpace(sweep.parameters),
+                [p["params"] for p in completed],
+                [p["kpis"].get(sweep.target_kpi) for p in completed],
+                min(sweep.refine_batch or 8, budget)
+            )
+
+        if not new_points:
+            sweep.results = aggregate(sweep, points)
+            sweep.status = "completed"
+            sweep.completed_at = datetime.now()
+            db.commit()
+            logger.info("Sweep completed", sweep_id=sweep_id, runs=len(points))
+            return sweep
+
+        sweep.current_round += 1
+        to_dispatch = launch_points(db, sweep, new_points, sweep.current_round)
+        db.commit()
+        logger.info("Sweep refined", sweep_id=sweep_id, round=sweep.current_round, points=len(new_points))
+        dispatch(to_dispatch)
+        if to_dispatch:
+            return sweep
+        # Every new point reused an earlier run; the round is already complete
+
+
+@celery_app.task(bind=True, name="advance_sweep")
+def advance_sweep_task(self, sweep_id: int):
+    """Advance a sweep after one of its runs finished"""
+    db = SessionLocal()
+    try:
+        sweep = advance_sweep(db, sweep_id)
+        return {"status": sweep.status if sweep else "not_found", "sweep_id": sweep_id}
+    except Exception as e:
+        logger.error("Advancing sweep failed", error=str(e), sweep_id=sweep_id)
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
@@ -0,0 +1,75 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json --threshold 0.1
+
+Exits with status 1 when any metric regresses by more than the threshold.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Any, Iterator, Tuple
+
+# (metric path, True when higher is better)
+METRICS = [
+    (("init_seconds",), False),
+    (("tick_seconds", "p50"), False),
+    (("tick_seconds", "p95"), False),
+    (("phases", "agents", "p50"), False),
+    (("phases", "environment", "p50"), False),
+    (("phases", "city_state", "p50"), False),
+    (("phases", "metrics", "p50"), False),
+    (("persistence", "actions_per_second"), True),
+    (("persistence", "snapshot_seconds"), False),
+    (("peak_memory_mb",), False),
+]
+
+
+def _lookup(case: Dict[str, Any], path: Tuple[str, ...]):
+    value = case
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> Iterator[Tuple[str, str, float, float, float, bool]]:
+    """Yield (case, metric, baseline, candidate, relative change, regressed) for shared cases"""
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    for case in candidate["cases"]:
+        base = baseline_cases.get(case["name"])
+        if not base:
+            continue
+        for path, higher_is_better in METRICS:
+            old, new = _lookup(base, path), _lookup(case, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = (-change if higher_is_better else change) > threshold
+            yield case["name"], ".".join(path), old, new, change, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results between commits")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    print(f"Comparing {baseline.get('commit')} -> {candidate.get('commit')}")
+
+    regressions = 0
+    for name, metric, old, new, change, regressed in compare(baseline, candidate, args.threshold):
+        marker = "REGRESSION" if regressed else ""
+        regressions += regressed
+        print(f"{name:<28} {metric:<34} {old:>12.4g} {new:>12.4g} {change:>+8.1%} {marker}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
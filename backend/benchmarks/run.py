@@ -0,0 +1,191 @@
+"""
+Simulation throughput benchmarks.
+
+    python -m benchmarks.run --graph grid osm --nodes 1000 10000 --agents 100 1000 --ticks 60
+
+Results are written as JSON (default: benchmarks/results/<commit>.json) and can
+be compared between commits with ``python -m benchmarks.compare``. Without LLM
+API keys agents use rule-based reasoning; point OPENAI_BASE_URL at the mock LLM
+server (``python -m app.mock_llm``) to include the LLM path.
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, json_serializer
+from app.models.scenario import Scenario, ScenarioRun
+from app.simulation.city_model import CityModel
+from app.simulation.simulation_engine import SimulationEngine
+from benchmarks.synthetic import make_city, synthetic_population
+
+RESULTS_DIR = Path(__file__).parent / "results"
+PHASES = ["environment", "agents", "city_state", "metrics"]  # reported first; other profiler phases follow
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "mean": statistics.fmean(values),
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "max": max(values)
+    }
+
+
+def timed_step(model: CityModel, timings: List[Dict[str, float]]):
+    """One real CityModel.step; phase durations come from the model's own profiler"""
+    before = {name: entry["total"] for name, entry in model.profiler.phases.items()}
+    start = time.perf_counter()
+    model.step()
+    tick = {"total": time.perf_counter() - start}
+    for name, entry in model.profiler.phases.items():
+        tick[name] = entry["total"] - before.get(name, 0.0)
+    timings.append(tick)
+
+
+def measure_persistence(model: CityModel, ticks: int) -> Dict[str, float]:
+    """Throughput of SimulationEngine persistence against an in-memory SQLite database"""
+    db_engine = create_engine("sqlite://", json_serializer=json_serializer)
+    Base.metadata.create_all(bind=db_engine)
+    session = sessionmaker(bind=db_engine)()
+    scenario = Scenario(name="benchmark", policy_type="none", policy_config={})
+    session.add(scenario)
+    session.flush()
+    run = ScenarioRun(scenario_id=scenario.id, status="running")
+    session.add(run)
+    session.commit()
+
+    engine = SimulationEngine(run.id)
+    engine.db.close()
+    engine.db = session
+    engine.model = model
+
+    action_seconds = []
+    for tick in range(ticks):
+        start = time.perf_counter()
+        engine._save_agent_actions(tick)
+        action_seconds.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    engine._save_state_snapshot()
+    snapshot_seconds = time.perf_counter() - start
+    session.close()
+
+    actions_per_tick = len(model.agents)
+    return {
+        "actions_per_second": actions_per_tick * ticks / sum(action_seconds),
+        "action_flush_seconds": _summary(action_seconds),
+        "snapshot_seconds": snapshot_seconds
+    }
+
+
+def measure_peak_memory(city_data: Dict[str, Any], agents_config: List[Dict], seed: int) -> float:
+    """Peak traced memory (MB) of model construction plus one tick, measured in a separate pass"""
+    gc.collect()
+    tracemalloc.start()
+    model = CityModel(city_data=city_data, scenario_config={}, agents_config=agents_config, seed=seed)
+    model.step()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del model
+    return peak / 1024 / 1024
+
+
+def run_case(kind: str, n_nodes: int, n_agents: int, ticks: int, persist_ticks: int, seed: int, memory: bool) -> Dict[str, Any]:
+    start = time.perf_counter()
+    city_data = make_city(kind, n_nodes, seed=seed)
+    agents_config = synthetic_population(city_data, n_agents, seed=seed)
+    generation_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = CityModel(city_data=city_data, scenario_config={"name": "benchmark"}, agents_config=agents_config, seed=seed)
+    init_seconds = time.perf_counter() - start
+
+    timings: List[Dict[str, float]] = []
+    for _ in range(ticks):
+        timed_step(model, timings)
+    totals = [tick["total"] for tick in timings]
+    # Phases that only run on some ticks (traffic, transit) count as 0 on the others
+    phases = sorted({name for tick in timings for name in tick} - {"total"}, key=lambda name: (PHASES.index(name) if name in PHASES else len(PHASES), name))
+
+    result = {
+        "name": f"{kind}-{n_nodes}n-{n_agents}a",
+        "graph": kind,
+        "nodes": len(city_data["nodes"]),
+        "edges": len(city_data["edges"]),
+        "agents": len(agents_config),
+        "ticks": ticks,
+        "generation_seconds": generation_seconds,
+        "init_seconds": init_seconds,
+        "ticks_per_second": ticks / sum(totals),
+        "tick_seconds": _summary(totals),
+        "phases": {phase: _summary([tick.get(phase, 0.0) for tick in timings]) for phase in phases},
+        "persistence": measure_persistence(model, persist_ticks) if persist_ticks else None,
+    }
+    del model
+    if memory:
+        result["peak_memory_mb"] = measure_peak_memory(city_data, agents_config, seed)
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CityLab simulation throughput benchmarks")
+    parser.add_argument("--graph", nargs="+", default=["grid", "osm"], choices=["grid", "osm"])
+    parser.add_argument("--nodes", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--agents", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--persist-ticks", type=int, default=5, help="0 disables the persistence benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-memory", action="store_true", help="skip the (slower) peak memory pass")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    commit = _git_commit()
+    cases = []
+    for kind in args.graph:
+        for n_nodes in args.nodes:
+            for n_agents in args.agents:
+                case = run_case(kind, n_nodes, n_agents, args.ticks, args.persist_ticks, args.seed, not args.skip_memory)
+                print(
+                    f"{case['name']:<28} init {case['init_seconds']:8.3f}s  "
+                    f"tick p50 {case['tick_seconds']['p50'] * 1000:9.2f}ms  "
+                    f"{case['ticks_per_second']:9.1f} ticks/s"
+                )
+                cases.append(case)
+
+    output = args.output or RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "commit": commit,
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": cases
+    }, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Synthetic city and population generators for benchmarks
+"""
+from typing import Dict, List, Any, Optional
+import numpy as np
+
+MODES = ["car", "transit", "bike", "walk"]
+MODE_SHARES = [0.45, 0.35, 0.12, 0.08]
+
+# Origin of generated coordinates (lon, lat) and grid spacing in degrees (~100m)
+ORIGIN = (-122.45, 37.75)
+SPACING = 0.001
+
+
+def grid_city(n_nodes: int) -> Dict[str, Any]:
+    """Square 4-connected street grid with roughly ``n_nodes`` intersections"""
+    side = max(2, int(round(np.sqrt(n_nodes))))
+    ids = np.arange(side * side)
+    rows, cols = np.divmod(ids, side)
+    x = ORIGIN[0] + cols * SPACING
+    y = ORIGIN[1] + rows * SPACING
+
+    horizontal = ids[cols < side - 1]
+    vertical = ids[rows < side - 1]
+    sources = np.concatenate([horizontal, vertical])
+    targets = np.concatenate([horizontal + 1, vertical + side])
+    return _to_city_data(x, y, sources, targets, highway=np.full(len(sources), "residential"))
+
+
+def osm_like_city(n_nodes: int, seed: int = 0, drop_fraction: float = 0.15, arterial_every: int = 10) -> Dict[str, Any]:
+    """Jittered grid with missing street segments and faster arterials, resembling an OSM drive network"""
+    rng = np.random.default_rng(seed)
+    side = max(2, int(round(np.sqrt(n_nodes))))
+    ids = np.arange(side * side)
+    rows, cols = np.divmod(ids, side)
+    x = ORIGIN[0] + (cols + rng.normal(0, 0.2, len(ids))) * SPACING
+    y = ORIGIN[1] + (rows + rng.normal(0, 0.2, len(ids))) * SPACING
+
+    horizontal = ids[cols < side - 1]
+    vertical = ids[rows < side - 1]
+    sources = np.concatenate([horizontal, vertical])
+    targets = np.concatenate([horizontal + 1, vertical + side])
+    is_arterial = np.concatenate([
+        rows[horizontal] % arterial_every == 0,
+        cols[vertical] % arterial_every == 0
+    ])
+
+    # Drop local streets at random, never arterials, to keep the network connected enough
+    keep = is_arterial | (rng.random(len(sources)) >= drop_fraction)
+    highway = np.where(is_arterial, "primary", "residential")
+    return _to_city_data(x, y, sources[keep], targets[keep], highway=highway[keep])
+
+
+def _to_city_data(x: np.ndarray, y: np.ndarray, sources: np.ndarray, targets: np.ndarray, highway: np.ndarray) -> Dict[str, Any]:
+    """Convert node/edge arrays to the city_data format produced by OSM ingestion"""
+    # Equirectangular metres, adequate at city scale
+    dx = (x[targets] - x[sources]) * 111_320 * np.cos(np.radians(ORIGIN[1]))
+    dy = (y[targets] - y[sources]) * 110_540
+    lengths = np.hypot(dx, dy)
+
+    node_ids = [str(i) for i in range(len(x))]
+    nodes = [
+        {"id": node_ids[i], "attributes": {"x": xi, "y": yi, "lat": yi, "lon": xi}}
+        for i, (xi, yi) in enumerate(zip(x.tolist(), y.tolist()))
+    ]
+    edges = [
+        {"source": node_ids[s], "target": node_ids[t], "weight": length, "attributes": {"length": length, "highway": hw}}
+        for s, t, length, hw in zip(sources.tolist(), targets.tolist(), lengths.tolist(), highway.tolist())
+    ]
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "metadata": {"node_count": len(nodes), "edge_count": len(edges), "synthetic": True}
+    }
+
+
+def synthetic_population(city_data: Dict[str, Any], n_residents: int, seed: int = 0, transit_routes: int = 20) -> List[Dict[str, Any]]:
+    """Agents config with residents on random home/work nodes plus an operator and orchestrator"""
+    rng = np.random.default_rng(seed)
+    node_ids = [node["id"] for node in city_data["nodes"]]
+    homes = rng.integers(0, len(node_ids), n_residents)
+    works = rng.integers(0, len(node_ids), n_residents)
+    modes = rng.choice(len(MODES), n_residents, p=MODE_SHARES)
+    departures = rng.integers(6, 10, n_residents)
+
+    agents_config = [
+        {
+            "agent_type": "resident",
+            "agent_id": f"resident_{i}",
+            "persona_config": {
+                "home_location": node_ids[h],
+                "work_location": node_ids[w],
+                "preferred_mode": MODES[m],
+                "schedule": {"work_start": int(d), "work_end": int(d) + 8}
+            }
+        }
+        for i, (h, w, m, d) in enumerate(zip(homes.tolist(), works.tolist(), modes.tolist(), departures.tolist()))
+    ]
+    routes = [f"route_{r}" for r in range(transit_routes)]
+    agents_config.append({
+        "agent_type": "transit_operator",
+        "agent_id": f"transit_operator_{n_residents}",
+        "persona_config": {"routes": routes, "frequencies": {r: 10 for r in routes}}
+    })
+    agents_config.append({
+        "agent_type": "orchestrator",
+        "agent_id": f"orchestrator_{n_residents + 1}",
+        "persona_config": {}
+    })
+    return agents_config
+
+
+def make_city(kind: str, n_nodes: int, seed: Optional[int] = 0) -> Dict[str, Any]:
+    if kind == "grid":
+        return grid_city(n_nodes)
+    if kind == "osm":
+        return osm_like_city(n_nodes, seed=seed or 0)
+    raise ValueError(f"Unknown city kind: {kind}")
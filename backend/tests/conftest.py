@@ -4,6 +4,7 @@ Pytest configuration and fixtures
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from app.core.database import Base, get_db
 from app.core.config import settings
 import os
@@ -36,3 +37,32 @@ def client():
     from fastapi.testclient import TestClient
     from app.main import app
     return TestClient(app)
+
+
+@pytest.fixture
+def sqlite_sessions():
+    """Session factory for a fresh in-memory SQLite database shared by all connections"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_client(sqlite_sessions):
+    """Test client whose database dependency uses the in-memory SQLite database"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    
+    def override_get_db():
+        session = sqlite_sessions()
+        try:
+            yield session
+        finally:
+            session.close()
+    
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
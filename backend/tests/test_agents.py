@@ -0,0 +1,117 @@
+"""
+Tests for agent reasoning helpers
+"""
+from app.agents import ResidentAgent
+from app.agents.prompting import PromptBuilder, TokenStats, summarize_deltas, summarize_routes
+
+
+def test_prompt_builder_drops_optional_sections_over_budget():
+    """Lowest-priority sections are dropped first and static context stays first"""
+    builder = PromptBuilder("resident", budget=40)
+    builder.add_static("Policy: fares drop to $1.")
+    builder.add("situation", "Time: 8:00")
+    builder.add("routes", "route " * 100, priority=1)
+    builder.instruct("What should you do?")
+
+    prompt = builder.build()
+
+    assert prompt.startswith("Policy: fares drop to $1.")
+    assert "route route" not in prompt
+    assert prompt.dropped_sections == ("routes",)
+    assert prompt.tokens <= 40
+
+
+def test_resident_prompt_summarizes_routes():
+    """Large route lists are summarized to the routes serving the resident"""
+    resident = ResidentAgent("resident_1", {"home_location": "a", "work_location": "b"})
+    routes = [{"id": f"r{i}", "stops": [f"s{i}"]} for i in range(500)] + [{"id": "home_line", "stops": ["a", "b"]}]
+    perception = {"timestamp": {"hour": 8}, "city_state": {"transit_routes": routes}}
+
+    prompt = resident._build_reasoning_prompt(perception)
+
+    assert "home_line (2 stops)" in prompt
+    assert "and 496 more" in prompt
+    assert "r499" not in prompt
+
+
+def test_summaries_and_token_stats():
+    """Ridership is reported as deltas and token usage is accumulated per type"""
+    assert summarize_routes([]) == "none"
+    summary = summarize_deltas({"r1": 120, "r2": 40}, {"r1": 100, "r2": 40})
+    assert "r1 +20" in summary and "r2" not in summary.split("changes:")[1]
+
+    stats = TokenStats()
+    stats.record("resident", "system prompt", "a short prompt")
+    stats.record("resident", "system prompt", "another short prompt")
+    summary = stats.summary()["resident"]
+    assert summary["calls"] == 2
+    assert summary["total_tokens"] == summary["prompt_tokens"] + summary["system_tokens"]
+
+
+def test_surrogate_policy_learns_habitual_mode(tmp_path):
+    """Surrogate reproduces a simple decision rule and round-trips through disk"""
+    from app.agents.surrogate import SurrogatePolicy, extract_features, features_to_matrix
+
+    rows, labels = [], []
+    for mode in ["car", "transit", "bike"]:
+        for hour in range(24):
+            rows.append(extract_features({
+                "timestamp": {"hour": hour},
+                "agent_state": {"preferred_mode": mode, "current_mode": mode, "current_activity": "home"},
+                "city_state": {}
+            }))
+            labels.append(mode)
+
+    policy = SurrogatePolicy().fit(features_to_matrix(rows), labels)
+    policy.save(tmp_path / "resident.json")
+    loaded = SurrogatePolicy.load(tmp_path / "resident.json")
+    predicted, confidence = loaded.predict(features_to_matrix(rows))
+
+    assert predicted == labels
+    assert confidence.min() > 0.5
+
+
+def test_decider_stream_is_one_generator_per_step_apart_from_rng():
+    from app.core.rng import AGENT, stream_key
+    agent = ResidentAgent("resident_0", {"home_location": "n0", "work_location": "n1"})
+    agent.rng_key = stream_key(3, AGENT, "resident_0", 1)
+    stream = agent.decider_rng
+    draws = [stream.random(), agent.decider_rng.random()]
+    assert agent.decider_rng is stream
+    assert draws[0] != agent.rng.random()
+
+    # The same step in another process draws the same values
+    again = ResidentAgent("resident_0", {"home_location": "n0", "work_location": "n1"})
+    again.rng_key = agent.rng_key
+    assert [again.decider_rng.random(), again.decider_rng.random()] == draws
+    agent.rng_key = stream_key(3, AGENT, "resident_0", 2)
+    assert agent.decider_rng is not stream
+
+
+def test_prompt_builder_truncates_static_context_until_it_fits(monkeypatch):
+    """Truncation re-counts tokens when a token spans more than the estimated 4 chars"""
+    monkeypatch.setattr("app.agents.prompting.count_tokens", lambda text: len(text) // 8)
+    builder = PromptBuilder("resident", budget=40)
+    builder.add_static("doc " * 200)
+    builder.add("situation", "Time: 8:00")
+
+    prompt = builder.build()
+
+    assert prompt.dropped_sections == ("static_context",)
+    assert prompt.tokens <= 40
+    assert prompt.startswith("doc doc")
+
+
+def test_transit_operator_prompt_has_no_side_effects():
+    """Building the prompt twice reports the same ridership trend; the step commits it"""
+    from app.agents.transit_operator import TransitOperatorAgent
+    operator = TransitOperatorAgent("transit_1", {"routes": ["r1"]})
+    operator.llm = None
+    perception = {"city_state": {"transit_ridership": {"r1": 120}}}
+
+    first = operator._build_reasoning_prompt(perception)
+    assert operator._build_reasoning_prompt(perception) == first
+    assert "r1 +120" in first
+
+    operator.commit(perception, operator.reason(perception))
+    assert "r1" not in operator._build_reasoning_prompt(perception).split("changes:")[-1]
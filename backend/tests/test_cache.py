@@ -0,0 +1,72 @@
+"""
+Tests for the completed-run response cache
+"""
+from app.core.cache import response_cache, run_scope
+from app.models.scenario import Scenario, ScenarioRun
+from app.models.simulation import SimulationMetrics
+
+
+class MemoryRedis:
+    """The subset of Redis commands used by the cache"""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def pipeline(self, transaction=False):
+        return self
+    
+    def execute(self):
+        pass
+    
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+    
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+    
+    def expire(self, key, ttl):
+        pass
+    
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+    
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+    
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def test_completed_run_metrics_are_cached_with_etag(sqlite_sessions, sqlite_client):
+    db = sqlite_sessions()
+    scenario = Scenario(name="cached", policy_type="none", policy_config={})
+    db.add(scenario)
+    db.flush()
+    run = ScenarioRun(scenario_id=scenario.id, status="completed")
+    db.add(run)
+    db.flush()
+    db.add(SimulationMetrics(run_id=run.id, avg_commute_time=31.5, metrics_json={}))
+    db.commit()
+    run_id = run.id
+    db.close()
+    
+    response_cache._redis = MemoryRedis()
+    try:
+        client = sqlite_client
+        url = f"/api/v1/simulations/runs/{run_id}/metrics"
+        first = client.get(url)
+        assert first.headers["X-Cache"] == "MISS"
+        assert first.json()["avg_commute_time"] == 31.5
+        
+        second = client.get(url)
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.content == first.content
+        
+        not_modified = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+        assert not_modified.status_code == 304
+        
+        response_cache.invalidate(run_scope(run_id))
+        assert client.get(url).headers["X-Cache"] == "MISS"
+    finally:
+        response_cache._redis = None
@@ -0,0 +1,159 @@
+"""
+Tests for graph partitioning and distributed stepping
+"""
+import networkx as nx
+
+from app.simulation.city_model import CityModel
+from app.simulation.distributed import agent_spec, partition_graph, region_worker
+from tests.test_simulation import _city_data, _residents
+
+
+def _commute_reason(self, perception):
+    """Rule-based reasoning: go to the other end of the commute by a randomly drawn mode"""
+    state = perception["agent_state"]
+    destination = state["work_location"] if state["current_activity"] == "home" else state["home_location"]
+    mode = self.rng.choice(["car", "transit", "bike", "walk"])
+    return {"action_type": "move", "action_data": {"destination": destination, "mode": mode, "route_id": "r1"}}
+
+
+def test_partition_is_balanced_with_small_cut():
+    graph = nx.grid_2d_graph(8, 8)
+    for node in graph:
+        graph.nodes[node].update(x=node[0] * 0.001, y=node[1] * 0.001)
+    assignment, report = partition_graph(graph, 4)
+    assert report["sizes"] == [16, 16, 16, 16]
+    # Four 4x4 quadrants cut 2 * 8 edges
+    assert report["edge_cut"] == 16
+    assert len(set(assignment.values())) == 4
+
+
+def _run(run_config):
+    agents_config = [{"agent_type": "orchestrator", "agent_id": "orchestrator_99"}] + _residents(6, home="n0", work="n7")
+    model = CityModel(city_data=_city_data(8), scenario_config={}, agents_config=agents_config, seed=11, run_config=run_config)
+    try:
+        for _ in range(4):
+            model.step()
+        return model
+    finally:
+        model.close()
+
+
+def _assert_matches(single, distributed):
+    for agent_id, agent in single.agents.items():
+        mirrored = distributed.agents[agent_id]
+        assert mirrored.state == agent.state
+        # Regions keep their residents' memory; the coordinator only mirrors state
+        if agent.agent_type == "resident":
+            assert mirrored.memory == []
+        else:
+            assert [m["action"] for m in mirrored.memory] == [m["action"] for m in agent.memory]
+    assert distributed.city_state["transit_ridership"] == single.city_state["transit_ridership"]
+    assert distributed.kpis.report() == single.kpis.report()
+
+
+def test_distributed_run_matches_single_process(monkeypatch):
+    from app.agents.resident import ResidentAgent
+    from app.simulation.distributed import LocalTransport
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", _commute_reason)
+    sent = []
+    send = LocalTransport.send
+    
+    def record(self, channel, message):
+        sent.append((channel, message))
+        send(self, channel, message)
+    
+    monkeypatch.setattr(LocalTransport, "send", record)
+    
+    single = _run({})
+    distributed = _run({"distributed": {"enabled": True, "regions": 2, "timeout": 30}})
+    
+    report = distributed.get_run_stats()["distributed"]
+    assert report["regions"] == 2
+    # Every resident crosses the region boundary every step
+    assert report["migrations"] == 6 * 4
+    _assert_matches(single, distributed)
+    # Steps carry the shared city state and neighbouring boundary residents, never the run's agent list
+    steps = [message for _, message in sent if message["type"] == "step"]
+    assert len(steps) == 2 * 4
+    assert all("agents" not in message["environment"] for message in steps)
+    assert all({entry["id"] for entry in message["boundary"]} <= {f"resident_{i}" for i in range(6)} for message in steps)
+
+
+def _run_in_daemon(queue):
+    from app.agents.resident import ResidentAgent
+    ResidentAgent._simple_reason = _commute_reason
+    single = _run({})
+    distributed = _run({"distributed": {"enabled": True, "regions": 2, "timeout": 30}})
+    try:
+        _assert_matches(single, distributed)
+        queue.put(distributed.get_run_stats()["distributed"]["migrations"])
+    except AssertionError as e:
+        queue.put(repr(e))
+
+
+def test_daemonic_coordinator_runs_regions_as_processes():
+    """Celery prefork workers are daemonic; regions still run as child processes with the same results"""
+    import multiprocessing
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_run_in_daemon, args=(queue,), daemon=True)
+    process.start()
+    assert queue.get(timeout=60) == 6 * 4
+    process.join()
+
+
+def test_region_worker_stops_without_coordinator(monkeypatch):
+    monkeypatch.setattr("app.simulation.distributed.POLL_SECONDS", 0.01)
+    
+    class OrphanedTransport:
+        def recv(self, channel, timeout):
+            raise TimeoutError(channel)
+        
+        def coordinator_alive(self):
+            return False
+    
+    region_worker(0, OrphanedTransport(), {}, seed=1)
+
+
+def test_region_tasks_have_a_dedicated_queue():
+    from app.core.celery_app import celery_app
+    assert celery_app.conf.task_routes["run_region_worker"] == {"queue": "regions"}
+
+
+def test_region_persists_its_residents_actions(monkeypatch, sqlite_sessions):
+    from app.agents.resident import ResidentAgent
+    from app.models.agent import AgentAction
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", _commute_reason)
+    monkeypatch.setattr("app.simulation.distributed._open_session", sqlite_sessions)
+    resident = ResidentAgent("resident_3", {"home_location": "n0", "work_location": "n7"})
+    environment = {"timestamp": {"tick": 5, "hour": 0, "day": 0}, "city_state": {}, "events": []}
+    
+    class ScriptedTransport:
+        def __init__(self):
+            self.inbox = [
+                {"type": "agents", "agents": [agent_spec(resident)]},
+                {"type": "boundary", "nodes": ["n0"]},
+                {"type": "persist"},
+                {"type": "step", "environment": environment, "boundary": []},
+                {"type": "stop"}
+            ]
+            self.results = []
+        
+        def recv(self, channel, timeout):
+            return self.inbox.pop(0)
+        
+        def send(self, channel, message):
+            self.results.append(message)
+    
+    transport = ScriptedTransport()
+    region_worker(0, transport, {"n0": 0, "n7": 1}, seed=1)
+    
+    [result] = transport.results
+    assert result["actions"]["resident_3"]["action_type"] == "move"
+    # The resident left for region 1 with its memory
+    [(target, spec)] = result["migrants"]
+    assert target == 1 and len(spec[5]) == 1
+    db = sqlite_sessions()
+    [action] = db.query(AgentAction).all()
+    assert (action.agent_id, action.simulation_tick, action.action_type) == (3, 5, "move")
+    db.close()
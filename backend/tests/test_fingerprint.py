@@ -0,0 +1,63 @@
+"""
+Tests for run fingerprints and reuse of identical runs
+"""
+from app.models.scenario import Scenario, ScenarioRun
+from app.models.simulation import RunSummary
+from app.simulation import fingerprint as fingerprint_module
+from app.simulation.fingerprint import build_agents_config, run_fingerprint
+
+
+def _fingerprint(policy_config, seed=1, run_config=None):
+    scenario_config = {"name": "s", "policy_type": "congestion_pricing", "policy_config": policy_config}
+    return run_fingerprint(scenario_config, "3:", build_agents_config(scenario_config, 7), seed, 7, run_config)
+
+
+def test_fingerprint_is_canonical_and_input_sensitive():
+    assert _fingerprint({"price": 5, "zone": "cbd"}) == _fingerprint({"zone": "cbd", "price": 5})
+    assert _fingerprint({"price": 5}) != _fingerprint({"price": 6})
+    assert _fingerprint({"price": 5}) != _fingerprint({"price": 5}, run_config={"archetypes": {"enabled": True}})
+    assert _fingerprint({"price": 5}, seed=None) is None
+
+
+def test_fingerprint_version_bump_retires_older_results(monkeypatch):
+    before = _fingerprint({"price": 5})
+    monkeypatch.setattr(fingerprint_module, "FINGERPRINT_VERSION", fingerprint_module.FINGERPRINT_VERSION + 1)
+    assert _fingerprint({"price": 5}) != before
+
+
+def test_fingerprint_tracks_surrogate_model(tmp_path):
+    model = tmp_path / "resident.json"
+    model.write_text('{"classes": ["car"]}')
+    run_config = {"surrogate": {"enabled": True, "model_path": str(model)}}
+    before = _fingerprint({"price": 5}, run_config=run_config)
+    
+    model.write_text('{"classes": ["car", "transit"]}')
+    assert _fingerprint({"price": 5}, run_config=run_config) != before
+
+
+def test_identical_run_reuses_completed_results(sqlite_sessions, sqlite_client):
+    db = sqlite_sessions()
+    scenario = Scenario(name="s", policy_type="congestion_pricing", policy_config={"price": 5})
+    db.add(scenario)
+    db.flush()
+    scenario_config = {"name": "s", "policy_type": "congestion_pricing", "policy_config": {"price": 5}}
+    fingerprint = run_fingerprint(scenario_config, None, build_agents_config(scenario_config, 7), 42, 7, None)
+    source = ScenarioRun(scenario_id=scenario.id, status="completed", seed=42, fingerprint=fingerprint, metrics={"equity_index": 0.8})
+    db.add(source)
+    db.flush()
+    db.add(RunSummary(run_id=source.id, scenario_id=scenario.id, seed=42, ticks=100, equity_index=0.8, series={"day": {}}))
+    db.commit()
+    scenario_id, source_id = scenario.id, source.id
+    db.close()
+    
+    response = sqlite_client.post(f"/api/v1/scenarios/{scenario_id}/runs", json={"seed": 42})
+    assert response.status_code == 201
+    run = response.json()
+    assert run["status"] == "completed"
+    assert run["source_run_id"] == source_id
+    assert run["metrics"] == {"equity_index": 0.8}
+
+    # The reused run is listed with the source's headline KPIs; series stay on the source's summary
+    listed = sqlite_client.get("/api/v1/scenarios/runs/summaries", params={"scenario_id": scenario_id}).json()
+    reused = next(row for row in listed if row["run_id"] == run["id"])
+    assert reused["equity_index"] == 0.8 and reused["ticks"] == 100
@@ -0,0 +1,101 @@
+"""
+Tests for streaming KPI accumulators
+"""
+import numpy as np
+import pytest
+
+from app.simulation.city_model import CityModel
+from app.simulation.kpis import Welford, QuantileSketch, KPIEngine
+from tests.test_simulation import _city_data, _residents, _random_mode_reason
+
+
+def test_accumulators_match_batch_statistics():
+    values = np.random.default_rng(0).lognormal(3.0, 0.5, 5000)
+    left, right, sketch = Welford(), Welford(), QuantileSketch(0.01)
+    for value in values[:1234]:
+        left.update(value)
+    for value in values[1234:]:
+        right.update(value)
+    for value in values:
+        sketch.update(value)
+    left.merge(right)
+    assert left.count == 5000
+    assert left.mean == pytest.approx(values.mean())
+    assert left.variance == pytest.approx(values.var(ddof=1))
+    assert (left.min, left.max) == (values.min(), values.max())
+    for q in (0.5, 0.9, 0.99):
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
+
+
+def test_engine_rolls_up_hours_and_days():
+    engine = KPIEngine()
+    for tick, minutes in [(10, 20.0), (50, 40.0), (70, 30.0), (24 * 60 + 5, 10.0)]:
+        engine.observe_departure(tick, "transit" if minutes > 25 else "car", "r1" if minutes > 25 else None)
+        engine.observe_trip(tick, minutes)
+    hourly = engine.series("hour")
+    assert hourly["start"] == [0, 60, 24 * 60]
+    assert hourly["trips"] == [2, 1, 1]
+    assert hourly["commute_mean"] == [30.0, 30.0, 10.0]
+    daily = engine.series("day")
+    assert daily["start"] == [0, 24 * 60]
+    assert daily["boardings"] == [2, 0]
+    assert daily["transit_modal_share"] == [pytest.approx(2 / 3, abs=1e-4), 0.0]
+    assert engine.snapshot() == {"avg_commute_time": 25.0, "transit_modal_share": 0.5, "transit_boardings": {"r1": 2}}
+
+
+def test_model_accumulates_kpis_across_ticks(monkeypatch):
+    from app.agents.resident import ResidentAgent
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", _random_mode_reason)
+    model = CityModel(city_data=_city_data(), scenario_config={}, agents_config=_residents(20), seed=1)
+    modes = []
+    for _ in range(3):
+        model.step()
+        modes += [agent.memory[-1]["action"]["action_data"]["mode"] for agent in model.agents.values()]
+    report = model.get_run_stats()["kpis"]
+    # Every tick's moves count, not only the last tick's
+    assert report["decisions"] == 60
+    assert report["boardings"] == {"default": modes.count("transit")}
+    assert report["transit_modal_share"] == pytest.approx(modes.count("transit") / 60)
+    assert model.kpis.series("hour")["decisions"] == [60]
+
+
+def test_current_values_cover_only_the_window():
+    engine = KPIEngine()
+    for tick, minutes in [(10, 20.0), (50, 40.0), (70, 30.0)]:
+        engine.observe_departure(tick, "transit" if minutes > 25 else "car", "r1")
+        engine.observe_trip(tick, minutes)
+    assert engine.current(59) == {"avg_commute_time": 30.0, "transit_modal_share": 0.5, "transit_boardings": {"r1": 2}}
+    assert engine.current(75) == {"avg_commute_time": 30.0, "transit_modal_share": 1.0, "transit_boardings": {"r1": 1}}
+    assert engine.current(130) == {"avg_commute_time": None, "transit_modal_share": None, "transit_boardings": {}}
+    daily = KPIEngine(window="day")
+    for tick in (10, 70):
+        daily.observe_trip(tick, 30.0)
+    assert daily.current(130)["avg_commute_time"] == 30.0
+    with pytest.raises(ValueError):
+        KPIEngine(window="week")
+
+
+def _drive_to_other_end(self, perception):
+    state = perception["agent_state"]
+    destination = state["work_location"] if state["current_activity"] == "home" else state["home_location"]
+    return {"action_type": "move", "action_data": {"destination": destination, "mode": "car"}}
+
+
+def test_tick_commutes_count_trips_not_decisions(monkeypatch):
+    from app.agents.resident import ResidentAgent
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", _drive_to_other_end)
+    agents_config = [{"agent_type": "orchestrator", "agent_id": "orchestrator_99"}] + _residents(4) + [
+        dict(config, agent_id=f"resident_{4 + i}") for i, config in enumerate(_residents(4, work="n0"))
+    ]
+    model = CityModel(city_data=_city_data(), scenario_config={}, agents_config=agents_config, seed=1)
+    for agent in model.schedule.of_type("resident"):
+        agent.state["car_commute_minutes"] = 20.0
+    for _ in range(3):
+        model.step()
+    report = model.get_run_stats()["kpis"]
+    assert report["decisions"] == 8 * 3
+    # Residents working at home move without travelling
+    assert report["commute"]["count"] == 4 * 3
+    # Metrics are the current hour's, which here is the whole run
+    assert model.city_state["metrics"]["avg_commute_time"] == 20.0
+    assert model.city_state["metrics"]["transit_modal_share"] == 0.0
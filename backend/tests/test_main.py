@@ -25,3 +25,25 @@ def test_api_docs_available(client):
     """Test that API docs are available"""
     response = client.get("/api/docs")
     assert response.status_code == 200
+
+
+def test_metrics_endpoint(client):
+    """Test that Prometheus metrics are exposed"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "citylab_simulation_ticks_total" in response.text
+
+
+def test_worker_metrics_group_is_stable_and_dropped_on_shutdown(monkeypatch):
+    """Worker pushes group by a stable instance, not the pid, and the group is deleted when the process exits"""
+    from app.core import metrics
+    monkeypatch.setattr(metrics.settings, "PROMETHEUS_PUSHGATEWAY_URL", "gateway:9091")
+    monkeypatch.setattr(metrics.settings, "WORKER_INSTANCE_ID", "worker-a")
+    calls = []
+    monkeypatch.setattr(metrics, "push_to_gateway", lambda url, job, registry, grouping_key: calls.append(("push", grouping_key)))
+    monkeypatch.setattr(metrics, "delete_from_gateway", lambda url, job, grouping_key: calls.append(("delete", grouping_key)))
+
+    metrics.push_metrics(metrics.WORKER_METRICS_JOB, {"instance": metrics.worker_instance()})
+    metrics._on_worker_process_shutdown()
+
+    assert calls == [("push", {"instance": "worker-a-0"}), ("delete", {"instance": "worker-a-0"})]
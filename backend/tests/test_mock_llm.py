@@ -0,0 +1,99 @@
+"""
+Tests for the mock LLM server
+"""
+from fastapi.testclient import TestClient
+from app.mock_llm import MockLLMConfig, create_app
+
+
+def _chat(client, prompt):
+    return client.post("/v1/chat/completions", json={
+        "model": "mock",
+        "messages": [
+            {"role": "system", "content": "You are a resident agent in an urban simulation."},
+            {"role": "user", "content": prompt}
+        ]
+    })
+
+
+def test_responses_are_deterministic_per_seed():
+    """Same seed and prompt give the same response across server instances"""
+    first = _chat(TestClient(create_app(MockLLMConfig(seed=7))), "Time: 8:00").json()
+    second = _chat(TestClient(create_app(MockLLMConfig(seed=7))), "Time: 8:00").json()
+
+    assert first["choices"][0]["message"]["content"] == second["choices"][0]["message"]["content"]
+    assert first["usage"]["prompt_tokens"] > 0
+
+
+def test_anthropic_endpoint_and_stats():
+    """Anthropic-style requests are served and accounted per agent type"""
+    client = TestClient(create_app(MockLLMConfig()))
+    response = client.post("/v1/messages", json={
+        "model": "mock",
+        "system": "You are a transit operator agent managing public transportation.",
+        "messages": [{"role": "user", "content": "Ridership is up."}],
+        "max_tokens": 100
+    })
+
+    assert response.status_code == 200
+    assert response.json()["content"][0]["type"] == "text"
+    stats = client.get("/stats").json()
+    assert stats["by_agent_type"]["transit_operator"]["requests"] == 1
+
+
+def test_error_injection():
+    """Error rate 1.0 fails every request with a retryable status"""
+    client = TestClient(create_app(MockLLMConfig(error_rate=1.0)))
+    response = _chat(client, "Time: 8:00")
+
+    assert response.status_code in (429, 500, 503)
+    assert client.get("/stats").json()["totals"]["errors"] == 1
+
+
+def test_attempt_comes_from_client_not_server_history():
+    """Repeated requests get the same outcome; only a client-supplied attempt varies faults"""
+    client = TestClient(create_app(MockLLMConfig(seed=3, error_rate=0.5)))
+    prompts = [f"Time: 8:{i:02d}" for i in range(20)]
+    failing = next(p for p in prompts if _chat(client, p).status_code != 200)
+
+    assert len({_chat(client, failing).status_code for _ in range(3)}) == 1
+    retried = [
+        client.post("/v1/chat/completions", headers={"X-Mock-Attempt": str(attempt)}, json={
+            "model": "mock",
+            "messages": [
+                {"role": "system", "content": "You are a resident agent in an urban simulation."},
+                {"role": "user", "content": failing}
+            ]
+        }).status_code
+        for attempt in range(1, 20)
+    ]
+    assert 200 in retried
+
+
+def test_sdk_retries_are_numbered_attempts():
+    """Retries made by the OpenAI SDK reach the server as later attempts, so an injected fault can clear"""
+    from langchain.schema import HumanMessage, SystemMessage
+    from langchain_openai import ChatOpenAI
+    from app.agents.base import _tag_attempt, numbered_attempts
+
+    client = TestClient(create_app(MockLLMConfig(seed=3, error_rate=0.5)))
+    prompts = [f"Time: 9:{i:02d}" for i in range(40)]
+    failing = next(
+        p for p in prompts
+        if _chat(client, p).status_code != 200 and client.post("/v1/chat/completions", headers={"X-Mock-Attempt": "1"}, json={
+            "model": "mock",
+            "messages": [
+                {"role": "system", "content": "You are a resident agent in an urban simulation."},
+                {"role": "user", "content": p}
+            ]
+        }).status_code == 200
+    )
+    client.event_hooks["request"].append(_tag_attempt)
+    llm = ChatOpenAI(model="mock", api_key="test", base_url="http://testserver/v1", max_retries=1, http_client=client)
+
+    with numbered_attempts():
+        response = llm.invoke([
+            SystemMessage(content="You are a resident agent in an urban simulation."),
+            HumanMessage(content=failing)
+        ])
+
+    assert response.content
@@ -0,0 +1,66 @@
+"""
+Tests for synthetic population generation
+"""
+import numpy as np
+
+from app.core.config import settings
+from app.simulation.city_model import CityModel
+from app.simulation.population import ipf, synthesize, load_or_synthesize
+from tests.test_simulation import _city_data
+
+ATTRIBUTES = {
+    "income": {"low": 0.3, "mid": 0.5, "high": 0.2},
+    "preferred_mode": {"car": 0.5, "transit": 0.3, "bike": 0.2},
+}
+
+
+def test_ipf_matches_marginals_and_keeps_seed_structure():
+    seed = np.array([[1.0, 1.0, 0.0], [1.0, 2.0, 1.0], [3.0, 1.0, 1.0]])
+    table = ipf(seed, [np.array([30, 50, 20]), np.array([50, 30, 20])])
+    assert np.allclose(table.sum(axis=1), [30, 50, 20])
+    assert np.allclose(table.sum(axis=0), [50, 30, 20])
+    assert table[0, 2] == 0
+
+
+def test_population_is_seeded_and_fitted():
+    city_data = _city_data(10)
+    model = CityModel(city_data=city_data, scenario_config={}, agents_config=[], seed=1)
+    config = {
+        "size": 20000,
+        "attributes": ATTRIBUTES,
+        "zones": [{"lat": 0.0, "lon": 0.0, "residents": 1}, {"lat": 0.0, "lon": 0.009, "jobs": 1}]
+    }
+    population = synthesize(model.graph, config, seed=7)
+    assert len(population) == 20000
+    shares = population.summary()["attributes"]["income"]
+    assert abs(shares["mid"] / 20000 - 0.5) < 0.02
+    # Zone centroids snap to their nearest nodes
+    assert set(population.node_ids[population.home]) == {"n0"}
+    assert set(population.node_ids[population.work]) == {"n9"}
+    again = synthesize(model.graph, config, seed=7)
+    assert np.array_equal(population.codes["income"], again.codes["income"])
+
+
+def test_model_builds_cached_population(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROCESSED_DATA_DIR", tmp_path)
+    agents_config = [{
+        "agent_type": "population",
+        "persona_config": {"size": 500, "attributes": ATTRIBUTES, "max_agents": 50, "city_version": "1:"}
+    }]
+    model = CityModel(city_data=_city_data(), scenario_config={}, agents_config=agents_config, seed=3)
+    residents = [agent for agent in model.agents.values() if agent.agent_type == "resident"]
+    assert len(residents) == 50
+    assert residents[0].state["home_location"] in model.graph
+    assert model.get_run_stats()["population"]["size"] == 500
+    assert len(list((tmp_path / "populations").glob("*.npz"))) == 1
+
+    cached = load_or_synthesize(model.graph, agents_config[0]["persona_config"], seed=3)
+    assert np.array_equal(cached.home, model.population.home)
+    assert cached.persona(0) == residents[0].persona_config
+
+
+def test_cache_key_follows_synthesis_code(monkeypatch):
+    from app.simulation import population
+    key = population.population_cache_key("1:", {"size": 10}, seed=3)
+    monkeypatch.setattr(population, "synthesis_version", lambda: "changed")
+    assert population.population_cache_key("1:", {"size": 10}, seed=3) != key
@@ -0,0 +1,102 @@
+"""
+Tests for live run progress publishing and coalescing
+"""
+import asyncio
+import json
+from app.core.progress import ProgressHub, ProgressPublisher, ProgressSubscriber
+
+
+class RecordingRedis:
+    """Captures pipelined commands"""
+    
+    def __init__(self):
+        self.published = []
+        self.values = {}
+    
+    def pipeline(self, transaction=False):
+        return self
+    
+    def set(self, key, value, ex=None):
+        self.values[key] = json.loads(value)
+    
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+    
+    def execute(self):
+        pass
+
+
+def test_publisher_sends_kpi_deltas_and_keeps_latest_state():
+    redis = RecordingRedis()
+    publisher = ProgressPublisher(7, redis=redis, every=1)
+    publisher.publish_tick(0, 3, {"equity_index": 0.7, "avg_commute_time": 30})
+    publisher.publish_tick(1, 3, {"equity_index": 0.7, "avg_commute_time": 28})
+    
+    channel, message = redis.published[-1]
+    assert channel == "run:7:progress"
+    assert message["kpi_delta"] == {"avg_commute_time": 28}
+    assert redis.values["run:7:progress:latest"]["kpis"] == {"equity_index": 0.7, "avg_commute_time": 28}
+
+
+def test_slow_subscriber_receives_one_coalesced_message():
+    async def scenario():
+        subscriber = ProgressSubscriber(7)
+        for tick in range(5):
+            subscriber.offer({"type": "tick", "tick": tick, "kpi_delta": {f"kpi_{tick % 2}": tick}})
+        message = await subscriber.next(timeout=0.1)
+        assert message["tick"] == 4
+        assert message["kpi_delta"] == {"kpi_0": 4, "kpi_1": 3}
+        assert message["coalesced"] == 5
+        assert await subscriber.next(timeout=0.01) is None
+    
+    asyncio.run(scenario())
+
+
+class FakePubSub:
+    """Async pub/sub whose channel only receives messages once subscribed"""
+    
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = asyncio.Queue()
+    
+    async def subscribe(self, channel):
+        await asyncio.sleep(0)
+        self.broker.setdefault(channel, []).append(self.queue)
+    
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+    
+    async def unsubscribe(self, channel):
+        self.broker[channel].remove(self.queue)
+    
+    async def close(self):
+        pass
+
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.broker = {}
+    
+    def pubsub(self):
+        return FakePubSub(self.broker)
+    
+    def publish(self, channel, message):
+        for queue in self.broker.get(channel, []):
+            queue.put_nowait({"type": "message", "data": json.dumps(message)})
+
+
+def test_hub_subscription_is_live_when_subscribe_returns():
+    async def scenario():
+        hub = ProgressHub(redis_url="redis://unused")
+        hub._redis = FakeAsyncRedis()
+        first, second = await asyncio.gather(hub.subscribe(7), hub.subscribe(7))
+        hub.redis.publish("run:7:progress", {"type": "tick", "tick": 0, "kpi_delta": {}})
+        
+        assert (await first.next(timeout=0.1))["tick"] == 0
+        assert (await second.next(timeout=0.1))["tick"] == 0
+        assert len(hub.redis.broker["run:7:progress"]) == 1
+        await hub.unsubscribe(first)
+        await hub.unsubscribe(second)
+    
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+"""
+Tests for KPI rollups and downsampled playback
+"""
+import numpy as np
+
+from app.core.cache import response_cache
+from app.models.scenario import Scenario, ScenarioRun
+from app.models.simulation import SimulationRollup
+from app.simulation.rollups import TimeSeriesRecorder, chunks, lttb, sample_values
+from tests.test_cache import MemoryRedis
+
+
+def test_lttb_keeps_extremes_and_rollups_aggregate():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[437] = 5.0
+    chosen = lttb(x, y, 50)
+    assert len(chosen) == 50
+    assert chosen[0] == 0 and chosen[-1] == 999
+    assert 437 in chosen
+    assert np.all(np.diff(chosen) > 0)
+
+    recorder = TimeSeriesRecorder()
+    for tick in range(180):
+        recorder.record(tick, {"avg_commute_time": float(tick // 60)} if tick < 150 else {"traffic_level": 1.0})
+    rollups = recorder.rollups()
+    assert rollups["hour"]["ticks"] == [0, 60, 120]
+    assert rollups["hour"]["series"]["avg_commute_time"] == [0.0, 1.0, 2.0]
+    assert rollups["hour"]["series"]["traffic_level"] == [None, None, 1.0]
+    assert rollups["day"]["max"]["avg_commute_time"] == [2.0]
+    assert len(rollups["minute"]["series"]["traffic_level"]) == 180
+
+
+def test_samples_take_kpis_from_the_window():
+    # Event runs keep the run-to-date trip mean in city state; it must not be sampled as the KPI
+    city_state = {"avg_commute_time": 41.0, "transit_ridership": {"r1": 2, "r2": 1}, "metrics": {"equity_index": 0.7}}
+    values = sample_values(city_state, {"avg_commute_time": None, "transit_modal_share": 0.25, "transit_boardings": {"r1": 3}})
+    assert values == {"transit_ridership": 3.0, "equity_index": 0.7, "transit_modal_share": 0.25, "transit_boardings": 3.0}
+
+
+def test_series_endpoint_downsamples_from_rollups(sqlite_sessions, sqlite_client):
+    db = sqlite_sessions()
+    scenario = Scenario(name="playback", policy_type="none", policy_config={})
+    db.add(scenario)
+    db.flush()
+    run = ScenarioRun(scenario_id=scenario.id, status="completed")
+    db.add(run)
+    db.flush()
+    recorder = TimeSeriesRecorder()
+    for tick in range(0, 30 * 24 * 60, 15):
+        recorder.record(tick, {"avg_commute_time": 30 + 5 * np.sin(tick / 600), "transit_ridership": tick % 7})
+    for resolution, rollup in recorder.rollups().items():
+        for chunk, part in chunks(resolution, rollup):
+            db.add(SimulationRollup(
+                run_id=run.id, resolution=resolution, chunk=chunk, ticks=part["ticks"], series=part["series"],
+                minimum=part.get("min"), maximum=part.get("max")
+            ))
+    db.commit()
+    # Minute samples are stored one row per simulated day
+    assert db.query(SimulationRollup).filter(SimulationRollup.resolution == "minute").count() == 30
+    run_id = run.id
+    db.close()
+
+    response_cache._redis = MemoryRedis()
+    try:
+        client = sqlite_client
+        url = f"/api/v1/simulations/runs/{run_id}/series"
+        body = client.get(url, params={"points": 100, "metrics": ["avg_commute_time"]}).json()
+        # 720 hourly buckets cover 100 points, so the minute samples are not read
+        assert body["resolution"] == "hour"
+        assert list(body["series"]) == ["avg_commute_time"]
+        points = body["series"]["avg_commute_time"]
+        assert len(points["ticks"]) == 100
+        # Hourly buckets carry their extremes around the mean
+        assert len(points["min"]) == len(points["max"]) == 100
+        assert all(low <= mean <= high for low, mean, high in zip(points["min"], points["values"], points["max"]))
+        assert any(low < high for low, high in zip(points["min"], points["max"]))
+
+        # A short range needs the raw samples
+        body = client.get(url, params={"points": 50, "tick_start": 600, "tick_end": 2400}).json()
+        assert body["resolution"] == "minute"
+        ticks = body["series"]["transit_ridership"]["ticks"]
+        assert len(ticks) == 50 and ticks[0] == 600 and ticks[-1] == 2400
+        assert body["series"]["transit_ridership"]["min"] is None
+
+        # A range crossing a day boundary reads both days' rows
+        body = client.get(url, params={"points": 200, "tick_start": 1300, "tick_end": 1600}).json()
+        ticks = body["series"]["transit_ridership"]["ticks"]
+        assert body["resolution"] == "minute"
+        assert ticks[0] == 1305 and ticks[-1] == 1590 and len(ticks) == 20
+
+        # An open range of 30 days would need every minute row; hourly buckets serve it instead
+        body = client.get(url, params={"points": 5000}).json()
+        assert body["resolution"] == "hour"
+        assert len(body["series"]["transit_ridership"]["ticks"]) == 720
+        body = client.get(url, params={"points": 5000, "tick_start": 0, "tick_end": 3 * 24 * 60}).json()
+        assert body["resolution"] == "minute"
+    finally:
+        response_cache._redis = None
@@ -0,0 +1,159 @@
+"""
+Tests for host-wide shared arrays
+"""
+import multiprocessing
+import os
+import uuid
+import numpy as np
+import pytest
+
+from app.core import shared_memory
+from app.core.config import settings
+from app.core.shared_memory import SharedArrays, sweep_stale
+from app.simulation.city_model import CityModel
+from app.simulation.population import load_or_synthesize, node_id_array
+from tests.test_simulation import _city_data
+
+
+@pytest.fixture(autouse=True)
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_memory, "REGISTRY_DIR", tmp_path / "shm")
+
+
+def _child_sum(key, queue):
+    shared = SharedArrays.attach(key)
+    queue.put((float(shared["values"].sum()), shared["values"].flags.writeable))
+    shared.release()
+
+
+def _child_hold(key):
+    # Exits without releasing, as a crashed run would
+    SharedArrays.attach(key)
+    os._exit(0)
+
+
+def test_children_attach_and_last_release_unlinks():
+    key = f"test:{uuid.uuid4().hex}"
+    values = np.arange(1000, dtype=np.float64)
+    shared = SharedArrays.publish(key, {"values": values}, meta={"unit": "m"})
+    assert shared.meta == {"unit": "m"}
+    assert not shared["values"].flags.writeable
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=_child_sum, args=(key, queue))
+    child.start()
+    assert queue.get(timeout=30) == (values.sum(), False)
+    child.join(timeout=30)
+
+    # A second publish of the same key attaches to the existing copy
+    again = SharedArrays.publish(key, {"values": np.zeros(3)})
+    assert again["values"].shape == (1000,)
+    again.release()
+    shared.release()
+    # The last holder gone, the segments and registry entry are removed
+    assert SharedArrays.attach(key) is None
+
+
+def test_segments_of_exited_holders_are_swept():
+    key = f"test:{uuid.uuid4().hex}"
+    with SharedArrays.publish(key, {"values": np.ones(10)}):
+        child = multiprocessing.get_context("fork").Process(target=_child_hold, args=(key,))
+        child.start()
+        child.join(timeout=30)
+    # The child never released; its dead pid keeps the arrays until swept
+    assert sweep_stale() == 1
+    assert SharedArrays.attach(key) is None
+
+
+def test_runs_share_one_population(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROCESSED_DATA_DIR", tmp_path)
+    config = {
+        "size": 500,
+        "attributes": {"income": {"low": 0.5, "high": 0.5}},
+        "city_version": "v1",
+        "shared_memory": True
+    }
+    model = CityModel(city_data=_city_data(10), scenario_config={}, agents_config=[], seed=1)
+    first = load_or_synthesize(model.graph, config, seed=3)
+    second = load_or_synthesize(model.graph, config, seed=3)
+    assert first.shared is not None and second.shared is not None
+    assert np.shares_memory(second.home, second.shared["home"])
+    assert [a.persona_config for a in first.residents(limit=20)] == [a.persona_config for a in second.residents(limit=20)]
+    first.release()
+    second.release()
+    assert not list(shared_memory.REGISTRY_DIR.glob("*.json"))
+
+
+def test_node_ids_are_typed_arrays():
+    osm = node_id_array([101, 57, 9000000001])
+    assert osm.dtype == np.int64
+    assert node_id_array(["n0", "n12"]).dtype.kind == "U"
+    with pytest.raises(ValueError):
+        node_id_array(["n0", 1])
+
+
+def _shared_population_run(run_config):
+    from app.agents.resident import ResidentAgent
+    agents_config = [{
+        "agent_type": "population",
+        "persona_config": {
+            "size": 60,
+            "attributes": {"preferred_mode": {"transit": 0.5, "car": 0.5}},
+            "city_version": "v1",
+            "shared_memory": True
+        }
+    }]
+    model = CityModel(city_data=_city_data(4), scenario_config={}, agents_config=agents_config, seed=3, run_config=run_config)
+    assert isinstance(model.agents["resident_0"], ResidentAgent)
+    key = model.population.shared_key
+    for _ in range(3):
+        model.step()
+    # Population columns are views of the shared segments, so read stats before releasing them
+    stats = model.get_run_stats()
+    model.close()
+    modes = [m["action"]["action_data"]["mode"] for a in model.agents.values() for m in a.memory]
+    return stats, key, modes
+
+
+def test_workers_resolve_personas_from_shared_population(tmp_path, monkeypatch):
+    from app.agents.resident import ResidentAgent
+    from tests.test_simulation import _random_mode_reason
+    monkeypatch.setattr(settings, "PROCESSED_DATA_DIR", tmp_path)
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", _random_mode_reason)
+
+    _, key, serial = _shared_population_run({})
+    stats, _, parallel = _shared_population_run(
+        {"parallel": {"enabled": True, "workers": 2, "min_agents": 10, "start_method": "fork"}}
+    )
+    assert key is not None
+    assert stats["parallel"]["agents"] == 180
+    assert parallel == serial
+    # Pool workers released their attachments; nothing is left published
+    assert not list(shared_memory.REGISTRY_DIR.glob("*.json"))
+
+
+def test_region_agents_travel_as_population_rows(tmp_path, monkeypatch):
+    from app.simulation.distributed import agent_spec, build_agent
+    from app.simulation.population import attach_population
+    monkeypatch.setattr(settings, "PROCESSED_DATA_DIR", tmp_path)
+    agents_config = [{
+        "agent_type": "population",
+        "persona_config": {"size": 10, "city_version": "v1", "shared_memory": True}
+    }]
+    model = CityModel(city_data=_city_data(4), scenario_config={}, agents_config=agents_config, seed=3)
+    agent = model.agents["resident_4"]
+    spec = agent_spec(agent, by_row=True)
+    assert spec[3] == 4
+
+    key = model.population.shared_key
+    population = attach_population(key)
+    # Node ids resolve from the shared array itself, not a per-process copy
+    assert np.shares_memory(population.node_ids, population.shared["node_ids"])
+    rebuilt = build_agent(spec, population)
+    assert rebuilt.persona_config == agent.persona_config
+    assert type(rebuilt.persona_config["home_location"]) is str
+    assert agent_spec(rebuilt, by_row=True) == spec
+    population.release()
+    model.close()
+    assert attach_population(key) is None
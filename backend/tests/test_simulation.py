@@ -0,0 +1,316 @@
+"""
+Tests for the simulation model
+"""
+import pytest
+from app.simulation.city_model import CityModel
+
+
+def _city_data(node_count=4):
+    """Small line graph with coordinates"""
+    return {
+        "nodes": [
+            {"id": f"n{i}", "attributes": {"x": i * 0.001, "y": 0.0}}
+            for i in range(node_count)
+        ],
+        "edges": [
+            {"source": f"n{i}", "target": f"n{i + 1}", "weight": 100.0}
+            for i in range(node_count - 1)
+        ]
+    }
+
+
+def _residents(count, home="n0", work="n3", mode="transit"):
+    return [
+        {
+            "agent_type": "resident",
+            "agent_id": f"resident_{i}",
+            "persona_config": {"home_location": home, "work_location": work, "preferred_mode": mode}
+        }
+        for i in range(count)
+    ]
+
+
+def test_archetypes_share_reasoning():
+    """Residents with identical personas reason once per archetype"""
+    agents_config = _residents(5) + _residents(3, home="n3", work="n0", mode="car")
+    agents_config[5:] = [dict(c, agent_id=f"resident_{5 + i}") for i, c in enumerate(agents_config[5:])]
+    model = CityModel(
+        city_data=_city_data(),
+        scenario_config={},
+        agents_config=agents_config,
+        seed=42,
+        run_config={"archetypes": {"enabled": True, "fidelity_sample_rate": 1.0}}
+    )
+
+    model.step()
+
+    report = model.get_run_stats()["archetypes"]
+    assert report["residents"] == 8
+    assert report["archetypes"] == 2
+    assert report["reasoning_calls"] == 2
+    assert report["applied_decisions"] == 6
+    assert report["fidelity_samples"] == 6
+    assert all(len(agent.memory) == 1 for agent in model.agents.values())
+
+
+def test_archetype_members_keep_own_destination():
+    """Shared reasoning is re-targeted at each member's own locations"""
+    agents_config = _residents(2)
+    agents_config[1]["persona_config"] = {"home_location": "n0", "work_location": "n3", "preferred_mode": "transit"}
+    model = CityModel(
+        city_data=_city_data(),
+        scenario_config={},
+        agents_config=agents_config,
+        run_config={"archetypes": {"enabled": True, "perturbation": 0.0}}
+    )
+    reasoning = {"action_type": "move", "action_data": {"destination": "elsewhere", "mode": "bike"}}
+
+    adapted = model.agents["resident_1"].adapt_reasoning(reasoning)
+
+    assert adapted["action_data"] == {"destination": "n3", "mode": "bike"}
+    assert reasoning["action_data"]["destination"] == "elsewhere"
+
+
+def test_surrogate_serves_confident_decisions(tmp_path):
+    """Confident surrogate predictions skip reasoning and are tracked per run"""
+    from app.agents.surrogate import SurrogatePolicy, extract_features, features_to_matrix
+
+    rows = [
+        extract_features({"timestamp": {"hour": h}, "agent_state": {"preferred_mode": m, "current_mode": m}, "city_state": {}})
+        for m in ["car", "transit"] for h in range(24)
+    ]
+    SurrogatePolicy().fit(features_to_matrix(rows), ["car"] * 24 + ["transit"] * 24).save(tmp_path / "resident.json")
+
+    model = CityModel(
+        city_data=_city_data(),
+        scenario_config={},
+        agents_config=_residents(3, mode="car"),
+        run_config={"surrogate": {"enabled": True, "model_path": str(tmp_path / "resident.json"), "confidence_threshold": 0.6}}
+    )
+    model.step()
+
+    report = model.get_run_stats()["surrogate"]
+    assert report["served"] == 3
+    assert report["escalated"] == 0
+    resident = model.agents["resident_0"]
+    assert resident.memory[-1]["reasoning"]["source"] == "surrogate"
+    assert resident.state["current_mode"] == "car"
+    assert resident.state["current_location"] == "n3"
+
+
+def test_missing_surrogate_model_falls_back_to_reasoning(tmp_path):
+    """A run whose surrogate model file is missing still runs, with residents reasoning themselves"""
+    model = CityModel(
+        city_data=_city_data(),
+        scenario_config={},
+        agents_config=_residents(2, mode="car"),
+        run_config={"surrogate": {"enabled": True, "model_path": str(tmp_path / "missing.json")}}
+    )
+    model.step()
+
+    assert model.surrogate is None
+    assert model.agents["resident_0"].memory[-1]["reasoning"]["source"] == "rule"
+
+
+def test_agent_memory_is_slim_and_capped():
+    """Only the latest memory entry keeps the full perception, and memory stops at memory_limit steps"""
+    model = CityModel(city_data=_city_data(), scenario_config={}, agents_config=_residents(1))
+    resident = model.agents["resident_0"]
+    resident.memory_limit = 3
+    for _ in range(5):
+        model.step()
+
+    assert len(resident.memory) == 3
+    assert "city_state" in resident.memory[-1]["perception"]
+    older = resident.memory[0]["perception"]
+    assert set(older) == {"timestamp", "location", "agent_state"}
+    assert "current_location" in older["agent_state"]
+    assert "home_location" not in older["agent_state"]
+
+
+def test_synthetic_city_runs():
+    from benchmarks.synthetic import make_city, synthetic_population
+
+    city_data = make_city("osm", 400, seed=1)
+    agents_config = synthetic_population(city_data, 20, seed=1)
+    model = CityModel(city_data=city_data, scenario_config={}, agents_config=agents_config, seed=1)
+    model.step()
+    assert model.current_tick == 1
+    assert len(model.agents) == len(agents_config)
+
+
+def test_run_stats_include_phase_profile():
+    """Tick phases and agent steps are profiled into the run stats"""
+    model = CityModel(city_data=_city_data(), scenario_config={}, agents_config=_residents(3), seed=1)
+    model.step()
+    model.step()
+    profile = model.get_run_stats()["profile"]
+    assert profile["ticks"] == 2
+    assert profile["phases"]["agents"]["count"] == 2
+    assert profile["agents"]["resident.rule"]["count"] == 6
+
+
+def test_convergence_detects_steady_state():
+    """A KPI repeating its daily cycle converges; a trending one does not"""
+    import math
+    from app.simulation.convergence import ConvergenceMonitor, TICKS_PER_DAY
+    
+    def cycle(tick):
+        return 30 + 5 * math.sin(2 * math.pi * tick / TICKS_PER_DAY)
+    
+    monitor = ConvergenceMonitor(metrics=["avg_commute_time"])
+    trending = ConvergenceMonitor(metrics=["avg_commute_time"])
+    for tick in range(5 * TICKS_PER_DAY):
+        # First day is a warm-up far from the steady cycle
+        value = cycle(tick) + (20 if tick < TICKS_PER_DAY else 0)
+        monitor.observe(tick, {"avg_commute_time": value})
+        trending.observe(tick, {"avg_commute_time": cycle(tick) + tick / 100})
+        if monitor.converged:
+            break
+    
+    assert monitor.converged_tick == 3 * TICKS_PER_DAY - 1
+    assert [day["stable"] for day in monitor.report()["days"]] == [False, True]
+    assert not trending.converged
+
+
+def test_event_scheduling_only_steps_due_agents(monkeypatch):
+    """With events, residents decide at departures and operators at reviews, not every minute"""
+    from app.agents.resident import ResidentAgent
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", lambda self, perception: self._parse_llm_response("take the bus"))
+    
+    agents_config = _residents(3) + [{"agent_type": "orchestrator", "agent_id": "orchestrator_9"}]
+    model = CityModel(
+        city_data=_city_data(),
+        scenario_config={},
+        agents_config=agents_config,
+        seed=1,
+        run_config={"events": {"enabled": True, "leave_home": "07:30", "leave_work": "17:00"}}
+    )
+    for window_end in range(15, 24 * 60 + 1, 15):
+        model.advance_to(window_end)
+    
+    assert model.events.processed == {"departure": 6, "arrival": 6, "review": 24}
+    assert len(model.drain_actions()) == 6 + 24
+    assert model.agents["resident_0"].state["current_activity"] == "home"
+    assert model.city_state["transit_ridership"] == {"default": 0}
+    # 300m on the line graph at transit speed
+    assert model.city_state["avg_commute_time"] == pytest.approx(1.0)
+
+
+def test_event_departures_without_locations_wait(monkeypatch):
+    """A resident with no work location skips its trips instead of failing the run"""
+    from app.agents.resident import ResidentAgent
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", lambda self, perception: self._parse_llm_response("take the bus"))
+    
+    agents_config = _residents(1, work=None)
+    model = CityModel(
+        city_data=_city_data(),
+        scenario_config={},
+        agents_config=agents_config,
+        seed=1,
+        run_config={"events": {"enabled": True, "leave_home": "07:30", "leave_work": "17:00"}}
+    )
+    model.advance_to(2 * 24 * 60)
+    
+    assert model.events.processed["departure"] == 4
+    assert "arrival" not in model.events.processed
+
+
+def test_staged_scheduler_is_simultaneous_and_seeded():
+    """All agents perceive before any applies; shuffled activation order is reproducible per seed"""
+    def run(seed):
+        model = CityModel(
+            city_data=_city_data(), scenario_config={}, agents_config=_residents(6), seed=seed,
+            run_config={"scheduler": {"shuffle": True}}
+        )
+        model.step()
+        return model
+    
+    model = run(5)
+    assert len(model.schedule.of_type("resident")) == 6
+    assert model.schedule.steps == 1
+    assert all(len(agent.memory) == 1 for agent in model.agents.values())
+    # Every perception was taken from the same pre-step state
+    assert {agent.memory[0]["perception"]["agent_state"]["current_activity"] for agent in model.agents.values()} == {"home"}
+    
+    order = list(model.schedule.activation_order())
+    assert [a.agent_id for a in run(5).schedule.activation_order()] == [a.agent_id for a in order]
+    assert [a.agent_id for a in run(6).schedule.activation_order()] != [a.agent_id for a in order]
+
+
+def _random_mode_reason(self, perception):
+    """Rule-based reasoning that draws from the agent's step stream"""
+    mode = self.rng.choice(["car", "transit", "bike", "walk"])
+    return {"action_type": "move", "action_data": {"destination": None, "mode": mode}, "confidence": 0.5}
+
+
+def _parallel_run(run_config):
+    model = CityModel(city_data=_city_data(), scenario_config={}, agents_config=_residents(40), seed=3, run_config=run_config)
+    for _ in range(3):
+        model.step()
+    model.close()
+    return model
+
+
+def _modes(model):
+    return [m["action"]["action_data"]["mode"] for a in model.agents.values() for m in a.memory]
+
+
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_parallel_decisions_match_serial(start_method):
+    """Shipped residents draw their rule-based mode from the step stream, so pool workers decide exactly as serial"""
+    serial = _parallel_run({})
+    parallel = _parallel_run({"parallel": {"enabled": True, "workers": 2, "min_agents": 10, "start_method": start_method}})
+    assert parallel.get_run_stats()["parallel"]["agents"] == 120
+    assert _modes(parallel) == _modes(serial)
+    assert len(set(_modes(serial))) > 1
+
+
+def _parallel_in_daemon(queue):
+    serial = _parallel_run({})
+    parallel = _parallel_run({"parallel": {"enabled": True, "workers": 2, "min_agents": 10, "start_method": "fork"}})
+    queue.put((parallel.get_run_stats()["parallel"], _modes(parallel) == _modes(serial)))
+
+
+def test_parallel_decider_runs_in_daemonic_process():
+    """Celery prefork workers are daemonic; the billiard pool still starts there and decides as serial"""
+    import multiprocessing
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_parallel_in_daemon, args=(queue,), daemon=True)
+    process.start()
+    stats, matches = queue.get(timeout=120)
+    process.join()
+    assert not stats["disabled"] and stats["agents"] == 120
+    assert matches
+
+
+def _stream_draw(queue):
+    from app.core.rng import AGENT, stream_key, python_random
+    queue.put(python_random(stream_key(3, AGENT, "resident_0", 7)).random())
+
+
+def test_agent_streams_do_not_depend_on_order_or_process(monkeypatch):
+    import multiprocessing
+    from app.agents.resident import ResidentAgent
+    from app.core.rng import AGENT, stream_key, python_random
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", _random_mode_reason)
+
+    def run(shuffle):
+        model = CityModel(
+            city_data=_city_data(), scenario_config={}, agents_config=_residents(30), seed=3,
+            run_config={"scheduler": {"shuffle": shuffle}}
+        )
+        for _ in range(3):
+            model.step()
+        return {a.agent_id: [m["action"]["action_data"]["mode"] for m in a.memory] for a in model.agents.values()}
+
+    assert run(True) == run(False)
+    # Streams are derived from the key alone, not from per-process hash seeds or draw history
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    child = context.Process(target=_stream_draw, args=(queue,))
+    child.start()
+    assert queue.get(timeout=60) == python_random(stream_key(3, AGENT, "resident_0", 7)).random()
+    child.join(timeout=60)
+    assert python_random(stream_key(3, AGENT, "resident_1", 7)).random() != python_random(stream_key(3, AGENT, "resident_0", 7)).random()
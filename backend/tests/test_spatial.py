@@ -0,0 +1,55 @@
+"""
+Tests for the node spatial index and batch snapping
+"""
+import numpy as np
+
+from app.core.config import settings
+from app.models.data import CityData
+from app.simulation.city_model import CityModel
+from app.simulation.spatial import SpatialIndex, build_spatial_index
+from tests.test_simulation import _city_data
+
+
+def test_nearest_and_radius_queries():
+    index = SpatialIndex.from_nodes(_city_data(4)["nodes"])
+    # Nodes are ~111m apart along the equator
+    assert index.snap([0.0011, 0.0029], [0.0, 0.0001]) == ["n1", "n3"]
+    assert index.snap([0.01], [0.0], max_distance=500) == [None]
+    assert sorted(index.within([0.0015], [0.0], radius=100)[0]) == ["n1", "n2"]
+
+
+def test_model_snaps_coordinate_personas():
+    agents_config = [{
+        "agent_type": "resident",
+        "agent_id": "resident_0",
+        "persona_config": {"home_location": {"lat": 0.0, "lon": 0.0002}, "work_location": {"lat": 0.0, "lon": 0.0031}}
+    }]
+    model = CityModel(city_data=_city_data(), scenario_config={}, agents_config=agents_config, seed=1)
+    resident = model.agents["resident_0"]
+    assert resident.state["home_location"] == "n0"
+    assert resident.state["work_location"] == "n3"
+
+
+def test_snap_endpoint_uses_persisted_index(tmp_path, monkeypatch, sqlite_sessions, sqlite_client):
+    monkeypatch.setattr(settings, "PROCESSED_DATA_DIR", tmp_path)
+    db = sqlite_sessions()
+    geometry = _city_data()
+    city_data = CityData(name="line", data_type="osm", status="completed")
+    db.add(city_data)
+    db.flush()
+    geometry["spatial_index_path"] = build_spatial_index(city_data.id, geometry)
+    city_data.geometry = geometry
+    db.commit()
+    data_id = city_data.id
+    db.close()
+    
+    response = sqlite_client.post(
+        f"/api/v1/data/city/{data_id}/snap",
+        json={"lon": [0.0021, 1.0], "lat": [0.0, 0.0], "max_distance": 1000, "radius": 50}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["nodes"] == ["n2", None]
+    assert np.isclose(body["distances"][0], 11.13, atol=0.05)
+    assert body["distances"][1] is None
+    assert body["within"] == [["n2"], []]
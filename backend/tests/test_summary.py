@@ -0,0 +1,82 @@
+"""
+Tests for run summaries and cross-run comparison
+"""
+from app.models.scenario import Scenario, ScenarioRun
+from app.models.simulation import RunSummary
+from app.simulation.city_model import CityModel
+from app.simulation.summary import build_summary
+from tests.test_simulation import _city_data, _residents, _random_mode_reason
+
+
+def test_summary_groups_residents_by_persona_and_zone(monkeypatch):
+    from app.agents.resident import ResidentAgent
+    monkeypatch.setattr(ResidentAgent, "_simple_reason", _random_mode_reason)
+    agents_config = _residents(10) + _residents(5, home="n2", mode="car")
+    for i, agent in enumerate(agents_config):
+        agent["agent_id"] = f"resident_{i}"
+    model = CityModel(city_data=_city_data(), scenario_config={}, agents_config=agents_config, seed=2)
+    for _ in range(2):
+        model.step()
+    summary = build_summary(model, {"avg_commute_time": 12.0})
+    assert summary["kpis"]["avg_commute_time"] == 12.0
+    assert summary["series"]["hour"]["decisions"] == [30]
+    groups = summary["groups"]
+    assert {k: v["residents"] for k, v in groups["preferred_mode"].items()} == {"transit": 10, "car": 5}
+    assert sum(v["residents"] for v in groups["zone"].values()) == 15
+    transit_now = sum(agent.state["current_mode"] == "transit" for agent in model.schedule.of_type("resident"))
+    shares = groups["preferred_mode"]
+    assert round(shares["transit"]["transit_share"] * 10 + shares["car"]["transit_share"] * 5) == transit_now
+
+
+def _summary(run_id, scenario_id, commute, share, boardings):
+    series = {"start": [0, 1440], "decisions": [100, 100], "transit_modal_share": share, "boardings": boardings}
+    return RunSummary(
+        run_id=run_id, scenario_id=scenario_id, seed=1, avg_commute_time=commute, transit_modal_share=sum(share) / 2,
+        transit_ridership=sum(boardings), series={"day": series, "hour": series},
+        groups={"income": {"low": {"avg_commute_time": commute, "transit_share": share[0], "car_share": 0.5}}}
+    )
+
+
+def test_compare_and_list_runs_from_summaries(sqlite_sessions, sqlite_client):
+    db = sqlite_sessions()
+    scenario = Scenario(name="compare", policy_type="none", policy_config={})
+    db.add(scenario)
+    db.flush()
+    runs = [ScenarioRun(scenario_id=scenario.id, status="completed", seed=1) for _ in range(3)]
+    db.add_all(runs)
+    db.flush()
+    # The third run reused the second run's results
+    runs[2].source_run_id = runs[1].id
+    db.add(_summary(runs[0].id, scenario.id, 40.0, [0.2, 0.2], [20, 20]))
+    db.add(_summary(runs[1].id, scenario.id, 30.0, [0.3, 0.5], [30, 50]))
+    db.commit()
+    scenario_id, ids = scenario.id, [run.id for run in runs]
+    db.close()
+
+    client = sqlite_client
+    response = client.get("/api/v1/scenarios/runs/compare", params={"baseline": ids[0], "runs": [ids[1], ids[2]]})
+    assert response.status_code == 200
+    first, reused = response.json()["comparisons"]
+    assert first["kpis"]["avg_commute_time"] == {"value": 30.0, "baseline": 40.0, "diff": -10.0, "pct": -25.0}
+    assert first["series"]["boardings"] == [10, 30]
+    assert first["groups"]["income"]["low"]["transit_share"]["diff"] == 0.1
+    assert reused["run_id"] == ids[2] and reused["kpis"] == first["kpis"]
+    # Hourly comparisons without groups read neither the daily series nor the group outcomes
+    hourly = client.get(
+        "/api/v1/scenarios/runs/compare", params={"baseline": ids[0], "runs": [ids[1]], "resolution": "hour", "groups": False}
+    ).json()
+    [only] = hourly["comparisons"]
+    assert only["series"]["boardings"] == [10, 30] and not only.get("groups")
+
+    missing = client.get("/api/v1/scenarios/runs/compare", params={"baseline": ids[0], "runs": [999]})
+    assert missing.status_code == 404
+
+    listed = client.get("/api/v1/scenarios/runs/summaries", params={"sort_by": "avg_commute_time", "descending": False}).json()
+    assert [row["run_id"] for row in listed] == [ids[1], ids[0]]
+    assert "series" not in listed[0]
+    # Runs are listed newest first, without their metrics
+    latest = client.get(f"/api/v1/scenarios/{scenario_id}/runs", params={"limit": 1}).json()
+    assert [run["id"] for run in latest] == [ids[2]]
+    assert "metrics" not in latest[0]
+    page = client.get(f"/api/v1/scenarios/{scenario_id}/runs", params={"skip": 1, "limit": 1}).json()
+    assert [run["id"] for run in page] == [ids[1]]
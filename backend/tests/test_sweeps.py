@@ -0,0 +1,91 @@
+"""
+Tests for parameter sweep designs, refinement and aggregation
+"""
+import numpy as np
+import pytest
+
+from app.models.scenario import Scenario, ScenarioRun
+from app.models.simulation import SimulationMetrics
+from app.models.sweep import Sweep
+from app.simulation.city_model import CityModel
+from app.simulation.fingerprint import scenario_config_for
+from app.simulation.policy import check_levers
+from app.simulation.sweeps import ParameterSpace, grid_design, latin_hypercube, refine
+from app.tasks.sweeps import advance_sweep
+from tests.test_simulation import _city_data, _residents
+
+
+def test_designs_cover_the_space():
+    space = ParameterSpace({"price": {"min": 0, "max": 10}, "lanes": {"min": 1, "max": 4, "integer": True}})
+    assert len(grid_design(space, 3)) == 9
+    
+    samples = latin_hypercube(space, 8, seed=1)
+    prices = sorted(point["price"] for point in samples)
+    # One sample per stratum of each parameter
+    assert [int(price // 1.25) for price in prices] == list(range(8))
+    assert all(isinstance(point["lanes"], int) for point in samples)
+    assert latin_hypercube(space, 8, seed=1) == samples
+
+
+def test_refine_samples_around_a_step():
+    space = ParameterSpace({"price": {"min": 0, "max": 10}})
+    points = [{"price": float(p)} for p in np.linspace(0, 10, 11)]
+    values = [0.0 if point["price"] < 6 else 1.0 for point in points]
+    new_points = refine(space, points, values, count=1)
+    assert new_points == [{"price": 5.5}]
+
+
+def test_advance_sweep_aggregates_completed_runs(sqlite_sessions):
+    db = sqlite_sessions()
+    scenario = Scenario(name="s", policy_type="congestion_pricing", policy_config={})
+    db.add(scenario)
+    db.flush()
+    sweep = Sweep(
+        name="price", scenario_id=scenario.id, parameters={"price": {"min": 0, "max": 10}},
+        design="grid", design_size=2, target_kpi="equity_index", refine_rounds=0, max_runs=10,
+        current_round=0, simulation_days=7, seed=1, status="running"
+    )
+    db.add(sweep)
+    db.flush()
+    for price, equity in ((0, 0.4), (10, 0.9)):
+        run = ScenarioRun(
+            scenario_id=scenario.id, status="completed", seed=1, sweep_id=sweep.id, sweep_round=0,
+            run_config={"policy_overrides": {"price": price}}
+        )
+        db.add(run)
+        db.flush()
+        db.add(SimulationMetrics(run_id=run.id, equity_index=equity))
+    db.commit()
+    
+    sweep = advance_sweep(db, sweep.id)
+    assert sweep.status == "completed"
+    assert sweep.results["completed"] == 2
+    assert sweep.results["extremes"]["equity_index"] == {"min": {"price": 0}, "max": {"price": 10}}
+    db.close()
+
+
+def test_sweep_points_change_the_simulated_kpis():
+    """A swept lever reaches the residents' mode choice, so different points give different KPIs"""
+    scenario = Scenario(name="fares", policy_type="transit_improvement", policy_config={})
+    shares = []
+    for point in grid_design(ParameterSpace({"transit_fare": {"min": 0, "max": 20}}), 2):
+        model = CityModel(
+            city_data=_city_data(),
+            scenario_config=scenario_config_for(scenario, {"policy_overrides": point}),
+            agents_config=_residents(40),
+            seed=3
+        )
+        for _ in range(3):
+            model.step()
+        shares.append(model.kpis.report()["transit_modal_share"])
+    
+    assert shares[0] > shares[1]
+
+
+def test_sweeps_reject_parameters_the_model_does_not_read():
+    check_levers(["transit_fare", "congestion_charge"])
+    with pytest.raises(ValueError, match="Unknown"):
+        check_levers(["price"])
+    with pytest.raises(ValueError, match="transit"):
+        check_levers(["headway_scale"], {})
+    check_levers(["headway_scale"], {"transit": {"enabled": True}})
@@ -0,0 +1,46 @@
+"""
+Tests for trace sampling and Celery context propagation
+"""
+from types import SimpleNamespace
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.core import tracing
+
+exporter = InMemorySpanExporter()
+provider = TracerProvider()
+provider.add_span_processor(SimpleSpanProcessor(exporter))
+trace.set_tracer_provider(provider)
+
+
+def test_unsampled_ticks_drop_child_spans():
+    exporter.clear()
+    with tracing.tracer.start_as_current_span("simulation.run"):
+        for tick in range(4):
+            with tracing.sampled(tick % 2 == 0), tracing.tracer.start_as_current_span("simulation.tick"):
+                with tracing.tracer.start_as_current_span("db.save_agent_actions"):
+                    pass
+    names = [span.name for span in exporter.get_finished_spans()]
+    assert names.count("simulation.tick") == 2
+    assert names.count("db.save_agent_actions") == 2
+    assert names.count("simulation.run") == 1
+
+
+def test_celery_headers_carry_trace_context():
+    exporter.clear()
+    headers = {}
+    with tracing.tracer.start_as_current_span("POST /runs") as request_span:
+        tracing._on_before_task_publish(headers=headers)
+    trace_id = request_span.get_span_context().trace_id
+
+    task = SimpleNamespace(name="run_simulation", request=SimpleNamespace(**headers))
+    tracing._on_task_prerun(task_id="t1", task=task)
+    with tracing.tracer.start_as_current_span("simulation.run"):
+        pass
+    tracing._on_task_postrun(task_id="t1", state="SUCCESS")
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert spans["celery.run_simulation"].context.trace_id == trace_id
+    assert spans["simulation.run"].parent.span_id == spans["celery.run_simulation"].context.span_id
@@ -0,0 +1,80 @@
+"""
+Tests for traffic assignment
+"""
+import networkx as nx
+import numpy as np
+import pytest
+
+from app.simulation import traffic
+from app.simulation.city_model import CityModel
+from app.simulation.traffic import RoadNetwork, frank_wolfe
+
+
+def _two_routes():
+    """Origin o to destination d over a fast arterial (via a) or a slow local street (via b)"""
+    graph = nx.Graph()
+    graph.add_edge("o", "a", length=1000, highway="primary")
+    graph.add_edge("a", "d", length=1000, highway="primary")
+    graph.add_edge("o", "b", length=1000, highway="residential")
+    graph.add_edge("b", "d", length=1000, highway="residential")
+    return graph
+
+
+@pytest.mark.parametrize("backend", ["scipy", "networkx"])
+def test_frank_wolfe_reaches_wardrop_equilibrium(backend, monkeypatch):
+    if backend == "scipy":
+        pytest.importorskip("scipy")
+    else:
+        monkeypatch.setattr(traffic, "dijkstra", None)
+    network = RoadNetwork.from_graph(_two_routes())
+    assignment = frank_wolfe(network, [("o", "d", 3000.0)], max_iterations=200, gap=1e-5)
+    
+    def route(via):
+        first = network.link_ids(np.array([network.index["o"]]), np.array([network.index[via]]))[0]
+        second = network.link_ids(np.array([network.index[via]]), np.array([network.index["d"]]))[0]
+        return assignment.volumes[first], assignment.times[first] + assignment.times[second]
+    
+    fast_volume, fast_time = route("a")
+    slow_volume, slow_time = route("b")
+    # Both routes carry traffic and no driver can switch to a quicker one
+    assert fast_volume + slow_volume == pytest.approx(3000.0)
+    assert fast_volume > slow_volume > 0
+    assert fast_time == pytest.approx(slow_time, rel=1e-2)
+    assert assignment.relative_gap < 1e-3
+
+
+def test_congestion_reaches_resident_perception():
+    agents_config = [
+        {
+            "agent_type": "resident",
+            "agent_id": f"resident_{i}",
+            "persona_config": {"home_location": "o", "work_location": "d", "preferred_mode": "car"}
+        }
+        for i in range(4)
+    ]
+    graph = _two_routes()
+    city_data = {
+        "nodes": [{"id": node} for node in graph.nodes],
+        "edges": [{"source": u, "target": v, "weight": 1000, "attributes": data} for u, v, data in graph.edges(data=True)]
+    }
+    model = CityModel(
+        city_data=city_data,
+        scenario_config={},
+        agents_config=agents_config,
+        run_config={"traffic": {"enabled": True, "vehicles_per_agent": 1000}}
+    )
+    model.step()
+    
+    state = model.agents["resident_0"].state
+    assert state["car_commute_minutes"] > state["car_free_flow_minutes"] == pytest.approx(2.0)
+    assert model.city_state["traffic_level"] != "low"
+    assert model.get_run_stats()["traffic"]["assignments"] == 1
+
+
+def test_road_class_reads_osm_speed_units_and_lanes():
+    assert traffic.parse_maxspeed("30 mph") == pytest.approx(48.28, abs=0.01)
+    assert traffic.parse_maxspeed(["20mph", "30 mph"]) == pytest.approx(32.19, abs=0.01)
+    assert traffic.parse_maxspeed("50") == 50.0
+    assert traffic.parse_maxspeed("none") is None
+    speed, capacity = traffic._road_class({"highway": "primary", "maxspeed": "signals", "lanes": "4"})
+    assert (speed, capacity) == (60.0, 3600.0)
@@ -0,0 +1,103 @@
+"""
+Tests for GTFS compilation and RAPTOR routing
+"""
+import networkx as nx
+import numpy as np
+import pytest
+
+from app.data_ingestion.gtfs_loader import load_gtfs
+from app.simulation.raptor import Timetable, TransitModel, earliest_arrivals
+
+
+def _write_feed(path):
+    """Line R1 a-b-c every 10 minutes from 07:00, line R2 b-d every 20 minutes from 07:00"""
+    path.mkdir()
+    (path / "stops.txt").write_text(
+        "stop_id,stop_name,stop_lat,stop_lon\n"
+        "a,A,0.0,0.00\nb,B,0.0,0.02\nc,C,0.0,0.04\nd,D,0.02,0.02\n"
+    )
+    (path / "routes.txt").write_text("route_id,route_short_name\nR1,1\nR2,2\n")
+    (path / "calendar.txt").write_text(
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20240101,20241231\nWE,0,0,0,0,0,1,1,20240101,20241231\n"
+    )
+    trips, stop_times = ["route_id,service_id,trip_id"], ["trip_id,arrival_time,departure_time,stop_id,stop_sequence"]
+    for i in range(6):
+        start = 7 * 60 + 10 * i
+        trips.append(f"R1,WK,r1_{i}")
+        for seq, (stop, offset) in enumerate([("a", 0), ("b", 5), ("c", 10)]):
+            t = f"{(start + offset) // 60:02d}:{(start + offset) % 60:02d}:00"
+            stop_times.append(f"r1_{i},{t},{t},{stop},{seq}")
+    for i in range(3):
+        start = 7 * 60 + 20 * i
+        trips.append(f"R2,WK,r2_{i}")
+        for seq, (stop, offset) in enumerate([("b", 0), ("d", 6)]):
+            t = f"{(start + offset) // 60:02d}:{(start + offset) % 60:02d}:00"
+            stop_times.append(f"r2_{i},{t},{t},{stop},{seq}")
+    # A weekend trip that must not be compiled for weekdays
+    trips.append("R1,WE,r1_weekend")
+    stop_times += ["r1_weekend,06:00:00,06:00:00,a,0", "r1_weekend,06:05:00,06:05:00,b,1"]
+    (path / "trips.txt").write_text("\n".join(trips) + "\n")
+    (path / "stop_times.txt").write_text("\n".join(stop_times) + "\n")
+
+
+@pytest.fixture
+def timetable(tmp_path):
+    _write_feed(tmp_path / "feed")
+    summary = load_gtfs(tmp_path / "feed", tmp_path / "timetable.npz")
+    assert summary["metadata"]["trip_count"] == 9
+    return Timetable.load(tmp_path / "timetable.npz")
+
+
+def test_raptor_finds_transfers(timetable):
+    stop = timetable.stop_index
+    access = np.full((1, len(timetable.stop_ids)), np.inf)
+    access[0, stop["a"]] = 7 * 3600 + 60  # 07:01, misses the 07:00 trip
+    arrivals = earliest_arrivals(timetable, access)
+    assert arrivals[0, stop["c"]] == 7 * 3600 + 20 * 60
+    # 07:15 at b, then the 07:20 R2 trip to d
+    assert arrivals[0, stop["d"]] == 7 * 3600 + 26 * 60
+
+
+def test_headway_change_regenerates_route(timetable):
+    assert timetable.headway_minutes("R1") == 10
+    assert timetable.set_headway("R1", 25) == 1
+    assert timetable.headway_minutes("R1") == 25
+    stop = timetable.stop_index
+    access = np.full((1, len(timetable.stop_ids)), np.inf)
+    access[0, stop["a"]] = 7 * 3600 + 60
+    assert earliest_arrivals(timetable, access)[0, stop["c"]] == 7 * 3600 + 35 * 60
+
+
+def test_resident_commutes_computed_in_bulk(timetable):
+    graph = nx.Graph()
+    for node, lon in (("home", 0.0), ("work", 0.04)):
+        graph.add_node(node, x=lon, y=0.0)
+
+    class Resident:
+        def __init__(self):
+            self.state = {"current_location": "home", "home_location": "home", "work_location": "work", "current_activity": "home"}
+
+    residents = [Resident(), Resident()]
+    transit = TransitModel(timetable, graph)
+    transit.update(residents, 7 * 3600 + 60)
+    assert [r.state["transit_commute_minutes"] for r in residents] == [19.0, 19.0]
+
+
+def test_transit_config_needs_a_timetable():
+    with pytest.raises(ValueError, match="timetable_path or gtfs_city_data_id"):
+        TransitModel.from_config(nx.Graph(), {"enabled": True})
+
+
+def test_fingerprint_tracks_timetable_content(tmp_path):
+    from app.simulation.fingerprint import timetable_version
+    _write_feed(tmp_path / "feed")
+    load_gtfs(tmp_path / "feed", tmp_path / "timetable.npz")
+    run_config = {"transit": {"enabled": True, "timetable_path": str(tmp_path / "timetable.npz")}}
+    before = timetable_version(run_config)
+
+    # Reprocessing a changed feed rewrites the same file
+    stops = tmp_path / "feed" / "stops.txt"
+    stops.write_text(stops.read_text().replace("d,D,0.02,0.02", "d,D,0.03,0.02"))
+    load_gtfs(tmp_path / "feed", tmp_path / "timetable.npz")
+    assert before is not None and timetable_version(run_config) != before
@@ -4,6 +4,9 @@ import { useEffect, useState, useCallback } from 'react'
 import axios from 'axios'
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts'
 
+// Live series are thinned to every other point once they reach this size
+const MAX_LIVE_POINTS = 1000
+
 interface MetricsDashboardProps {
   scenarioId: number | null
 }
@@ -22,16 +25,23 @@ export default function MetricsDashboard({ scenarioId }: MetricsDashboardProps)
   const [metrics, setMetrics] = useState<Metrics | null>(null)
   const [timeSeries, setTimeSeries] = useState<any[]>([])
   const [loading, setLoading] = useState(false)
+  const [liveRunId, setLiveRunId] = useState<number | null>(null)
 
   const fetchMetrics = useCallback(async () => {
     if (!scenarioId) return
     setLoading(true)
     try {
       const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-      // Get latest run for scenario
-      const runsResponse = await axios.get(`${apiUrl}/api/v1/scenarios/${scenarioId}/runs`)
+      // Runs are listed newest first
+      const runsResponse = await axios.get(`${apiUrl}/api/v1/scenarios/${scenarioId}/runs?limit=1`)
       if (runsResponse.data.length > 0) {
         const latestRun = runsResponse.data[0]
+        if (latestRun.status === 'pending' || latestRun.status === 'running') {
+          // Live runs are followed through the progress stream below
+          setLiveRunId(latestRun.id)
+          return
+        }
+        setLiveRunId(null)
         const metricsResponse = await axios.get(`${apiUrl}/api/v1/simulations/runs/${latestRun.id}/metrics`)
         setMetrics(metricsResponse.data)
       }
@@ -46,9 +56,10 @@ export default function MetricsDashboard({ scenarioId }: MetricsDashboardProps)
     if (!scenarioId) return
     try {
       const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-      const runsResponse = await axios.get(`${apiUrl}/api/v1/scenarios/${scenarioId}/runs`)
+      const runsResponse = await axios.get(`${apiUrl}/api/v1/scenarios/${scenarioId}/runs?limit=1`)
       if (runsResponse.data.length > 0) {
         const latestRun = runsResponse.data[0]
+        if (latestRun.status === 'pending' || latestRun.status === 'running') return
         const statesResponse = await axios.get(`${apiUrl}/api/v1/simulations/runs/${latestRun.id}/states`)
         
         // Transform to time series
@@ -71,6 +82,43 @@ export default function MetricsDashboard({ scenarioId }: MetricsDashboardProps)
     fetchTimeSeries()
   }, [scenarioId, fetchMetrics, fetchTimeSeries])
 
+  useEffect(() => {
+    if (!liveRunId) return
+    const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
+    const source = new EventSource(`${apiUrl}/api/v1/simulations/runs/${liveRunId}/stream`)
+    let kpis: any = {}
+
+    const onProgress = (event: MessageEvent) => {
+      const message = JSON.parse(event.data)
+      kpis = { ...kpis, ...(message.kpis || {}), ...(message.kpi_delta || {}) }
+      setMetrics(kpis)
+      if (message.type === 'tick') {
+        setTimeSeries((series) => {
+          const kept = series.length >= MAX_LIVE_POINTS ? series.filter((_, i) => i % 2 === 1) : series
+          return [...kept, {
+            tick: message.tick,
+            commute_time: kpis.avg_commute_time || 0,
+            transit_ridership: kpis.transit_ridership || 0,
+            equity_index: kpis.equity_index || 0,
+          }]
+        })
+      }
+    }
+    const onDone = () => {
+      source.close()
+      setLiveRunId(null)
+      fetchMetrics()
+      fetchTimeSeries()
+    }
+
+    source.addEventListener('tick', onProgress)
+    source.addEventListener('completed', onDone)
+    source.addEventListener('failed', onDone)
+    source.addEventListener('stream_error', onDone)
+    source.addEventListener('error', () => source.readyState === EventSource.CLOSED && onDone())
+    return () => source.close()
+  }, [liveRunId, fetchMetrics, fetchTimeSeries])
+
 
   if (!scenarioId) {
     return (